@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from app.dashboard import schemas
+from app.dashboard.service import DashboardService, compute_etag, etag_matches, get_dashboard_service
+from app.user.router import get_current_user_dependency
+from app.user.schemas import UserResponse
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="",
+    tags=["dashboard"]
+)
+
+@router.get(
+    "/today",
+    response_model=schemas.TodayDashboardResponse,
+    summary="获取今日概览",
+    description="""
+    **首页一次请求获取今日数据**
+
+    包含今日营养摄入、每日推荐、运动 / 水分 / 用药汇总、智能提醒和下次胰岛素预测，
+    服务端并发查询。响应带 ETag，客户端携带 If-None-Match 重新请求时内容未变化返回 304。
+    本接口不安排胰岛素提醒通知（见 /api/records/predict-next-insulin）。
+    """,
+    responses={304: {"description": "内容未变化"}}
+)
+async def get_today_dashboard(
+    request: Request,
+    dashboard_service: DashboardService = Depends(get_dashboard_service),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """获取今日概览"""
+    try:
+        dashboard = await dashboard_service.get_today(current_user.id)
+    except Exception as e:
+        logger.error(f"Get today dashboard error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取今日概览失败: {str(e)}"
+        )
+    
+    body = dashboard.model_dump_json().encode()
+    etag = compute_etag(body)
+    # private：内容因用户而异；no-cache：每次使用前按 ETag 重新验证
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,24 @@
+"""首页今日概览相关的数据模型"""
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any
+from app.records.schemas import (
+    NextInsulinPredictionResponse,
+    SmartReminderResponse,
+    TodayExerciseSummary,
+    TodayMedicationSummary,
+    TodayWaterSummary,
+)
+
+class TodayDashboardResponse(BaseModel):
+    """今日概览（首页一次请求获取）
+
+    各部分互相独立，某一部分读取失败时为 null，其余部分照常返回。
+    """
+    date: str = Field(..., description="日期 (YYYY-MM-DD，UTC)")
+    nutrition_intake: Optional[Dict[str, Any]] = Field(None, description="今日营养摄入统计（同 /api/nutrition/today-intake）")
+    daily_recommendation: Optional[Dict[str, Any]] = Field(None, description="每日推荐营养摄入（同 /api/nutrition/daily-recommendation）")
+    exercise: Optional[TodayExerciseSummary] = Field(None, description="今日运动汇总")
+    water: Optional[TodayWaterSummary] = Field(None, description="今日水分摄入汇总")
+    medication: Optional[TodayMedicationSummary] = Field(None, description="今日用药汇总")
+    reminders: Optional[SmartReminderResponse] = Field(None, description="智能提醒")
+    next_insulin: Optional[NextInsulinPredictionResponse] = Field(None, description="下次胰岛素注射预测（未设置用户参数时为 null，不安排通知）")
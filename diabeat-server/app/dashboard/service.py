@@ -0,0 +1,83 @@
+"""首页今日概览
+
+首页原先需要分别请求今日营养摄入、每日推荐、运动 / 水分 / 用药汇总、智能
+提醒和下次胰岛素预测，每个请求各自认证、各自查询用户。这里只认证一次、
+加载一次用户信息和参数，其余查询用 asyncio.gather 并发执行（每个任务使用
+连接池中的独立连接）。
+"""
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Any, Awaitable, Dict
+from app.dashboard import schemas
+from app.nutrition.daily_recommendation import DailyNutritionRecommendation
+from app.records import crud as records_crud
+from app.records.schemas import SmartReminderResponse
+from app.records.service import RecordService
+from app.reminders.service import get_reminder_service
+from app.user import crud as user_crud
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def compute_etag(payload: bytes) -> str:
+    """响应内容的弱 ETag"""
+    return f'W/"{hashlib.sha1(payload).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 是否包含该 ETag（弱比较，支持多个值和 *）"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return "*" in candidates or any(
+        (tag[2:] if tag.startswith("W/") else tag) == bare for tag in candidates
+    )
+
+
+class DashboardService:
+    """今日概览服务"""
+
+    def __init__(self):
+        self.record_service = RecordService()
+        self.reminder_service = get_reminder_service()
+        self.daily_recommendation = DailyNutritionRecommendation()
+
+    async def get_today(self, user_id: str) -> schemas.TodayDashboardResponse:
+        """并发读取今日概览的各个部分"""
+        now = datetime.utcnow()
+        user_info, user_params = await user_crud.load_user_context(user_id)
+
+        parts: Dict[str, Awaitable[Any]] = {
+            "nutrition_intake": records_crud.get_today_nutrition_intake(user_id, now),
+            "daily_recommendation": self.daily_recommendation.get_user_daily_recommendation(
+                user_id, user_info, user_params
+            ),
+            "exercise": self.record_service.get_today_exercise_summary(user_id),
+            "water": self.record_service.get_today_water_summary(user_id),
+            "medication": self.record_service.get_today_medication_summary(user_id),
+            "reminders": self._reminders(user_id),
+        }
+        if user_params:
+            parts["next_insulin"] = self.record_service.predict_next_insulin_time(user_id, user_params)
+
+        results = await asyncio.gather(*parts.values(), return_exceptions=True)
+
+        dashboard: Dict[str, Any] = {"date": now.date().isoformat()}
+        for name, result in zip(parts, results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ 今日概览 {name} 读取失败: user={user_id}, {str(result)}")
+                continue
+            dashboard[name] = result
+        return schemas.TodayDashboardResponse(**dashboard)
+
+    async def _reminders(self, user_id: str) -> SmartReminderResponse:
+        result = await self.reminder_service.get_smart_reminders(user_id)
+        return SmartReminderResponse(**result)
+
+
+def get_dashboard_service() -> DashboardService:
+    """获取今日概览服务实例"""
+    return DashboardService()
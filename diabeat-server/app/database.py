@@ -14,12 +14,35 @@ logger = logging.getLogger(__name__)
 DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
 DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5))
 
+# 多 worker 部署（见 gunicorn_conf.py）：DB_CONNECTION_BUDGET 为整个集群
+# （APP_INSTANCES 个实例 x 每个实例 WEB_CONCURRENCY 个 worker）可用的数据库连接总数，
+# 按 worker 均分；每个 worker 预留 1 个连接用于单例任务的主节点选举（app.utils.leader）
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", 0))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+APP_INSTANCES = int(os.getenv("APP_INSTANCES", 1))
+
+
+def worker_pool_size() -> int:
+    """每个 worker 连接池的最大连接数（未设置 DB_CONNECTION_BUDGET 时为 DB_POOL_SIZE + DB_MAX_OVERFLOW）"""
+    if DB_CONNECTION_BUDGET <= 0:
+        return DB_POOL_SIZE + DB_MAX_OVERFLOW
+    per_worker = DB_CONNECTION_BUDGET // (WEB_CONCURRENCY * APP_INSTANCES) - 1
+    if per_worker < 2:
+        logger.warning(
+            f"⚠️ 数据库连接预算 {DB_CONNECTION_BUDGET} 不足以分配给 "
+            f"{APP_INSTANCES} x {WEB_CONCURRENCY} 个 worker，每个 worker 至少使用 2 个连接"
+        )
+    return max(per_worker, 2)
+
+
+DB_MAX_CONNECTIONS = worker_pool_size()
+
 # 创建数据库实例，配置连接池
 # 注意：asyncpg 不支持 pool_pre_ping 参数
 database = Database(
     settings.DATABASE_URL,
-    min_size=5,
-    max_size=DB_POOL_SIZE + DB_MAX_OVERFLOW
+    min_size=min(5, DB_MAX_CONNECTIONS),
+    max_size=DB_MAX_CONNECTIONS
 )
 
 # Redis缓存配置
@@ -57,7 +80,7 @@ async def close_redis():
         except Exception as e:
             logger.warning(f"⚠️ Redis连接池关闭失败: {str(e)}")
 
-# SQLAlchemy配置
+# SQLAlchemy配置（仅用于开发环境的 create_all，连接按需创建，不计入连接预算）
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=settings.debug,  # 在开发环境打印SQL语句
@@ -111,66 +134,33 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
-async def execute_query(query, values=None, cache_key=None, cache_ttl=300):
+async def execute_query(query, values=None, cache_key=None, cache_ttl=300, cache_tags=()):
     """
     执行SQL查询的通用函数，支持结果缓存
     
     Args:
         query: SQL查询语句
         values: 查询参数
-        cache_key: 缓存键（可选）
+        cache_key: 缓存键（可选）；提供时按 fetch_all 读取，结果以字典列表缓存（见 app.utils.cache）
         cache_ttl: 缓存过期时间（秒，默认5分钟）
+        cache_tags: 缓存失效标签（可选）
         
     Returns:
-        查询结果
+        查询结果（使用缓存时为字典列表）
     """
-    # 如果提供了缓存键，尝试从缓存获取
-    if cache_key:
-        redis = await get_redis()
-        if redis:
-            try:
-                cached_result = await redis.get(cache_key)
-                if cached_result:
-                    import json
-                    logger.debug(f"从缓存获取查询结果: {cache_key}")
-                    return json.loads(cached_result)
-            except Exception as e:
-                logger.warning(f"缓存读取失败: {str(e)}")
-    
-    # 执行数据库查询
     db = await get_database()
-    if values:
-        result = await db.execute(query, values)
-    else:
-        result = await db.execute(query)
+    if not cache_key:
+        if values:
+            return await db.execute(query, values)
+        return await db.execute(query)
+    
+    from app.utils.cache import query_cache
     
-    # 如果提供了缓存键，将结果存入缓存
-    if cache_key:
-        redis = await get_redis()
-        if redis:
-            try:
-                import json
-                # 将查询结果转换为可序列化的格式
-                # 注意：这取决于查询结果的类型，可能需要根据实际情况调整
-                if hasattr(result, '_mapping'):
-                    # 单条记录
-                    serializable_result = dict(result._mapping)
-                elif hasattr(result, 'all'):
-                    # 多条记录
-                    serializable_result = [dict(row._mapping) for row in result.all()]
-                else:
-                    serializable_result = result
-                
-                await redis.setex(
-                    cache_key,
-                    cache_ttl,
-                    json.dumps(serializable_result, default=str)
-                )
-                logger.debug(f"查询结果已缓存: {cache_key}, TTL: {cache_ttl}秒")
-            except Exception as e:
-                logger.warning(f"缓存写入失败: {str(e)}")
+    async def load():
+        rows = await db.fetch_all(query, values)
+        return [dict(row) for row in rows]
     
-    return result
+    return await query_cache.get_or_load("query", cache_key, load, ttl=cache_ttl, tags=cache_tags)
 
 
 async def transaction(func):
@@ -1,6 +1,5 @@
 from abc import ABC, abstractmethod
 from typing import List, Tuple
-from PIL import Image
 
 class FoodClassifierBase(ABC):
     """食物分类器基类"""
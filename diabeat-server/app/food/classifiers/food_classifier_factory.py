@@ -1,11 +1,9 @@
 from typing import Optional
 from app.config import settings
 from .food_classifier_base import FoodClassifierBase
-from .openai_food_classifier import OpenAIFoodClassifier
-from .qwen_food_classifier import QwenFoodClassifier
 
 class FoodClassifierFactory:
-    """食物分类器工厂"""
+    """食物分类器工厂（各分类器及其 SDK 在创建时才导入）"""
     
     @staticmethod
     def create(classifier_type: Optional[str] = None) -> FoodClassifierBase:
@@ -19,8 +17,10 @@ class FoodClassifierFactory:
         """
         provider = (classifier_type or settings.FOOD_CLASSIFIER_PROVIDER).lower()
         if provider == "openai":
+            from .openai_food_classifier import OpenAIFoodClassifier
             return OpenAIFoodClassifier()
         if provider == "qwen":
+            from .qwen_food_classifier import QwenFoodClassifier
             return QwenFoodClassifier()
         raise ValueError(f"Unknown classifier type: {provider}")
 
@@ -1,8 +1,8 @@
 import base64
 import json
 from typing import List, Tuple
-from openai import OpenAI
 from app.config import settings
+from app.llm import llm_client, LLMOverloadedError, PROVIDER_OPENAI, PRIORITY_RECOGNITION
 from .food_classifier_base import FoodClassifierBase
 
 class OpenAIFoodClassifier(FoodClassifierBase):
@@ -11,7 +11,6 @@ class OpenAIFoodClassifier(FoodClassifierBase):
     def __init__(self):
         if not settings.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY not configured")
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
     
     async def identify(self, image_data: bytes) -> Tuple[List[str], float]:
         """使用 OpenAI Vision 识别食物"""
@@ -20,9 +19,10 @@ class OpenAIFoodClassifier(FoodClassifierBase):
             base64_image = base64.b64encode(image_data).decode('utf-8')
             
             # 调用 OpenAI Vision API
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
+            content = await llm_client.chat(
+                PROVIDER_OPENAI,
+                "gpt-4o",
+                [
                     {
                         "role": "user",
                         "content": [
@@ -47,11 +47,10 @@ class OpenAIFoodClassifier(FoodClassifierBase):
                         ]
                     }
                 ],
+                PRIORITY_RECOGNITION,
                 max_tokens=1000
             )
             
-            # 解析响应
-            content = response.choices[0].message.content
             # 尝试提取 JSON
             if "```json" in content:
                 content = content.split("```json")[1].split("```")[0].strip()
@@ -67,6 +66,8 @@ class OpenAIFoodClassifier(FoodClassifierBase):
             
             return food_names, total_confidence
             
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             # 如果识别失败，返回默认值
             return ["未知食物"], 0.5
@@ -1,4 +1,5 @@
 from typing import List
+import math
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status, Query
 from app.food import schemas, service
 from app.food.service import FoodService
@@ -7,6 +8,7 @@ from app.storage.local import LocalStorageProvider
 from app.user.router import get_current_user_dependency
 from app.user.schemas import UserResponse
 from app.config import settings
+from app.llm import LLMOverloadedError
 import logging
 
 logger = logging.getLogger(__name__)
@@ -131,6 +133,13 @@ async def recognize_food(
         
     except HTTPException:
         raise
+    except LLMOverloadedError as e:
+        retry_after = max(1, math.ceil(e.estimated_wait))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"识别服务繁忙，请约 {retry_after} 秒后重试",
+            headers={"Retry-After": str(retry_after)}
+        )
     except Exception as e:
         logger.error(f"Food recognition error: {str(e)}")
         raise HTTPException(
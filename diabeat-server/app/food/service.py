@@ -121,15 +121,14 @@ class FoodService:
             
             # 获取用户信息和参数，计算建议食用量
             logger.info(f"👤 获取用户信息: user_id={user_id}")
-            user_info = await user_crud.get_user_by_id(user_id) or {}
-            user_params = await user_crud.get_user_parameters(user_id)
+            user_info, user_params = await user_crud.load_user_context(user_id)
             logger.info(f"📋 用户信息: diabetes_type={user_info.get('diabetes_type')}, gender={user_info.get('gender')}")
             
             # 获取今日剩余营养额度
             from app.nutrition.daily_recommendation import DailyNutritionRecommendation
             from app.records import crud as records_crud
             daily_rec = DailyNutritionRecommendation()
-            daily_recommendation = daily_rec.calculate_daily_recommendation(user_info, user_params)
+            daily_recommendation = await daily_rec.get_user_daily_recommendation(user_id, user_info, user_params)
             today_intake = await records_crud.get_today_nutrition_intake(user_id, datetime.utcnow())
             
             remaining_nutrition = {
@@ -0,0 +1 @@
+# Continuous glucose readings module
@@ -0,0 +1,173 @@
+"""CGM 血糖分析报告
+
+基于每日统计（见 app.glucose.stats）计算，90 天报告只读取 90 行：
+
+- 目标范围内外时间占比（TIR / TBR / TAR，按读数数量计）
+- 平均血糖、标准差、变异系数（CV）、GMI、估算糖化血红蛋白（eA1c）
+- 低 / 高血糖事件次数
+- 按一天中各小时的 AGP 百分位带（由按小时直方图合并后插值）
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Sequence
+import numpy as np
+from app.glucose import stats
+from app.glucose.ingest import MGDL_PER_MMOL
+
+# AGP 百分位
+AGP_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def gmi_percent(mean_mmol: float) -> float:
+    """血糖管理指标 GMI（%）= 3.31 + 0.02392 x 平均血糖（mg/dL）"""
+    return 3.31 + 0.02392 * mean_mmol * MGDL_PER_MMOL
+
+
+def ea1c_percent(mean_mmol: float) -> float:
+    """估算糖化血红蛋白（ADAG 公式，%）= (平均血糖 mg/dL + 46.7) / 28.7"""
+    return (mean_mmol * MGDL_PER_MMOL + 46.7) / 28.7
+
+
+def histogram_percentiles(histograms: np.ndarray, percentiles: Sequence[float]) -> np.ndarray:
+    """按行由直方图计算百分位（区间内线性插值）
+
+    Args:
+        histograms: (行数, HIST_BINS) 计数
+        percentiles: 0-100
+
+    Returns:
+        (行数, 百分位数) 血糖值，没有读数的行为 NaN
+    """
+    counts = histograms.astype(np.float64)
+    cumulative = np.cumsum(counts, axis=1)
+    totals = cumulative[:, -1:]
+    targets = totals * (np.asarray(percentiles, dtype=np.float64) / 100)
+    rows = np.arange(counts.shape[0])[:, None]
+    # 第一个累计数 >= 目标值的区间
+    bins = (cumulative[:, None, :] < targets[:, :, None]).sum(axis=2)
+    bins = np.minimum(bins, stats.HIST_BINS - 1)
+    before = np.where(bins > 0, cumulative[rows, np.maximum(bins - 1, 0)], 0.0)
+    in_bin = counts[rows, bins]
+    fraction = np.divide(targets - before, in_bin, out=np.zeros_like(targets), where=in_bin > 0)
+    values = stats.HIST_MIN + (bins + np.clip(fraction, 0, 1)) * stats.HIST_BIN
+    values[totals[:, 0] == 0] = np.nan
+    return values
+
+
+def _round(value: Optional[float], digits: int = 1) -> Optional[float]:
+    if value is None or not np.isfinite(value):
+        return None
+    return round(float(value), digits)
+
+
+def build_report(
+    rows: Sequence[Any],
+    start_date: date,
+    end_date: date,
+    utc_offset_hours: int = 0
+) -> Dict[str, Any]:
+    """由每日统计行生成分析报告
+
+    Args:
+        rows: stats.get_daily_stats 返回的行
+        utc_offset_hours: AGP 按本地时间展示的时区偏移（小时）
+    """
+    report: Dict[str, Any] = {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "days": (end_date - start_date).days + 1,
+        "days_with_data": len(rows),
+        "reading_count": 0,
+        "mean_bg": None,
+        "sd": None,
+        "cv": None,
+        "gmi": None,
+        "ea1c": None,
+        "min_bg": None,
+        "max_bg": None,
+        "time_very_low": 0.0,
+        "time_low": 0.0,
+        "time_in_range": 0.0,
+        "time_high": 0.0,
+        "time_very_high": 0.0,
+        "hypo_events": 0,
+        "hyper_events": 0,
+        "agp": [],
+        "daily": [],
+    }
+    if not rows:
+        return report
+
+    columns = {
+        name: np.array([row[name] for row in rows], dtype=np.float64)
+        for name in stats.STATS_COLUMNS if name != "hourly_histogram"
+    }
+    counts = columns["reading_count"]
+    n = counts.sum()
+    if n == 0:
+        return report
+
+    mean = columns["bg_sum"].sum() / n
+    variance = (columns["bg_sum_sq"].sum() - n * mean * mean) / (n - 1) if n > 1 else 0.0
+    sd = float(np.sqrt(max(variance, 0.0)))
+
+    report.update({
+        "reading_count": int(n),
+        "mean_bg": _round(mean),
+        "sd": _round(sd, 2),
+        "cv": _round(sd / mean * 100 if mean > 0 else None),
+        "gmi": _round(gmi_percent(mean)),
+        "ea1c": _round(ea1c_percent(mean)),
+        "min_bg": _round(columns["bg_min"].min()),
+        "max_bg": _round(columns["bg_max"].max()),
+        "time_very_low": round(columns["very_low_count"].sum() / n, 4),
+        "time_low": round(columns["low_count"].sum() / n, 4),
+        "time_in_range": round(columns["in_range_count"].sum() / n, 4),
+        "time_high": round(columns["high_count"].sum() / n, 4),
+        "time_very_high": round(columns["very_high_count"].sum() / n, 4),
+        "hypo_events": int(columns["hypo_events"].sum()),
+        "hyper_events": int(columns["hyper_events"].sum()),
+    })
+
+    # 合并各天的按小时直方图，按时区偏移旋转为本地小时
+    hourly = np.zeros((stats.HOURS, stats.HIST_BINS), dtype=np.int64)
+    for row in rows:
+        hourly += stats.decode_histogram(row["hourly_histogram"])
+    hourly = np.roll(hourly, utc_offset_hours % stats.HOURS, axis=0)
+    bands = histogram_percentiles(hourly, AGP_PERCENTILES)
+    hour_counts = hourly.sum(axis=1)
+    report["agp"] = [
+        {
+            "hour": hour,
+            "reading_count": int(hour_counts[hour]),
+            **{f"p{p}": _round(bands[hour, i]) for i, p in enumerate(AGP_PERCENTILES)},
+        }
+        for hour in range(stats.HOURS)
+    ]
+
+    daily_mean = columns["bg_sum"] / np.maximum(counts, 1)
+    daily_tir = columns["in_range_count"] / np.maximum(counts, 1)
+    report["daily"] = [
+        {
+            "date": row["date"].isoformat(),
+            "reading_count": int(counts[i]),
+            "mean_bg": _round(daily_mean[i]),
+            "time_in_range": round(float(daily_tir[i]), 4),
+            "hypo_events": int(columns["hypo_events"][i]),
+            "hyper_events": int(columns["hyper_events"][i]),
+        }
+        for i, row in enumerate(rows)
+    ]
+    return report
+
+
+async def get_report(
+    user_id: str,
+    days: int = 14,
+    end_date: Optional[date] = None,
+    utc_offset_hours: int = 0
+) -> Dict[str, Any]:
+    """最近 days 天（截至 end_date，含当天）的分析报告（日期按 UTC 划分）"""
+    end_date = end_date or datetime.utcnow().date()
+    start_date = end_date - timedelta(days=days - 1)
+    rows = await stats.get_daily_stats(user_id, start_date, end_date)
+    return build_report(rows, start_date, end_date, utc_offset_hours)
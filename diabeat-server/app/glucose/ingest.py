@@ -0,0 +1,222 @@
+"""连续血糖（CGM）读数批量写入
+
+CGM 每 1-5 分钟产生一条读数，逐条 INSERT 跟不上。一批读数的处理流程：
+
+1. 校验（NumPy 向量化）：单位换算、数值范围、时间范围，批内同一测量时间只保留第一条
+2. 确保读数所在月份的分区存在（进程内缓存已确认的月份）
+3. 一条多行 INSERT（unnest 数组参数）写入，(user_id, measured_at) 冲突时跳过
+4. 重算涉及日期的每日统计（见 app.glucose.stats）
+
+写入按 (user_id, measured_at) 幂等，客户端重传同一批数据是安全的；
+重传时同样会重算每日统计，上次重算失败的日期借此恢复一致。
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from asyncpg.exceptions import CheckViolationError
+from app.glucose.stats import refresh_daily_stats
+from app.monitoring.metrics import GLUCOSE_READINGS_INGESTED
+from app.records import queries
+import logging
+
+logger = logging.getLogger(__name__)
+
+# mg/dL -> mmol/L
+MGDL_PER_MMOL = 18.0182
+UNIT_FACTORS = {"mmol/l": 1.0, "mg/dl": 1 / MGDL_PER_MMOL}
+
+# 有效血糖范围（mmol/L），超出范围的多为传感器错误值
+BG_MIN = 1.0
+BG_MAX = 35.0
+# 允许的时钟偏差：测量时间不能晚于当前时间太多
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+# 最多回填多久以前的数据
+MAX_BACKFILL = timedelta(days=365)
+# 存储精度（mmol/L 小数位）
+VALUE_PRECISION = 2
+
+INSERT_READINGS = queries.register("glucose_insert_readings", """
+    INSERT INTO glucose_readings (user_id, measured_at, bg_value, source, device_id)
+    SELECT $1, t.measured_at, t.bg_value, $4, $5
+    FROM unnest($2::timestamp[], $3::float4[]) AS t(measured_at, bg_value)
+    ON CONFLICT (user_id, measured_at) DO NOTHING
+""")
+
+ENSURE_PARTITION = queries.register("glucose_ensure_partition", """
+    SELECT ensure_glucose_partition($1::date)
+""")
+
+
+class PreparedReadings:
+    """校验后的一批读数（按测量时间升序）"""
+
+    __slots__ = ("measured_at", "values", "rejections", "duplicates")
+
+    def __init__(
+        self,
+        measured_at: np.ndarray,
+        values: np.ndarray,
+        rejections: List[Tuple[int, str]],
+        duplicates: int
+    ):
+        self.measured_at = measured_at    # datetime64[s]，UTC
+        self.values = values              # float64，mmol/L
+        self.rejections = rejections      # [(请求中的下标, 原因)]
+        self.duplicates = duplicates      # 批内重复的读数数量
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def days(self) -> List[date]:
+        """读数涉及的日期（UTC）"""
+        return np.unique(self.measured_at.astype("datetime64[D]")).tolist()
+
+    def months(self) -> List[date]:
+        """读数涉及的月份（各月第一天）"""
+        return np.unique(self.measured_at.astype("datetime64[M]")).astype("datetime64[D]").tolist()
+
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = _EPOCH.replace(tzinfo=timezone.utc)
+
+
+def _epoch_seconds(measured_at: Sequence[datetime]) -> np.ndarray:
+    """测量时间 -> UTC 秒（datetime64[s]，截断到秒）
+
+    不带时区的时间按 UTC 处理。逐个做 datetime 减法比直接用 datetime
+    对象构造 datetime64 数组快一个数量级。
+    """
+    seconds = np.fromiter(
+        ((t - (_EPOCH if t.tzinfo is None else _EPOCH_UTC)).total_seconds() for t in measured_at),
+        dtype=np.float64,
+        count=len(measured_at)
+    )
+    return np.floor(seconds).astype(np.int64).astype("datetime64[s]")
+
+
+def prepare_readings(
+    measured_at: Sequence[datetime],
+    values: Sequence[float],
+    unit: str = "mmol/L",
+    now: Optional[datetime] = None
+) -> PreparedReadings:
+    """校验并规范化一批读数
+
+    测量时间转换为 UTC 并截断到秒；数值换算为 mmol/L。
+
+    Raises:
+        ValueError: 单位不支持或两个序列长度不一致
+    """
+    factor = UNIT_FACTORS.get(unit.lower())
+    if factor is None:
+        raise ValueError(f"不支持的血糖单位: {unit}（支持 mmol/L、mg/dL）")
+    if len(measured_at) != len(values):
+        raise ValueError("measured_at 与 values 长度不一致")
+
+    now = now or datetime.utcnow()
+    times = _epoch_seconds(measured_at)
+    bg = np.asarray(values, dtype=np.float64) * factor
+
+    reasons: Dict[str, np.ndarray] = {
+        "血糖值无效": ~np.isfinite(bg),
+        f"血糖值超出有效范围（{BG_MIN}-{BG_MAX} mmol/L）": (bg < BG_MIN) | (bg > BG_MAX),
+        "测量时间晚于当前时间": times > np.datetime64(now + MAX_CLOCK_SKEW, "s"),
+        f"测量时间早于 {MAX_BACKFILL.days} 天前": times < np.datetime64(now - MAX_BACKFILL, "s"),
+    }
+    rejected = np.zeros(bg.shape, dtype=bool)
+    rejections: List[Tuple[int, str]] = []
+    for reason, mask in reasons.items():
+        mask = mask & ~rejected
+        rejections.extend((int(index), reason) for index in np.flatnonzero(mask))
+        rejected |= mask
+    rejections.sort()
+
+    valid = np.flatnonzero(~rejected)
+    # np.unique 返回每个测量时间首次出现的位置，结果按时间升序
+    _, first = np.unique(times[valid], return_index=True)
+    keep = valid[first]
+    return PreparedReadings(
+        measured_at=times[keep],
+        values=np.round(bg[keep], VALUE_PRECISION),
+        rejections=rejections,
+        duplicates=int(valid.shape[0] - keep.shape[0])
+    )
+
+
+class GlucoseIngestor:
+    """血糖读数批量写入"""
+
+    def __init__(self):
+        # 已确认存在的分区月份
+        self._partitions: Set[date] = set()
+
+    async def ensure_partitions(self, months: Sequence[date]):
+        for month in months:
+            if month in self._partitions:
+                continue
+            await queries.execute(ENSURE_PARTITION, month)
+            self._partitions.add(month)
+
+    async def write(
+        self,
+        user_id: str,
+        readings: PreparedReadings,
+        source: str = "cgm",
+        device_id: Optional[str] = None
+    ) -> int:
+        """写入校验后的读数并重算每日统计，返回新写入的数量（已存在的测量时间被跳过）"""
+        if not len(readings):
+            return 0
+        months = readings.months()
+        await self.ensure_partitions(months)
+        args = (
+            user_id,
+            readings.measured_at.astype("datetime64[us]").tolist(),
+            readings.values.tolist(),
+            source,
+            device_id,
+        )
+        try:
+            status = await queries.execute(INSERT_READINGS, *args)
+        except CheckViolationError:
+            # 分区被删除（如数据保留清理）后缓存失效，重建分区后重试一次
+            logger.warning(f"⚠️ 血糖读数分区缺失，重建后重试: {months}")
+            self._partitions.difference_update(months)
+            await self.ensure_partitions(months)
+            status = await queries.execute(INSERT_READINGS, *args)
+        await refresh_daily_stats(user_id, readings.days())
+        return int(status.split()[-1])
+
+    async def ingest(
+        self,
+        user_id: str,
+        measured_at: Sequence[datetime],
+        values: Sequence[float],
+        unit: str = "mmol/L",
+        source: str = "cgm",
+        device_id: Optional[str] = None
+    ) -> Dict[str, object]:
+        """校验并写入一批读数
+
+        Returns:
+            received / inserted / duplicates / rejected / rejections
+        """
+        readings = prepare_readings(measured_at, values, unit)
+        inserted = await self.write(user_id, readings, source, device_id)
+        duplicates = readings.duplicates + len(readings) - inserted
+        rejected = len(readings.rejections)
+
+        GLUCOSE_READINGS_INGESTED.labels(outcome="inserted").inc(inserted)
+        GLUCOSE_READINGS_INGESTED.labels(outcome="duplicate").inc(duplicates)
+        GLUCOSE_READINGS_INGESTED.labels(outcome="rejected").inc(rejected)
+        return {
+            "received": len(values),
+            "inserted": inserted,
+            "duplicates": duplicates,
+            "rejected": rejected,
+            "rejections": readings.rejections,
+        }
+
+
+# 模块级单例
+glucose_ingestor = GlucoseIngestor()
@@ -0,0 +1,114 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from datetime import date
+from typing import Optional
+from app.glucose import schemas
+from app.glucose.service import GlucoseService
+from app.user.router import get_current_user_dependency
+from app.user.schemas import UserResponse
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="",
+    tags=["glucose"]
+)
+
+def get_glucose_service() -> GlucoseService:
+    """获取血糖读数服务实例"""
+    return GlucoseService()
+
+@router.post(
+    "/readings/batch",
+    response_model=schemas.GlucoseIngestResponse,
+    summary="批量写入血糖读数",
+    description="""
+    **批量上传连续血糖监测（CGM）或血糖仪读数**
+    
+    ### 功能特性
+    - 📦 单次最多 10000 条读数，一条语句写入
+    - 🔁 按测量时间去重（精确到秒），重复上传同一批数据是安全的
+    - 📏 支持 mmol/L 和 mg/dL，统一换算为 mmol/L 保存
+    - ✅ 逐条校验数值和时间范围，未通过的读数单独返回，不影响其余读数
+    """,
+    responses={
+        400: {
+            "description": "请求参数错误（单位或数据来源不支持）"
+        },
+        401: {
+            "description": "未授权"
+        }
+    }
+)
+async def ingest_glucose_readings(
+    request: schemas.GlucoseReadingBatch,
+    glucose_service: GlucoseService = Depends(get_glucose_service),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """
+    批量写入血糖读数 API
+    
+    替代逐条提交实测血糖，供 CGM 设备同步使用。
+    """
+    try:
+        logger.info(f"🩸 血糖读数批量写入: user={current_user.id}, count={len(request.readings)}, source={request.source}")
+        return await glucose_service.ingest_readings(request=request, user_id=current_user.id)
+        
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Glucose ingest error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"血糖读数写入失败: {str(e)}"
+        )
+
+@router.get(
+    "/analytics",
+    response_model=schemas.GlucoseAnalyticsResponse,
+    summary="CGM 血糖分析报告",
+    description="""
+    **基于连续血糖读数的分析报告**
+    
+    ### 功能特性
+    - 🎯 目标范围内外时间占比（TIR / TBR / TAR）
+    - 📊 平均血糖、标准差、变异系数（CV）、GMI、估算糖化血红蛋白
+    - ⚠️ 低血糖 / 高血糖事件次数（越界持续 15 分钟以上）
+    - 🕐 按一天中各小时的 AGP 百分位带（5 / 25 / 50 / 75 / 95）
+    - ⚡ 基于预计算的每日统计，不扫描原始读数
+    
+    日期按 UTC 划分；AGP 的小时可通过 utc_offset_hours 换算为本地时间。
+    """,
+    responses={
+        401: {
+            "description": "未授权"
+        }
+    }
+)
+async def get_glucose_analytics(
+    days: int = Query(14, ge=1, le=90, description="报告天数（含结束日期当天）"),
+    end_date: Optional[date] = Query(None, description="结束日期（YYYY-MM-DD，默认今天）"),
+    utc_offset_hours: int = Query(0, ge=-12, le=14, description="AGP 本地时区偏移（小时），如北京时间为 8"),
+    glucose_service: GlucoseService = Depends(get_glucose_service),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """
+    CGM 血糖分析报告 API
+    """
+    try:
+        return await glucose_service.get_analytics(
+            user_id=current_user.id,
+            days=days,
+            end_date=end_date,
+            utc_offset_hours=utc_offset_hours
+        )
+        
+    except Exception as e:
+        logger.error(f"Glucose analytics error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取血糖分析报告失败: {str(e)}"
+        )
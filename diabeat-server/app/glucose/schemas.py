@@ -0,0 +1,74 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+# 单次批量写入的读数上限（约 7 天的 1 分钟 CGM 数据）
+MAX_BATCH_READINGS = 10000
+
+class GlucoseReading(BaseModel):
+    """单条血糖读数"""
+    measured_at: datetime = Field(..., description="测量时间（ISO格式，不带时区时按 UTC）")
+    value: float = Field(..., description="血糖值，单位见 unit")
+
+class GlucoseReadingBatch(BaseModel):
+    """血糖读数批量写入请求"""
+    readings: List[GlucoseReading] = Field(..., min_length=1, max_length=MAX_BATCH_READINGS, description="血糖读数（顺序不限）")
+    unit: str = Field("mmol/L", description="血糖单位: mmol/L 或 mg/dL")
+    source: str = Field("cgm", description="数据来源: cgm/meter/manual")
+    device_id: Optional[str] = Field(None, max_length=64, description="设备标识（可选）")
+
+class GlucoseReadingRejection(BaseModel):
+    """被拒绝的读数"""
+    index: int = Field(..., description="读数在请求中的下标")
+    reason: str = Field(..., description="拒绝原因")
+
+class GlucoseIngestResponse(BaseModel):
+    """血糖读数批量写入响应"""
+    received: int = Field(..., description="收到的读数数量")
+    inserted: int = Field(..., description="新写入的读数数量")
+    duplicates: int = Field(..., description="重复（同一测量时间已存在）而跳过的读数数量")
+    rejected: int = Field(..., description="校验未通过的读数数量")
+    rejections: List[GlucoseReadingRejection] = Field(default_factory=list, description="被拒绝的读数（最多列出 100 条）")
+
+class GlucoseAGPHour(BaseModel):
+    """一天中某个小时的 AGP 百分位带（mmol/L，没有读数时为空）"""
+    hour: int = Field(..., description="小时（0-23，按 utc_offset_hours 换算后的本地时间）")
+    reading_count: int = Field(..., description="该小时的读数数量")
+    p5: Optional[float] = Field(None, description="第 5 百分位")
+    p25: Optional[float] = Field(None, description="第 25 百分位")
+    p50: Optional[float] = Field(None, description="中位数")
+    p75: Optional[float] = Field(None, description="第 75 百分位")
+    p95: Optional[float] = Field(None, description="第 95 百分位")
+
+class GlucoseDailySummary(BaseModel):
+    """单日血糖概况"""
+    date: str = Field(..., description="日期 (YYYY-MM-DD，UTC)")
+    reading_count: int = Field(..., description="读数数量")
+    mean_bg: Optional[float] = Field(None, description="平均血糖（mmol/L）")
+    time_in_range: float = Field(..., description="目标范围内（3.9-10.0）时间占比（0-1）")
+    hypo_events: int = Field(0, description="低血糖事件次数")
+    hyper_events: int = Field(0, description="高血糖事件次数")
+
+class GlucoseAnalyticsResponse(BaseModel):
+    """CGM 血糖分析报告"""
+    start_date: str = Field(..., description="开始日期 (YYYY-MM-DD，UTC)")
+    end_date: str = Field(..., description="结束日期 (YYYY-MM-DD，UTC，含当天)")
+    days: int = Field(..., description="报告天数")
+    days_with_data: int = Field(..., description="有读数的天数")
+    reading_count: int = Field(..., description="读数总数")
+    mean_bg: Optional[float] = Field(None, description="平均血糖（mmol/L）")
+    sd: Optional[float] = Field(None, description="标准差（mmol/L）")
+    cv: Optional[float] = Field(None, description="变异系数（%），≤36% 视为血糖稳定")
+    gmi: Optional[float] = Field(None, description="血糖管理指标 GMI（%）")
+    ea1c: Optional[float] = Field(None, description="估算糖化血红蛋白 eA1c（%）")
+    min_bg: Optional[float] = Field(None, description="最低血糖（mmol/L）")
+    max_bg: Optional[float] = Field(None, description="最高血糖（mmol/L）")
+    time_very_low: float = Field(0.0, description="< 3.0 mmol/L 时间占比（0-1）")
+    time_low: float = Field(0.0, description="3.0-3.8 mmol/L 时间占比（0-1）")
+    time_in_range: float = Field(0.0, description="3.9-10.0 mmol/L 时间占比（0-1）")
+    time_high: float = Field(0.0, description="10.1-13.9 mmol/L 时间占比（0-1）")
+    time_very_high: float = Field(0.0, description="> 13.9 mmol/L 时间占比（0-1）")
+    hypo_events: int = Field(0, description="低血糖事件次数（< 3.9 持续 15 分钟以上）")
+    hyper_events: int = Field(0, description="高血糖事件次数（> 13.9 持续 15 分钟以上）")
+    agp: List[GlucoseAGPHour] = Field(default_factory=list, description="按小时的 AGP 百分位带（24 项，无读数时为空列表）")
+    daily: List[GlucoseDailySummary] = Field(default_factory=list, description="有读数的每日概况")
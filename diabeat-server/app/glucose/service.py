@@ -0,0 +1,68 @@
+from datetime import date
+from typing import Optional
+from app.glucose.schemas import (
+    GlucoseReadingBatch,
+    GlucoseIngestResponse,
+    GlucoseReadingRejection,
+    GlucoseAnalyticsResponse,
+)
+from app.glucose.ingest import glucose_ingestor
+from app.glucose import analytics
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 支持的数据来源
+SOURCES = ("cgm", "meter", "manual")
+# 响应中最多列出的被拒绝读数
+MAX_REPORTED_REJECTIONS = 100
+
+class GlucoseService:
+    """连续血糖读数服务"""
+    
+    async def ingest_readings(
+        self,
+        request: GlucoseReadingBatch,
+        user_id: str
+    ) -> GlucoseIngestResponse:
+        """批量写入血糖读数
+        
+        Raises:
+            ValueError: 单位或数据来源不支持
+        """
+        source = request.source.lower()
+        if source not in SOURCES:
+            raise ValueError(f"不支持的数据来源: {request.source}（支持 {', '.join(SOURCES)}）")
+        
+        result = await glucose_ingestor.ingest(
+            user_id=user_id,
+            measured_at=[reading.measured_at for reading in request.readings],
+            values=[reading.value for reading in request.readings],
+            unit=request.unit,
+            source=source,
+            device_id=request.device_id
+        )
+        if result["rejected"]:
+            logger.info(f"⚠️ 血糖读数校验未通过: user={user_id}, rejected={result['rejected']}")
+        
+        return GlucoseIngestResponse(
+            received=result["received"],
+            inserted=result["inserted"],
+            duplicates=result["duplicates"],
+            rejected=result["rejected"],
+            rejections=[
+                GlucoseReadingRejection(index=index, reason=reason)
+                for index, reason in result["rejections"][:MAX_REPORTED_REJECTIONS]
+            ]
+        )
+    
+    async def get_analytics(
+        self,
+        user_id: str,
+        days: int = 14,
+        end_date: Optional[date] = None,
+        utc_offset_hours: int = 0
+    ) -> GlucoseAnalyticsResponse:
+        """获取最近 days 天的 CGM 分析报告"""
+        report = await analytics.get_report(user_id, days, end_date, utc_offset_hours)
+        return GlucoseAnalyticsResponse(**report)
@@ -0,0 +1,249 @@
+"""每日血糖统计（glucose_daily_stats）
+
+分析报告只读取每日统计行，不再扫描原始读数。读数写入后按天重算受影响的
+日期（NumPy 向量化）：读出这些日期的原始读数，计算分档计数、和 / 平方和、
+最值、低 / 高血糖事件和按小时的血糖直方图，整行覆盖写入。
+
+整天重算而非增量累加，乱序上传、回填和重复读数都不需要特殊处理；同一用户
+的重算用事务级咨询锁串行化，最后一次重算总能看到之前所有已提交的读数。
+
+低 / 高血糖事件：低于 3.9（高于 13.9）持续 15 分钟以上记为一次事件，
+两次越界读数之间间隔超过 15 分钟（恢复正常或数据中断）视为事件结束。
+事件计入持续满 15 分钟的那一天，因此重算某天时需要多读前一天末尾的
+读数，并同时重算后一天。
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+from app.database import database
+from app.records import queries
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 血糖分档阈值（mmol/L）
+VERY_LOW = 3.0
+LOW = 3.9
+HIGH = 10.0
+VERY_HIGH = 13.9
+
+# 事件判定（秒）
+EVENT_MIN_SECONDS = 15 * 60
+EVENT_GAP_SECONDS = 15 * 60
+# 重算某天时向前多读的时长，足以判断跨日事件的起点
+EVENT_LOOKBACK = timedelta(seconds=EVENT_MIN_SECONDS + EVENT_GAP_SECONDS)
+
+# 按小时直方图：0.2 mmol/L 一个区间，从 1.0 开始，共 170 个（覆盖到 35.0）
+HIST_MIN = 1.0
+HIST_BIN = 0.2
+HIST_BINS = 170
+HOURS = 24
+
+SECONDS_PER_DAY = 86400
+EPOCH_DATE = date(1970, 1, 1)
+
+STATS_COLUMNS = (
+    "reading_count", "bg_sum", "bg_sum_sq", "bg_min", "bg_max",
+    "very_low_count", "low_count", "in_range_count", "high_count", "very_high_count",
+    "hypo_events", "hyper_events", "hourly_histogram",
+)
+
+LOCK_USER = queries.register("glucose_stats_lock", """
+    SELECT pg_advisory_xact_lock(hashtextextended('glucose_daily_stats:' || $1::text, 0))
+""")
+
+READINGS_RANGE = queries.register("glucose_readings_range", """
+    SELECT
+        COALESCE(array_agg(extract(epoch FROM measured_at)::float8 ORDER BY measured_at), '{}') AS times,
+        COALESCE(array_agg(bg_value::float8 ORDER BY measured_at), '{}') AS bg_values
+    FROM glucose_readings
+    WHERE user_id = $1 AND measured_at >= $2 AND measured_at < $3
+""")
+
+UPSERT_STATS = queries.register("glucose_stats_upsert", """
+    INSERT INTO glucose_daily_stats AS s (
+        user_id, date, reading_count, bg_sum, bg_sum_sq, bg_min, bg_max,
+        very_low_count, low_count, in_range_count, high_count, very_high_count,
+        hypo_events, hyper_events, hourly_histogram, updated_at
+    )
+    SELECT $1, t.*, CURRENT_TIMESTAMP
+    FROM unnest(
+        $2::date[], $3::int[], $4::float8[], $5::float8[], $6::float4[], $7::float4[],
+        $8::int[], $9::int[], $10::int[], $11::int[], $12::int[],
+        $13::int[], $14::int[], $15::bytea[]
+    ) AS t
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        reading_count = EXCLUDED.reading_count,
+        bg_sum = EXCLUDED.bg_sum,
+        bg_sum_sq = EXCLUDED.bg_sum_sq,
+        bg_min = EXCLUDED.bg_min,
+        bg_max = EXCLUDED.bg_max,
+        very_low_count = EXCLUDED.very_low_count,
+        low_count = EXCLUDED.low_count,
+        in_range_count = EXCLUDED.in_range_count,
+        high_count = EXCLUDED.high_count,
+        very_high_count = EXCLUDED.very_high_count,
+        hypo_events = EXCLUDED.hypo_events,
+        hyper_events = EXCLUDED.hyper_events,
+        hourly_histogram = EXCLUDED.hourly_histogram,
+        updated_at = EXCLUDED.updated_at
+""")
+
+STATS_RANGE = queries.register("glucose_stats_range", f"""
+    SELECT date, {", ".join(STATS_COLUMNS)}
+    FROM glucose_daily_stats
+    WHERE user_id = $1 AND date >= $2 AND date <= $3
+    ORDER BY date
+""")
+
+
+def day_number(day: date) -> int:
+    return (day - EPOCH_DATE).days
+
+
+def event_times(times: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """越界持续满 EVENT_MIN_SECONDS 的时刻（每次事件一个）
+
+    Args:
+        times: 升序的 UTC 秒
+        mask: 越界的读数
+    """
+    t = times[mask]
+    if t.size == 0:
+        return t
+    starts = np.ones(t.size, dtype=bool)
+    starts[1:] = np.diff(t) > EVENT_GAP_SECONDS
+    start_index = np.flatnonzero(starts)
+    end_index = np.append(start_index[1:], t.size) - 1
+    durations = t[end_index] - t[start_index]
+    return t[start_index][durations >= EVENT_MIN_SECONDS] + EVENT_MIN_SECONDS
+
+
+def histogram_bins(values: np.ndarray) -> np.ndarray:
+    return np.clip(((values - HIST_MIN) / HIST_BIN).astype(np.int64), 0, HIST_BINS - 1)
+
+
+def compute_daily_stats(times: np.ndarray, values: np.ndarray, days: Sequence[date]) -> List[Dict[str, Any]]:
+    """计算指定日期的每日统计
+
+    Args:
+        times: 升序的 UTC 秒（应包含各日期之前 EVENT_LOOKBACK 的读数）
+        values: 血糖值（mmol/L）
+        days: 需要计算的日期
+
+    Returns:
+        有读数的日期的统计行（字段见 STATS_COLUMNS，另含 date）
+    """
+    targets = np.unique(np.array([day_number(day) for day in days], dtype=np.int64))
+    reading_days = times.astype(np.int64) // SECONDS_PER_DAY
+    slot = np.searchsorted(targets, reading_days)
+    slot_clipped = np.minimum(slot, targets.size - 1)
+    selected = targets[slot_clipped] == reading_days
+    slot = slot_clipped[selected]
+    t = times[selected]
+    v = values[selected]
+    size = targets.size
+
+    def per_day(weights=None, dtype=np.int64) -> np.ndarray:
+        return np.bincount(slot, weights=weights, minlength=size).astype(dtype)
+
+    counts = per_day()
+    very_low = v < VERY_LOW
+    low = (v >= VERY_LOW) & (v < LOW)
+    in_range = (v >= LOW) & (v <= HIGH)
+    high = (v > HIGH) & (v <= VERY_HIGH)
+
+    # 读数按时间升序，同一天的读数连续，reduceat 按天取最值
+    present = np.flatnonzero(counts)
+    boundaries = np.searchsorted(slot, present)
+    bg_min = np.zeros(size)
+    bg_max = np.zeros(size)
+    if present.size:
+        bg_min[present] = np.minimum.reduceat(v, boundaries)
+        bg_max[present] = np.maximum.reduceat(v, boundaries)
+
+    def events_per_day(mask: np.ndarray) -> np.ndarray:
+        qualified = event_times(times, mask).astype(np.int64) // SECONDS_PER_DAY
+        index = np.searchsorted(targets, qualified)
+        index_clipped = np.minimum(index, size - 1)
+        hits = index_clipped[targets[index_clipped] == qualified]
+        return np.bincount(hits, minlength=size)
+
+    hypo_events = events_per_day(values < LOW)
+    hyper_events = events_per_day(values > VERY_HIGH)
+
+    hours = (t.astype(np.int64) % SECONDS_PER_DAY) // 3600
+    flat = (slot * HOURS + hours) * HIST_BINS + histogram_bins(v)
+    histograms = np.bincount(flat, minlength=size * HOURS * HIST_BINS).reshape(size, HOURS * HIST_BINS)
+    histograms = np.minimum(histograms, np.iinfo(np.uint16).max).astype("<u2")
+
+    columns = {
+        "reading_count": counts,
+        "bg_sum": per_day(v, np.float64),
+        "bg_sum_sq": per_day(v * v, np.float64),
+        "bg_min": bg_min,
+        "bg_max": bg_max,
+        "very_low_count": per_day(very_low.astype(np.float64)),
+        "low_count": per_day(low.astype(np.float64)),
+        "in_range_count": per_day(in_range.astype(np.float64)),
+        "high_count": per_day(high.astype(np.float64)),
+        "very_high_count": per_day((v > VERY_HIGH).astype(np.float64)),
+        "hypo_events": hypo_events,
+        "hyper_events": hyper_events,
+    }
+    rows = []
+    for index in present:
+        row = {"date": EPOCH_DATE + timedelta(days=int(targets[index]))}
+        for name, column in columns.items():
+            row[name] = column[index].item()
+        row["hourly_histogram"] = histograms[index].tobytes()
+        rows.append(row)
+    return rows
+
+
+def decode_histogram(raw: bytes) -> np.ndarray:
+    """hourly_histogram -> (24, HIST_BINS) 计数矩阵"""
+    return np.frombuffer(raw, dtype="<u2").reshape(HOURS, HIST_BINS)
+
+
+def _spans(days: Sequence[date]) -> List[Tuple[date, date]]:
+    """把日期合并为连续区间（含两端），避免稀疏回填时读取大段无关数据"""
+    spans: List[Tuple[date, date]] = []
+    for day in sorted(set(days)):
+        if spans and day - spans[-1][1] <= timedelta(days=1):
+            spans[-1] = (spans[-1][0], day)
+        else:
+            spans.append((day, day))
+    return spans
+
+
+async def refresh_daily_stats(user_id: str, days: Sequence[date]) -> int:
+    """重算用户指定日期（及各自后一天）的每日统计，返回写入的行数"""
+    if not days:
+        return 0
+    affected = set(days) | {day + timedelta(days=1) for day in days}
+    rows: List[Dict[str, Any]] = []
+    async with database.transaction():
+        await queries.execute(LOCK_USER, user_id)
+        for first, last in _spans(affected):
+            start = datetime.combine(first, datetime.min.time())
+            record = await queries.fetchrow(
+                READINGS_RANGE, user_id, start - EVENT_LOOKBACK, start + timedelta(days=(last - first).days + 1)
+            )
+            times = np.asarray(record["times"], dtype=np.float64)
+            values = np.asarray(record["bg_values"], dtype=np.float64)
+            span_days = [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+            rows.extend(compute_daily_stats(times, values, [day for day in span_days if day in affected]))
+        if rows:
+            await queries.execute(
+                UPSERT_STATS,
+                user_id,
+                [row["date"] for row in rows],
+                *[[row[name] for row in rows] for name in STATS_COLUMNS]
+            )
+    return len(rows)
+
+
+async def get_daily_stats(user_id: str, start_date: date, end_date: date) -> List[Any]:
+    """读取日期范围内的每日统计行（没有读数的日期不返回）"""
+    return await queries.fetch(STATS_RANGE, user_id, start_date, end_date)
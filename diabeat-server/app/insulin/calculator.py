@@ -58,7 +58,8 @@ class InsulinCalculator:
         meal_time: Optional[str] = None,
         gi_value: Optional[float] = None,
         max_dose: Optional[float] = None,
-        min_dose: float = 0.5
+        min_dose: float = 0.5,
+        insulin_on_board: float = 0.0
     ) -> Dict[str, Any]:
         """计算胰岛素剂量
         
@@ -73,6 +74,7 @@ class InsulinCalculator:
             gi_value: 升糖指数（可选）
             max_dose: 最大剂量（可选）
             min_dose: 最小剂量
+            insulin_on_board: 之前注射仍在作用的胰岛素（单位），从校正剂量中扣除
             
         Returns:
             Dict: 计算结果
@@ -88,6 +90,14 @@ class InsulinCalculator:
             bg_diff = current_bg - target_bg
             correction_insulin = bg_diff / isf if isf > 0 else 0
         
+        # 2.1 扣除活性胰岛素（只抵消校正部分，不减少覆盖本餐碳水的剂量）
+        iob_adjustment = min(correction_insulin, max(insulin_on_board, 0.0))
+        correction_insulin -= iob_adjustment
+        if iob_adjustment > 0:
+            warnings.append(f"体内仍有约 {round(insulin_on_board, 1)} 单位活性胰岛素，已从校正剂量中扣除")
+        elif insulin_on_board >= 0.05:
+            warnings.append(f"体内仍有约 {round(insulin_on_board, 1)} 单位活性胰岛素，注意叠加低血糖风险")
+        
         # 3. 活动水平调整
         activity_factor = self.ACTIVITY_FACTORS.get(activity_level.lower(), 1.0)
         activity_adjustment = (carb_insulin + correction_insulin) * (activity_factor - 1.0)
@@ -134,6 +144,8 @@ class InsulinCalculator:
             "carb_insulin": round(carb_insulin, 2),
             "correction_insulin": round(correction_insulin, 2),
             "activity_adjustment": round(activity_adjustment, 2),
+            "insulin_on_board": round(insulin_on_board, 2),
+            "iob_adjustment": round(iob_adjustment, 2),
             "injection_timing": injection_timing,
             "split_dose": split_dose,
             "risk_level": risk_level,
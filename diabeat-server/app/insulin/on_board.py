@@ -0,0 +1,343 @@
+"""活性胰岛素（IOB）/ 活性碳水（COB）追踪
+
+每个用户在 Redis 列表（不可用时退回进程内 deque）中保存最近的注射和进食
+事件，容量固定（环形缓冲区）。写入注射 / 用餐记录时追加事件，
+读取时用 time_aware_predictor 预先生成的衰减曲线表对缓冲区内的事件求和，
+剂量计算和预测不必每次回扫历史记录。
+
+缓冲区首次使用或过期后从数据库回填一次（只读作用时间内的少量记录）。
+追加不论缓冲区是否已回填都会写入，回填时与缓冲区中已有的事件按记录ID合并，
+读取数据库与写入回填结果之间提交的注射不会丢失，也不会重复计算。
+
+用药记录中类型为 insulin 的记录不区分基础 / 餐时胰岛素（剂量单位也不一定是
+单位），不能按速效曲线计算，不计入活性胰岛素；餐时注射通过注射记录写入。
+"""
+import json
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from app.database import get_redis
+from app.records import queries
+from app.prediction.time_aware_predictor import (
+    CARB_PROFILES,
+    DEFAULT_INSULIN_TYPE,
+    INSULIN_PROFILES,
+    gi_band,
+    time_aware_predictor,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 每个用户保留的最近事件数
+RING_SIZE = 32
+# 回填时向前查找的时间（覆盖最长的胰岛素作用时间和碳水吸收时间）
+LOOKBACK_MINUTES = max(
+    max(duration for _, duration in INSULIN_PROFILES.values()),
+    max(duration for _, duration in CARB_PROFILES.values())
+)
+# Redis 缓冲区有效期，过期后从数据库重新回填
+REDIS_TTL_SECONDS = 6 * 3600
+# 进程内缓冲区有效期：多进程部署时其他进程的写入不会到达这里，缩短有效期定期回填
+MEMORY_TTL_SECONDS = 60
+
+KEY_PREFIX = "onboard"
+
+INSULIN = "insulin"
+CARBS = "carbs"
+
+ONBOARD_INJECTIONS = queries.register("onboard_injections", f"""
+    SELECT
+        id::text AS id,
+        injection_time AS event_time,
+        actual_dose::float8 AS amount,
+        insulin_record_id::text AS ref
+    FROM insulin_injection_records
+    WHERE user_id = $1 AND injection_time >= $2
+    ORDER BY injection_time DESC
+    LIMIT {RING_SIZE}
+""")
+
+ONBOARD_MEALS = queries.register("onboard_meals", f"""
+    SELECT
+        mr.id::text AS id,
+        mr.meal_time AS event_time,
+        nr.total_carbs::float8 AS amount,
+        nr.gi_value::float8 AS gi_value,
+        mr.nutrition_record_id::text AS ref
+    FROM meal_records mr
+    JOIN nutrition_records nr ON mr.nutrition_record_id = nr.id
+    WHERE mr.user_id = $1 AND mr.meal_time >= $2
+    ORDER BY mr.meal_time DESC
+    LIMIT {RING_SIZE}
+""")
+
+NUTRITION_CARBS = queries.register("onboard_nutrition_carbs", """
+    SELECT total_carbs::float8 AS total_carbs, gi_value::float8 AS gi_value
+    FROM nutrition_records
+    WHERE id = $1
+""")
+
+# 回填：与缓冲区中已有的事件按记录ID合并（回填结果优先），按时间倒序保留最新的若干条，返回合并结果
+# KEYS[1]: 缓冲区, KEYS[2]: 回填标记
+# ARGV[1]: 容量, ARGV[2]: 有效期（秒）, ARGV[3..]: 回填事件（JSON）
+SEED_SCRIPT = """
+local events = {}
+local seen = {}
+local function add(raw)
+    local event = cjson.decode(raw)
+    if not seen[event.id] then
+        seen[event.id] = true
+        table.insert(events, {event.t, raw})
+    end
+end
+for i = 3, #ARGV do
+    add(ARGV[i])
+end
+for _, raw in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+    add(raw)
+end
+table.sort(events, function(a, b) return a[1] > b[1] end)
+redis.call('DEL', KEYS[1])
+for i = 1, math.min(#events, tonumber(ARGV[1])) do
+    redis.call('RPUSH', KEYS[1], events[i][2])
+end
+if #events > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+redis.call('SETEX', KEYS[2], ARGV[2], 1)
+return redis.call('LRANGE', KEYS[1], 0, -1)
+"""
+
+
+def _timestamp(value: datetime) -> float:
+    """数据库中的时间为不带时区的 UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def make_event(
+    kind: str,
+    record_id: str,
+    event_time: datetime,
+    amount: float,
+    profile: str,
+    ref: Optional[str] = None
+) -> Dict[str, Any]:
+    """构造缓冲区事件（键名保持简短，减少 Redis 存储）"""
+    return {"k": kind, "id": record_id, "t": _timestamp(event_time), "a": amount, "p": profile, "r": ref}
+
+
+def merge_events(
+    seeded: List[Dict[str, Any]],
+    existing: Iterable[Dict[str, Any]],
+    size: int = RING_SIZE
+) -> List[Dict[str, Any]]:
+    """合并回填事件和缓冲区中已有的事件（按记录ID去重，最新的在前）"""
+    merged = {}
+    for event in list(seeded) + list(existing):
+        merged.setdefault(event["id"], event)
+    return sorted(merged.values(), key=lambda event: event["t"], reverse=True)[:size]
+
+
+def compute_on_board(
+    events: Iterable[Dict[str, Any]],
+    now: float,
+    exclude_refs: Iterable[str] = ()
+) -> Dict[str, Any]:
+    """按衰减曲线表对事件求和
+
+    Args:
+        events: 缓冲区事件
+        now: 当前时间戳（秒）
+        exclude_refs: 不计入的关联记录ID（如正在预测的本餐营养记录，避免重复计算）
+    """
+    excluded = set(ref for ref in exclude_refs if ref)
+    seen = set()
+    insulin_on_board = 0.0
+    carbs_on_board = 0.0
+    last_insulin_at = None
+    for event in events:
+        if event["id"] in seen or event.get("r") in excluded:
+            continue
+        seen.add(event["id"])
+        minutes = (now - event["t"]) / 60
+        if minutes < 0:
+            continue
+        if event["k"] == INSULIN:
+            tables = time_aware_predictor.insulin_tables.get(event["p"]) or time_aware_predictor.insulin_tables[DEFAULT_INSULIN_TYPE]
+            insulin_on_board += event["a"] * tables["iob"].at(minutes)
+            if last_insulin_at is None or event["t"] > last_insulin_at:
+                last_insulin_at = event["t"]
+        else:
+            tables = time_aware_predictor.carb_tables.get(event["p"]) or time_aware_predictor.carb_tables["medium"]
+            carbs_on_board += event["a"] * (1 - tables["absorbed"].at(minutes))
+
+    return {
+        "insulin_on_board": round(insulin_on_board, 2),
+        "carbs_on_board": round(carbs_on_board, 1),
+        "minutes_since_insulin": int((now - last_insulin_at) // 60) if last_insulin_at is not None else None,
+    }
+
+
+class MemoryRingStore:
+    """进程内环形缓冲区（Redis 不可用时使用）"""
+
+    def __init__(self, size: int = RING_SIZE, ttl_seconds: int = MEMORY_TTL_SECONDS):
+        self.size = size
+        self.ttl_seconds = ttl_seconds
+        self._buffers: Dict[str, deque] = {}
+        self._expires: Dict[str, float] = {}
+
+    async def load(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        """返回缓冲区事件；未回填或已过期时返回 None"""
+        if self._expires.get(user_id, 0) <= time.monotonic():
+            return None
+        return list(self._buffers[user_id])
+
+    async def seed(self, user_id: str, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """写入回填结果（与回填期间追加的事件合并），返回合并后的事件"""
+        merged = merge_events(events, self._buffers.get(user_id, ()), self.size)
+        self._buffers[user_id] = deque(merged, maxlen=self.size)
+        self._expires[user_id] = time.monotonic() + self.ttl_seconds
+        return merged
+
+    async def append(self, user_id: str, event: Dict[str, Any]):
+        """追加事件（最新的在前）；未回填时保留到回填时合并"""
+        self._buffers.setdefault(user_id, deque(maxlen=self.size)).appendleft(event)
+
+    async def invalidate(self, user_id: str):
+        self._buffers.pop(user_id, None)
+        self._expires.pop(user_id, None)
+
+
+class RedisRingStore:
+    """Redis 列表实现的环形缓冲区，多进程共享"""
+
+    def __init__(self, redis, size: int = RING_SIZE, ttl_seconds: int = REDIS_TTL_SECONDS):
+        self.redis = redis
+        self.size = size
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def _keys(user_id: str):
+        return f"{KEY_PREFIX}:{user_id}", f"{KEY_PREFIX}:{user_id}:seeded"
+
+    async def load(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        key, seeded_key = self._keys(user_id)
+        pipe = self.redis.pipeline()
+        pipe.exists(seeded_key)
+        pipe.lrange(key, 0, self.size - 1)
+        seeded, raw_events = await pipe.execute()
+        if not seeded:
+            return None
+        return [json.loads(raw) for raw in raw_events]
+
+    async def seed(self, user_id: str, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """原子地合并回填结果与缓冲区中已有的事件并标记为已回填，返回合并后的事件"""
+        raw_events = await self.redis.eval(
+            SEED_SCRIPT, 2, *self._keys(user_id),
+            self.size, self.ttl_seconds, *[json.dumps(event) for event in events]
+        )
+        return [json.loads(raw) for raw in raw_events]
+
+    async def append(self, user_id: str, event: Dict[str, Any]):
+        """追加事件；未回填时同样写入，回填时合并"""
+        key, _ = self._keys(user_id)
+        pipe = self.redis.pipeline()
+        pipe.lpush(key, json.dumps(event))
+        pipe.ltrim(key, 0, self.size - 1)
+        pipe.expire(key, self.ttl_seconds)
+        await pipe.execute()
+
+    async def invalidate(self, user_id: str):
+        await self.redis.delete(*self._keys(user_id))
+
+
+class OnBoardTracker:
+    """IOB / COB 追踪服务"""
+
+    def __init__(self):
+        self._memory_store = MemoryRingStore()
+
+    async def _store(self):
+        redis = await get_redis()
+        if redis:
+            return RedisRingStore(redis)
+        return self._memory_store
+
+    async def _load_from_db(self, user_id: str) -> List[Dict[str, Any]]:
+        """从数据库回填作用时间内的事件"""
+        since = datetime.utcnow() - timedelta(minutes=LOOKBACK_MINUTES)
+        injections = await queries.fetch(ONBOARD_INJECTIONS, user_id, since)
+        meals = await queries.fetch(ONBOARD_MEALS, user_id, since)
+
+        events = [
+            make_event(INSULIN, row["id"], row["event_time"], row["amount"], DEFAULT_INSULIN_TYPE, row["ref"])
+            for row in injections
+        ]
+        events += [
+            make_event(CARBS, row["id"], row["event_time"], row["amount"], gi_band(row["gi_value"]), row["ref"])
+            for row in meals
+        ]
+        events.sort(key=lambda event: event["t"], reverse=True)
+        return events
+
+    async def get_state(
+        self,
+        user_id: str,
+        exclude_refs: Iterable[str] = (),
+        now: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """获取用户当前的活性胰岛素和活性碳水
+
+        Returns:
+            Dict: insulin_on_board（单位）、carbs_on_board（克）、minutes_since_insulin
+        """
+        store = await self._store()
+        events = await store.load(user_id)
+        if events is None:
+            events = await store.seed(user_id, await self._load_from_db(user_id))
+        return compute_on_board(events, now if now is not None else time.time(), exclude_refs)
+
+    async def record_insulin(
+        self,
+        user_id: str,
+        record_id: str,
+        injected_at: datetime,
+        dose: float,
+        insulin_type: str = DEFAULT_INSULIN_TYPE,
+        ref: Optional[str] = None
+    ):
+        """记录一次胰岛素注射"""
+        event = make_event(INSULIN, record_id, injected_at, float(dose), insulin_type, ref)
+        await (await self._store()).append(user_id, event)
+
+    async def record_meal(
+        self,
+        user_id: str,
+        record_id: str,
+        meal_time: datetime,
+        nutrition_record_id: Optional[str]
+    ):
+        """记录一次进食（没有营养记录时无法得知碳水量，忽略）"""
+        if not nutrition_record_id:
+            return
+        nutrition = await queries.fetchrow(NUTRITION_CARBS, nutrition_record_id)
+        if not nutrition or not nutrition["total_carbs"]:
+            return
+        event = make_event(
+            CARBS, record_id, meal_time, nutrition["total_carbs"],
+            gi_band(nutrition["gi_value"]), nutrition_record_id
+        )
+        await (await self._store()).append(user_id, event)
+
+    async def invalidate(self, user_id: str):
+        """丢弃缓冲区，下次读取时从数据库回填（批量导入、同步上传后使用）"""
+        await (await self._store()).invalidate(user_id)
+
+
+# 模块级单例
+on_board_tracker = OnBoardTracker()
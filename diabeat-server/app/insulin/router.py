@@ -104,3 +104,51 @@ async def calculate_insulin(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"计算过程中发生错误: {str(e)}"
         )
+
+@router.post(
+    "/sweep",
+    response_model=schemas.InsulinSweepResponse,
+    summary="候选剂量扫描",
+    description="""
+    **一次比较多个候选剂量的预测血糖曲线**
+    
+    ### 功能特性
+    - 💉 支持剂量列表或剂量范围（最多 41 个候选），自动加入计算器建议剂量
+    - 📈 一次批量预测所有候选剂量的血糖曲线（已考虑活性胰岛素 / 活性碳水）
+    - 🎯 返回目标范围内外的时间占比和范围外时间最少的剂量
+    - 🗂️ 只做计算，不保存胰岛素记录和预测记录
+    """,
+    responses={
+        400: {
+            "description": "请求参数错误或用户参数未设置"
+        },
+        401: {
+            "description": "未授权"
+        }
+    }
+)
+async def sweep_insulin_doses(
+    request: schemas.InsulinSweepRequest,
+    insulin_service: InsulinService = Depends(get_insulin_service),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """
+    候选剂量扫描 API
+    
+    替代逐个剂量调用 /calculate 试算。
+    """
+    try:
+        logger.info(f"💉 剂量扫描请求: user={current_user.id}, carbs={request.total_carbs}g, bg={request.current_bg}")
+        return await insulin_service.sweep_doses(request=request, user_id=current_user.id)
+        
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Insulin sweep error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"剂量扫描失败: {str(e)}"
+        )
@@ -14,8 +14,49 @@ class InsulinCalculationResponse(BaseModel):
     carb_insulin: float = Field(..., description="碳水胰岛素（单位）")
     correction_insulin: float = Field(..., description="校正胰岛素（单位）")
     activity_adjustment: float = Field(..., description="活动调整（单位）")
+    insulin_on_board: float = Field(0.0, description="活性胰岛素（单位）")
+    iob_adjustment: float = Field(0.0, description="因活性胰岛素扣除的校正剂量（单位）")
     injection_timing: str = Field(..., description="建议注射时机")
     split_dose: bool = Field(False, description="是否需要分次注射")
     risk_level: str = Field(..., description="风险等级: low, medium, high")
     warnings: List[str] = Field(default_factory=list, description="警告信息")
 
+
+class InsulinSweepRequest(BaseModel):
+    """候选剂量扫描请求（不保存记录）"""
+    total_carbs: float = Field(..., gt=0, description="总碳水化合物（克）")
+    current_bg: float = Field(..., gt=0, description="当前血糖值（mmol/L）")
+    activity_level: Optional[str] = Field("sedentary", description="活动水平: sedentary, light, moderate, vigorous")
+    meal_time: Optional[str] = Field(None, description="用餐时间（ISO格式）")
+    gi_value: Optional[float] = Field(None, description="升糖指数（可选）")
+    doses: Optional[List[float]] = Field(None, max_length=41, description="候选剂量列表（单位），提供时忽略剂量范围")
+    dose_min: Optional[float] = Field(None, ge=0, description="候选剂量下限（单位）")
+    dose_max: Optional[float] = Field(None, ge=0, description="候选剂量上限（单位）")
+    dose_step: float = Field(0.5, gt=0, description="候选剂量间隔（单位）")
+    step_minutes: int = Field(15, ge=5, le=60, description="预测时间网格间隔（分钟）")
+    horizon_minutes: int = Field(240, ge=30, le=720, description="预测时间网格终点（分钟）")
+
+class InsulinSweepCandidate(BaseModel):
+    """单个候选剂量的评估结果（bg_values 与 time_points 一一对应）"""
+    dose: float = Field(..., description="候选剂量（单位）")
+    bg_values: List[float] = Field(..., description="各时间点预测血糖值（mmol/L）")
+    peak_time: int = Field(..., description="峰值时间（分钟）")
+    peak_value: float = Field(..., description="峰值血糖值（mmol/L）")
+    risk_level: str = Field(..., description="血糖风险等级: low, medium, high")
+    dose_risk_level: str = Field(..., description="剂量风险等级: low, medium, high")
+    time_in_range: float = Field(..., description="目标范围内时间占比（0-1）")
+    time_below_range: float = Field(..., description="低于目标范围时间占比（0-1）")
+    time_above_range: float = Field(..., description="高于目标范围时间占比（0-1）")
+    exceeds_max_dose: bool = Field(False, description="是否超过用户设置的最大剂量")
+
+class InsulinSweepResponse(BaseModel):
+    """候选剂量扫描响应"""
+    recommended_dose: float = Field(..., description="计算器建议剂量（单位），已包含在候选中")
+    best_dose: float = Field(..., description="不超过最大剂量的候选中范围外时间最少的剂量（单位）")
+    insulin_on_board: float = Field(0.0, description="活性胰岛素（单位）")
+    carbs_on_board: float = Field(0.0, description="活性碳水（克）")
+    target_bg_low: float = Field(..., description="目标血糖下限（mmol/L）")
+    target_bg_high: float = Field(..., description="目标血糖上限（mmol/L）")
+    time_points: List[int] = Field(..., description="预测时间点（分钟，餐后）")
+    candidates: List[InsulinSweepCandidate] = Field(..., description="按剂量升序排列的候选结果")
+    warnings: List[str] = Field(default_factory=list, description="警告信息")
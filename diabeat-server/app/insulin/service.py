@@ -1,8 +1,17 @@
 from typing import Optional
 from uuid import uuid4
 from datetime import datetime
-from app.insulin.schemas import InsulinCalculationRequest, InsulinCalculationResponse
+from app.insulin.schemas import (
+    InsulinCalculationRequest,
+    InsulinCalculationResponse,
+    InsulinSweepRequest,
+    InsulinSweepResponse,
+    InsulinSweepCandidate,
+)
 from app.insulin.calculator import InsulinCalculator
+from app.insulin.on_board import on_board_tracker
+from app.insulin import sweep
+from app.prediction import engine
 from app.user import crud
 from app.database import database
 import logging
@@ -34,37 +43,24 @@ class InsulinService:
             InsulinCalculationResponse: 计算结果
         """
         try:
-            # 获取用户参数
-            user_params = await crud.get_user_parameters(user_id)
-            if not user_params:
-                raise ValueError("用户参数未设置，请先设置用户参数")
+            params = await self._get_dose_parameters(user_id)
             
-            # 提取参数（转换为 float 避免 Decimal 类型问题）
-            isf = float(user_params.get("isf")) if user_params.get("isf") else None
-            icr = float(user_params.get("icr")) if user_params.get("icr") else None
-            target_bg_low = float(user_params.get("target_bg_low", 4.0))
-            target_bg_high = float(user_params.get("target_bg_high", 7.8))
-            max_dose = float(user_params.get("max_insulin_dose")) if user_params.get("max_insulin_dose") else None
-            min_dose = float(user_params.get("min_insulin_dose", 0.5))
-            
-            if not isf or not icr:
-                raise ValueError("ISF 或 ICR 未设置，请先设置用户参数")
-            
-            # 使用目标血糖范围的中值
-            target_bg = (target_bg_low + target_bg_high) / 2.0
+            # 之前注射仍在作用的胰岛素
+            on_board = await self._get_on_board(user_id)
             
             # 执行计算
             result = self.calculator.calculate_insulin_dose(
                 total_carbs=request.total_carbs,
                 current_bg=request.current_bg,
-                isf=isf,
-                icr=icr,
-                target_bg=target_bg,
+                isf=params["isf"],
+                icr=params["icr"],
+                target_bg=params["target_bg"],
                 activity_level=request.activity_level or "sedentary",
                 meal_time=request.meal_time,
                 gi_value=gi_value,
-                max_dose=max_dose,
-                min_dose=min_dose
+                max_dose=params["max_dose"],
+                min_dose=params["min_dose"],
+                insulin_on_board=on_board["insulin_on_board"]
             )
             
             # 保存记录到数据库
@@ -84,6 +80,140 @@ class InsulinService:
             logger.error(f"Insulin calculation error: {str(e)}")
             raise
     
+    async def sweep_doses(
+        self,
+        request: InsulinSweepRequest,
+        user_id: str
+    ) -> InsulinSweepResponse:
+        """候选剂量扫描
+        
+        用户参数和活性胰岛素只读取一次，计算器给出建议剂量后与候选剂量
+        一起做一次批量预测，返回各剂量的血糖曲线和范围外时间最少的剂量。
+        不保存胰岛素记录和预测记录。
+        
+        Raises:
+            ValueError: 用户参数未设置或候选剂量无效
+        """
+        params = await self._get_dose_parameters(user_id)
+        on_board = await self._get_on_board(user_id)
+        activity_level = request.activity_level or "sedentary"
+        
+        recommendation = self.calculator.calculate_insulin_dose(
+            total_carbs=request.total_carbs,
+            current_bg=request.current_bg,
+            isf=params["isf"],
+            icr=params["icr"],
+            target_bg=params["target_bg"],
+            activity_level=activity_level,
+            meal_time=request.meal_time,
+            gi_value=request.gi_value,
+            max_dose=params["max_dose"],
+            min_dose=params["min_dose"],
+            insulin_on_board=on_board["insulin_on_board"]
+        )
+        recommended_dose = recommendation["recommended_dose"]
+        
+        doses = sweep.candidate_doses(
+            doses=request.doses,
+            dose_min=request.dose_min,
+            dose_max=request.dose_max,
+            dose_step=request.dose_step,
+            extra=[recommended_dose]
+        )
+        time_points = engine.time_grid(request.step_minutes, request.horizon_minutes)
+        batch = sweep.sweep(
+            doses,
+            total_carbs=request.total_carbs,
+            current_bg=request.current_bg,
+            gi_value=request.gi_value,
+            activity_level=activity_level,
+            time_points=time_points,
+            insulin_on_board=on_board["insulin_on_board"],
+            carbs_on_board=on_board["carbs_on_board"]
+        )
+        below, above = sweep.range_fractions(batch.bg_values, params["target_bg_low"], params["target_bg_high"])
+        dose_risk = sweep.assess_dose_risk(doses, request.current_bg)
+        max_dose = params["max_dose"]
+        # 建议剂量已按最大剂量截断且总在候选中，至少有一个候选可选
+        best = sweep.best_candidate(doses, below, above, recommended_dose, max_dose)
+        
+        dose_values = doses.tolist()
+        bg_values = batch.bg_values.tolist()
+        peak_values = engine.round1(batch.peak_value).tolist()
+        below_values = below.round(3).tolist()
+        above_values = above.round(3).tolist()
+        candidates = [
+            InsulinSweepCandidate(
+                dose=dose_values[i],
+                bg_values=bg_values[i],
+                peak_time=int(batch.peak_time[i]),
+                peak_value=peak_values[i],
+                risk_level=engine.RISK_LEVELS[batch.risk_level[i]],
+                dose_risk_level=sweep.DOSE_RISK_LEVELS[dose_risk[i]],
+                time_in_range=round(1 - below_values[i] - above_values[i], 3),
+                time_below_range=below_values[i],
+                time_above_range=above_values[i],
+                exceeds_max_dose=bool(max_dose and dose_values[i] > max_dose)
+            )
+            for i in range(len(dose_values))
+        ]
+        
+        warnings = list(recommendation["warnings"])
+        
+        logger.info(
+            f"💉 剂量扫描: user={user_id}, candidates={len(dose_values)}, "
+            f"recommended={recommended_dose}, best={dose_values[best]}"
+        )
+        return InsulinSweepResponse(
+            recommended_dose=recommended_dose,
+            best_dose=dose_values[best],
+            insulin_on_board=on_board["insulin_on_board"],
+            carbs_on_board=on_board["carbs_on_board"],
+            target_bg_low=params["target_bg_low"],
+            target_bg_high=params["target_bg_high"],
+            time_points=list(time_points),
+            candidates=candidates,
+            warnings=warnings
+        )
+    
+    async def _get_dose_parameters(self, user_id: str) -> dict:
+        """读取剂量计算所需的用户参数
+        
+        Raises:
+            ValueError: 用户参数未设置
+        """
+        user_params = await crud.get_user_parameters(user_id)
+        if not user_params:
+            raise ValueError("用户参数未设置，请先设置用户参数")
+        
+        # 提取参数（转换为 float 避免 Decimal 类型问题）
+        isf = float(user_params.get("isf")) if user_params.get("isf") else None
+        icr = float(user_params.get("icr")) if user_params.get("icr") else None
+        target_bg_low = float(user_params.get("target_bg_low", 4.0))
+        target_bg_high = float(user_params.get("target_bg_high", 7.8))
+        
+        if not isf or not icr:
+            raise ValueError("ISF 或 ICR 未设置，请先设置用户参数")
+        
+        return {
+            "isf": isf,
+            "icr": icr,
+            "target_bg_low": target_bg_low,
+            "target_bg_high": target_bg_high,
+            # 使用目标血糖范围的中值
+            "target_bg": (target_bg_low + target_bg_high) / 2.0,
+            "max_dose": float(user_params.get("max_insulin_dose")) if user_params.get("max_insulin_dose") else None,
+            "min_dose": float(user_params.get("min_insulin_dose", 0.5)),
+        }
+    
+    async def _get_on_board(self, user_id: str) -> dict:
+        """获取活性胰岛素 / 活性碳水，失败时按 0 处理"""
+        try:
+            return await on_board_tracker.get_state(user_id)
+        except Exception as e:
+            logger.warning(f"⚠️ 获取活性胰岛素失败，按无活性胰岛素计算: {str(e)}")
+            return {"insulin_on_board": 0.0, "carbs_on_board": 0.0, "minutes_since_insulin": None}
+    
     async def _save_insulin_record(
         self,
         user_id: str,
@@ -0,0 +1,124 @@
+"""候选剂量扫描（what-if）
+
+对同一餐的多个候选剂量一次性计算：剂量风险等级（与 InsulinCalculator
+的规则相同）、向量化规则模型预测的血糖曲线，以及曲线在目标范围内外的
+时间占比，在不超过最大剂量的候选中选出范围外时间最少的剂量。
+只做计算，不保存任何记录。
+"""
+from typing import Optional, Sequence
+import numpy as np
+from app.prediction import engine
+
+# 单次扫描的候选剂量上限（不含额外加入的建议剂量）
+MAX_CANDIDATES = 41
+# 候选剂量精度（单位），与剂量计算结果的保留位数一致
+DOSE_PRECISION = 2
+
+DOSE_RISK_LEVELS = ("low", "medium", "high")
+
+
+def candidate_doses(
+    doses: Optional[Sequence[float]] = None,
+    dose_min: Optional[float] = None,
+    dose_max: Optional[float] = None,
+    dose_step: float = 0.5,
+    extra: Sequence[float] = ()
+) -> np.ndarray:
+    """生成去重、升序的候选剂量
+
+    Args:
+        doses: 显式列出的剂量；提供时忽略范围参数
+        dose_min / dose_max / dose_step: 剂量范围（含两端）
+        extra: 额外加入的剂量（如计算器的建议剂量）
+
+    Raises:
+        ValueError: 参数无效或候选数超过上限
+    """
+    if doses:
+        if len(doses) > MAX_CANDIDATES:
+            raise ValueError(f"候选剂量过多（{len(doses)}），最多 {MAX_CANDIDATES} 个")
+        values = np.asarray(doses, dtype=np.float64)
+    elif dose_min is not None and dose_max is not None:
+        if dose_step <= 0:
+            raise ValueError("dose_step 必须大于 0")
+        if dose_max < dose_min:
+            raise ValueError("dose_max 不能小于 dose_min")
+        count = int(np.floor((dose_max - dose_min) / dose_step + 1e-9)) + 1
+        if count > MAX_CANDIDATES:
+            raise ValueError(f"候选剂量过多（{count}），最多 {MAX_CANDIDATES} 个")
+        values = dose_min + dose_step * np.arange(count)
+    else:
+        raise ValueError("请提供 doses，或同时提供 dose_min 和 dose_max")
+
+    values = np.concatenate([values, np.asarray(extra, dtype=np.float64)])
+    if (values < 0).any():
+        raise ValueError("剂量不能为负数")
+    return np.unique(np.round(values, DOSE_PRECISION))
+
+
+def assess_dose_risk(doses: np.ndarray, current_bg: float) -> np.ndarray:
+    """向量化的 InsulinCalculator._assess_risk，返回 DOSE_RISK_LEVELS 下标"""
+    risk = np.zeros(doses.shape, dtype=np.intp)
+    risk[doses > 10] = 1
+    high = doses > 15
+    if current_bg > 15:
+        high |= doses > 10
+    if current_bg < 4.0:
+        high[:] = True
+    risk[high] = 2
+    return risk
+
+
+def range_fractions(bg_values: np.ndarray, target_low: float, target_high: float):
+    """各候选曲线低于 / 高于目标范围的时间占比（时间网格等间隔）"""
+    below = (bg_values < target_low).mean(axis=1)
+    above = (bg_values > target_high).mean(axis=1)
+    return below, above
+
+
+def best_candidate(
+    doses: np.ndarray,
+    below: np.ndarray,
+    above: np.ndarray,
+    reference_dose: float,
+    max_dose: Optional[float] = None
+) -> int:
+    """不超过最大剂量的候选中范围外时间最少的下标
+
+    范围外时间相同时优先低血糖时间更少的，再优先最接近参考剂量的。
+
+    Raises:
+        ValueError: 所有候选剂量都超过最大剂量
+    """
+    eligible = np.flatnonzero(doses <= max_dose) if max_dose else np.arange(doses.shape[0])
+    if eligible.size == 0:
+        raise ValueError(f"所有候选剂量都超过最大限制 {max_dose} 单位")
+    order = np.lexsort((
+        np.abs(doses[eligible] - reference_dose), below[eligible], below[eligible] + above[eligible]
+    ))
+    return int(eligible[order[0]])
+
+
+def sweep(
+    doses: np.ndarray,
+    total_carbs: float,
+    current_bg: float,
+    gi_value: Optional[float],
+    activity_level: str,
+    time_points: Sequence[int],
+    insulin_on_board: float = 0.0,
+    carbs_on_board: float = 0.0
+) -> engine.BatchPrediction:
+    """对所有候选剂量做一次批量预测
+
+    与单次预测一致，活性胰岛素和活性碳水并入本次剂量和碳水。
+    """
+    size = doses.shape[0]
+    return engine.predict_batch(
+        total_carbs=np.full(size, total_carbs + carbs_on_board),
+        insulin_dose=doses + insulin_on_board,
+        current_bg=np.full(size, current_bg),
+        gi_value=[gi_value] * size,
+        activity_level=[activity_level] * size,
+        time_points=time_points
+    )
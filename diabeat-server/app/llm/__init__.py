@@ -0,0 +1,18 @@
+"""大模型调用（调度、限流）"""
+from app.llm.client import PROVIDER_DASHSCOPE, PROVIDER_OPENAI, llm_client
+from app.llm.scheduler import (
+    LLMOverloadedError,
+    PRIORITY_NUTRITION_PLAN,
+    PRIORITY_PREDICTION,
+    PRIORITY_RECOGNITION,
+)
+
+__all__ = [
+    "llm_client",
+    "LLMOverloadedError",
+    "PROVIDER_DASHSCOPE",
+    "PROVIDER_OPENAI",
+    "PRIORITY_RECOGNITION",
+    "PRIORITY_PREDICTION",
+    "PRIORITY_NUTRITION_PLAN",
+]
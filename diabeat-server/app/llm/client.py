@@ -0,0 +1,195 @@
+"""大模型调用客户端
+
+食物识别、AI 血糖预测、AI 营养方案统一通过 llm_client.chat 调用：
+
+- 经过 LLMScheduler 排队限流（见 app.llm.scheduler）
+- 使用异步客户端（AsyncOpenAI，通义千问走 OpenAI 兼容接口），不再阻塞事件循环
+- 关闭 SDK 内置重试；429 时按 Retry-After 暂停该模型并重新排队，最多
+  LLM_RATE_LIMIT_RETRIES 次
+- 同一进程内并发的相同请求（服务商、模型、消息、参数都相同，如同一用户同时
+  打开两个页面触发的营养方案生成）只调用一次（app.utils.single_flight），
+  合并后的调用按先到请求的优先级排队
+
+配置中的限流值是整个集群的配额，每个 worker 按 APP_INSTANCES x WEB_CONCURRENCY 均分。
+"""
+import hashlib
+import json
+import math
+from typing import Any, Dict, List
+import logging
+
+from app.config import settings
+from app.database import APP_INSTANCES, WEB_CONCURRENCY
+from app.llm.scheduler import LLMOverloadedError, LLMScheduler
+from app.monitoring.metrics import LLM_REQUESTS
+from app.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_DASHSCOPE = "dashscope"
+PROVIDER_OPENAI = "openai"
+
+DASHSCOPE_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+
+# 估算 token 用量：文字按每 token 约 1.5 个字符，图片按固定值
+CHARS_PER_TOKEN = 1.5
+IMAGE_TOKENS = 1200
+# 429 未返回 Retry-After 时的暂停时间（秒）
+DEFAULT_RETRY_AFTER = 2.0
+
+
+def _per_worker(limits: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """集群配额按 worker 均分（并发数至少为 1）"""
+    workers = max(1, WEB_CONCURRENCY * APP_INSTANCES)
+    return {
+        key: {
+            **value,
+            "concurrency": max(1, math.floor(value.get("concurrency", 8) / workers)),
+            "tpm": value.get("tpm", 0) / workers,
+        }
+        for key, value in limits.items()
+    }
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: int) -> float:
+    """估算一次调用的 token 用量（提示词 + 最多生成的 token 数）"""
+    prompt = 0.0
+    for message in messages:
+        content = message.get("content")
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content or ""}]
+        for part in parts:
+            if part.get("type") == "image_url":
+                prompt += IMAGE_TOKENS
+            else:
+                prompt += len(part.get("text") or "") / CHARS_PER_TOKEN
+    return prompt + max_tokens
+
+
+def request_key(provider: str, model: str, messages: List[Dict[str, Any]], max_tokens: int, temperature: float) -> str:
+    """合并相同请求用的键（消息内容的哈希，图片的 base64 也参与计算）"""
+    payload = json.dumps(
+        [provider, model, messages, max_tokens, temperature],
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _retry_after(error: Exception) -> float:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+class LLMClient:
+    """带调度的大模型客户端（各服务商的 SDK 客户端在首次调用时创建）"""
+
+    def __init__(self, scheduler: LLMScheduler):
+        self.scheduler = scheduler
+        self._clients: Dict[str, Any] = {}
+        self._flight = SingleFlight("llm")
+
+    def is_configured(self, provider: str) -> bool:
+        if provider == PROVIDER_DASHSCOPE:
+            return bool(settings.DASHSCOPE_API_KEY)
+        if provider == PROVIDER_OPENAI:
+            return bool(settings.OPENAI_API_KEY)
+        return False
+
+    def _client(self, provider: str):
+        client = self._clients.get(provider)
+        if client is None:
+            from openai import AsyncOpenAI
+            if provider == PROVIDER_DASHSCOPE:
+                client = AsyncOpenAI(
+                    api_key=settings.DASHSCOPE_API_KEY,
+                    base_url=DASHSCOPE_BASE_URL,
+                    timeout=settings.LLM_TIMEOUT,
+                    max_retries=0,
+                )
+            elif provider == PROVIDER_OPENAI:
+                client = AsyncOpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    timeout=settings.LLM_TIMEOUT,
+                    max_retries=0,
+                )
+            else:
+                raise ValueError(f"未知的大模型服务商: {provider}")
+            self._clients[provider] = client
+        return client
+
+    async def chat(
+        self,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        priority: int,
+        max_tokens: int = 1000,
+        temperature: float = 0.3
+    ) -> str:
+        """调用对话补全，返回第一条回复的文本（没有回复时为空字符串）
+
+        Raises:
+            LLMOverloadedError: 排队等待超过该优先级允许的时间
+        """
+        key = request_key(provider, model, messages, max_tokens, temperature)
+        return await self._flight.do(
+            key, lambda: self._chat(provider, model, messages, priority, max_tokens, temperature)
+        )
+
+    async def _chat(
+        self,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        priority: int,
+        max_tokens: int,
+        temperature: float
+    ) -> str:
+        from openai import RateLimitError
+
+        client = self._client(provider)
+        tokens = estimate_tokens(messages, max_tokens)
+        slot = None
+        try:
+            for attempt in range(settings.LLM_RATE_LIMIT_RETRIES + 1):
+                slot = await self.scheduler.acquire(provider, model, priority, tokens, retry_of=slot)
+                try:
+                    response = await client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                    )
+                except RateLimitError as e:
+                    LLM_REQUESTS.labels(provider=provider, model=model, outcome="rate_limited").inc()
+                    slot.release(retry_after=_retry_after(e))
+                    if attempt == settings.LLM_RATE_LIMIT_RETRIES:
+                        raise
+                    continue
+                except BaseException:
+                    slot.release()
+                    raise
+                usage = getattr(response, "usage", None)
+                slot.release(used_tokens=getattr(usage, "total_tokens", None))
+                LLM_REQUESTS.labels(provider=provider, model=model, outcome="ok").inc()
+                if not response.choices or not response.choices[0].message:
+                    return ""
+                return response.choices[0].message.content or ""
+        except LLMOverloadedError as e:
+            LLM_REQUESTS.labels(provider=provider, model=model, outcome="rejected").inc()
+            logger.warning(f"⚠️ {e}")
+            raise
+        except RateLimitError:
+            raise
+        except Exception:
+            LLM_REQUESTS.labels(provider=provider, model=model, outcome="error").inc()
+            raise
+
+
+llm_client = LLMClient(LLMScheduler(
+    provider_limits=_per_worker(settings.LLM_PROVIDER_LIMITS),
+    model_limits=_per_worker(settings.LLM_MODEL_LIMITS),
+    max_wait=settings.LLM_MAX_WAIT_SECONDS,
+))
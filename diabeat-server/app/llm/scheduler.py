@@ -0,0 +1,346 @@
+"""LLM 请求调度
+
+所有大模型调用（食物识别、AI 血糖预测、AI 营养方案）经过同一个调度器，
+按服务商和模型两级限流：
+
+- 并发数：同时在途的请求数
+- 令牌速率（每分钟 token 数）：令牌桶，请求开始前按估算的 token 数
+  （提示词 + max_tokens）扣除，完成后按实际用量退还多扣的部分
+- 优先级：用户正在等待的食物识别优先于 AI 预测，AI 预测优先于营养方案；
+  同一优先级先到先得
+- 准入控制：按排在前面的请求估算等待时间，超过该优先级允许的最长等待
+  时直接拒绝（LLMOverloadedError，带估算等待时间），调用方立即走回退方案，
+  而不是排队到超时
+- 服务商返回 429 时暂停该模型的令牌桶（按 Retry-After），请求回到队首
+  重新排队，不在 SDK 内部盲目重试
+
+asyncio 单线程使用，无需加锁。
+"""
+import asyncio
+import itertools
+import time
+from typing import Any, Dict, List, Optional
+import logging
+
+from app.monitoring.metrics import LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT, LLM_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+# 优先级（数值越小越优先）
+PRIORITY_RECOGNITION = 0
+PRIORITY_PREDICTION = 1
+PRIORITY_NUTRITION_PLAN = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_RECOGNITION: "recognition",
+    PRIORITY_PREDICTION: "prediction",
+    PRIORITY_NUTRITION_PLAN: "nutrition_plan",
+}
+
+# 未配置 latency 时，刚启动、还没有耗时样本时假设的单次调用耗时（秒）
+DEFAULT_LATENCY_SECONDS = 5.0
+LATENCY_ALPHA = 0.2
+
+
+class LLMOverloadedError(Exception):
+    """排队等待时间超过允许值，请求被拒绝"""
+
+    def __init__(self, provider: str, model: str, estimated_wait: float):
+        self.provider = provider
+        self.model = model
+        self.estimated_wait = estimated_wait
+        super().__init__(f"{provider}/{model} 繁忙，预计需等待 {estimated_wait:.0f} 秒")
+
+
+class TokenBucket:
+    """每分钟 token 数的令牌桶（tokens_per_minute <= 0 表示不限）"""
+
+    def __init__(self, tokens_per_minute: float):
+        self.capacity = float(tokens_per_minute)
+        self.rate = self.capacity / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, tokens: float, now: Optional[float] = None) -> float:
+        """距离能扣除 tokens 还需等待的秒数"""
+        if self.unlimited:
+            return max(0.0, self.paused_until - (now or time.monotonic()))
+        now = now or time.monotonic()
+        self._refill(now)
+        tokens = min(tokens, self.capacity)
+        shortfall = max(0.0, tokens - self.tokens)
+        return max(shortfall / self.rate, self.paused_until - now)
+
+    def take(self, tokens: float):
+        if not self.unlimited:
+            self._refill(time.monotonic())
+            self.tokens -= min(tokens, self.capacity)
+
+    def refund(self, tokens: float):
+        if not self.unlimited:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def pause(self, seconds: float):
+        """服务商限流（429）时暂停放行"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        if not self.unlimited:
+            self.tokens = min(self.tokens, 0.0)
+
+
+class _Limit:
+    """一级限流：并发数 + 令牌桶 + 平均耗时"""
+
+    def __init__(self, config: Dict[str, float], default_concurrency: int = 8):
+        self.concurrency = max(1, int(config.get("concurrency", default_concurrency)))
+        self.bucket = TokenBucket(config.get("tpm", 0))
+        self.active = 0
+        self.latency = float(config.get("latency", DEFAULT_LATENCY_SECONDS))
+
+    def blocked_for(self, tokens: float, now: float) -> Optional[float]:
+        """无法立即放行时返回需要等待的秒数（并发已满时返回 None），可以放行时返回 0"""
+        if self.active >= self.concurrency:
+            return None
+        return self.bucket.wait_time(tokens, now)
+
+    def estimate_wait(self, requests_ahead: int, tokens_ahead: float, now: float) -> float:
+        """估算排在 requests_ahead 个请求（共 tokens_ahead 个 token）之后需要等待的时间"""
+        rounds = (self.active + requests_ahead + 1 - self.concurrency) / self.concurrency
+        concurrency_wait = max(0.0, rounds) * self.latency
+        return max(concurrency_wait, self.bucket.wait_time(tokens_ahead, now))
+
+    def record_latency(self, seconds: float):
+        self.latency += LATENCY_ALPHA * (seconds - self.latency)
+
+
+class _Ticket:
+    __slots__ = ("priority", "seq", "model", "tokens", "future", "enqueued_at")
+
+    def __init__(self, priority: int, seq: int, model: str, tokens: float, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.model = model
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _Provider:
+    def __init__(self, name: str, limit: _Limit):
+        self.name = name
+        self.limit = limit
+        self.models: Dict[str, _Limit] = {}
+        self.queue: List[_Ticket] = []
+        self.wakeup: Optional[asyncio.TimerHandle] = None
+
+
+class Slot:
+    """调度器放行的一次调用，完成后必须 release"""
+
+    def __init__(self, scheduler: "LLMScheduler", ticket: _Ticket, provider: str):
+        self._scheduler = scheduler
+        self.provider = provider
+        self.model = ticket.model
+        self.tokens = ticket.tokens
+        self.priority = ticket.priority
+        self.seq = ticket.seq
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self, used_tokens: Optional[float] = None, retry_after: Optional[float] = None):
+        """
+        Args:
+            used_tokens: 实际用量（已知时退还多扣的部分）
+            retry_after: 服务商返回 429 时暂停该模型的秒数
+        """
+        if not self._released:
+            self._released = True
+            self._scheduler._release(self, used_tokens, retry_after)
+
+
+class LLMScheduler:
+    """按服务商 / 模型限流、按优先级排队的调度器"""
+
+    def __init__(
+        self,
+        provider_limits: Dict[str, Dict[str, float]],
+        model_limits: Dict[str, Dict[str, float]],
+        max_wait: Dict[str, float]
+    ):
+        """
+        Args:
+            provider_limits: 服务商 -> {"concurrency": 并发数, "tpm": 每分钟 token 数,
+                "latency": 预计单次耗时（秒，用于估算等待，运行后按实际耗时更新）}
+            model_limits: "服务商/模型" -> 同上（未配置的模型只受服务商限制）
+            max_wait: 优先级名称 -> 允许的最长排队等待（秒）
+        """
+        self.provider_limits = provider_limits
+        self.model_limits = model_limits
+        self.max_wait = max_wait
+        self._providers: Dict[str, _Provider] = {}
+        self._seq = itertools.count()
+
+    def _provider(self, name: str) -> _Provider:
+        provider = self._providers.get(name)
+        if provider is None:
+            config = self.provider_limits.get(name, {})
+            provider = _Provider(name, _Limit(config))
+            self._providers[name] = provider
+        return provider
+
+    def _model(self, provider: _Provider, model: str) -> _Limit:
+        limit = provider.models.get(model)
+        if limit is None:
+            config = self.model_limits.get(f"{provider.name}/{model}", {})
+            limit = _Limit(
+                {"latency": provider.limit.latency, **config, "tpm": config.get("tpm", 0)},
+                default_concurrency=provider.limit.concurrency
+            )
+            provider.models[model] = limit
+        return limit
+
+    def estimate_wait(self, provider_name: str, model: str, priority: int, tokens: float) -> float:
+        """新请求的估算排队时间（秒）"""
+        provider = self._provider(provider_name)
+        model_limit = self._model(provider, model)
+        now = time.monotonic()
+        ahead = [t for t in provider.queue if t.priority <= priority and not t.future.done()]
+        same_model = [t for t in ahead if t.model == model]
+        return max(
+            provider.limit.estimate_wait(len(ahead), sum(t.tokens for t in ahead) + tokens, now),
+            model_limit.estimate_wait(len(same_model), sum(t.tokens for t in same_model) + tokens, now),
+        )
+
+    async def acquire(
+        self,
+        provider_name: str,
+        model: str,
+        priority: int,
+        tokens: float,
+        retry_of: Optional[Slot] = None
+    ) -> Slot:
+        """排队等待放行，超过允许的等待时间时抛出 LLMOverloadedError
+
+        Args:
+            tokens: 估算的 token 用量
+            retry_of: 被服务商限流（429）的上一次放行；重试时保留原来的排队顺序，不再做准入检查
+        """
+        priority_name = PRIORITY_NAMES.get(priority, str(priority))
+        if retry_of is None:
+            estimated = self.estimate_wait(provider_name, model, priority, tokens)
+            if estimated > self.max_wait.get(priority_name, 30.0):
+                raise LLMOverloadedError(provider_name, model, estimated)
+            seq = next(self._seq)
+        else:
+            seq = retry_of.seq
+
+        provider = self._provider(provider_name)
+        ticket = _Ticket(priority, seq, model, tokens, asyncio.get_running_loop().create_future())
+        provider.queue.append(ticket)
+        LLM_QUEUE_DEPTH.labels(provider=provider_name, model=model).inc()
+        self._pump(provider)
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # 已放行但调用方被取消：归还名额
+                ticket.future.result().release(used_tokens=0)
+            else:
+                ticket.future.cancel()
+                LLM_QUEUE_DEPTH.labels(provider=provider_name, model=model).dec()
+                self._pump(provider)
+            raise
+        LLM_QUEUE_WAIT.labels(provider=provider_name, model=model, priority=priority_name).observe(
+            time.monotonic() - ticket.enqueued_at
+        )
+        return ticket.future.result()
+
+    def _pump(self, provider: _Provider):
+        """按优先级放行排队的请求
+
+        服务商级限流时停止放行（保证优先级）；某个模型限流时跳过该模型，
+        其余模型的请求继续放行。
+        """
+        if provider.wakeup is not None:
+            provider.wakeup.cancel()
+            provider.wakeup = None
+        now = time.monotonic()
+        blocked_models = set()
+        next_check: Optional[float] = None
+        for ticket in sorted(provider.queue):
+            if ticket.future.done() or ticket.model in blocked_models:
+                continue
+            provider_wait = provider.limit.blocked_for(ticket.tokens, now)
+            if provider_wait is None:
+                break
+            if provider_wait > 0:
+                next_check = provider_wait if next_check is None else min(next_check, provider_wait)
+                break
+            model_limit = self._model(provider, ticket.model)
+            model_wait = model_limit.blocked_for(ticket.tokens, now)
+            if model_wait is None or model_wait > 0:
+                blocked_models.add(ticket.model)
+                if model_wait:
+                    next_check = model_wait if next_check is None else min(next_check, model_wait)
+                continue
+            provider.limit.active += 1
+            model_limit.active += 1
+            provider.limit.bucket.take(ticket.tokens)
+            model_limit.bucket.take(ticket.tokens)
+            LLM_QUEUE_DEPTH.labels(provider=provider.name, model=ticket.model).dec()
+            LLM_IN_FLIGHT.labels(provider=provider.name, model=ticket.model).inc()
+            ticket.future.set_result(Slot(self, ticket, provider.name))
+        provider.queue = [t for t in provider.queue if not t.future.done()]
+        if next_check is not None and provider.queue:
+            # 令牌不足或限流暂停：到时间再检查（并发已满时由 release 触发）
+            provider.wakeup = asyncio.get_running_loop().call_later(next_check, self._pump, provider)
+
+    def _release(self, slot: Slot, used_tokens: Optional[float], retry_after: Optional[float]):
+        provider = self._provider(slot.provider)
+        model_limit = self._model(provider, slot.model)
+        provider.limit.active -= 1
+        model_limit.active -= 1
+        LLM_IN_FLIGHT.labels(provider=slot.provider, model=slot.model).dec()
+        if retry_after is not None:
+            logger.warning(f"⚠️ {slot.provider}/{slot.model} 触发服务商限流，暂停 {retry_after:.1f} 秒")
+            model_limit.bucket.pause(retry_after)
+        else:
+            if used_tokens != 0:
+                provider.limit.record_latency(time.monotonic() - slot.started)
+                model_limit.record_latency(time.monotonic() - slot.started)
+            if used_tokens is not None and used_tokens < slot.tokens:
+                provider.limit.bucket.refund(slot.tokens - used_tokens)
+                model_limit.bucket.refund(slot.tokens - used_tokens)
+        self._pump(provider)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        result = {}
+        for name, provider in self._providers.items():
+            result[name] = {
+                "active": provider.limit.active,
+                "queued": sum(1 for t in provider.queue if not t.future.done()),
+                "models": {
+                    model: {
+                        "active": limit.active,
+                        "latency_seconds": round(limit.latency, 2),
+                        "tokens": None if limit.bucket.unlimited else round(limit.bucket.tokens),
+                        "paused_seconds": round(max(0.0, limit.bucket.paused_until - now), 1),
+                    }
+                    for model, limit in provider.models.items()
+                },
+            }
+        return result
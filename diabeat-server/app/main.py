@@ -38,15 +38,21 @@ from app.prediction.router import router as prediction_router
 from app.records.router import router as records_router
 from app.notification.router import router as notification_router
 from app.user.device_router import router as device_router
+from app.sync.router import router as sync_router
+from app.glucose.router import router as glucose_router
+from app.dashboard.router import router as dashboard_router
 
 
 
 # 导入监控模块
 from app.monitoring.health_check import health_check_router
 from app.monitoring.metrics import setup_metrics
+from app.monitoring.readiness import readiness
 
 # 工具
 from app.utils import fastmcp_client
+from app.utils.cache import query_cache
+from app.utils.leader import LeaderElection
 from fastapi.staticfiles import StaticFiles
 
 
@@ -54,24 +60,32 @@ from fastapi.staticfiles import StaticFiles
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
+    singleton_jobs = None
     try:
         info(logger, "应用启动开始")
-        
-        # 初始化数据库连接
-        info(logger, "正在连接数据库...")
-        try:
-            await connect_db()
-            info(logger, "✅ 数据库连接成功")
-            
-            # 创建数据库表
-            async with engine.begin() as conn:
-                await conn.run_sync(Base.metadata.create_all)
-            info(logger, "✅ 数据库表创建完成")
-        except Exception as e:
-            error(logger, f"⚠️  数据库连接失败: {str(e)}")
-            warning(logger, "⚠️  某些功能可能不可用（用户注册、数据记录等）")
-            info(logger, "💡 提示：如果需要数据库功能，请启动 PostgreSQL 数据库")
-        
+
+        # 依赖探测在后台进行，不阻塞启动；就绪状态见 /health/ready
+        async def probe_database():
+            if not database.is_connected:
+                await connect_db()
+            # 表结构由 scripts/init_db.sh 迁移创建，启动时默认不再执行 create_all
+            if settings.DB_CREATE_TABLES_ON_STARTUP:
+                async with engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+                info(logger, "✅ 数据库表创建完成")
+            return "数据库连接成功"
+
+        async def probe_mcp():
+            if not settings.MCP_ENABLED:
+                return "MCP集成未启用"
+            if not await fastmcp_client.health_check():
+                raise RuntimeError("MCP服务连接失败，MCP增强功能将使用回退方案")
+            agents = await fastmcp_client.list_agents()
+            return f"发现 {len(agents)} 个可用MCP代理"
+
+        info(logger, "正在后台连接数据库...")
+        readiness.probe_in_background("database", probe_database, required=True)
+
         # 初始化Redis缓存
         info(logger, "正在初始化Redis缓存...")
         try:
@@ -81,55 +95,69 @@ async def lifespan(app: FastAPI):
             error(logger, f"⚠️ Redis初始化失败: {str(e)}")
             warning(logger, "⚠️  缓存功能将不可用，系统性能可能受到影响")
         
+        # 订阅查询缓存失效通知（订阅成功后启用进程内缓存）
+        query_cache.start()
+        
         # 确保 static 目录存在
         os.makedirs("static", exist_ok=True)
         os.makedirs("static/uploads", exist_ok=True)
         
-        # 检查MCP服务健康状态
-        info(logger, "正在检查MCP服务健康状态...")
-        try:
-            is_healthy = await fastmcp_client.health_check()
-            if is_healthy:
-                info(logger, "✅ MCP服务连接正常")
-                # 尝试列出可用代理
-                try:
-                    agents = await fastmcp_client.list_agents()
-                    info(logger, f"✅ 发现 {len(agents)} 个可用MCP代理")
-                except Exception as e:
-                    warning(logger, f"⚠️  无法获取MCP代理列表: {str(e)}")
-            else:
-                warning(logger, "⚠️  MCP服务连接失败")
-                warning(logger, "⚠️  MCP增强功能将不可用，系统将使用回退方案")
-        except Exception as e:
-            error(logger, f"⚠️  MCP服务健康检查失败: {str(e)}")
-            warning(logger, "⚠️  MCP相关功能可能不可用")
+        # 创建MCP客户端连接池（所有MCP请求共用）
+        await fastmcp_client.start()
+
+        # 在后台检查MCP服务健康状态（可选依赖，不影响就绪）
+        info(logger, "正在后台检查MCP服务健康状态...")
+        readiness.probe_in_background("mcp", probe_mcp)
+
+        # 启动单例后台任务（通知处理、营养汇总修复）：多 worker / 多实例部署时
+        # 只在持有咨询锁的主节点上运行，整个集群只有一份
+        if settings.SINGLETON_JOBS_ENABLED:
+            try:
+                from app.notification.background_tasks import NotificationBackgroundTask
+                from app.nutrition.rollup import run_periodic_repair
+                
+                singleton_jobs = LeaderElection("diabeat:singleton-jobs", {
+                    "通知处理": NotificationBackgroundTask.run_periodic_task,
+                    "营养汇总修复": run_periodic_repair,
+                })
+                singleton_jobs.start()
+                info(logger, "✅ 单例后台任务已参与主节点选举（通知处理、营养汇总修复）")
+            except Exception as e:
+                warning(logger, f"⚠️ 单例后台任务启动失败（可选功能）: {str(e)}")
+                warning(logger, "   通知功能仍可用，但需要手动触发或使用外部任务队列")
         
-        # 启动后台任务（通知处理）
+        # 启动预测记录延迟写入
         try:
-            from app.notification.background_tasks import NotificationBackgroundTask
-            import asyncio
-            
-            # 创建后台任务（在后台运行，不阻塞主应用）
-            async def start_background_task():
-                try:
-                    await NotificationBackgroundTask.run_periodic_task()
-                except asyncio.CancelledError:
-                    info(logger, "后台任务已取消")
-                except Exception as e:
-                    error(logger, f"后台任务错误: {str(e)}")
-            
-            # 在后台启动任务
-            background_task = asyncio.create_task(start_background_task())
-            info(logger, "✅ 后台任务已启动（通知处理）")
+            from app.prediction.writer import prediction_writer
+            await prediction_writer.start()
         except Exception as e:
-            warning(logger, f"⚠️ 后台任务启动失败（可选功能）: {str(e)}")
-            warning(logger, "   通知功能仍可用，但需要手动触发或使用外部任务队列")
+            warning(logger, f"⚠️ 预测记录延迟写入启动失败，将直接写入数据库: {str(e)}")
         
-        info(logger, "✅ 应用启动完成，服务就绪")
+        readiness.mark_started()
+        info(logger, f"✅ 应用启动完成（{readiness.startup_seconds:.2f} 秒），依赖就绪后开始接受流量")
         yield
-        
+
     finally:
         # 关闭时的清理操作
+        await readiness.stop()
+
+        if singleton_jobs is not None:
+            await singleton_jobs.stop()
+
+        info(logger, "正在写入缓冲区中的预测记录...")
+        try:
+            from app.prediction.writer import prediction_writer
+            await prediction_writer.stop()
+        except Exception as e:
+            error(logger, f"⚠️  写入预测记录时出错: {str(e)}")
+        
+        await query_cache.stop()
+        
+        try:
+            await fastmcp_client.close()
+        except Exception as e:
+            error(logger, f"⚠️  关闭MCP客户端时出错: {str(e)}")
+        
         info(logger, "正在断开数据库连接...")
         try:
             await disconnect_db()
@@ -200,12 +228,30 @@ app.include_router(
     tags=["prediction"]
 )
 
+app.include_router(
+    glucose_router,
+    prefix="/api/glucose",
+    tags=["glucose"]
+)
+
 app.include_router(
     records_router,
     prefix="/api/records",
     tags=["records"]
 )
 
+app.include_router(
+    dashboard_router,
+    prefix="/api/dashboard",
+    tags=["dashboard"]
+)
+
+app.include_router(
+    sync_router,
+    prefix="/api/sync",
+    tags=["sync"]
+)
+
 app.include_router(
     notification_router,
     prefix="/api/notifications",
@@ -281,7 +327,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             "path": request.url.path,
             "request_id": request_id,
             "timestamp": datetime.datetime.utcnow().isoformat() + "Z"
-        }
+        },
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
@@ -4,10 +4,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from typing import Dict, Any, List, Optional
 import asyncio
 import time
-import psutil
 from app.database import database, get_redis
 from app.utils.logger import get_logger, info, warning, error
 from app.monitoring.metrics import ACTIVE_REQUESTS, DB_CONNECTION_POOL_SIZE, DB_CONNECTION_POOL_USED
+from app.monitoring.readiness import readiness
 
 logger = get_logger(__name__)
 
@@ -67,6 +67,8 @@ class HealthCheckService:
             健康检查结果，包含CPU和内存使用情况
         """
         try:
+            import psutil
+            
             # 获取系统资源使用情况
             cpu_percent = psutil.cpu_percent(interval=0.1)
             memory = psutil.virtual_memory()
@@ -238,6 +240,7 @@ class HealthCheckService:
             
             # 获取应用启动时间（实际应用中可能需要调整）
             # 这里使用当前进程创建时间作为参考
+            import psutil
             process = psutil.Process()
             uptime = time.time() - process.create_time()
             
@@ -391,3 +394,28 @@ async def detailed_health_check():
         详细的健康检查结果
     """
     return await health_check_service.run_health_checks()
+
+
+@health_check_router.get("/live", response_model=Dict[str, Any])
+async def liveness_check():
+    """
+    存活检查端点：进程能处理请求即返回200，不检查任何依赖
+    
+    Returns:
+        存活状态
+    """
+    return {"status": "alive", "timestamp": time.time()}
+
+
+@health_check_router.get("/ready", response_model=Dict[str, Any])
+async def readiness_check():
+    """
+    就绪检查端点：必需依赖（数据库）就绪前返回503，可选依赖（MCP等）只报告状态
+    
+    Returns:
+        各依赖的就绪状态
+    """
+    result = readiness.snapshot()
+    if not result["ready"]:
+        raise HTTPException(status_code=503, detail=result)
+    return result
@@ -2,6 +2,8 @@
 
 from fastapi import FastAPI, Request, Response
 from prometheus_client import Counter, Histogram, Gauge, Summary, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import REGISTRY, CollectorRegistry, multiprocess
+import os
 import time
 from functools import wraps
 from typing import Callable, Any, Optional
@@ -52,6 +54,58 @@ CACHE_HIT_RATIO = Summary(
     'Cache hit ratio'
 )
 
+ENRICHMENT_LATENCY = Histogram(
+    'diabeat_prediction_enrichment_duration_seconds',
+    'Prediction enrichment (AI analyst, MCP) latency in seconds',
+    ['enrichment', 'outcome'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 1.5, 2.5, 5.0, 10.0, 30.0, 60.0, 90.0)
+)
+
+GLUCOSE_READINGS_INGESTED = Counter(
+    'diabeat_glucose_readings_ingested_total',
+    'Glucose readings received by the bulk ingest endpoint',
+    ['outcome']
+)
+
+LLM_REQUESTS = Counter(
+    'diabeat_llm_requests_total',
+    'LLM requests by provider, model and outcome (ok, error, rate_limited, rejected)',
+    ['provider', 'model', 'outcome']
+)
+
+LLM_QUEUE_DEPTH = Gauge(
+    'diabeat_llm_queue_depth',
+    'LLM requests waiting in the scheduler queue',
+    ['provider', 'model'],
+    multiprocess_mode='livesum'
+)
+
+LLM_IN_FLIGHT = Gauge(
+    'diabeat_llm_in_flight',
+    'LLM requests currently running',
+    ['provider', 'model'],
+    multiprocess_mode='livesum'
+)
+
+LLM_QUEUE_WAIT = Histogram(
+    'diabeat_llm_queue_wait_seconds',
+    'Time LLM requests spent waiting in the scheduler queue',
+    ['provider', 'model', 'priority'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+)
+
+QUERY_CACHE_REQUESTS = Counter(
+    'diabeat_query_cache_requests_total',
+    'Query cache lookups by cache name and result (local_hit, redis_hit, miss)',
+    ['cache', 'result']
+)
+
+SINGLE_FLIGHT_CALLS = Counter(
+    'diabeat_single_flight_calls_total',
+    'Calls through a single-flight group, by outcome (executed, coalesced into an in-flight call)',
+    ['name', 'outcome']
+)
+
 # 指标中间件配置
 _metrics_app: Optional[FastAPI] = None
 
@@ -111,15 +165,24 @@ def setup_metrics(app: FastAPI) -> None:
     # 添加Prometheus指标端点
     @app.get("/metrics", tags=["monitoring"])
     async def metrics_endpoint():
-        """Prometheus指标端点"""
+        """Prometheus指标端点（多 worker 部署时汇总所有 worker 的指标）"""
         return Response(
-            content=generate_latest(),
+            content=generate_latest(_collector_registry()),
             media_type=CONTENT_TYPE_LATEST
         )
     
     logger.info("性能指标收集中间件已配置")
 
 
+def _collector_registry():
+    """多进程模式（gunicorn_conf.py 设置 PROMETHEUS_MULTIPROC_DIR）下从共享目录汇总各 worker 的指标"""
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
 def get_metrics_app() -> Optional[FastAPI]:
     """
     获取配置了指标的应用实例
@@ -0,0 +1,121 @@
+"""服务就绪状态
+
+启动时不再同步等待各依赖（数据库、MCP 等）：lifespan 只启动后台探测任务，
+探测结果写入就绪状态，由 /health/ready 对外报告。
+
+- 必需依赖（如数据库）未就绪时 /health/ready 返回 503，负载均衡 / 编排系统
+  暂不转发流量；探测失败按指数退避持续重试，直到成功
+- 可选依赖（如 MCP）只报告状态，不影响就绪；不可用时相关功能走回退方案，
+  探测任务继续在后台重试
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+READY = "ready"
+UNAVAILABLE = "unavailable"
+
+# 探测失败后的重试间隔（秒）：从 PROBE_RETRY_MIN 开始翻倍，最长 PROBE_RETRY_MAX
+PROBE_RETRY_MIN = 1.0
+PROBE_RETRY_MAX = 60.0
+
+
+class ReadinessState:
+    """各依赖的就绪状态（asyncio 单线程使用，无需加锁）"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.startup_seconds: Optional[float] = None
+        self.components: Dict[str, Dict[str, Any]] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def register(self, component: str, required: bool):
+        self.components[component] = {
+            "status": PENDING,
+            "required": required,
+            "message": None,
+            "attempts": 0,
+            "checked_at": None,
+            "ready_at": None,
+        }
+
+    def update(self, component: str, ready: bool, message: Optional[str] = None):
+        state = self.components[component]
+        now = time.time()
+        state["attempts"] += 1
+        state["checked_at"] = now
+        state["message"] = message
+        if ready:
+            if state["status"] != READY:
+                state["ready_at"] = now
+                logger.info(f"✅ {component} 已就绪（启动后 {now - self.started_at:.2f} 秒）")
+            state["status"] = READY
+        else:
+            state["status"] = UNAVAILABLE
+
+    def mark_started(self):
+        """lifespan 启动阶段结束（开始接受请求）"""
+        self.startup_seconds = time.time() - self.started_at
+
+    @property
+    def is_ready(self) -> bool:
+        return all(
+            state["status"] == READY
+            for state in self.components.values()
+            if state["required"]
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready,
+            "startup_seconds": self.startup_seconds,
+            "uptime_seconds": time.time() - self.started_at,
+            "components": {name: dict(state) for name, state in self.components.items()},
+        }
+
+    def probe_in_background(
+        self,
+        component: str,
+        probe: Callable[[], Awaitable[Optional[str]]],
+        required: bool = False
+    ) -> asyncio.Task:
+        """在后台探测依赖，失败按指数退避重试直到成功
+
+        Args:
+            component: 依赖名称
+            probe: 探测函数，成功时返回说明（可为 None），失败时抛出异常
+            required: 是否为就绪的必需依赖
+        """
+        self.register(component, required)
+        task = asyncio.create_task(self._probe_until_ready(component, probe), name=f"readiness:{component}")
+        self._tasks.append(task)
+        return task
+
+    async def _probe_until_ready(self, component: str, probe: Callable[[], Awaitable[Optional[str]]]):
+        delay = PROBE_RETRY_MIN
+        while True:
+            try:
+                message = await probe()
+                self.update(component, True, message)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.update(component, False, str(e))
+                logger.warning(f"⚠️ {component} 暂不可用，{delay:.0f} 秒后重试: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, PROBE_RETRY_MAX)
+
+    async def stop(self):
+        """取消尚未完成的探测任务"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+
+readiness = ReadinessState()
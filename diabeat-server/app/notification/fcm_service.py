@@ -1,15 +1,15 @@
 from typing import Optional
-import firebase_admin
-from firebase_admin import credentials, messaging
 from app.config import settings
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 class FCMService:
-    """Firebase Cloud Messaging 服务"""
+    """Firebase Cloud Messaging 服务（firebase_admin 在首次发送时才导入）"""
     
     _initialized = False
+    _messaging = None
     
     @classmethod
     def initialize(cls):
@@ -18,6 +18,9 @@ class FCMService:
             return
         
         try:
+            import firebase_admin
+            from firebase_admin import credentials, messaging
+            
             # 从环境变量或配置文件读取 Firebase 凭证
             # 方法1: 使用 FIREBASE_CREDENTIALS_PATH
             if hasattr(settings, 'FIREBASE_CREDENTIALS_PATH') and settings.FIREBASE_CREDENTIALS_PATH:
@@ -31,6 +34,7 @@ class FCMService:
                 # 使用默认凭证（从环境变量）
                 firebase_admin.initialize_app()
             
+            cls._messaging = messaging
             cls._initialized = True
             logger.info("FCM initialized successfully")
         except Exception as e:
@@ -60,8 +64,8 @@ class FCMService:
             cls.initialize()
         
         try:
-            message = messaging.Message(
-                notification=messaging.Notification(
+            message = cls._messaging.Message(
+                notification=cls._messaging.Notification(
                     title=title,
                     body=body
                 ),
@@ -69,7 +73,7 @@ class FCMService:
                 token=fcm_token
             )
             
-            response = messaging.send(message)
+            response = cls._messaging.send(message)
             logger.info(f"Successfully sent message: {response}")
             return True
             
@@ -100,8 +104,8 @@ class FCMService:
             cls.initialize()
         
         try:
-            message = messaging.MulticastMessage(
-                notification=messaging.Notification(
+            message = cls._messaging.MulticastMessage(
+                notification=cls._messaging.Notification(
                     title=title,
                     body=body
                 ),
@@ -109,7 +113,7 @@ class FCMService:
                 tokens=fcm_tokens
             )
             
-            response = messaging.send_multicast(message)
+            response = cls._messaging.send_multicast(message)
             
             result = {
                 "success_count": response.success_count,
@@ -1,15 +1,21 @@
 from typing import List, Dict, Any, Optional
 from app.nutrition.schemas import FoodItemInput
+from app.utils.cache import query_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 食物营养数据由 sql/nutrition_foods_data.sql 导入，很少变化；导入新数据后
+# 调用 query_cache.invalidate(FOOD_CACHE_TAG)
+FOOD_CACHE_TTL = 3600
+FOOD_CACHE_TAG = "nutrition_foods"
+
 class NutritionCalculator:
     """营养成分计算器"""
     
     async def _get_food_nutrition_from_db(self, food_name: str) -> Optional[Dict[str, float]]:
-        """从数据库获取食物营养成分"""
-        try:
+        """从数据库获取食物营养成分（经查询缓存，未找到的结果也缓存）"""
+        async def load():
             from app.database import database
             query = """
                 SELECT carbs, protein, fat, fiber, calories, gi_value 
@@ -30,13 +36,18 @@ class NutritionCalculator:
                     "calories": float(result["calories"]),
                     "gi_value": float(result["gi_value"]) if result["gi_value"] else None
                 }
+            return None
+        try:
+            return await query_cache.get_or_load(
+                "food_nutrition", food_name, load, ttl=FOOD_CACHE_TTL, tags=[FOOD_CACHE_TAG]
+            )
         except Exception as e:
             logger.warning(f"Failed to query database for {food_name}: {str(e)}")
         return None
     
     async def search_food_by_name(self, food_name: str) -> List[Dict[str, Any]]:
-        """根据食物名称从数据库中搜索食物，返回名称和卡路里"""
-        try:
+        """根据食物名称从数据库中搜索食物，返回名称和卡路里（经查询缓存，并发的相同搜索只查询一次）"""
+        async def load():
             from app.database import database
             query = """
                 SELECT id, name_cn AS name, calories
@@ -54,6 +65,11 @@ class NutritionCalculator:
                 {"id": str(r["id"]), "name": r["name"], "calories": int(r["calories"]) if r["calories"] else 0}
                 for r in results
             ]
+        try:
+            # 查询不区分大小写，键也按小写合并
+            return await query_cache.get_or_load(
+                "food_search", food_name.lower(), load, ttl=FOOD_CACHE_TTL, tags=[FOOD_CACHE_TAG]
+            )
         except Exception as e:
             logger.warning(f"Failed to search database for {food_name}: {str(e)}")
             return []
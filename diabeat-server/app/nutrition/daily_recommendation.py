@@ -2,26 +2,32 @@
 from typing import Optional, Dict, Any
 from datetime import date
 from app.food.recommendation_calculator import FoodRecommendationCalculator
+from app.llm import llm_client, PROVIDER_DASHSCOPE, PRIORITY_NUTRITION_PLAN
+from app.user import crud as user_crud
+from app.utils.cache import query_cache
 import logging
-from openai import OpenAI
-import os
 import json
 
 logger = logging.getLogger(__name__)
 
+# 每日营养方案缓存时间（秒）；资料修改后版本号变化，旧方案不再命中
+# 传统方法按出生日期计算年龄，最多缓存一天
+DAILY_PLAN_CACHE_TTL = 24 * 3600
+AI_PLAN_CACHE_TTL = 30 * 24 * 3600
+
+
+def _profile_key(user_id: str, user_info: Dict[str, Any]) -> str:
+    """方案缓存键：用户 + 资料版本"""
+    return f"{user_id}:{user_info.get('profile_version', 0)}"
+
+
 class DailyNutritionRecommendation:
     """每日推荐营养摄入计算器"""
     
     def __init__(self):
         self.recommendation_calculator = FoodRecommendationCalculator()
-        # 初始化OpenAI客户端（通义千问）
-        api_key = os.getenv("DASHSCOPE_API_KEY")
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
-        ) if api_key else None
     
-    def calculate_daily_recommendation_with_ai(
+    async def calculate_daily_recommendation_with_ai(
         self,
         user_info: Dict[str, Any]
     ) -> Dict[str, Any]:
@@ -34,8 +40,8 @@ class DailyNutritionRecommendation:
         Returns:
             Dict: 每日营养推荐
         """
-        if not self.client:
-            logger.warning("AI客户端未初始化，使用传统计算方法")
+        if not llm_client.is_configured(PROVIDER_DASHSCOPE):
+            logger.warning("DASHSCOPE_API_KEY未配置，使用传统计算方法")
             return self.calculate_daily_recommendation(user_info, None)
         
         try:
@@ -77,17 +83,18 @@ class DailyNutritionRecommendation:
 
             logger.info(f"调用AI生成营养建议: user={user_info.get('age')}岁 {gender_cn}")
             
-            response = self.client.chat.completions.create(
-                model="qwen-plus",
-                messages=[
+            content = await llm_client.chat(
+                PROVIDER_DASHSCOPE,
+                "qwen-plus",
+                [
                     {"role": "system", "content": "你是一位专业的糖尿病营养师，擅长根据患者情况制定营养方案。必须返回纯JSON格式。"},
                     {"role": "user", "content": prompt}
                 ],
+                PRIORITY_NUTRITION_PLAN,
                 temperature=0.3,
                 max_tokens=1000
             )
-            
-            content = response.choices[0].message.content.strip()
+            content = content.strip()
             logger.info(f"AI响应: {content[:200]}...")
             
             # 解析JSON响应
@@ -120,6 +127,50 @@ class DailyNutritionRecommendation:
             logger.error(f"AI生成营养建议失败: {str(e)}, 使用传统计算方法")
             return self.calculate_daily_recommendation(user_info, None)
     
+    async def get_user_daily_recommendation(
+        self,
+        user_id: str,
+        user_info: Optional[Dict[str, Any]] = None,
+        user_params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """每日推荐（传统方法），按 (用户, 资料版本, 参数版本) 缓存，资料或参数修改后才重新计算
+        
+        Args:
+            user_id: 用户ID
+            user_info: 已加载的用户信息（可选，未提供时读取）
+            user_params: 已加载的用户参数（与 user_info 一起提供）
+        """
+        if user_info is None:
+            user_info, user_params = await user_crud.load_user_context(user_id)
+        
+        # 尚未设置参数时为 none，创建参数（版本号从 0 开始）后不会命中旧方案
+        params_version = user_params.get("profile_version", 0) if user_params else "none"
+        
+        async def compute():
+            return self.calculate_daily_recommendation(user_info, user_params)
+        
+        return await query_cache.get_or_load(
+            "daily_plan", f"{_profile_key(user_id, user_info)}:{params_version}", compute, ttl=DAILY_PLAN_CACHE_TTL
+        )
+    
+    async def get_user_ai_recommendation(self, user_id: str) -> Dict[str, Any]:
+        """AI 生成的每日营养方案，按 (用户, 资料版本) 缓存，资料修改后才重新调用大模型
+        
+        AI 不可用时返回的传统计算结果不缓存，下次请求会再尝试 AI。
+        """
+        user_info, _ = await user_crud.load_user_context(user_id)
+        
+        async def compute():
+            return await self.calculate_daily_recommendation_with_ai(user_info)
+        
+        return await query_cache.get_or_load(
+            "daily_plan_ai",
+            _profile_key(user_id, user_info),
+            compute,
+            ttl=AI_PLAN_CACHE_TTL,
+            cache_if=lambda plan: "ai_reasoning" in plan
+        )
+    
     def calculate_daily_recommendation(
         self,
         user_info: Dict[str, Any],
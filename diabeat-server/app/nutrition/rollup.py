@@ -0,0 +1,217 @@
+"""每日营养摄入汇总
+
+daily_nutrition_rollup 由数据库触发器在用餐记录 / 营养记录写入时增量维护
+（见 sql/migrations/add_daily_nutrition_rollup.sql），这里负责读取汇总以及
+回填、纠偏的修复任务。
+"""
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List
+from app.database import database
+from app.records import queries
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 周期修复覆盖的最近天数（今天和昨天足以覆盖补录、跨日修改等情况）
+REPAIR_RECENT_DAYS = 2
+# 周期修复间隔（秒）
+REPAIR_INTERVAL_SECONDS = 3600
+
+ROLLUP_COLUMNS = """
+    date,
+    total_calories::float8 AS total_calories,
+    total_carbs::float8 AS total_carbs,
+    total_net_carbs::float8 AS total_net_carbs,
+    total_protein::float8 AS total_protein,
+    total_fat::float8 AS total_fat,
+    total_fiber::float8 AS total_fiber,
+    meal_count
+"""
+
+ROLLUP_DAY = queries.register("nutrition_rollup_day", f"""
+    SELECT {ROLLUP_COLUMNS}
+    FROM daily_nutrition_rollup
+    WHERE user_id = $1 AND date = $2
+""")
+
+ROLLUP_RANGE = queries.register("nutrition_rollup_range", f"""
+    SELECT {ROLLUP_COLUMNS}
+    FROM daily_nutrition_rollup
+    WHERE user_id = $1 AND date >= $2 AND date <= $3
+    ORDER BY date
+""")
+
+# $4 为 date_trunc 的粒度（week / month）
+ROLLUP_TRENDS = queries.register("nutrition_rollup_trends", """
+    SELECT
+        date_trunc($4, date)::date AS period_start,
+        COUNT(*) FILTER (WHERE meal_count > 0) AS days_logged,
+        COALESCE(SUM(meal_count), 0)::int AS meal_count,
+        COALESCE(SUM(total_calories), 0)::float8 AS total_calories,
+        COALESCE(SUM(total_carbs), 0)::float8 AS total_carbs,
+        COALESCE(SUM(total_net_carbs), 0)::float8 AS total_net_carbs,
+        COALESCE(SUM(total_protein), 0)::float8 AS total_protein,
+        COALESCE(SUM(total_fat), 0)::float8 AS total_fat,
+        COALESCE(SUM(total_fiber), 0)::float8 AS total_fiber
+    FROM daily_nutrition_rollup
+    WHERE user_id = $1 AND date >= $2 AND date <= $3
+    GROUP BY 1
+    ORDER BY 1
+""")
+
+# 按源数据重算 [$1, $2] 日期范围内的汇总，只改写有偏差的行
+REPAIR_UPSERT = queries.register("nutrition_rollup_repair", """
+    WITH actual AS (
+        SELECT
+            mr.user_id,
+            mr.meal_time::date AS date,
+            COALESCE(SUM(nr.calories), 0) AS total_calories,
+            COALESCE(SUM(nr.total_carbs), 0) AS total_carbs,
+            COALESCE(SUM(nr.net_carbs), 0) AS total_net_carbs,
+            COALESCE(SUM(nr.protein), 0) AS total_protein,
+            COALESCE(SUM(nr.fat), 0) AS total_fat,
+            COALESCE(SUM(nr.fiber), 0) AS total_fiber,
+            COUNT(*) AS meal_count
+        FROM meal_records mr
+        LEFT JOIN nutrition_records nr ON mr.nutrition_record_id = nr.id
+        WHERE mr.meal_time >= $1::date AND mr.meal_time < $2::date + 1
+        GROUP BY mr.user_id, mr.meal_time::date
+    )
+    INSERT INTO daily_nutrition_rollup AS r (
+        user_id, date, total_calories, total_carbs, total_net_carbs,
+        total_protein, total_fat, total_fiber, meal_count
+    )
+    SELECT
+        user_id, date, total_calories, total_carbs, total_net_carbs,
+        total_protein, total_fat, total_fiber, meal_count
+    FROM actual
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        total_calories = EXCLUDED.total_calories,
+        total_carbs = EXCLUDED.total_carbs,
+        total_net_carbs = EXCLUDED.total_net_carbs,
+        total_protein = EXCLUDED.total_protein,
+        total_fat = EXCLUDED.total_fat,
+        total_fiber = EXCLUDED.total_fiber,
+        meal_count = EXCLUDED.meal_count,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE (r.total_calories, r.total_carbs, r.total_net_carbs, r.total_protein,
+           r.total_fat, r.total_fiber, r.meal_count)
+          IS DISTINCT FROM
+          (EXCLUDED.total_calories, EXCLUDED.total_carbs, EXCLUDED.total_net_carbs,
+           EXCLUDED.total_protein, EXCLUDED.total_fat, EXCLUDED.total_fiber, EXCLUDED.meal_count)
+""")
+
+# 删除范围内已没有任何用餐记录的汇总行
+REPAIR_DELETE_STALE = queries.register("nutrition_rollup_repair_stale", """
+    DELETE FROM daily_nutrition_rollup r
+    WHERE r.date >= $1 AND r.date <= $2
+      AND NOT EXISTS (
+          SELECT 1 FROM meal_records mr
+          WHERE mr.user_id = r.user_id
+            AND mr.meal_time >= r.date
+            AND mr.meal_time < r.date + 1
+      )
+""")
+
+
+def _empty_day(day: date) -> Dict[str, Any]:
+    return {
+        "total_calories": 0.0,
+        "total_carbs": 0.0,
+        "total_net_carbs": 0.0,
+        "total_protein": 0.0,
+        "total_fat": 0.0,
+        "total_fiber": 0.0,
+        "meal_count": 0,
+        "date": day.isoformat()
+    }
+
+
+def _day_from_row(row) -> Dict[str, Any]:
+    result = dict(row)
+    result["date"] = row["date"].isoformat()
+    return result
+
+
+async def get_daily_intake(user_id: str, day: date) -> Dict[str, Any]:
+    """获取某一天的营养摄入（单行主键读取）"""
+    row = await queries.fetchrow(ROLLUP_DAY, user_id, day)
+    return _day_from_row(row) if row else _empty_day(day)
+
+
+async def get_intake_range(user_id: str, start_date: date, end_date: date) -> List[Dict[str, Any]]:
+    """获取日期范围内每天的营养摄入，没有记录的日期补零"""
+    rows = await queries.fetch(ROLLUP_RANGE, user_id, start_date, end_date)
+    by_date = {row["date"]: row for row in rows}
+    days = []
+    day = start_date
+    while day <= end_date:
+        days.append(_day_from_row(by_date[day]) if day in by_date else _empty_day(day))
+        day += timedelta(days=1)
+    return days
+
+
+async def get_intake_trends(user_id: str, start_date: date, end_date: date, unit: str) -> List[Dict[str, Any]]:
+    """按周或按月汇总营养摄入
+
+    Args:
+        unit: "week" 或 "month"
+    """
+    rows = await queries.fetch(ROLLUP_TRENDS, user_id, start_date, end_date, unit)
+    periods = []
+    for row in rows:
+        period = dict(row)
+        period["period_start"] = row["period_start"].isoformat()
+        days_logged = row["days_logged"] or 0
+        for key in ("calories", "carbs", "net_carbs", "protein", "fat", "fiber"):
+            total = row[f"total_{key}"]
+            period[f"avg_daily_{key}"] = round(total / days_logged, 2) if days_logged else 0.0
+        periods.append(period)
+    return periods
+
+
+def _rows_affected(status: str) -> int:
+    try:
+        return int(status.split()[-1])
+    except (AttributeError, ValueError, IndexError):
+        return 0
+
+
+async def repair_daily_rollup(start_date: date, end_date: date) -> Dict[str, int]:
+    """按源数据重算日期范围内的汇总，修正触发器之外的偏差（回填、手工改库等）
+
+    修复期间对汇总表加 SHARE ROW EXCLUSIVE 锁：等待已写入汇总的事务提交，并让新的
+    用餐记录写入在触发器处等待，保证重算结果与并发写入的增量不会互相覆盖。
+    该锁与自身冲突，多个 worker / 实例同时修复时依次执行，不会在升级锁时死锁。
+    范围越大锁持有越久，日常只修复最近几天，全量回填在低峰期运行。
+    """
+    async with database.transaction():
+        await database.execute("LOCK TABLE daily_nutrition_rollup IN SHARE ROW EXCLUSIVE MODE")
+        upserted = _rows_affected(await queries.execute(REPAIR_UPSERT, start_date, end_date))
+        deleted = _rows_affected(await queries.execute(REPAIR_DELETE_STALE, start_date, end_date))
+
+    if upserted or deleted:
+        logger.warning(
+            f"⚠️ 营养汇总已修复: {start_date} ~ {end_date}, 更新 {upserted} 行, 删除 {deleted} 行"
+        )
+    else:
+        logger.info(f"✅ 营养汇总校验一致: {start_date} ~ {end_date}")
+    return {"upserted": upserted, "deleted": deleted}
+
+
+async def repair_recent_days(days: int = REPAIR_RECENT_DAYS) -> Dict[str, int]:
+    """修复最近几天的汇总"""
+    end_date = datetime.utcnow().date()
+    start_date = end_date - timedelta(days=days - 1)
+    return await repair_daily_rollup(start_date, end_date)
+
+
+async def run_periodic_repair():
+    """周期性修复最近几天的汇总"""
+    while True:
+        try:
+            await repair_recent_days()
+        except Exception as e:
+            logger.error(f"Error in nutrition rollup repair: {str(e)}")
+        await asyncio.sleep(REPAIR_INTERVAL_SECONDS)
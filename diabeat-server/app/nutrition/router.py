@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import Optional
+from typing import Optional, List
+from datetime import datetime, date, timedelta
 from app.nutrition import schemas
 from app.nutrition.service import NutritionService
 from app.nutrition.daily_recommendation import DailyNutritionRecommendation
 from app.user.router import get_current_user_dependency
 from app.user.schemas import UserResponse
-from app.user import crud as user_crud
 from app.records import crud as records_crud
+from app.nutrition import rollup
 import logging
 
 logger = logging.getLogger(__name__)
@@ -125,15 +126,7 @@ async def get_daily_recommendation(
 ):
     """获取每日推荐营养摄入"""
     try:
-        user_info = await user_crud.get_user_by_id(current_user.id) or {}
-        user_params = await user_crud.get_user_parameters(current_user.id)
-        
-        recommendation = daily_recommendation.calculate_daily_recommendation(
-            user_info=user_info,
-            user_params=user_params
-        )
-        
-        return recommendation
+        return await daily_recommendation.get_user_daily_recommendation(current_user.id)
     except Exception as e:
         logger.error(f"获取每日推荐营养失败: {str(e)}")
         raise HTTPException(
@@ -151,7 +144,6 @@ async def get_today_intake(
 ):
     """获取今日营养摄入统计"""
     try:
-        from datetime import datetime
         intake = await records_crud.get_today_nutrition_intake(current_user.id, datetime.utcnow())
         return intake
     except Exception as e:
@@ -160,3 +152,98 @@ async def get_today_intake(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"获取今日营养摄入失败: {str(e)}"
         )
+
+# 日期范围查询最多返回的天数
+MAX_INTAKE_RANGE_DAYS = 366
+
+@router.get(
+    "/intake",
+    response_model=List[schemas.DailyIntake],
+    summary="获取日期范围内的每日营养摄入",
+    description="按天返回营养摄入统计，没有用餐记录的日期补零"
+)
+async def get_intake_range(
+    start_date: str = Query(..., description="开始日期 (YYYY-MM-DD)"),
+    end_date: str = Query(..., description="结束日期 (YYYY-MM-DD，包含当天)"),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """获取日期范围内的每日营养摄入"""
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="日期格式错误，请使用 YYYY-MM-DD 格式"
+        )
+    if end < start or (end - start).days >= MAX_INTAKE_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"日期范围无效，最多查询 {MAX_INTAKE_RANGE_DAYS} 天"
+        )
+    
+    try:
+        return await rollup.get_intake_range(current_user.id, start, end)
+    except Exception as e:
+        logger.error(f"获取营养摄入范围失败: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取营养摄入失败: {str(e)}"
+        )
+
+@router.get(
+    "/trends/weekly",
+    response_model=schemas.IntakeTrendResponse,
+    summary="获取每周营养摄入趋势",
+    description="按自然周（周一开始）汇总最近若干周的营养摄入"
+)
+async def get_weekly_trends(
+    weeks: int = Query(12, ge=1, le=104, description="统计的周数（含本周）"),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """获取每周营养摄入趋势"""
+    try:
+        today = datetime.utcnow().date()
+        start = today - timedelta(days=today.weekday()) - timedelta(weeks=weeks - 1)
+        periods = await rollup.get_intake_trends(current_user.id, start, today, "week")
+        return schemas.IntakeTrendResponse(
+            unit="week",
+            start_date=start.isoformat(),
+            end_date=today.isoformat(),
+            periods=periods
+        )
+    except Exception as e:
+        logger.error(f"获取每周营养趋势失败: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取每周营养趋势失败: {str(e)}"
+        )
+
+@router.get(
+    "/trends/monthly",
+    response_model=schemas.IntakeTrendResponse,
+    summary="获取每月营养摄入趋势",
+    description="按自然月汇总最近若干个月的营养摄入"
+)
+async def get_monthly_trends(
+    months: int = Query(6, ge=1, le=36, description="统计的月数（含本月）"),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """获取每月营养摄入趋势"""
+    try:
+        today = datetime.utcnow().date()
+        month_index = today.year * 12 + today.month - 1 - (months - 1)
+        start = date(month_index // 12, month_index % 12 + 1, 1)
+        periods = await rollup.get_intake_trends(current_user.id, start, today, "month")
+        return schemas.IntakeTrendResponse(
+            unit="month",
+            start_date=start.isoformat(),
+            end_date=today.isoformat(),
+            periods=periods
+        )
+    except Exception as e:
+        logger.error(f"获取每月营养趋势失败: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取每月营养趋势失败: {str(e)}"
+        )
@@ -24,3 +24,39 @@ class NutritionCalculationResponse(BaseModel):
     calculation_details: Optional[List[dict]] = Field(None, description="计算详情")
     nutrition_record_id: Optional[str] = Field(None, description="营养记录ID（如果已保存）")
 
+
+class DailyIntake(BaseModel):
+    """单日营养摄入统计"""
+    date: str = Field(..., description="日期 (YYYY-MM-DD)")
+    total_calories: float = Field(..., description="总热量（千卡）")
+    total_carbs: float = Field(..., description="总碳水化合物（克）")
+    total_net_carbs: float = Field(..., description="净碳水化合物（克）")
+    total_protein: float = Field(..., description="蛋白质（克）")
+    total_fat: float = Field(..., description="脂肪（克）")
+    total_fiber: float = Field(..., description="膳食纤维（克）")
+    meal_count: int = Field(..., description="用餐次数")
+
+class IntakeTrendPeriod(BaseModel):
+    """一周或一个月的营养摄入汇总"""
+    period_start: str = Field(..., description="周期开始日期 (YYYY-MM-DD)")
+    days_logged: int = Field(..., description="有用餐记录的天数")
+    meal_count: int = Field(..., description="用餐次数")
+    total_calories: float = Field(..., description="总热量（千卡）")
+    total_carbs: float = Field(..., description="总碳水化合物（克）")
+    total_net_carbs: float = Field(..., description="净碳水化合物（克）")
+    total_protein: float = Field(..., description="蛋白质（克）")
+    total_fat: float = Field(..., description="脂肪（克）")
+    total_fiber: float = Field(..., description="膳食纤维（克）")
+    avg_daily_calories: float = Field(..., description="日均热量（按有记录的天数）")
+    avg_daily_carbs: float = Field(..., description="日均碳水化合物")
+    avg_daily_net_carbs: float = Field(..., description="日均净碳水化合物")
+    avg_daily_protein: float = Field(..., description="日均蛋白质")
+    avg_daily_fat: float = Field(..., description="日均脂肪")
+    avg_daily_fiber: float = Field(..., description="日均膳食纤维")
+
+class IntakeTrendResponse(BaseModel):
+    """营养摄入趋势"""
+    unit: str = Field(..., description="汇总粒度 (week/month)")
+    start_date: str = Field(..., description="统计开始日期")
+    end_date: str = Field(..., description="统计结束日期")
+    periods: List[IntakeTrendPeriod] = Field(default_factory=list, description="各周期汇总（没有记录的周期省略）")
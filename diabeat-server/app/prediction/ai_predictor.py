@@ -5,8 +5,7 @@ AI增强的血糖预测器
 from typing import Dict, Any, Optional, List
 import logging
 import json
-from openai import OpenAI
-from app.config import settings
+from app.llm import llm_client, PROVIDER_DASHSCOPE, PRIORITY_PREDICTION
 from app.prediction.predictor import BloodGlucosePredictor
 
 logger = logging.getLogger(__name__)
@@ -19,16 +18,11 @@ class AIBloodGlucosePredictor:
         self.model = "qwen3-max"  # 使用最强的qwen3-max模型
         self.rule_based_predictor = BloodGlucosePredictor()  # Fallback
         
-        # 初始化通义千问客户端
-        if settings.DASHSCOPE_API_KEY:
-            self.client = OpenAI(
-                api_key=settings.DASHSCOPE_API_KEY,
-                base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
-            )
+        # 通义千问（经 app.llm 调度限流）
+        if llm_client.is_configured(PROVIDER_DASHSCOPE):
             self.ai_enabled = True
             logger.info(f"✅ AI血糖预测器初始化成功，使用模型: {self.model}")
         else:
-            self.client = None
             self.ai_enabled = False
             logger.warning("⚠️ DASHSCOPE_API_KEY未配置，将使用规则引擎")
     
@@ -54,7 +48,10 @@ class AIBloodGlucosePredictor:
         recent_meals: Optional[List] = None,
         recent_medications: Optional[List] = None,
         recent_exercises: Optional[List] = None,
-        recent_water: Optional[List] = None
+        recent_water: Optional[List] = None,
+        # 既往注射 / 进食仍在作用的部分
+        insulin_on_board: float = 0.0,
+        carbs_on_board: float = 0.0
     ) -> Dict[str, Any]:
         """
         预测餐后血糖变化
@@ -70,14 +67,17 @@ class AIBloodGlucosePredictor:
             meal_time: 餐点时间（可选）
             medication_time: 药物服用时间（可选）
             current_time: 当前时间（可选）
+            insulin_on_board: 活性胰岛素（单位）
+            carbs_on_board: 活性碳水（克）
             
         Returns:
             Dict: 预测结果
         """
         if not self.ai_enabled:
             logger.info("使用规则引擎进行预测")
-            return self.rule_based_predictor.predict(
-                total_carbs, insulin_dose, current_bg, gi_value, activity_level
+            return self._predict_with_rules(
+                total_carbs, insulin_dose, current_bg, gi_value, activity_level,
+                insulin_on_board, carbs_on_board
             )
         
         try:
@@ -88,7 +88,8 @@ class AIBloodGlucosePredictor:
                 gi_value, activity_level, user_bias, correction_count,
                 meal_time, medication_time, current_time,
                 weight, height, age, gender, diabetes_type,
-                recent_meals, recent_medications, recent_exercises, recent_water
+                recent_meals, recent_medications, recent_exercises, recent_water,
+                insulin_on_board, carbs_on_board
             )
             logger.info("✅ AI预测成功")
             return ai_result
@@ -96,10 +97,34 @@ class AIBloodGlucosePredictor:
         except Exception as e:
             logger.error(f"❌ AI预测失败: {e}, 降级使用规则引擎")
             # 降级到规则引擎
-            return self.rule_based_predictor.predict(
-                total_carbs, insulin_dose, current_bg, gi_value, activity_level
+            return self._predict_with_rules(
+                total_carbs, insulin_dose, current_bg, gi_value, activity_level,
+                insulin_on_board, carbs_on_board
             )
     
+    def _predict_with_rules(
+        self,
+        total_carbs: float,
+        insulin_dose: float,
+        current_bg: float,
+        gi_value: Optional[float],
+        activity_level: str,
+        insulin_on_board: float = 0.0,
+        carbs_on_board: float = 0.0
+    ) -> Dict[str, Any]:
+        """规则引擎预测
+        
+        规则模型只有单次进食和单次注射，既往仍在作用的胰岛素和碳水
+        （预测时间范围内基本会全部起效）直接并入本次的剂量和碳水。
+        """
+        result = self.rule_based_predictor.predict(
+            total_carbs + carbs_on_board,
+            insulin_dose + insulin_on_board,
+            current_bg, gi_value, activity_level
+        )
+        result["model"] = "rules"
+        return result
+    
     async def _predict_with_ai(
         self,
         total_carbs: float,
@@ -120,7 +145,9 @@ class AIBloodGlucosePredictor:
         recent_meals: Optional[List] = None,
         recent_medications: Optional[List] = None,
         recent_exercises: Optional[List] = None,
-        recent_water: Optional[List] = None
+        recent_water: Optional[List] = None,
+        insulin_on_board: float = 0.0,
+        carbs_on_board: float = 0.0
     ) -> Dict[str, Any]:
         """使用AI模型进行预测（支持时间感知 + 个性化 + 历史记录）"""
         
@@ -173,10 +200,19 @@ class AIBloodGlucosePredictor:
             )
             logger.info("使用传统预测（无时间上下文，但有用户信息和历史记录）")
         
-        # 调用AI模型
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
+        # 既往注射 / 进食仍在作用的部分
+        if insulin_on_board >= 0.05 or carbs_on_board >= 1:
+            prompt = (
+                f"**既往记录仍在作用**: 活性胰岛素约 {insulin_on_board:.1f} 单位，"
+                f"活性碳水约 {carbs_on_board:.0f}g（均不含本次），预测时需一并考虑。\n\n"
+                + prompt
+            )
+        
+        # 调用AI模型（排队超时等同调用失败，由 predict 降级到规则引擎）
+        result_text = await llm_client.chat(
+            PROVIDER_DASHSCOPE,
+            self.model,
+            [
                 {
                     "role": "system",
                     "content": self._get_system_prompt()
@@ -186,16 +222,17 @@ class AIBloodGlucosePredictor:
                     "content": prompt
                 }
             ],
+            PRIORITY_PREDICTION,
             temperature=0.3,  # 降低随机性，提高一致性
             max_tokens=2000
         )
         
         # 解析AI返回结果
-        result_text = response.choices[0].message.content
         logger.debug(f"AI返回: {result_text[:200]}...")
         
         # 提取JSON
         result = self._parse_ai_response(result_text)
+        result["model"] = self.model
         
         return result
     
@@ -0,0 +1,144 @@
+"""血糖预测纠正记录与每用户偏差统计
+
+提交纠正时在同一事务中写入实测血糖、纠正记录，并以 O(1) 更新
+user_prediction_bias 中的偏差 EWMA 和纠正次数。预测时从 Redis 读取
+偏差统计（未命中时按主键读取一次并回填），不扫描纠正记录。
+"""
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.database import database, get_redis
+from app.records import queries
+import logging
+
+logger = logging.getLogger(__name__)
+
+# EWMA 平滑系数：2 / (N + 1)，N = 10，与原先“最近 10 次纠正的平均值”的时间尺度相当
+BIAS_ALPHA = 2 / (10 + 1)
+# 偏差统计缓存有效期（秒）；提交纠正时直接写入新值，过期只影响不活跃用户
+BIAS_CACHE_TTL_SECONDS = 24 * 3600
+BIAS_KEY_PREFIX = "bgbias"
+
+INSERT_ACTUAL = queries.register("correction_insert_actual", """
+    INSERT INTO actual_blood_glucose (id, user_id, bg_value, source, measured_at, created_at)
+    VALUES ($1, $2, $3, $4, $5, $6)
+""")
+
+INSERT_CORRECTION = queries.register("correction_insert", """
+    INSERT INTO blood_glucose_corrections
+    (id, user_id, actual_bg_id, prediction_id, prediction_time_minutes, predicted_value,
+     actual_value, difference, measured_at, source, note, created_at)
+    VALUES ($1, $2, $1, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+""")
+
+UPDATE_BIAS = queries.register("correction_update_bias", f"""
+    INSERT INTO user_prediction_bias AS b (user_id, bias, correction_count, updated_at)
+    VALUES ($1, $2, 1, $3)
+    ON CONFLICT (user_id) DO UPDATE SET
+        bias = b.bias + {BIAS_ALPHA!r} * (EXCLUDED.bias - b.bias),
+        correction_count = b.correction_count + 1,
+        updated_at = EXCLUDED.updated_at
+    RETURNING bias, correction_count
+""")
+
+SELECT_BIAS = queries.register("correction_bias", """
+    SELECT bias, correction_count
+    FROM user_prediction_bias
+    WHERE user_id = $1
+""")
+
+LIST_CORRECTIONS = queries.register("correction_list", """
+    SELECT
+        id::text AS id,
+        prediction_id::text AS prediction_id,
+        predicted_value::float8 AS predicted_value,
+        actual_value::float8 AS actual_value,
+        difference::float8 AS difference,
+        prediction_time_minutes,
+        measured_at,
+        source,
+        note,
+        created_at
+    FROM blood_glucose_corrections
+    WHERE user_id = $1
+    ORDER BY measured_at DESC
+    LIMIT $2
+""")
+
+
+def _bias_key(user_id: str) -> str:
+    return f"{BIAS_KEY_PREFIX}:{user_id}"
+
+
+async def _cache_bias(user_id: str, bias: float, count: int):
+    try:
+        redis = await get_redis()
+        if redis:
+            await redis.setex(_bias_key(user_id), BIAS_CACHE_TTL_SECONDS, json.dumps([bias, count]))
+    except Exception as e:
+        logger.warning(f"⚠️ 偏差统计缓存写入失败: {str(e)}")
+
+
+async def save_correction(
+    correction_id: str,
+    user_id: str,
+    actual_value: float,
+    measured_at: datetime,
+    source: str,
+    prediction_id: Optional[str],
+    prediction_time_minutes: Optional[int],
+    predicted_value: Optional[float],
+    difference: Optional[float],
+    note: Optional[str]
+) -> datetime:
+    """保存实测血糖和纠正记录，有关联预测时更新偏差统计
+
+    Returns:
+        datetime: 创建时间
+    """
+    created_at = datetime.utcnow()
+    stats = None
+    async with database.transaction():
+        await queries.execute(
+            INSERT_ACTUAL, correction_id, user_id, actual_value, source, measured_at, created_at
+        )
+        await queries.execute(
+            INSERT_CORRECTION, correction_id, user_id, prediction_id, prediction_time_minutes,
+            predicted_value, actual_value, difference, measured_at, source, note, created_at
+        )
+        if prediction_id and difference is not None:
+            stats = await queries.fetchrow(UPDATE_BIAS, user_id, difference, created_at)
+
+    if stats:
+        await _cache_bias(user_id, float(stats["bias"]), int(stats["correction_count"]))
+    return created_at
+
+
+async def get_bias_stats(user_id: str) -> Tuple[float, int]:
+    """获取用户的预测偏差 EWMA 和纠正次数
+
+    Returns:
+        (偏差, 纠正次数)，没有纠正记录时为 (0.0, 0)
+    """
+    redis = None
+    try:
+        redis = await get_redis()
+        if redis:
+            cached = await redis.get(_bias_key(user_id))
+            if cached:
+                bias, count = json.loads(cached)
+                return float(bias), int(count)
+    except Exception as e:
+        logger.warning(f"⚠️ 偏差统计缓存读取失败: {str(e)}")
+
+    row = await queries.fetchrow(SELECT_BIAS, user_id)
+    bias, count = (float(row["bias"]), int(row["correction_count"])) if row else (0.0, 0)
+    if redis:
+        await _cache_bias(user_id, bias, count)
+    return bias, count
+
+
+async def list_corrections(user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """最近的纠正记录（按测量时间倒序）"""
+    rows = await queries.fetch(LIST_CORRECTIONS, user_id, limit)
+    return [dict(row) for row in rows]
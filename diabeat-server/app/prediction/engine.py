@@ -0,0 +1,203 @@
+"""向量化血糖预测引擎
+
+与 BloodGlucosePredictor 使用同一套规则模型，但以 NumPy 数组一次计算
+多个场景（不同用户、不同假设剂量）在任意时间网格上的血糖曲线。
+
+逐点计算中与场景无关的部分（上升进度 t/peak、指数衰减 0.95 ** ((t-peak)/30)、
+置信度）只取决于峰值时间和时间点，按峰值时间档位预先用 Python 标量运算
+生成查找表，再按场景所属档位取行广播，保证在默认时间点上与标量实现
+逐位一致（包括 round(x, 1) 的舍入结果）。
+"""
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.prediction.predictor import ACTIVITY_FACTORS, DEFAULT_TIME_POINTS, BloodGlucosePredictor
+
+# GI 档位：高 GI、中 GI、低 GI、未提供
+GI_HIGH, GI_MEDIUM, GI_LOW, GI_UNKNOWN = 0, 1, 2, 3
+CARB_MULTIPLIERS = np.array([1.2, 1.0, 0.8, 1.0])
+PEAK_TIMES = np.array([60, 90, 120, 90])
+
+RISK_LEVELS = ("low", "medium", "high")
+
+MIN_BG = 3.0
+MAX_BG = 20.0
+
+# 复用标量实现的建议生成规则
+_rule_predictor = BloodGlucosePredictor()
+
+
+def time_grid(step_minutes: int = 5, horizon_minutes: int = 360) -> Tuple[int, ...]:
+    """生成等间隔时间网格（不含 0 分钟），例如每 5 分钟直到 6 小时"""
+    return tuple(range(step_minutes, horizon_minutes + 1, step_minutes))
+
+
+@lru_cache(maxsize=32)
+def _curve_table(time_points: Tuple[int, ...]) -> Dict[str, np.ndarray]:
+    """按 GI 档位生成与场景无关的曲线系数表，形状均为 (档位数, 时间点数)"""
+    rising, progress, decay_complement, confidence = [], [], [], []
+    for peak_time in PEAK_TIMES.tolist():
+        rising.append([t <= peak_time for t in time_points])
+        progress.append([t / peak_time for t in time_points])
+        decay_complement.append([1 - 0.95 ** ((t - peak_time) / 30) for t in time_points])
+        confidence.append([0.85 if abs(t - peak_time) <= 30 else 0.75 for t in time_points])
+    return {
+        "rising": np.array(rising, dtype=bool),
+        "progress": np.array(progress, dtype=np.float64),
+        "decay_complement": np.array(decay_complement, dtype=np.float64),
+        "confidence": np.array(confidence, dtype=np.float64),
+    }
+
+
+def round1(values: np.ndarray) -> np.ndarray:
+    """与 Python 内置 round(x, 1) 结果一致的向量化舍入
+
+    np.round 先乘 10 再取整，x * 10 的浮点误差会让恰好落在 .x5 附近的值
+    与 round() 的十进制精确舍入结果不同；这类值极少，逐个用 round() 修正。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scaled = values * 10.0
+    rounded = np.round(scaled) / 10.0
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded = rounded.copy()
+        flat_values = values.reshape(-1)
+        flat_rounded = rounded.reshape(-1)
+        for index in np.flatnonzero(near_tie):
+            flat_rounded[index] = round(float(flat_values[index]), 1)
+    return rounded
+
+
+def gi_bands(gi_values: np.ndarray) -> np.ndarray:
+    """GI 值 -> 档位，NaN 或 0 视为未提供（与标量实现的 ``if gi_value:`` 一致）"""
+    known = ~np.isnan(gi_values) & (gi_values != 0)
+    bands = np.full(gi_values.shape, GI_UNKNOWN, dtype=np.intp)
+    bands[known & (gi_values <= 55)] = GI_LOW
+    bands[known & (gi_values > 55)] = GI_MEDIUM
+    bands[known & (gi_values > 70)] = GI_HIGH
+    return bands
+
+
+def activity_factors(activity_levels: Optional[Sequence[Optional[str]]], size: int) -> np.ndarray:
+    """活动水平 -> 调整系数"""
+    if activity_levels is None:
+        return np.ones(size)
+    return np.array([
+        ACTIVITY_FACTORS.get((level or "sedentary").lower(), 1.0) for level in activity_levels
+    ], dtype=np.float64)
+
+
+class BatchPrediction:
+    """一批场景的预测结果（按列存放）"""
+
+    __slots__ = (
+        "time_points", "bg_values", "confidence", "peak_time",
+        "peak_value", "risk_level", "gi_value", "activity_level"
+    )
+
+    def __init__(
+        self,
+        time_points: Tuple[int, ...],
+        bg_values: np.ndarray,
+        confidence: np.ndarray,
+        peak_time: np.ndarray,
+        peak_value: np.ndarray,
+        risk_level: np.ndarray,
+        gi_value: np.ndarray,
+        activity_level: Optional[Sequence[Optional[str]]]
+    ):
+        self.time_points = time_points
+        self.bg_values = bg_values        # (N, T) 已舍入到 0.1
+        self.confidence = confidence      # (N, T)
+        self.peak_time = peak_time        # (N,)
+        self.peak_value = peak_value      # (N,) 未舍入，供风险评估和建议使用
+        self.risk_level = risk_level      # (N,) RISK_LEVELS 下标
+        self.gi_value = gi_value
+        self.activity_level = activity_level
+
+    def __len__(self) -> int:
+        return self.bg_values.shape[0]
+
+    def recommendations(self, index: int) -> List[str]:
+        """生成第 index 个场景的优化建议（与标量实现相同）"""
+        gi_value = self.gi_value[index]
+        activity_level = self.activity_level[index] if self.activity_level is not None else "sedentary"
+        return _rule_predictor._generate_recommendations(
+            float(self.peak_value[index]),
+            RISK_LEVELS[self.risk_level[index]],
+            None if np.isnan(gi_value) else float(gi_value),
+            activity_level or "sedentary"
+        )
+
+    def result(self, index: int) -> Dict[str, Any]:
+        """第 index 个场景的结果，结构与 BloodGlucosePredictor.predict 的返回值相同"""
+        bg_values = self.bg_values[index].tolist()
+        confidence = self.confidence[index].tolist()
+        return {
+            "predictions": [
+                {"time_minutes": t, "bg_value": bg_values[i], "confidence": confidence[i]}
+                for i, t in enumerate(self.time_points)
+            ],
+            "peak_time": int(self.peak_time[index]),
+            "peak_value": round(float(self.peak_value[index]), 1),
+            "risk_level": RISK_LEVELS[self.risk_level[index]],
+            "recommendations": self.recommendations(index)
+        }
+
+
+def predict_batch(
+    total_carbs: Sequence[float],
+    insulin_dose: Sequence[float],
+    current_bg: Sequence[float],
+    gi_value: Optional[Sequence[Optional[float]]] = None,
+    activity_level: Optional[Sequence[Optional[str]]] = None,
+    time_points: Sequence[int] = DEFAULT_TIME_POINTS
+) -> BatchPrediction:
+    """批量预测餐后血糖曲线
+
+    Args:
+        total_carbs / insulin_dose / current_bg: 每个场景的输入，长度相同
+        gi_value: 每个场景的 GI 值，None 表示未提供
+        activity_level: 每个场景的活动水平，None 表示 sedentary
+        time_points: 预测时间点（分钟），默认与标量实现相同
+
+    Returns:
+        BatchPrediction: 按列存放的预测结果
+    """
+    carbs = np.asarray(total_carbs, dtype=np.float64)
+    dose = np.asarray(insulin_dose, dtype=np.float64)
+    current = np.asarray(current_bg, dtype=np.float64)
+    size = carbs.shape[0]
+    if gi_value is None:
+        gi = np.full(size, np.nan)
+    else:
+        gi = np.array([np.nan if g is None else g for g in gi_value], dtype=np.float64)
+
+    time_points = tuple(int(t) for t in time_points)
+    table = _curve_table(time_points)
+    bands = gi_bands(gi)
+
+    # 与标量实现保持相同的运算顺序，保证浮点结果逐位一致
+    carb_impact = carbs * 0.15 * CARB_MULTIPLIERS[bands] * activity_factors(activity_level, size)
+    net_impact = carb_impact - dose * 2.0
+    peak_value = np.maximum(current + net_impact, MIN_BG)
+
+    rising = current[:, None] + net_impact[:, None] * table["progress"][bands]
+    falling = peak_value[:, None] - (peak_value - current)[:, None] * table["decay_complement"][bands]
+    bg_values = np.where(table["rising"][bands], rising, falling)
+    bg_values = round1(np.clip(bg_values, MIN_BG, MAX_BG))
+
+    risk_level = np.zeros(size, dtype=np.intp)
+    risk_level[peak_value > 10.0] = 1
+    risk_level[peak_value > 13.9] = 2
+
+    return BatchPrediction(
+        time_points=time_points,
+        bg_values=bg_values,
+        confidence=table["confidence"][bands],
+        peak_time=PEAK_TIMES[bands],
+        peak_value=peak_value,
+        risk_level=risk_level,
+        gi_value=gi,
+        activity_level=activity_level
+    )
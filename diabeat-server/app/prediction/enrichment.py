@@ -0,0 +1,190 @@
+"""预测结果增强（AI 分析、MCP）的并发执行
+
+基础预测完成后，各项增强并发执行，整体受一个截止时间约束：
+截止时间内完成的增强合并进响应，未完成的在后台继续执行（有单独的
+最长等待时间），完成后写入 Redis，客户端可按 prediction_id 拉取。
+
+每项增强的耗时按结果（ok / error / late）记录到 Prometheus 直方图。
+"""
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from aioredis.exceptions import WatchError
+from app.database import get_redis
+from app.monitoring.metrics import ENRICHMENT_LATENCY
+import logging
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "bgpred:enrich"
+# 后台增强结果的保存时间（秒）
+RESULT_TTL_SECONDS = 600
+
+# 后台任务的强引用，避免执行中被垃圾回收
+_background_tasks: Set[asyncio.Task] = set()
+
+
+async def _timed(name: str, factory: Callable[[], Awaitable[Any]], deadline_at: float) -> Any:
+    """执行一项增强并记录耗时；超过截止时间才完成的记为 late"""
+    start = time.monotonic()
+    outcome = "ok"
+    try:
+        return await factory()
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        finished = time.monotonic()
+        if outcome == "ok" and finished > deadline_at:
+            outcome = "late"
+        ENRICHMENT_LATENCY.labels(enrichment=name, outcome=outcome).observe(finished - start)
+
+
+async def run_enrichments(
+    enrichments: Dict[str, Callable[[], Awaitable[Any]]],
+    deadline_seconds: float,
+    late_timeout_seconds: float = 0,
+    on_pending: Optional[Callable[[List[str]], Awaitable[None]]] = None,
+    on_late: Optional[Callable[[str, Any], Awaitable[None]]] = None
+) -> Tuple[Dict[str, Any], List[str]]:
+    """并发执行多项增强
+
+    Args:
+        enrichments: 名称 -> 增强函数
+        deadline_seconds: 等待全部增强的截止时间
+        late_timeout_seconds: 未按时完成的增强在后台最多再执行多久，0 表示直接取消
+        on_pending: 转入后台前的回调（未完成的增强名称），在任何 on_late 之前执行完毕
+        on_late: 后台增强完成后的回调（名称, 结果），出错或超时时结果为 None
+
+    Returns:
+        (截止时间内成功完成的结果, 未按时完成、仍在后台执行的增强名称)
+    """
+    if not enrichments:
+        return {}, []
+
+    deadline_at = time.monotonic() + deadline_seconds
+    tasks = {
+        name: asyncio.create_task(_timed(name, factory, deadline_at))
+        for name, factory in enrichments.items()
+    }
+    await asyncio.wait(tasks.values(), timeout=deadline_seconds)
+
+    results: Dict[str, Any] = {}
+    late: List[str] = []
+    for name, task in tasks.items():
+        if not task.done():
+            late.append(name)
+            continue
+        if task.cancelled():
+            continue
+        if task.exception() is not None:
+            logger.warning(f"⚠️ 预测增强失败: {name}, error={task.exception()}")
+            continue
+        results[name] = task.result()
+
+    keep_running = bool(late) and late_timeout_seconds > 0 and on_late is not None
+    if keep_running and on_pending is not None:
+        try:
+            await on_pending(late)
+        except Exception as e:
+            logger.warning(f"⚠️ 记录后台增强失败，取消未完成的增强: {str(e)}")
+            keep_running = False
+
+    for name in late:
+        task = tasks[name]
+        if keep_running:
+            background = asyncio.create_task(_finish_late(name, task, late_timeout_seconds, on_late))
+            _background_tasks.add(background)
+            background.add_done_callback(_background_tasks.discard)
+        else:
+            task.cancel()
+
+    if late:
+        logger.info(f"⏱️ 预测增强未在 {int(deadline_seconds * 1000)}ms 内完成: {', '.join(late)}")
+    return results, late
+
+
+async def _finish_late(
+    name: str,
+    task: asyncio.Task,
+    timeout_seconds: float,
+    on_late: Callable[[str, Any], Awaitable[None]]
+):
+    result = None
+    try:
+        result = await asyncio.wait_for(task, timeout=timeout_seconds)
+    except asyncio.TimeoutError:
+        logger.warning(f"⚠️ 预测增强后台执行超时，已取消: {name}")
+    except Exception as e:
+        logger.warning(f"⚠️ 预测增强后台执行失败: {name}, error={str(e)}")
+    try:
+        await on_late(name, result)
+    except Exception as e:
+        logger.warning(f"⚠️ 保存后台增强结果失败: {name}, error={str(e)}")
+
+
+class LateEnrichmentStore:
+    """后台增强结果（Redis 哈希，按 prediction_id 保存）
+
+    字段：user_id、pending（JSON 数组）、各增强名称（JSON 结果，失败时为 null）
+    """
+
+    @staticmethod
+    def _key(prediction_id: str) -> str:
+        return f"{KEY_PREFIX}:{prediction_id}"
+
+    async def start(self, prediction_id: str, user_id: str, pending: List[str]):
+        """记录转入后台的增强（Redis 不可用时抛出异常，调用方据此取消后台增强）"""
+        redis = await get_redis()
+        if not redis:
+            raise RuntimeError("Redis 不可用")
+        key = self._key(prediction_id)
+        pipe = redis.pipeline()
+        pipe.hset(key, mapping={"user_id": str(user_id), "pending": json.dumps(pending)})
+        pipe.expire(key, RESULT_TTL_SECONDS)
+        await pipe.execute()
+
+    async def finish(self, prediction_id: str, name: str, result: Any):
+        redis = await get_redis()
+        if not redis:
+            return
+        key = self._key(prediction_id)
+        # 单个请求的增强数量很少，读改写即可（同一预测的后台任务可能并发完成，用事务保证 pending 正确）
+        async with redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    pending = json.loads(await pipe.hget(key, "pending") or "[]")
+                    pipe.multi()
+                    pipe.hset(key, mapping={
+                        name: json.dumps(result, ensure_ascii=False, default=str),
+                        "pending": json.dumps([item for item in pending if item != name]),
+                    })
+                    pipe.expire(key, RESULT_TTL_SECONDS)
+                    await pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    async def load(self, prediction_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """读取后台增强结果，不存在或不属于该用户时返回 None"""
+        redis = await get_redis()
+        if not redis:
+            return None
+        fields = await redis.hgetall(self._key(prediction_id))
+        if not fields or fields.get("user_id") != str(user_id):
+            return None
+        pending = json.loads(fields.pop("pending", "[]"))
+        fields.pop("user_id", None)
+        return {
+            "pending": pending,
+            "enrichments": {name: json.loads(value) for name, value in fields.items()},
+        }
+
+
+# 模块级单例
+late_enrichment_store = LateEnrichmentStore()
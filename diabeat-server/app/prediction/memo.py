@@ -0,0 +1,266 @@
+"""预测结果缓存
+
+同样的输入（客户端重试、重新查看同一餐）不再重复调用 AI 模型：
+- 缓存键由规范化、量化后的输入生成（碳水、剂量、当前血糖、GI、
+  活动水平、距进食 / 用药时间、活性胰岛素 / 碳水、用户资料和历史记录的哈希）；
+  预测器收到的也是同一组量化后的输入，缓存结果与输入一一对应
+- 结果保存在 Redis 中并设置过期时间，只缓存模型输出，不含每次请求的
+  prediction_id 和提醒
+- 同一进程内并发的相同请求只计算一次（app.utils.single_flight），跨进程用 Redis
+  锁让后到的请求等待先到请求的结果
+"""
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from app.database import get_redis
+from app.prediction.time_aware_predictor import time_aware_predictor
+from app.utils.single_flight import SingleFlight
+import logging
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "bgpred"
+# 缓存格式版本，规则或提示词变更导致旧结果失效时递增
+KEY_VERSION = 2
+
+# 量化精度
+CARBS_QUANTUM = 1.0         # 克
+DOSE_QUANTUM = 0.1          # 单位
+BG_QUANTUM = 0.1            # mmol/L
+GI_QUANTUM = 1.0
+CARBS_ON_BOARD_QUANTUM = 1.0
+INSULIN_ON_BOARD_QUANTUM = 0.1
+MINUTES_QUANTUM = 5         # 距进食 / 用药时间（分钟）
+BIAS_QUANTUM = 0.1
+
+# 跨进程锁的有效期，应大于一次 AI 调用的最长耗时
+LOCK_SECONDS = 30
+# 等待其他进程计算结果时的轮询间隔
+POLL_SECONDS = 0.2
+
+
+def quantize(value: Optional[float], quantum: float) -> Optional[float]:
+    """按精度四舍五入（None 原样返回）"""
+    if value is None:
+        return None
+    return round(round(float(value) / quantum) * quantum, 6)
+
+
+def _quantize_minutes(minutes: Optional[int]) -> Optional[int]:
+    if minutes is None:
+        return None
+    return int(minutes // MINUTES_QUANTUM * MINUTES_QUANTUM)
+
+
+def canonical_times(
+    meal_time: Optional[str],
+    medication_time: Optional[str],
+    current_time: Optional[str] = None
+) -> Dict[str, Optional[str]]:
+    """把进食 / 用药时间换算为按 5 分钟量化后的时间
+
+    以当前时间为基准，返回的 meal_time / medication_time 与 current_time 之间
+    正好相差量化后的分钟数，预测器据此算出的时间上下文与缓存键一致。
+    时间无法解析时原样返回，由预测器按无时间上下文处理。
+    """
+    time_context = time_aware_predictor.calculate_time_context(meal_time, medication_time, current_time)
+    if "current_time" not in time_context:
+        return {"meal_time": meal_time, "medication_time": medication_time, "current_time": current_time}
+    now = time_context["current_time"]
+
+    def shifted(minutes: Optional[int]) -> Optional[str]:
+        if minutes is None:
+            return None
+        return (datetime.fromisoformat(now) - timedelta(minutes=_quantize_minutes(minutes))).isoformat()
+
+    return {
+        "meal_time": shifted(time_context["minutes_since_meal"]),
+        "medication_time": shifted(time_context["minutes_since_medication"]),
+        "current_time": now,
+    }
+
+
+def _digest(value: Any) -> Optional[str]:
+    """任意可 JSON 序列化内容的短哈希，空值返回 None"""
+    if not value:
+        return None
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str, separators=(",", ":"))
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def profile_hash(
+    weight: Optional[float] = None,
+    height: Optional[float] = None,
+    age: Optional[int] = None,
+    gender: Optional[str] = None,
+    diabetes_type: Optional[str] = None,
+    user_bias: float = 0.0,
+    correction_count: int = 0
+) -> Optional[str]:
+    """影响个性化预测的用户资料哈希"""
+    return _digest([
+        weight, height, age, gender, diabetes_type,
+        quantize(user_bias, BIAS_QUANTUM), correction_count
+    ])
+
+
+def canonical_key(
+    total_carbs: float,
+    insulin_dose: float,
+    current_bg: float,
+    gi_value: Optional[float],
+    activity_level: Optional[str],
+    insulin_on_board: float = 0.0,
+    carbs_on_board: float = 0.0,
+    meal_time: Optional[str] = None,
+    medication_time: Optional[str] = None,
+    current_time: Optional[str] = None,
+    profile: Optional[str] = None,
+    history: Any = None
+) -> str:
+    """由规范化输入生成缓存键
+
+    数值输入应已经过 quantize、时间应已经过 canonical_times（见 PredictionService），
+    这里只负责组装。时间只以“距进食 / 用药的分钟数”和当前小时参与，
+    同一餐在 5 分钟内重复查看可以命中。
+    """
+    time_context = time_aware_predictor.calculate_time_context(meal_time, medication_time, current_time)
+    parts = [
+        KEY_VERSION,
+        total_carbs,
+        insulin_dose,
+        current_bg,
+        gi_value or None,
+        (activity_level or "sedentary").lower(),
+        insulin_on_board,
+        carbs_on_board,
+        _quantize_minutes(time_context.get("minutes_since_meal")),
+        _quantize_minutes(time_context.get("minutes_since_medication")),
+        time_context.get("current_hour") if time_context.get("has_time_context") else None,
+        profile,
+        _digest(history),
+    ]
+    return f"{KEY_PREFIX}:{_digest(parts)}"
+
+
+class PredictionMemo:
+    """Redis 预测结果缓存 + 进程内 single-flight"""
+
+    def __init__(self, lock_seconds: int = LOCK_SECONDS, poll_seconds: float = POLL_SECONDS):
+        self.lock_seconds = lock_seconds
+        self.poll_seconds = poll_seconds
+        self._flight = SingleFlight("prediction")
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        ttl_for: Callable[[Dict[str, Any]], int]
+    ) -> Tuple[Dict[str, Any], str]:
+        """读取缓存，未命中时计算并写入
+
+        Args:
+            key: canonical_key 生成的缓存键
+            compute: 计算函数（调用预测器）
+            ttl_for: 根据结果决定缓存时间（秒），返回 0 表示不缓存
+
+        Returns:
+            (结果, 来源)，来源为 hit / miss / coalesced；并发调用方各自拿到副本
+        """
+        (result, source), coalesced = await self._flight.execute(
+            key, lambda: self._load_or_compute(key, compute, ttl_for)
+        )
+        if coalesced:
+            self.stats["coalesced"] += 1
+            source = "coalesced"
+        return result, source
+
+    async def _load_or_compute(self, key, compute, ttl_for) -> Tuple[Dict[str, Any], str]:
+        redis = await self._redis()
+        lock_key = f"{key}:lock"
+        locked = False
+        if redis:
+            cached = await self._get(redis, key)
+            if cached is not None:
+                self.stats["hits"] += 1
+                return cached, "hit"
+            locked = await self._acquire(redis, lock_key)
+            if locked is False:
+                # 其他进程正在计算，等待其结果，超时后自行计算
+                cached = await self._wait_for(redis, key)
+                if cached is not None:
+                    self.stats["coalesced"] += 1
+                    return cached, "coalesced"
+
+        self.stats["misses"] += 1
+        try:
+            result = await compute()
+            ttl = ttl_for(result)
+            if redis and ttl > 0:
+                await self._set(redis, key, result, ttl)
+            return result, "miss"
+        finally:
+            if locked:
+                await self._release(redis, lock_key)
+
+    async def _redis(self):
+        try:
+            return await get_redis()
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"⚠️ 预测缓存不可用: {str(e)}")
+            return None
+
+    async def _get(self, redis, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = await redis.get(key)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"⚠️ 预测缓存读取失败: {str(e)}")
+            return None
+
+    async def _set(self, redis, key: str, result: Dict[str, Any], ttl: int):
+        try:
+            await redis.setex(key, ttl, json.dumps(result, ensure_ascii=False, default=str))
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"⚠️ 预测缓存写入失败: {str(e)}")
+
+    async def _acquire(self, redis, lock_key: str) -> Optional[bool]:
+        """加锁成功返回 True，锁被占用返回 False，Redis 出错返回 None（直接计算）"""
+        try:
+            return bool(await redis.set(lock_key, 1, nx=True, ex=self.lock_seconds))
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"⚠️ 预测缓存加锁失败: {str(e)}")
+            return None
+
+    async def _release(self, redis, lock_key: str):
+        try:
+            await redis.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"⚠️ 预测缓存解锁失败: {str(e)}")
+
+    async def _wait_for(self, redis, key: str) -> Optional[Dict[str, Any]]:
+        deadline = time.monotonic() + self.lock_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_seconds)
+            cached = await self._get(redis, key)
+            if cached is not None:
+                return cached
+            try:
+                if not await redis.exists(f"{key}:lock"):
+                    # 持锁方失败或结果不缓存
+                    return None
+            except Exception:
+                return None
+        return None
+
+
+# 模块级单例
+prediction_memo = PredictionMemo()
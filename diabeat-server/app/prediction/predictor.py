@@ -3,6 +3,17 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# 活动水平对碳水影响的调整系数
+ACTIVITY_FACTORS = {
+    "sedentary": 1.0,
+    "light": 0.95,
+    "moderate": 0.90,
+    "vigorous": 0.85
+}
+
+# 默认预测时间点：餐后30分钟、1小时、1.5小时、2小时、3小时、4小时
+DEFAULT_TIME_POINTS = (30, 60, 90, 120, 180, 240)
+
 class BloodGlucosePredictor:
     """血糖预测器（MVP版本 - 基于规则引擎）"""
     
@@ -49,13 +60,7 @@ class BloodGlucosePredictor:
             peak_time = 90
         
         # 活动水平调整
-        activity_factors = {
-            "sedentary": 1.0,
-            "light": 0.95,
-            "moderate": 0.90,
-            "vigorous": 0.85
-        }
-        activity_factor = activity_factors.get(activity_level.lower(), 1.0)
+        activity_factor = ACTIVITY_FACTORS.get(activity_level.lower(), 1.0)
         
         # 计算峰值血糖
         carb_impact = base_carb_impact * carb_impact_multiplier * activity_factor
@@ -67,9 +72,7 @@ class BloodGlucosePredictor:
         
         # 生成预测点
         predictions = []
-        time_points = [30, 60, 90, 120, 180, 240]  # 餐后30分钟、1小时、1.5小时、2小时、3小时、4小时
-        
-        for time_minutes in time_points:
+        for time_minutes in DEFAULT_TIME_POINTS:
             if time_minutes <= peak_time:
                 # 上升阶段：线性上升
                 progress = time_minutes / peak_time
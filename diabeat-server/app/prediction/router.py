@@ -200,6 +200,73 @@ async def predict_blood_glucose(
             detail=f"预测过程中发生错误: {str(e)}"
         )
 
+@router.post(
+    "/blood-glucose/batch",
+    response_model=schemas.BatchPredictionResponse,
+    summary="批量预测血糖",
+    description="""
+    **一次预测多个场景的餐后血糖曲线**
+    
+    ### 功能特性
+    - 📊 向量化规则模型，一次请求最多 1000 个场景
+    - ⏱️ 支持自定义时间网格（如每 5 分钟直到 6 小时）
+    - 🔁 适用于不同剂量的 what-if 对比
+    
+    ### 使用说明
+    1. 提供场景列表（碳水、剂量、当前血糖、可选 GI 和活动水平）
+    2. 可选设置 step_minutes / horizon_minutes 生成时间网格
+    3. 结果按场景顺序返回，bg_values 与 time_points 一一对应
+    
+    默认时间点下的结果与单次预测的规则模型完全一致；不调用AI，也不保存预测记录。
+    """
+)
+async def predict_blood_glucose_batch(
+    request: schemas.BatchPredictionRequest,
+    prediction_service: PredictionService = Depends(get_prediction_service),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """批量预测血糖 API"""
+    try:
+        logger.info(f"📈 批量血糖预测请求: user={current_user.id}, scenarios={len(request.scenarios)}")
+        return prediction_service.predict_batch(request)
+    except Exception as e:
+        logger.error(f"Batch blood glucose prediction error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"批量预测过程中发生错误: {str(e)}"
+        )
+
+@router.get(
+    "/blood-glucose/{prediction_id}/enrichments",
+    response_model=schemas.PredictionEnrichmentsResponse,
+    summary="获取后台完成的预测增强",
+    description="""
+    **获取未在响应截止时间内完成的预测增强（AI分析、MCP）**
+    
+    预测响应中 pending_enrichments 非空时，可用 prediction_id 轮询本接口，
+    pending 为空表示全部增强已结束。结果保存 10 分钟。
+    """
+)
+async def get_prediction_enrichments(
+    prediction_id: str,
+    prediction_service: PredictionService = Depends(get_prediction_service),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """获取后台预测增强 API"""
+    try:
+        return await prediction_service.get_late_enrichments(prediction_id, current_user.id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Get prediction enrichments error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取预测增强失败: {str(e)}"
+        )
+
 @router.post("/health-insight", response_model=dict)
 async def get_health_insight(
     query: schemas.HealthInsightQuery,
@@ -71,6 +71,44 @@ class BloodGlucosePredictionResponse(BaseModel):
     confidence_score: Optional[float] = Field(0.85, description="预测置信度分数")
     note: Optional[str] = Field(None, description="附加说明")
     risk_assessment: Optional[dict] = Field(default_factory=dict, description="详细风险评估")
+    ai_analysis: Optional[dict] = Field(None, description="AI分析结果")
+    pending_enrichments: List[str] = Field(default_factory=list, description="未在截止时间内完成、仍在后台执行的增强（可通过 enrichments 接口获取）")
+
+class PredictionEnrichmentsResponse(BaseModel):
+    """后台完成的预测增强结果"""
+    prediction_id: str = Field(..., description="预测记录ID")
+    pending: List[str] = Field(default_factory=list, description="仍在执行的增强")
+    ai_analysis: Optional[dict] = Field(None, description="AI分析结果（失败或超时为空）")
+    mcp: Optional[dict] = Field(None, description="MCP增强结果（失败或超时为空）")
+
+class BatchPredictionScenario(BaseModel):
+    """批量预测中的单个场景"""
+    total_carbs: float = Field(..., gt=0, description="总碳水化合物（克）")
+    insulin_dose: float = Field(..., ge=0, description="胰岛素剂量（单位）")
+    current_bg: float = Field(..., gt=0, description="当前血糖值（mmol/L）")
+    gi_value: Optional[float] = Field(None, description="升糖指数")
+    activity_level: Optional[str] = Field("sedentary", description="活动水平")
+
+class BatchPredictionRequest(BaseModel):
+    """批量血糖预测请求（规则模型，不调用AI、不保存记录）"""
+    scenarios: List[BatchPredictionScenario] = Field(..., min_length=1, max_length=1000, description="预测场景列表")
+    step_minutes: Optional[int] = Field(None, ge=5, le=60, description="时间网格间隔（分钟），留空使用默认时间点")
+    horizon_minutes: int = Field(240, ge=30, le=720, description="时间网格终点（分钟），仅在设置 step_minutes 时生效")
+    include_recommendations: bool = Field(True, description="是否生成优化建议")
+
+class BatchPredictionResult(BaseModel):
+    """单个场景的预测结果（与 time_points 一一对应）"""
+    bg_values: List[float] = Field(..., description="各时间点预测血糖值（mmol/L）")
+    confidence: List[float] = Field(..., description="各时间点预测置信度")
+    peak_time: int = Field(..., description="峰值时间（分钟）")
+    peak_value: float = Field(..., description="峰值血糖值（mmol/L）")
+    risk_level: str = Field(..., description="风险等级: low, medium, high")
+    recommendations: List[str] = Field(default_factory=list, description="优化建议")
+
+class BatchPredictionResponse(BaseModel):
+    """批量血糖预测响应"""
+    time_points: List[int] = Field(..., description="预测时间点（分钟，餐后）")
+    results: List[BatchPredictionResult] = Field(..., description="按请求顺序排列的预测结果")
 
 class BloodGlucoseCorrectionRequest(BaseModel):
     """血糖预测纠正请求"""
@@ -84,7 +122,7 @@ class BloodGlucoseCorrectionRequest(BaseModel):
 class BloodGlucoseCorrectionResponse(BaseModel):
     """血糖预测纠正响应"""
     id: str
-    prediction_id: str
+    prediction_id: Optional[str] = None
     predicted_value: float
     actual_value: float
     difference: float
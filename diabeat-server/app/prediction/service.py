@@ -1,18 +1,10 @@
 """
 血糖预测服务
 
-TODO: 数据库表结构需要优化
-当前 actual_blood_glucose 表结构：
-  - id, user_id, bg_value, source, measured_at, created_at
-
-需要添加的列用于支持纠正功能：
-  - prediction_id (关联到预测记录)
-  - prediction_time_minutes (预测时间点)
-  - predicted_value (预测值)
-  - difference (实测值与预测值的差异)
-  - note (备注)
-
-或创建单独的 blood_glucose_corrections 表
+纠正记录：实测血糖写入 actual_blood_glucose，与预测的关联（预测ID、时间点、
+预测值、差值、备注）写入 blood_glucose_corrections；每用户的偏差 EWMA 和
+纠正次数保存在 user_prediction_bias 中，提交纠正时增量更新，预测时从缓存读取
+（见 app.prediction.corrections）。
 """
 from typing import Optional, List, Tuple
 from uuid import uuid4
@@ -23,9 +15,19 @@ from app.prediction.schemas import (
     BloodGlucosePrediction,
     BloodGlucoseCorrectionRequest,
     BloodGlucoseCorrectionResponse,
+    BatchPredictionRequest,
+    BatchPredictionResponse,
+    BatchPredictionResult,
+    PredictionEnrichmentsResponse,
 )
 from app.prediction.predictor import BloodGlucosePredictor
+from app.prediction import engine
 from app.prediction.ai_predictor import AIBloodGlucosePredictor
+from app.prediction import memo
+from app.prediction.writer import prediction_writer
+from app.prediction.enrichment import run_enrichments, late_enrichment_store
+from app.prediction import corrections
+from app.insulin.on_board import on_board_tracker
 from app.database import database
 from app.utils.fastmcp_client import enhance_glucose_prediction, is_mcp_available
 from app.config import settings
@@ -82,37 +84,14 @@ class PredictionService:
             BloodGlucosePredictionResponse: 预测结果
         """
         try:
-            # 获取用户历史偏差（AI预测器会使用这个信息）
-            bias = await self._get_user_bias(user_id)
+            # 获取用户历史偏差和纠正记录数（AI预测器会使用偏差，纠正次数用于评估可信度）
+            bias, correction_count = await self._get_bias_stats(user_id)
             
-            # 获取纠正记录数（用于评估可信度）
-            correction_count = await self._get_correction_count(user_id)
+            # 既往注射 / 进食仍在作用的部分（不含本次预测对应的记录）
+            on_board = await self._get_on_board(user_id, insulin_record_id, nutrition_record_id)
             
-            # 执行AI增强预测（支持时间感知 + 个性化 + 历史记录）
-            result = await self.predictor.predict(
-                total_carbs=request.total_carbs,
-                insulin_dose=request.insulin_dose,
-                current_bg=request.current_bg,
-                gi_value=request.gi_value,
-                activity_level=request.activity_level or "sedentary",
-                user_bias=bias,
-                correction_count=correction_count,
-                # 时间上下文
-                meal_time=request.meal_time,
-                medication_time=request.medication_time,
-                current_time=request.current_time,
-                # 用户基础信息（个性化）
-                weight=request.weight,
-                height=request.height,
-                age=request.age,
-                gender=request.gender,
-                diabetes_type=request.diabetes_type,
-                # 历史记录（AI上下文）
-                recent_meals=request.recent_meals,
-                recent_medications=request.recent_medications,
-                recent_exercises=request.recent_exercises,
-                recent_water=request.recent_water
-            )
+            # 执行AI增强预测（支持时间感知 + 个性化 + 历史记录），相同输入复用缓存结果
+            result = await self._predict_memoized(request, bias, correction_count, on_board)
             
             # 检查是否需要提醒用餐/用药
             reminders = await self._check_reminders(request, result)
@@ -149,71 +128,26 @@ class PredictionService:
             # 绑定预测ID，方便后续纠正
             response_data.prediction_id = prediction_id
             
-            # AI增强：使用DiabetesAnalystAgent分析预测结果
+            # 增强（AI分析、MCP）并发执行，受整体截止时间约束
+            enrichments = {}
             if self._diabetes_analyst:
-                try:
-                    logger.info("使用DiabetesAnalystAgent增强预测分析")
-                    
-                    analyst_result = await self._diabetes_analyst.execute({
-                        "peak_value": result["peak_value"],
-                        "current_bg": request.current_bg,
-                        "activity_level": request.activity_level or "sedentary",
-                        "gi_value": request.gi_value,
-                        "total_carbs": request.total_carbs,
-                        "insulin_dose": request.insulin_dose,
-                        "predictions": result["predictions"]
-                    })
-                    
-                    if analyst_result["success"]:
-                        analysis = analyst_result["result"]
-                        # 添加AI分析结果到响应
-                        if hasattr(response_data, 'ai_analysis'):
-                            response_data.ai_analysis = analysis
-                        logger.info("AI分析增强完成")
-                except Exception as e:
-                    logger.warning(f"AI分析增强失败: {e}")
-            
-            # 如果启用MCP且MCP可用，尝试增强预测（保持向后兼容）
+                enrichments["ai_analysis"] = lambda: self._analyze_prediction(request, result)
             if use_mcp and is_mcp_available():
-                try:
-                    logger.info("尝试使用MCP增强血糖预测")
-                    
-                    # 准备发送给MCP的数据
-                    prediction_data = {
-                        "current_blood_glucose": request.current_bg,
-                        "peak_value": result["peak_value"],
-                        "peak_time": result["peak_time"],
-                        "risk_level": result["risk_level"],
-                        "total_carbs": request.total_carbs,
-                        "insulin_dose": request.insulin_dose,
-                        "gi_value": request.gi_value,
-                        "activity_level": request.activity_level or "sedentary",
-                        "predictions": result["predictions"]
-                    }
-                    
-                    # 调用MCP获取增强结果
-                    enhanced_result = await enhance_glucose_prediction(prediction_data)
-                    
-                    # 更新响应数据
-                    if hasattr(response_data, 'confidence_score'):
-                        response_data.confidence_score = enhanced_result.get("confidence_score", 0.85)
-                    if hasattr(response_data, 'risk_assessment'):
-                        response_data.risk_assessment = enhanced_result.get("risk_assessment", {})
-                    if hasattr(response_data, 'note'):
-                        response_data.note = enhanced_result.get("note", None)
-                    
-                    # 如果MCP提供了额外建议，合并它们
-                    mcp_recommendations = enhanced_result.get("recommendations", [])
-                    if mcp_recommendations:
-                        response_data.recommendations.extend(mcp_recommendations)
-                        # 去重
-                        response_data.recommendations = list(set(response_data.recommendations))
-                        
-                    logger.info("MCP增强预测成功")
-                    
-                except Exception as e:
-                    logger.warning(f"MCP增强预测失败: {str(e)}，使用基础预测结果")
-                    # 保留基础预测结果，不抛出异常
+                enrichments["mcp"] = lambda: self._enhance_with_mcp(request, result)
+            
+            if enrichments:
+                completed, late = await run_enrichments(
+                    enrichments,
+                    deadline_seconds=settings.PREDICTION_ENRICHMENT_DEADLINE_MS / 1000,
+                    late_timeout_seconds=settings.PREDICTION_ENRICHMENT_LATE_TIMEOUT,
+                    on_pending=lambda names: late_enrichment_store.start(prediction_id, user_id, names),
+                    on_late=lambda name, value: late_enrichment_store.finish(prediction_id, name, value)
+                )
+                if completed.get("ai_analysis") is not None:
+                    response_data.ai_analysis = completed["ai_analysis"]
+                if completed.get("mcp") is not None:
+                    self._apply_mcp_enhancement(response_data, completed["mcp"])
+                response_data.pending_enrichments = late
             
             return response_data
             
@@ -221,6 +155,179 @@ class PredictionService:
             logger.error(f"Blood glucose prediction error: {str(e)}")
             raise
     
+    async def _analyze_prediction(self, request: BloodGlucosePredictionRequest, result: dict) -> Optional[dict]:
+        """AI增强：使用DiabetesAnalystAgent分析预测结果"""
+        logger.info("使用DiabetesAnalystAgent增强预测分析")
+        analyst_result = await self._diabetes_analyst.execute({
+            "peak_value": result["peak_value"],
+            "current_bg": request.current_bg,
+            "activity_level": request.activity_level or "sedentary",
+            "gi_value": request.gi_value,
+            "total_carbs": request.total_carbs,
+            "insulin_dose": request.insulin_dose,
+            "predictions": result["predictions"]
+        })
+        if not analyst_result["success"]:
+            return None
+        logger.info("AI分析增强完成")
+        return analyst_result["result"]
+    
+    async def _enhance_with_mcp(self, request: BloodGlucosePredictionRequest, result: dict) -> dict:
+        """MCP增强预测结果（保持向后兼容）"""
+        logger.info("尝试使用MCP增强血糖预测")
+        
+        # 准备发送给MCP的数据
+        prediction_data = {
+            "current_blood_glucose": request.current_bg,
+            "peak_value": result["peak_value"],
+            "peak_time": result["peak_time"],
+            "risk_level": result["risk_level"],
+            "total_carbs": request.total_carbs,
+            "insulin_dose": request.insulin_dose,
+            "gi_value": request.gi_value,
+            "activity_level": request.activity_level or "sedentary",
+            "predictions": result["predictions"]
+        }
+        return await enhance_glucose_prediction(prediction_data)
+    
+    def _apply_mcp_enhancement(self, response_data: BloodGlucosePredictionResponse, enhanced_result: dict):
+        """将MCP增强结果合并到响应"""
+        response_data.confidence_score = enhanced_result.get("confidence_score", 0.85)
+        response_data.risk_assessment = enhanced_result.get("risk_assessment", {})
+        response_data.note = enhanced_result.get("note", None)
+        
+        # 如果MCP提供了额外建议，合并它们（去重并保持顺序）
+        mcp_recommendations = enhanced_result.get("recommendations", [])
+        if mcp_recommendations:
+            response_data.recommendations = list(dict.fromkeys(
+                response_data.recommendations + mcp_recommendations
+            ))
+        logger.info("MCP增强预测成功")
+    
+    async def get_late_enrichments(self, prediction_id: str, user_id: str) -> PredictionEnrichmentsResponse:
+        """获取截止时间后才完成的增强结果
+        
+        Raises:
+            ValueError: 预测记录没有后台增强或已过期
+        """
+        stored = await late_enrichment_store.load(prediction_id, user_id)
+        if stored is None:
+            raise ValueError("未找到该预测的后台增强结果（可能已全部按时完成或已过期）")
+        enrichments = stored["enrichments"]
+        return PredictionEnrichmentsResponse(
+            prediction_id=prediction_id,
+            pending=stored["pending"],
+            ai_analysis=enrichments.get("ai_analysis"),
+            mcp=enrichments.get("mcp")
+        )
+    
+    async def _predict_memoized(
+        self,
+        request: BloodGlucosePredictionRequest,
+        bias: float,
+        correction_count: int,
+        on_board: dict
+    ) -> dict:
+        """调用预测器，相同的规范化输入复用缓存的模型输出
+        
+        数值输入先量化、进食 / 用药时间先按 5 分钟量化（memo.canonical_times），
+        再同时用于缓存键和预测，保证缓存结果与输入一一对应。
+        """
+        activity_level = (request.activity_level or "sedentary").lower()
+        inputs = dict(
+            total_carbs=memo.quantize(request.total_carbs, memo.CARBS_QUANTUM),
+            insulin_dose=memo.quantize(request.insulin_dose, memo.DOSE_QUANTUM),
+            current_bg=memo.quantize(request.current_bg, memo.BG_QUANTUM),
+            gi_value=memo.quantize(request.gi_value, memo.GI_QUANTUM),
+            activity_level=activity_level,
+            insulin_on_board=memo.quantize(on_board["insulin_on_board"], memo.INSULIN_ON_BOARD_QUANTUM),
+            carbs_on_board=memo.quantize(on_board["carbs_on_board"], memo.CARBS_ON_BOARD_QUANTUM),
+            # 时间上下文
+            **memo.canonical_times(request.meal_time, request.medication_time, request.current_time)
+        )
+        
+        async def compute() -> dict:
+            return await self.predictor.predict(
+                **inputs,
+                user_bias=bias,
+                correction_count=correction_count,
+                # 用户基础信息（个性化）
+                weight=request.weight,
+                height=request.height,
+                age=request.age,
+                gender=request.gender,
+                diabetes_type=request.diabetes_type,
+                # 历史记录（AI上下文）
+                recent_meals=request.recent_meals,
+                recent_medications=request.recent_medications,
+                recent_exercises=request.recent_exercises,
+                recent_water=request.recent_water
+            )
+        
+        if not settings.PREDICTION_CACHE_ENABLED:
+            return await compute()
+        
+        key = memo.canonical_key(
+            **inputs,
+            profile=memo.profile_hash(
+                request.weight, request.height, request.age, request.gender,
+                request.diabetes_type, bias, correction_count
+            ),
+            history=[
+                [item.model_dump() for item in items] if items else None
+                for items in (
+                    request.recent_meals, request.recent_medications,
+                    request.recent_exercises, request.recent_water
+                )
+            ]
+        )
+        result, source = await memo.prediction_memo.get_or_compute(key, compute, self._cache_ttl)
+        if source != "miss":
+            logger.info(f"♻️ 复用预测结果: source={source}, key={key}")
+        return result
+    
+    def _cache_ttl(self, result: dict) -> int:
+        """AI 失败降级为规则引擎的结果只短暂缓存，避免故障期间重试风暴又不长期掩盖 AI 结果"""
+        if self.predictor.is_enabled() and result.get("model") == "rules":
+            return settings.PREDICTION_CACHE_FALLBACK_TTL
+        return settings.PREDICTION_CACHE_TTL
+    
+    def predict_batch(self, request: BatchPredictionRequest) -> BatchPredictionResponse:
+        """批量预测（向量化规则模型）
+        
+        用于跨用户或假设剂量的 what-if 分析，不调用AI、不保存预测记录。
+        """
+        scenarios = request.scenarios
+        if request.step_minutes:
+            time_points = engine.time_grid(request.step_minutes, request.horizon_minutes)
+        else:
+            time_points = engine.DEFAULT_TIME_POINTS
+        
+        batch = engine.predict_batch(
+            total_carbs=[s.total_carbs for s in scenarios],
+            insulin_dose=[s.insulin_dose for s in scenarios],
+            current_bg=[s.current_bg for s in scenarios],
+            gi_value=[s.gi_value for s in scenarios],
+            activity_level=[s.activity_level for s in scenarios],
+            time_points=time_points
+        )
+        
+        bg_values = batch.bg_values.tolist()
+        confidence = batch.confidence.tolist()
+        peak_values = engine.round1(batch.peak_value).tolist()
+        results = [
+            BatchPredictionResult(
+                bg_values=bg_values[i],
+                confidence=confidence[i],
+                peak_time=int(batch.peak_time[i]),
+                peak_value=peak_values[i],
+                risk_level=engine.RISK_LEVELS[batch.risk_level[i]],
+                recommendations=batch.recommendations(i) if request.include_recommendations else []
+            )
+            for i in range(len(batch))
+        ]
+        return BatchPredictionResponse(time_points=list(batch.time_points), results=results)
+    
     async def _save_prediction_record(
         self,
         user_id: str,
@@ -229,7 +336,7 @@ class PredictionService:
         request: BloodGlucosePredictionRequest,
         result: dict
     ) -> str:
-        """保存预测记录到数据库"""
+        """保存预测记录（后台批量写入数据库）"""
         prediction_id = str(uuid4())
         
         # 构建预测数据 JSON
@@ -240,25 +347,16 @@ class PredictionService:
             "risk_level": result["risk_level"]
         }
         
-        query = """
-            INSERT INTO bg_predictions 
-            (id, user_id, insulin_record_id, nutrition_record_id, prediction_data, created_at)
-            VALUES 
-            (:id, :user_id, :insulin_record_id, :nutrition_record_id, CAST(:prediction_data AS JSONB), :created_at)
-            RETURNING id
-        """
-        
-        values = {
+        # 延迟写入：ID 在应用内生成，不等待数据库即可返回
+        await prediction_writer.submit({
             "id": prediction_id,
             "user_id": user_id,
             "insulin_record_id": insulin_record_id,
             "nutrition_record_id": nutrition_record_id,
             "prediction_data": json.dumps(prediction_data),
             "created_at": datetime.utcnow()
-        }
-        
-        db_result = await database.fetch_one(query=query, values=values)
-        return str(db_result["id"])
+        })
+        return prediction_id
 
     async def submit_correction(
         self,
@@ -268,6 +366,7 @@ class PredictionService:
         """提交实测血糖用于纠正"""
         # 如果有prediction_id，获取预测记录；否则使用默认值
         predicted_value = 0.0
+        linked_prediction_id = None
         if request.prediction_id and request.prediction_id.strip():
             try:
                 prediction = await self._get_prediction_record(request.prediction_id, user_id)
@@ -276,6 +375,7 @@ class PredictionService:
                     prediction_data,
                     request.prediction_time_minutes
                 )
+                linked_prediction_id = str(prediction["id"])
             except Exception as e:
                 logger.warning(f"无法获取预测记录 {request.prediction_id}: {e}，使用默认值")
                 predicted_value = 0.0
@@ -286,16 +386,16 @@ class PredictionService:
         # 生成correction_id
         correction_id = str(uuid4())
         
-        correction_id, created_at = await self._save_actual_measurement(
+        created_at = await self._save_actual_measurement(
             user_id=user_id,
             correction_id=correction_id,
             actual_value=request.actual_value,
             measured_at=measured_at,
             source=request.source or "manual",
-            prediction_id=request.prediction_id,
+            prediction_id=linked_prediction_id,
             prediction_time_minutes=request.prediction_time_minutes,
-            predicted_value=predicted_value,
-            difference=difference,
+            predicted_value=predicted_value if predicted_value > 0 else None,
+            difference=difference if predicted_value > 0 else None,
             note=request.note
         )
         
@@ -318,38 +418,34 @@ class PredictionService:
         limit: int = 20
     ) -> List[BloodGlucoseCorrectionResponse]:
         """获取最近的纠正记录"""
-        # TODO: 需要创建blood_glucose_corrections表或扩展actual_blood_glucose表
-        # 当前表结构不支持纠正记录查询，暂时返回空列表
-        return []
-        
-        # 原始代码（待表结构优化后启用）:
-        # query = """
-        #     SELECT id, prediction_id, predicted_value, bg_value AS actual_value,
-        #            difference, prediction_time_minutes, measured_at, source, note, created_at
-        #     FROM actual_blood_glucose
-        #     WHERE user_id = :user_id AND prediction_id IS NOT NULL
-        #     ORDER BY measured_at DESC
-        #     LIMIT :limit
-        # """
-        # rows = await database.fetch_all(query, values={"user_id": user_id, "limit": limit})
-        # corrections: List[BloodGlucoseCorrectionResponse] = []
-        # for row in rows:
-        #     row_dict = dict(row)
-        #     corrections.append(BloodGlucoseCorrectionResponse(
-        #         id=str(row_dict["id"]),
-        #         prediction_id=str(row_dict["prediction_id"]),
-        #         predicted_value=float(row_dict.get("predicted_value") or 0),
-        #         actual_value=float(row_dict.get("actual_value") or 0),
-        #         difference=float(row_dict.get("difference") or 0),
-        #         prediction_time_minutes=row_dict.get("prediction_time_minutes"),
-        #         measured_at=row_dict["measured_at"],
-        #         source=row_dict.get("source") or "manual",
-        #         note=row_dict.get("note"),
-        #         created_at=row_dict["created_at"]
-        #     ))
-        # return corrections
+        rows = await corrections.list_corrections(user_id, limit)
+        return [
+            BloodGlucoseCorrectionResponse(
+                id=row["id"],
+                prediction_id=row["prediction_id"],
+                predicted_value=row["predicted_value"] or 0.0,
+                actual_value=row["actual_value"],
+                difference=row["difference"] or 0.0,
+                prediction_time_minutes=row["prediction_time_minutes"],
+                measured_at=row["measured_at"],
+                source=row["source"] or "manual",
+                note=row["note"],
+                created_at=row["created_at"]
+            )
+            for row in rows
+        ]
 
     async def _get_prediction_record(self, prediction_id: str, user_id: str) -> dict:
+        # 刚生成、尚未写入数据库的预测记录
+        pending = prediction_writer.get(prediction_id)
+        if pending and str(pending["user_id"]) == str(user_id):
+            return {
+                "id": pending["id"],
+                "user_id": pending["user_id"],
+                "prediction_data": json.loads(pending["prediction_data"]),
+                "created_at": pending["created_at"]
+            }
+        
         query = """
             SELECT id, user_id, prediction_data, created_at
             FROM bg_predictions
@@ -386,66 +482,47 @@ class PredictionService:
         predicted_value: Optional[float] = None,
         difference: Optional[float] = None,
         note: Optional[str] = None
-    ) -> Tuple[str, datetime]:
-        """保存实测血糖"""
-        query = """
-            INSERT INTO actual_blood_glucose
-            (id, user_id, bg_value, source, measured_at, created_at)
-            VALUES
-            (:id, :user_id, :bg_value, :source, :measured_at, :created_at)
-            RETURNING id, created_at
-        """
-        created_at = datetime.utcnow()
-        values = {
-            "id": correction_id,
-            "user_id": user_id,
-            "bg_value": actual_value,
-            "source": source,
-            "measured_at": measured_at,
-            "created_at": created_at
-        }
-        result = await database.fetch_one(query=query, values=values)
-        
-        # TODO: 将预测相关数据保存到单独的corrections表
-        # prediction_id, prediction_time_minutes, predicted_value, difference, note
-        
-        return str(result["id"]), result["created_at"]
+    ) -> datetime:
+        """保存实测血糖和纠正记录，返回创建时间"""
+        if prediction_id and prediction_writer.get(prediction_id):
+            # 关联的预测记录仍在写入缓冲区中，先写入数据库再引用
+            await prediction_writer.flush()
+        return await corrections.save_correction(
+            correction_id=correction_id,
+            user_id=user_id,
+            actual_value=actual_value,
+            measured_at=measured_at,
+            source=source,
+            prediction_id=prediction_id,
+            prediction_time_minutes=prediction_time_minutes,
+            predicted_value=predicted_value,
+            difference=difference,
+            note=note
+        )
 
-    async def _get_user_bias(self, user_id: str) -> float:
-        """计算用户最近纠正的平均偏差"""
-        # TODO: 需要添加difference列到actual_blood_glucose表
-        # 暂时返回0，表示没有偏差调整
-        return 0.0
-        
-        # 原始代码（待表结构更新后启用）:
-        # query = """
-        #     SELECT difference
-        #     FROM actual_blood_glucose
-        #     WHERE user_id = :user_id AND difference IS NOT NULL
-        #     ORDER BY measured_at DESC
-        #     LIMIT 10
-        # """
-        # rows = await database.fetch_all(query=query, values={"user_id": user_id})
-        # differences = [float(row["difference"]) for row in rows if row and row["difference"] is not None]
-        # if not differences:
-        #     return 0.0
-        # return sum(differences) / len(differences)
+    async def _get_bias_stats(self, user_id: str) -> Tuple[float, int]:
+        """获取用户的预测偏差和纠正次数，失败时按无偏差处理"""
+        try:
+            return await corrections.get_bias_stats(user_id)
+        except Exception as e:
+            logger.warning(f"⚠️ 获取预测偏差失败，按 0 处理: {str(e)}")
+            return 0.0, 0
+    
+    async def _get_on_board(
+        self,
+        user_id: str,
+        insulin_record_id: Optional[str],
+        nutrition_record_id: Optional[str]
+    ) -> dict:
+        """获取活性胰岛素 / 活性碳水，失败时按 0 处理"""
+        try:
+            return await on_board_tracker.get_state(
+                user_id, exclude_refs=(insulin_record_id, nutrition_record_id)
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 获取活性胰岛素失败，按 0 处理: {str(e)}")
+            return {"insulin_on_board": 0.0, "carbs_on_board": 0.0, "minutes_since_insulin": None}
     
-    async def _get_correction_count(self, user_id: str) -> int:
-        """获取用户的纠正记录数"""
-        # TODO: 待表结构优化后从corrections表获取
-        # 暂时返回0
-        return 0
-        
-        # 待启用的代码:
-        # query = """
-        #     SELECT COUNT(*) as count
-        #     FROM actual_blood_glucose
-        #     WHERE user_id = :user_id
-        # """
-        # result = await database.fetch_one(query=query, values={"user_id": user_id})
-        # return result["count"] if result else 0
-
     def _apply_bias_adjustment(
         self,
         result: dict,
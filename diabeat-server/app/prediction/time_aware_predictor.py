@@ -0,0 +1,452 @@
+"""时间感知预测：胰岛素作用与碳水吸收曲线库
+
+按胰岛素类型和 GI 档位在模块加载时一次性生成 1 分钟分辨率的曲线表
+（NumPy 数组），运行时每次求值只是一次表内线性插值，不再逐请求计算
+指数 / 分段函数。
+
+- 胰岛素：采用 OpenAPS / Loop 使用的指数作用模型，由峰值时间和作用持续时间
+  （DIA）确定曲线，表中保存剩余活性胰岛素比例（IOB）和瞬时作用强度。
+- 碳水：采用分段线性吸收速率（先线性上升到峰值，再线性下降到吸收结束），
+  峰值时间与规则预测器的 GI 档位一致，表中保存累计吸收比例。
+
+血糖影响系数与 BloodGlucosePredictor 保持一致：每克碳水约升高 0.15 mmol/L，
+每单位胰岛素约降低 2.0 mmol/L。
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from app.prediction.predictor import DEFAULT_TIME_POINTS
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 与规则预测器一致的简化血糖影响系数
+CARB_BG_IMPACT = 0.15      # mmol/L per g
+INSULIN_BG_IMPACT = 2.0    # mmol/L per unit
+
+# 胰岛素类型 -> (峰值时间, 作用持续时间)，单位分钟
+INSULIN_PROFILES = {
+    "ultra_rapid": (55, 300),   # 超速效（如 Fiasp）
+    "rapid": (75, 300),         # 速效（门冬、赖脯胰岛素）
+    "short": (150, 480),        # 短效（常规人胰岛素）
+    "intermediate": (360, 840), # 中效（NPH）
+}
+DEFAULT_INSULIN_TYPE = "rapid"
+
+# GI 档位 -> (吸收速率峰值时间, 吸收持续时间)，单位分钟
+CARB_PROFILES = {
+    "high": (60, 180),
+    "medium": (90, 240),
+    "low": (120, 300),
+}
+
+# 提醒阈值
+HYPO_RISK_BG = 4.4              # 胰岛素仍在作用且血糖低于此值时提醒进食
+LONG_FAST_MINUTES = 300         # 胰岛素仍在作用且距上次进食超过 5 小时
+VERY_LONG_FAST_MINUTES = 360    # 距上次进食超过 6 小时
+BOLUS_CARB_THRESHOLD = 15       # 需要餐时胰岛素的碳水量（克）
+BOLUS_WINDOW_MINUTES = 120      # 餐后此时间内仍提醒补打
+BOLUS_PRE_MEAL_MINUTES = 30     # 餐前此时间内注射视为本餐餐时胰岛素
+
+
+class CurveTable:
+    """1 分钟分辨率的曲线表，超出范围时取端点值"""
+
+    __slots__ = ("values", "_values", "_last")
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+        self._values = values.tolist()
+        self._last = len(self._values) - 1
+
+    def at(self, minute: float) -> float:
+        """单点线性插值（O(1)）"""
+        if minute <= 0:
+            return self._values[0]
+        if minute >= self._last:
+            return self._values[-1]
+        index = int(minute)
+        fraction = minute - index
+        low = self._values[index]
+        return low + (self._values[index + 1] - low) * fraction
+
+    def at_many(self, minutes: Sequence[float]) -> np.ndarray:
+        """多点线性插值"""
+        return np.interp(minutes, np.arange(self._last + 1), self.values)
+
+
+def _insulin_tables(peak: int, duration: int) -> Dict[str, CurveTable]:
+    """指数胰岛素作用模型
+
+    tau、a、S 的定义见 OpenAPS oref0 的 exponential insulin curve。
+    """
+    t = np.arange(duration + 1, dtype=np.float64)
+    tau = peak * (1 - peak / duration) / (1 - 2 * peak / duration)
+    a = 2 * tau / duration
+    s = 1 / (1 - a + (1 + a) * np.exp(-duration / tau))
+    activity = (s / tau ** 2) * t * (1 - t / duration) * np.exp(-t / tau)
+    iob = 1 - s * (1 - a) * ((t ** 2 / (tau * duration * (1 - a)) - t / tau - 1) * np.exp(-t / tau) + 1)
+    iob = np.clip(iob, 0.0, 1.0)
+    iob[-1] = 0.0
+    return {
+        "iob": CurveTable(iob),
+        "activity": CurveTable(activity / activity.max()),
+    }
+
+
+def _carb_tables(peak: int, duration: int) -> Dict[str, CurveTable]:
+    """分段线性吸收速率模型，累计吸收比例在吸收结束时为 1"""
+    t = np.arange(duration + 1, dtype=np.float64)
+    rate = np.where(t <= peak, t / peak, (duration - t) / (duration - peak))
+    absorbed = np.cumsum(rate)
+    absorbed = (absorbed - absorbed[0]) / (absorbed[-1] - absorbed[0])
+    return {
+        "absorbed": CurveTable(absorbed),
+        "rate": CurveTable(rate),
+    }
+
+
+def gi_band(gi_value: Optional[float]) -> str:
+    """GI 值 -> 档位（未提供时按中等 GI 处理，与规则预测器一致）"""
+    if not gi_value:
+        return "medium"
+    if gi_value > 70:
+        return "high"
+    if gi_value > 55:
+        return "medium"
+    return "low"
+
+
+def _parse_time(value: Optional[Any]) -> Optional[datetime]:
+    """解析 ISO 时间，统一为不带时区的 UTC"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _minutes_between(start: Optional[datetime], end: datetime) -> Optional[int]:
+    if start is None:
+        return None
+    return max(0, int((end - start).total_seconds() // 60))
+
+
+class TimeAwarePredictor:
+    """基于预计算曲线表的时间感知预测器"""
+
+    def __init__(self):
+        self.insulin_tables = {
+            name: _insulin_tables(peak, duration)
+            for name, (peak, duration) in INSULIN_PROFILES.items()
+        }
+        self.carb_tables = {
+            name: _carb_tables(peak, duration)
+            for name, (peak, duration) in CARB_PROFILES.items()
+        }
+
+    def calculate_time_context(
+        self,
+        meal_time: Optional[Any],
+        medication_time: Optional[Any],
+        current_time: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        """计算距进食 / 用药的时间
+
+        Returns:
+            Dict: has_time_context 为 False 时表示缺少进食时间，无法做时间感知预测
+        """
+        try:
+            now = _parse_time(current_time) or datetime.utcnow()
+            meal_at = _parse_time(meal_time)
+            medication_at = _parse_time(medication_time)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"⚠️ 时间上下文解析失败: {e}")
+            return {"has_time_context": False, "minutes_since_meal": None, "minutes_since_medication": None}
+
+        minutes_since_meal = _minutes_between(meal_at, now)
+        minutes_since_medication = _minutes_between(medication_at, now)
+        medication_to_meal = None
+        if meal_at is not None and medication_at is not None:
+            medication_to_meal = int((meal_at - medication_at).total_seconds() // 60)
+
+        return {
+            "has_time_context": minutes_since_meal is not None,
+            "minutes_since_meal": minutes_since_meal,
+            "minutes_since_medication": minutes_since_medication,
+            "medication_to_meal_minutes": medication_to_meal,
+            "current_time": now.isoformat(),
+            "current_hour": now.hour,
+        }
+
+    def model_carb_absorption(
+        self,
+        total_carbs: float,
+        minutes_since_meal: Optional[float],
+        gi_value: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """碳水吸收状态：已吸收 / 剩余（COB）以及剩余的升糖作用"""
+        band = gi_band(gi_value)
+        peak, duration = CARB_PROFILES[band]
+        tables = self.carb_tables[band]
+        minutes = minutes_since_meal or 0
+
+        absorbed_fraction = tables["absorbed"].at(minutes)
+        remaining_carbs = total_carbs * (1 - absorbed_fraction)
+        if minutes >= duration:
+            phase = "complete"
+        elif minutes < peak:
+            phase = "rising"
+        else:
+            phase = "declining"
+
+        return {
+            "gi_band": band,
+            "peak_time": peak,
+            "absorption_duration": duration,
+            "absorbed_fraction": round(absorbed_fraction, 3),
+            "absorbed_carbs": round(total_carbs - remaining_carbs, 1),
+            "remaining_carbs": round(remaining_carbs, 1),
+            "absorption_rate": round(tables["rate"].at(minutes), 3),
+            "remaining_bg_rise": round(remaining_carbs * CARB_BG_IMPACT, 1),
+            "remaining_duration": max(0, duration - int(minutes)),
+            "phase": phase,
+        }
+
+    def model_insulin_effect(
+        self,
+        insulin_dose: float,
+        minutes_since_medication: Optional[float],
+        insulin_type: str = DEFAULT_INSULIN_TYPE
+    ) -> Dict[str, Any]:
+        """胰岛素作用状态：活性胰岛素（IOB）、作用强度和剩余降糖作用
+
+        未提供注射时间时视为尚未注射，全部剂量仍待起效。
+        """
+        if insulin_type not in INSULIN_PROFILES:
+            insulin_type = DEFAULT_INSULIN_TYPE
+        peak, duration = INSULIN_PROFILES[insulin_type]
+        tables = self.insulin_tables[insulin_type]
+
+        if minutes_since_medication is None:
+            return {
+                "insulin_type": insulin_type,
+                "peak_time": peak,
+                "duration": duration,
+                "insulin_on_board": round(insulin_dose, 2),
+                "iob_fraction": 1.0,
+                "activity": 0.0,
+                "remaining_bg_drop": round(insulin_dose * INSULIN_BG_IMPACT, 1),
+                "remaining_duration": 0,
+                "phase": "not_injected",
+            }
+
+        iob_fraction = tables["iob"].at(minutes_since_medication)
+        if minutes_since_medication >= duration:
+            phase = "ended"
+        elif minutes_since_medication < peak * 0.5:
+            phase = "onset"
+        elif minutes_since_medication <= peak * 1.5:
+            phase = "peak"
+        else:
+            phase = "declining"
+
+        insulin_on_board = insulin_dose * iob_fraction
+        return {
+            "insulin_type": insulin_type,
+            "peak_time": peak,
+            "duration": duration,
+            "insulin_on_board": round(insulin_on_board, 2),
+            "iob_fraction": round(iob_fraction, 3),
+            "activity": round(tables["activity"].at(minutes_since_medication), 3),
+            "remaining_bg_drop": round(insulin_on_board * INSULIN_BG_IMPACT, 1),
+            "remaining_duration": max(0, duration - int(minutes_since_medication)),
+            "phase": phase,
+        }
+
+    def project_glucose(
+        self,
+        current_bg: float,
+        total_carbs: float,
+        insulin_dose: float,
+        minutes_since_meal: Optional[float],
+        minutes_since_medication: Optional[float],
+        gi_value: Optional[float] = None,
+        time_points: Sequence[int] = DEFAULT_TIME_POINTS,
+        insulin_type: str = DEFAULT_INSULIN_TYPE,
+        carb_band: Optional[str] = None
+    ) -> List[Dict[str, float]]:
+        """从当前时刻起的血糖走势（只计入本餐碳水和本次胰岛素的剩余作用）
+
+        未提供注射时间时假设现在注射；carb_band 指定时忽略 gi_value。
+        """
+        if insulin_type not in INSULIN_PROFILES:
+            insulin_type = DEFAULT_INSULIN_TYPE
+        carb_absorbed = self.carb_tables[carb_band or gi_band(gi_value)]["absorbed"]
+        insulin_iob = self.insulin_tables[insulin_type]["iob"]
+        meal_offset = minutes_since_meal or 0
+        insulin_offset = minutes_since_medication or 0
+
+        offsets = np.asarray(time_points, dtype=np.float64)
+        carb_delta = carb_absorbed.at_many(meal_offset + offsets) - carb_absorbed.at(meal_offset)
+        insulin_delta = insulin_iob.at(insulin_offset) - insulin_iob.at_many(insulin_offset + offsets)
+        bg_values = (
+            current_bg
+            + total_carbs * CARB_BG_IMPACT * carb_delta
+            - insulin_dose * INSULIN_BG_IMPACT * insulin_delta
+        )
+        bg_values = np.clip(bg_values, 3.0, 20.0)
+        return [
+            {"time_minutes": int(t), "bg_value": round(float(bg), 1)}
+            for t, bg in zip(time_points, bg_values)
+        ]
+
+    def check_meal_reminder(
+        self,
+        minutes_since_meal: Optional[float],
+        current_bg: float,
+        insulin_remaining_duration: float
+    ) -> Optional[Dict[str, Any]]:
+        """胰岛素仍在作用而进食不足时提醒进食"""
+        insulin_active = insulin_remaining_duration > 0
+        if insulin_active and current_bg < HYPO_RISK_BG:
+            return {
+                "type": "meal",
+                "priority": "high",
+                "message": f"当前血糖 {current_bg} mmol/L 偏低且胰岛素仍在作用，建议立即补充15g快速碳水",
+                "minutes_since_meal": minutes_since_meal,
+            }
+        if minutes_since_meal is None:
+            return None
+        if insulin_active and minutes_since_meal >= LONG_FAST_MINUTES:
+            return {
+                "type": "meal",
+                "priority": "medium",
+                "message": f"距上次进食已 {int(minutes_since_meal) // 60} 小时且胰岛素仍在作用，注意低血糖风险，建议按时进食",
+                "minutes_since_meal": minutes_since_meal,
+            }
+        if minutes_since_meal >= VERY_LONG_FAST_MINUTES:
+            return {
+                "type": "meal",
+                "priority": "low",
+                "message": f"距上次进食已超过 {VERY_LONG_FAST_MINUTES // 60} 小时，建议规律进餐",
+                "minutes_since_meal": minutes_since_meal,
+            }
+        return None
+
+    def check_medication_reminder(
+        self,
+        minutes_since_meal: Optional[float],
+        minutes_since_medication: Optional[float],
+        total_carbs: float
+    ) -> Optional[Dict[str, Any]]:
+        """进食了较多碳水但本餐尚未注射胰岛素时提醒"""
+        if minutes_since_meal is None or total_carbs < BOLUS_CARB_THRESHOLD:
+            return None
+        if minutes_since_meal > BOLUS_WINDOW_MINUTES:
+            return None
+        # 最近一次注射在餐前 30 分钟以内或餐后，视为本餐已注射
+        if (
+            minutes_since_medication is not None
+            and minutes_since_medication <= minutes_since_meal + BOLUS_PRE_MEAL_MINUTES
+        ):
+            return None
+        if minutes_since_meal <= 30:
+            return {
+                "type": "medication",
+                "priority": "high",
+                "message": f"本餐约 {round(total_carbs)}g 碳水，尚未记录餐时胰岛素，请及时注射",
+                "minutes_since_meal": minutes_since_meal,
+            }
+        return {
+            "type": "medication",
+            "priority": "medium",
+            "message": f"已餐后 {int(minutes_since_meal)} 分钟仍未记录餐时胰岛素，补打剂量请咨询医生或按医嘱减量",
+            "minutes_since_meal": minutes_since_meal,
+        }
+
+    def generate_time_aware_prompt(
+        self,
+        request: Any,
+        time_context: Dict[str, Any],
+        carb_model: Dict[str, Any],
+        insulin_model: Dict[str, Any],
+        user_bias: float,
+        correction_count: int
+    ) -> str:
+        """生成包含吸收 / 作用状态和基线走势的预测 prompt"""
+        baseline = self.project_glucose(
+            request.current_bg,
+            request.total_carbs,
+            request.insulin_dose,
+            time_context.get("minutes_since_meal"),
+            time_context.get("minutes_since_medication"),
+            insulin_type=insulin_model.get("insulin_type", DEFAULT_INSULIN_TYPE),
+            carb_band=carb_model.get("gi_band")
+        )
+        baseline_text = "、".join(f"{p['time_minutes']}分钟 {p['bg_value']}" for p in baseline)
+        medication_text = (
+            f"{time_context['minutes_since_medication']}分钟前"
+            if time_context.get("minutes_since_medication") is not None else "尚未注射（假设现在注射）"
+        )
+
+        return f"""请基于以下时间信息，预测这位糖尿病患者从现在起的血糖变化：
+
+**当前状态**:
+- 当前血糖: {request.current_bg} mmol/L
+- 本餐碳水化合物: {request.total_carbs}g，{time_context['minutes_since_meal']}分钟前进食
+- 胰岛素剂量: {request.insulin_dose}单位，{medication_text}
+- 活动水平: {request.activity_level}
+
+**碳水吸收状态**（{carb_model['gi_band']} GI，约{carb_model['absorption_duration']}分钟吸收完）:
+- 已吸收: {carb_model['absorbed_carbs']}g，剩余: {carb_model['remaining_carbs']}g（阶段: {carb_model['phase']}）
+- 剩余升糖作用: 约 +{carb_model['remaining_bg_rise']} mmol/L
+
+**胰岛素作用状态**（{insulin_model['insulin_type']}，峰值{insulin_model['peak_time']}分钟，持续{insulin_model['duration']}分钟）:
+- 活性胰岛素: {insulin_model['insulin_on_board']}单位（阶段: {insulin_model['phase']}）
+- 剩余降糖作用: 约 -{insulin_model['remaining_bg_drop']} mmol/L
+
+**动力学模型基线**（从现在起，mmol/L）: {baseline_text}
+
+**历史数据** (用于个性化调整):
+- 用户历史预测偏差: {user_bias:+.1f} mmol/L
+- 历史纠正记录数: {correction_count}次
+
+请在基线基础上结合临床经验调整，time_minutes 表示从现在起的分钟数，
+严格按照以下JSON格式返回，不要包含其他内容：
+
+```json
+{{
+  "predictions": [
+    {{"time_minutes": 30, "bg_value": 7.2, "confidence": 0.85}},
+    {{"time_minutes": 60, "bg_value": 8.5, "confidence": 0.90}},
+    {{"time_minutes": 90, "bg_value": 9.2, "confidence": 0.92}},
+    {{"time_minutes": 120, "bg_value": 8.8, "confidence": 0.88}},
+    {{"time_minutes": 180, "bg_value": 7.5, "confidence": 0.80}},
+    {{"time_minutes": 240, "bg_value": 6.8, "confidence": 0.75}}
+  ],
+  "peak_time": 90,
+  "peak_value": 9.2,
+  "risk_level": "medium",
+  "recommendations": [
+    "建议餐后2小时监测血糖，确认实际值与预测值的偏差"
+  ],
+  "reasoning": "简要说明推理过程"
+}}
+```
+
+注意：
+1. bg_value范围: 3.0-20.0 mmol/L
+2. confidence范围: 0.70-0.95
+3. 所有数值保留1位小数
+4. recommendations为数组，3-5条建议
+5. risk_level: high（峰值 > 13.9）、medium（10.0-13.9）、low（< 10.0）
+"""
+
+
+# 模块级单例：曲线表只在导入时生成一次
+time_aware_predictor = TimeAwarePredictor()
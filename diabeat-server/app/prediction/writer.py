@@ -0,0 +1,313 @@
+"""预测记录延迟写入（write-behind）
+
+预测记录的 ID 在应用内生成，保存时不必等待数据库：记录先放入内存缓冲区
+并立即返回 ID，后台任务每隔 N 毫秒或攒满 M 条时用一条多行 INSERT 写入。
+
+- 数据库不可用时，整批追加写入磁盘溢出文件（JSON Lines，fsync），
+  之后每次写入成功后回放。每个 worker 进程写各自的文件（路径后加 .{pid}），
+  回放时先改名再读取，并接管已退出的 worker 遗留的文件（改名是原子操作，
+  多个 worker 同时接管时只有一个成功）；溢出目录只供本机的 worker 使用
+- 个别记录违反约束（如引用了已删除的胰岛素记录）或数据无效时逐条重试，只丢弃
+  出错的记录；连接断开、连接数耗尽、死锁等其他错误按数据库不可用处理，整批溢出
+- 溢出文件中无法解析的行（如写入中途崩溃留下的半行）移入 .corrupt 文件，不阻塞回放
+- 关闭应用时停止后台任务并写完缓冲区中的记录
+- 尚未写入的记录可通过 get() 读取（预测后立即纠正时使用）
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from asyncpg.exceptions import DataError, IntegrityConstraintViolationError
+from app.config import settings
+from app.records import queries
+import logging
+
+logger = logging.getLogger(__name__)
+
+INSERT_PREDICTIONS = queries.register("prediction_write_batch", """
+    INSERT INTO bg_predictions
+    (id, user_id, insulin_record_id, nutrition_record_id, prediction_data, created_at)
+    SELECT id, user_id, insulin_record_id, nutrition_record_id, prediction_data::jsonb, created_at
+    FROM unnest($1::uuid[], $2::uuid[], $3::uuid[], $4::uuid[], $5::text[], $6::timestamp[])
+        AS t(id, user_id, insulin_record_id, nutrition_record_id, prediction_data, created_at)
+    ON CONFLICT (id) DO NOTHING
+""")
+
+# 每行的字段顺序与 INSERT_PREDICTIONS 的参数一致
+FIELDS = ("id", "user_id", "insulin_record_id", "nutrition_record_id", "prediction_data", "created_at")
+
+# 说明记录本身有问题的错误，逐条重试时丢弃该记录；其他错误（含 PostgresError 的
+# 其他子类，如 CannotConnectNowError、TooManyConnectionsError、DeadlockDetectedError）
+# 都按数据库暂时不可用处理
+ROW_REJECTION_ERRORS = (IntegrityConstraintViolationError, DataError)
+
+# 回放溢出文件时每批的行数
+REPLAY_CHUNK_SIZE = 1000
+# 回放失败后的重试间隔（秒），避免数据库故障期间反复重写溢出文件
+REPLAY_RETRY_SECONDS = 10
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+async def insert_rows(rows: List[Dict[str, Any]]) -> None:
+    """一条语句写入多行（按 ID 幂等，回放溢出文件时可安全重复）"""
+    columns = [[row[field] for row in rows] for field in FIELDS]
+    await queries.execute(INSERT_PREDICTIONS, *columns)
+
+
+class PredictionWriter:
+    """预测记录写入缓冲区"""
+
+    def __init__(
+        self,
+        batch_size: int = settings.PREDICTION_WRITE_BATCH_SIZE,
+        interval_ms: int = settings.PREDICTION_WRITE_INTERVAL_MS,
+        max_pending: int = settings.PREDICTION_WRITE_MAX_PENDING,
+        spill_path: str = settings.PREDICTION_SPILL_PATH
+    ):
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self.max_pending = max_pending
+        self.spill_path = spill_path
+        self._pending: List[Dict[str, Any]] = []
+        # 尚未写入数据库的记录（含正在写入的批次），供 get() 读取
+        self._unwritten: Dict[str, Dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._replay_after = 0.0
+        self.stats = {"written": 0, "batches": 0, "spilled": 0, "replayed": 0, "dropped": 0, "corrupt": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def submit(self, row: Dict[str, Any]) -> None:
+        """提交一条记录（字段见 FIELDS）
+
+        后台任务未启动时（如脚本中使用）直接写入数据库。
+        """
+        if not self.running:
+            await insert_rows([row])
+            self.stats["written"] += 1
+            return
+
+        self._pending.append(row)
+        self._unwritten[str(row["id"])] = row
+        if len(self._pending) >= self.max_pending:
+            # 写入跟不上时在请求内同步写入，避免缓冲区无限增长
+            await self.flush()
+        elif len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def get(self, prediction_id: str) -> Optional[Dict[str, Any]]:
+        """读取尚未写入数据库的记录"""
+        return self._unwritten.get(str(prediction_id))
+
+    async def start(self):
+        """启动后台写入任务"""
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"✅ 预测记录延迟写入已启动: batch={self.batch_size}, interval={int(self.interval * 1000)}ms"
+        )
+
+    async def stop(self):
+        """停止后台任务并写完缓冲区"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush(force_replay=True)
+        logger.info(f"✅ 预测记录延迟写入已停止: {self.stats}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ 预测记录写入任务错误: {str(e)}")
+
+    async def flush(self, force_replay: bool = False):
+        """写入缓冲区中的全部记录，成功后回放溢出文件"""
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                written = await self._write_batch(batch)
+                for row in batch:
+                    self._unwritten.pop(str(row["id"]), None)
+                if not written:
+                    # 数据库不可用，其余记录直接溢出，等下次再试
+                    rest = self._pending
+                    self._pending = []
+                    for row in rest:
+                        self._unwritten.pop(str(row["id"]), None)
+                    self._spill(rest)
+                    return
+            await self._replay_spill(force=force_replay)
+
+    async def _write_batch(self, batch: List[Dict[str, Any]], spill: bool = True) -> bool:
+        """写入一批记录，数据库不可用时返回 False（spill 为 True 时未写入的记录溢出到磁盘）"""
+        try:
+            await insert_rows(batch)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+            return True
+        except ROW_REJECTION_ERRORS as e:
+            logger.warning(f"⚠️ 预测记录批量写入失败，逐条重试: {str(e)}")
+        except Exception as e:
+            logger.error(f"❌ 数据库不可用，{len(batch)} 条预测记录暂未写入: {str(e)}")
+            if spill:
+                self._spill(batch)
+            return False
+
+        for index, row in enumerate(batch):
+            try:
+                await insert_rows([row])
+                self.stats["written"] += 1
+            except ROW_REJECTION_ERRORS as e:
+                self.stats["dropped"] += 1
+                logger.error(f"❌ 预测记录被拒绝: id={row['id']}, error={str(e)}")
+            except Exception as e:
+                logger.error(f"❌ 数据库不可用，{len(batch) - index} 条预测记录暂未写入: {str(e)}")
+                if spill:
+                    self._spill(batch[index:])
+                return False
+        return True
+
+    def _worker_path(self) -> str:
+        """当前 worker 的溢出文件（预加载应用时单例在 fork 前创建，pid 在使用时读取）"""
+        return f"{self.spill_path}.{os.getpid()}"
+
+    def _next_spill_file(self) -> Optional[str]:
+        """下一个待回放的文件：当前 worker 的溢出文件，或已退出的 worker 遗留的文件"""
+        own_path = self._worker_path()
+        if os.path.exists(own_path):
+            return own_path
+        directory = os.path.dirname(self.spill_path) or "."
+        # 不带 pid 的文件为按 worker 分开之前遗留的溢出文件
+        pattern = re.compile(rf"^{re.escape(os.path.basename(self.spill_path))}(?:\.(\d+)(?:\.replay)?)?$")
+        try:
+            names = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return None
+        for name in names:
+            match = pattern.match(name)
+            if not match:
+                continue
+            pid = int(match.group(1)) if match.group(1) else None
+            if pid is None or (pid != os.getpid() and not _pid_alive(pid)):
+                return os.path.join(directory, name)
+        return None
+
+    def _spill(self, rows: List[Dict[str, Any]]):
+        """追加写入当前 worker 的溢出文件并落盘"""
+        if not rows:
+            return
+        directory = os.path.dirname(self.spill_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self._worker_path(), "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(
+                    {**row, "created_at": row["created_at"].isoformat()},
+                    ensure_ascii=False
+                ) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.stats["spilled"] += len(rows)
+
+    async def _replay_spill(self, force: bool = False):
+        """回放溢出文件（数据库恢复后调用）
+
+        先把文件改名为当前 worker 的回放文件再回放，回放期间新溢出的记录写入新文件。
+        回放失败时保留改名后的文件，稍后从头重试（写入按 ID 幂等，已写入的部分会被跳过）。
+        """
+        if not force and time.monotonic() < self._replay_after:
+            return
+        replay_path = self._worker_path() + ".replay"
+        if not os.path.exists(replay_path):
+            source = self._next_spill_file()
+            if source is None:
+                return
+            try:
+                os.replace(source, replay_path)
+            except FileNotFoundError:
+                # 其他 worker 已接管该文件
+                await self._replay_spill(force=True)
+                return
+
+        rows = []
+        lines = []
+        corrupt = []
+        with open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                line = line.rstrip("\n") + "\n"
+                try:
+                    row = json.loads(line)
+                    row["created_at"] = datetime.fromisoformat(row["created_at"])
+                except (ValueError, KeyError, TypeError):
+                    corrupt.append(line)
+                    continue
+                rows.append(row)
+                lines.append(line)
+        if corrupt:
+            self._quarantine(replay_path, corrupt, lines)
+
+        for start in range(0, len(rows), REPLAY_CHUNK_SIZE):
+            chunk = rows[start:start + REPLAY_CHUNK_SIZE]
+            if not await self._write_batch(chunk, spill=False):
+                self._replay_after = time.monotonic() + REPLAY_RETRY_SECONDS
+                return
+            self.stats["replayed"] += len(chunk)
+        os.remove(replay_path)
+        if rows:
+            logger.info(f"✅ 已回放 {len(rows)} 条溢出的预测记录")
+
+        # 回放期间可能有新的溢出记录，或还有其他待接管的文件
+        if self._next_spill_file() is not None:
+            await self._replay_spill(force=True)
+
+
+    def _quarantine(self, replay_path: str, corrupt: List[str], lines: List[str]):
+        """把无法解析的行移入 .corrupt 文件，回放文件只保留可解析的行"""
+        corrupt_path = self._worker_path() + ".corrupt"
+        with open(corrupt_path, "a", encoding="utf-8") as f:
+            f.writelines(corrupt)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp_path = replay_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, replay_path)
+        self.stats["corrupt"] += len(corrupt)
+        logger.error(f"❌ 溢出文件中 {len(corrupt)} 行无法解析，已移入 {corrupt_path}")
+
+
+# 模块级单例
+prediction_writer = PredictionWriter()
@@ -0,0 +1,261 @@
+"""用户最近活动快照
+
+智能提醒和下次注射预测需要最后一餐时间、最后一次用药的时间和类型、最后一次
+注射时间，以及近 7 天的用餐模式。这些值按用户保存在 Redis 哈希
+``activity:{user_id}`` 中，读取只需一次 HGETALL：
+
+- 未回填、已过期，或用餐模式不是今天按当前最后一餐计算的，执行一条汇总查询
+  （一次数据库往返）后整体回填；同一 worker 内并发的回填合并为一次
+- 写入用餐 / 注射 / 用药记录时，用 Lua 脚本只在新时间更晚时更新对应字段，
+  离线补录的旧记录不会覆盖更新的时间；写入用餐记录时同时丢弃用餐模式
+- 同步上传可能修改已有记录的时间，直接删除快照，下次读取时回填
+
+回填同样只写入更晚的时间，与写入并发时不会覆盖写入的新值。
+Redis 不可用时直接查询数据库。
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from app.database import get_redis
+from app.monitoring.metrics import CACHE_HIT_RATIO, QUERY_CACHE_REQUESTS
+from app.records import queries
+from app.utils.single_flight import SingleFlight
+import logging
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "activity"
+# 快照有效期，过期后从数据库重新回填
+REDIS_TTL_SECONDS = 7 * 24 * 3600
+# 用餐模式统计的天数
+PATTERN_DAYS = 7
+
+ACTIVITY_SNAPSHOT = queries.register("activity_snapshot", """
+    SELECT
+        (SELECT meal_time FROM meal_records
+         WHERE user_id = $1
+         ORDER BY meal_time DESC
+         LIMIT 1) AS last_meal_time,
+        (SELECT injection_time FROM insulin_injection_records
+         WHERE user_id = $1
+         ORDER BY injection_time DESC
+         LIMIT 1) AS last_insulin_time,
+        m.medication_time AS last_medication_time,
+        m.medication_type AS last_medication_type,
+        (SELECT COALESCE(json_agg(json_build_object(
+                    'date', d.meal_date, 'count', d.meal_count, 'avg_hour', d.avg_hour
+                ) ORDER BY d.meal_date DESC), '[]'::json)::text
+         FROM (
+            SELECT
+                DATE(meal_time) AS meal_date,
+                COUNT(*) AS meal_count,
+                ROUND(AVG(EXTRACT(HOUR FROM meal_time))::numeric, 1)::float8 AS avg_hour
+            FROM meal_records
+            WHERE user_id = $1 AND meal_time >= $2
+            GROUP BY DATE(meal_time)
+         ) d) AS meal_days
+    FROM (SELECT 1) AS one
+    LEFT JOIN LATERAL (
+        SELECT medication_time, medication_type FROM medication_records
+        WHERE user_id = $1
+        ORDER BY medication_time DESC
+        LIMIT 1
+    ) m ON TRUE
+""")
+
+# 只在新时间更晚时更新时间字段（时间统一为定长的 UTC ISO 字符串，可直接按字符串比较）
+# KEYS[1]: 快照键
+# ARGV: ttl, seeded, drop_pattern, meal, insulin, medication, medication_type, pattern, pattern_day, pattern_meal
+MERGE_SCRIPT = """
+local key = KEYS[1]
+local function newer(field, value)
+    if value == '' then
+        return false
+    end
+    local current = redis.call('HGET', key, field)
+    if current and current >= value then
+        return false
+    end
+    redis.call('HSET', key, field, value)
+    return true
+end
+if ARGV[3] == '1' then
+    redis.call('HDEL', key, 'pattern', 'pattern_day', 'pattern_meal')
+end
+newer('meal', ARGV[4])
+newer('insulin', ARGV[5])
+if newer('medication', ARGV[6]) then
+    redis.call('HSET', key, 'medication_type', ARGV[7])
+end
+if ARGV[8] ~= '' then
+    redis.call('HSET', key, 'pattern', ARGV[8], 'pattern_day', ARGV[9], 'pattern_meal', ARGV[10])
+end
+if ARGV[2] == '1' then
+    redis.call('HSET', key, 'seeded', '1')
+end
+redis.call('EXPIRE', key, ARGV[1])
+return 1
+"""
+
+
+def _encode_time(value: Optional[datetime]) -> str:
+    """编码为定长的 timezone-naive UTC 字符串（空值为空字符串）"""
+    if value is None:
+        return ""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+def _decode_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _meal_pattern(meal_days: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """与 crud.get_user_meal_pattern 的返回结构一致"""
+    if not meal_days:
+        return {"avg_meal_times": [], "meal_frequency": 0}
+    return {
+        "meal_times": meal_days,
+        "avg_meal_frequency": len(meal_days) / PATTERN_DAYS
+    }
+
+
+class ActivityTracker:
+    """最近活动快照服务"""
+
+    def __init__(self):
+        self._refill_flight = SingleFlight("activity_snapshot")
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"{KEY_PREFIX}:{user_id}"
+
+    async def _redis(self):
+        try:
+            return await get_redis()
+        except Exception as e:
+            logger.warning(f"⚠️ 活动快照不可用: {str(e)}")
+            return None
+
+    async def get_snapshot(self, user_id: str) -> Dict[str, Any]:
+        """获取用户最近活动
+
+        Returns:
+            Dict: last_meal_time、last_insulin_time、last_medication_time、
+            last_medication_type、meal_pattern（结构同 crud.get_user_meal_pattern）
+        """
+        redis = await self._redis()
+        if redis:
+            try:
+                snapshot = self._decode(await redis.hgetall(self._key(user_id)))
+            except Exception as e:
+                logger.warning(f"⚠️ 读取活动快照失败: {str(e)}")
+                redis = None
+            else:
+                if snapshot is not None:
+                    self._record("redis_hit")
+                    return snapshot
+        self._record("miss")
+        return await self._refill_flight.do(user_id, lambda: self._refill(user_id, redis))
+
+    @staticmethod
+    def _decode(fields: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """解析快照；未回填或用餐模式已失效时返回 None"""
+        if not fields.get("seeded"):
+            return None
+        if fields.get("pattern_day") != datetime.utcnow().date().isoformat():
+            return None
+        if fields.get("pattern_meal", "") != fields.get("meal", ""):
+            return None
+        return {
+            "last_meal_time": _decode_time(fields.get("meal")),
+            "last_insulin_time": _decode_time(fields.get("insulin")),
+            "last_medication_time": _decode_time(fields.get("medication")),
+            "last_medication_type": fields.get("medication_type") or None,
+            "meal_pattern": _meal_pattern(json.loads(fields["pattern"])),
+        }
+
+    async def _refill(self, user_id: str, redis) -> Dict[str, Any]:
+        """执行汇总查询并回填快照"""
+        now = datetime.utcnow()
+        row = await queries.fetchrow(ACTIVITY_SNAPSHOT, user_id, now - timedelta(days=PATTERN_DAYS))
+        meal_days = json.loads(row["meal_days"])
+        snapshot = {
+            "last_meal_time": row["last_meal_time"],
+            "last_insulin_time": row["last_insulin_time"],
+            "last_medication_time": row["last_medication_time"],
+            "last_medication_type": row["last_medication_type"],
+            "meal_pattern": _meal_pattern(meal_days),
+        }
+        if redis:
+            last_meal = _encode_time(row["last_meal_time"])
+            try:
+                await self._merge(
+                    redis, user_id, seeded=True,
+                    meal=last_meal,
+                    insulin=_encode_time(row["last_insulin_time"]),
+                    medication=_encode_time(row["last_medication_time"]),
+                    medication_type=row["last_medication_type"] or "",
+                    pattern=json.dumps(meal_days),
+                    pattern_day=now.date().isoformat(),
+                    pattern_meal=last_meal,
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ 回填活动快照失败: {str(e)}")
+        return snapshot
+
+    async def _merge(
+        self,
+        redis,
+        user_id: str,
+        seeded: bool = False,
+        drop_pattern: bool = False,
+        meal: str = "",
+        insulin: str = "",
+        medication: str = "",
+        medication_type: str = "",
+        pattern: str = "",
+        pattern_day: str = "",
+        pattern_meal: str = ""
+    ):
+        await redis.eval(
+            MERGE_SCRIPT, 1, self._key(user_id),
+            REDIS_TTL_SECONDS, "1" if seeded else "0", "1" if drop_pattern else "0",
+            meal, insulin, medication, medication_type, pattern, pattern_day, pattern_meal
+        )
+
+    async def _update(self, user_id: str, **fields):
+        # 写入后到达的读取不再加入写入前开始的回填
+        self._refill_flight.forget(user_id)
+        redis = await self._redis()
+        if redis:
+            await self._merge(redis, user_id, **fields)
+
+    async def record_meal(self, user_id: str, meal_time: datetime):
+        """记录一次用餐（同时丢弃用餐模式，下次读取时重新统计）"""
+        await self._update(user_id, meal=_encode_time(meal_time), drop_pattern=True)
+
+    async def record_insulin(self, user_id: str, injected_at: datetime):
+        """记录一次胰岛素注射"""
+        await self._update(user_id, insulin=_encode_time(injected_at))
+
+    async def record_medication(self, user_id: str, medication_time: datetime, medication_type: str):
+        """记录一次用药"""
+        await self._update(user_id, medication=_encode_time(medication_time), medication_type=medication_type)
+
+    async def invalidate(self, user_id: str):
+        """删除快照，下次读取时从数据库回填（同步上传等可能修改已有记录时使用）"""
+        self._refill_flight.forget(user_id)
+        redis = await self._redis()
+        if redis:
+            await redis.delete(self._key(user_id))
+
+    @staticmethod
+    def _record(result: str):
+        QUERY_CACHE_REQUESTS.labels(cache="activity_snapshot", result=result).inc()
+        CACHE_HIT_RATIO.observe(0 if result == "miss" else 1)
+
+
+# 模块级单例
+activity_tracker = ActivityTracker()
@@ -1,7 +1,13 @@
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Mapping, Tuple, AsyncIterator
 from uuid import uuid4
 from datetime import datetime, timezone
 from app.database import database
+from app.records import queries
+from app.nutrition import rollup
+from app.utils.single_flight import SingleFlight
+
+# 并发读取同一用户同一天的营养摄入（如多个页面同时刷新）合并为一次查询
+_intake_flight = SingleFlight("today_nutrition_intake")
 
 def _normalize_datetime(dt: datetime) -> datetime:
     """将 datetime 统一为 timezone-naive UTC"""
@@ -9,6 +15,24 @@ def _normalize_datetime(dt: datetime) -> datetime:
         return dt.astimezone(timezone.utc).replace(tzinfo=None)
     return dt
 
+def _list_query(
+    variants,
+    user_id: str,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    limit: Optional[int],
+    cursor: Optional[Tuple[datetime, str]]
+):
+    """选出列表查询语句并组装参数（时间统一为 naive UTC）"""
+    return queries.list_args(
+        variants,
+        user_id,
+        limit,
+        _normalize_datetime(start_date) if start_date else None,
+        _normalize_datetime(end_date) if end_date else None,
+        (_normalize_datetime(cursor[0]), cursor[1]) if cursor else None
+    )
+
 async def create_meal_record(
     user_id: str,
     meal_time: datetime,
@@ -38,6 +62,8 @@ async def create_meal_record(
     }
     
     result = await database.fetch_one(query=query, values=values)
+    # 新记录写入后到达的读取不再加入写入前开始的查询
+    _intake_flight.forget((user_id, values["meal_time"].date()))
     return str(result["id"])
 
 async def create_insulin_injection_record(
@@ -71,57 +97,46 @@ async def create_insulin_injection_record(
     result = await database.fetch_one(query=query, values=values)
     return str(result["id"])
 
-async def get_recent_meal_records(user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+async def get_recent_meal_records(user_id: str, limit: int = 10) -> List[Mapping[str, Any]]:
     """获取最近的用餐记录"""
-    query = """
-        SELECT * FROM meal_records 
-        WHERE user_id = :user_id 
-        ORDER BY meal_time DESC 
-        LIMIT :limit
-    """
-    
-    results = await database.fetch_all(query=query, values={"user_id": user_id, "limit": limit})
-    return [dict(row) for row in results]
+    return await get_meal_records(user_id, limit=limit)
 
-async def get_recent_insulin_records(user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+async def get_meal_records(
+    user_id: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = 10,
+    cursor: Optional[Tuple[datetime, str]] = None
+) -> List[Mapping[str, Any]]:
+    """获取用餐记录列表（支持日期范围和键集游标）"""
+    query, args = _list_query(queries.MEAL_RECORDS, user_id, start_date, end_date, limit, cursor)
+    return await queries.fetch(query, *args)
+
+async def get_recent_insulin_records(
+    user_id: str,
+    limit: int = 10,
+    cursor: Optional[Tuple[datetime, str]] = None
+) -> List[Mapping[str, Any]]:
     """获取最近的胰岛素注射记录"""
-    query = """
-        SELECT * FROM insulin_injection_records 
-        WHERE user_id = :user_id 
-        ORDER BY injection_time DESC 
-        LIMIT :limit
-    """
-    
-    results = await database.fetch_all(query=query, values={"user_id": user_id, "limit": limit})
-    return [dict(row) for row in results]
+    query, args = _list_query(queries.INSULIN_RECORDS, user_id, None, None, limit, cursor)
+    return await queries.fetch(query, *args)
+
+def stream_insulin_records(
+    user_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[Tuple[datetime, str]] = None
+) -> AsyncIterator[Mapping[str, Any]]:
+    """以数据库游标流式读取胰岛素注射记录"""
+    query, args = _list_query(queries.INSULIN_RECORDS, user_id, None, None, limit, cursor)
+    return queries.stream(query, *args)
 
 async def get_last_meal_time(user_id: str) -> Optional[datetime]:
     """获取最后一次用餐时间"""
-    query = """
-        SELECT meal_time FROM meal_records 
-        WHERE user_id = :user_id 
-        ORDER BY meal_time DESC 
-        LIMIT 1
-    """
-    
-    result = await database.fetch_one(query=query, values={"user_id": user_id})
-    if result:
-        return result["meal_time"]
-    return None
+    return await queries.fetchval(queries.LAST_MEAL_TIME, user_id)
 
 async def get_last_insulin_time(user_id: str) -> Optional[datetime]:
     """获取最后一次胰岛素注射时间"""
-    query = """
-        SELECT injection_time FROM insulin_injection_records 
-        WHERE user_id = :user_id 
-        ORDER BY injection_time DESC 
-        LIMIT 1
-    """
-    
-    result = await database.fetch_one(query=query, values={"user_id": user_id})
-    if result:
-        return result["injection_time"]
-    return None
+    return await queries.fetchval(queries.LAST_INSULIN_TIME, user_id)
 
 async def get_user_meal_pattern(user_id: str, days: int = 7) -> Dict[str, Any]:
     """分析用户用餐模式"""
@@ -162,71 +177,25 @@ async def get_user_meal_pattern(user_id: str, days: int = 7) -> Dict[str, Any]:
         "avg_meal_frequency": len(meal_times) / days if days > 0 else 0
     }
 
+def forget_nutrition_intake(user_id: str):
+    """用户的用餐记录批量变化后（如同步上传，可能涉及任意日期），之后的读取不再加入变化前开始的查询"""
+    _intake_flight.forget_if(lambda key: key[0] == user_id)
+
 async def get_today_nutrition_intake(user_id: str, target_date: Optional[datetime] = None) -> Dict[str, Any]:
-    """获取指定日期的营养摄入统计"""
-    from datetime import date as date_type
-    
+    """获取指定日期的营养摄入统计（读取每日汇总表）"""
     if target_date is None:
         target_date = datetime.utcnow()
     
-    # 获取当天的开始和结束时间
-    start_of_day = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_day = target_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-    
-    query = """
-        SELECT 
-            COALESCE(SUM(nr.calories), 0) as total_calories,
-            COALESCE(SUM(nr.total_carbs), 0) as total_carbs,
-            COALESCE(SUM(nr.net_carbs), 0) as total_net_carbs,
-            COALESCE(SUM(nr.protein), 0) as total_protein,
-            COALESCE(SUM(nr.fat), 0) as total_fat,
-            COALESCE(SUM(nr.fiber), 0) as total_fiber,
-            COUNT(DISTINCT mr.id) as meal_count
-        FROM meal_records mr
-        LEFT JOIN nutrition_records nr ON mr.nutrition_record_id = nr.id
-        WHERE mr.user_id = :user_id
-          AND mr.meal_time >= :start_of_day
-          AND mr.meal_time <= :end_of_day
-    """
-    
-    result = await database.fetch_one(
-        query=query,
-        values={
-            "user_id": user_id,
-            "start_of_day": start_of_day,
-            "end_of_day": end_of_day
-        }
-    )
-    
-    if result:
-        return {
-            "total_calories": float(result["total_calories"] or 0),
-            "total_carbs": float(result["total_carbs"] or 0),
-            "total_net_carbs": float(result["total_net_carbs"] or 0),
-            "total_protein": float(result["total_protein"] or 0),
-            "total_fat": float(result["total_fat"] or 0),
-            "total_fiber": float(result["total_fiber"] or 0),
-            "meal_count": int(result["meal_count"] or 0),
-            "date": target_date.date().isoformat()
-        }
-    
-    return {
-        "total_calories": 0.0,
-        "total_carbs": 0.0,
-        "total_net_carbs": 0.0,
-        "total_protein": 0.0,
-        "total_fat": 0.0,
-        "total_fiber": 0.0,
-        "meal_count": 0,
-        "date": target_date.date().isoformat()
-    }
+    day = _normalize_datetime(target_date).date()
+    return await _intake_flight.do((user_id, day), lambda: rollup.get_daily_intake(user_id, day))
 
 async def get_meal_history(
     user_id: str,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    limit: int = 100
-) -> List[Dict[str, Any]]:
+    limit: int = 100,
+    cursor: Optional[Tuple[datetime, str]] = None
+) -> List[Mapping[str, Any]]:
     """获取用户的饮食历史记录（支持日期范围查询）
     
     Args:
@@ -234,50 +203,24 @@ async def get_meal_history(
         start_date: 开始日期（可选）
         end_date: 结束日期（可选）
         limit: 返回记录数量限制
+        cursor: 键集游标 (时间, ID)，只返回排在该位置之后的记录（可选）
         
     Returns:
-        List[Dict]: 饮食历史记录列表，包含营养信息
-    """
-    query = """
-        SELECT 
-            mr.id,
-            mr.user_id,
-            mr.meal_time,
-            mr.food_recognition_id,
-            mr.nutrition_record_id,
-            mr.notes,
-            mr.created_at,
-            nr.total_carbs,
-            nr.net_carbs,
-            nr.protein,
-            nr.fat,
-            nr.fiber,
-            nr.calories,
-            nr.gi_value,
-            nr.gl_value,
-            fr.image_url,
-            fr.recognition_result
-        FROM meal_records mr
-        LEFT JOIN nutrition_records nr ON mr.nutrition_record_id = nr.id
-        LEFT JOIN food_recognitions fr ON mr.food_recognition_id = fr.id
-        WHERE mr.user_id = :user_id
+        List[Record]: 饮食历史记录列表，包含营养信息，可直接展开为 MealHistoryItem
     """
-    
-    values = {"user_id": user_id, "limit": limit}
-    
-    # 添加日期范围过滤
-    if start_date:
-        query += " AND mr.meal_time >= :start_date"
-        values["start_date"] = _normalize_datetime(start_date)
-    
-    if end_date:
-        query += " AND mr.meal_time <= :end_date"
-        values["end_date"] = _normalize_datetime(end_date)
-    
-    query += " ORDER BY mr.meal_time DESC LIMIT :limit"
-    
-    results = await database.fetch_all(query=query, values=values)
-    return [dict(row) for row in results]
+    query, args = _list_query(queries.MEAL_HISTORY, user_id, start_date, end_date, limit, cursor)
+    return await queries.fetch(query, *args)
+
+def stream_meal_history(
+    user_id: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[Tuple[datetime, str]] = None
+) -> AsyncIterator[Mapping[str, Any]]:
+    """以数据库游标流式读取用户的饮食历史记录"""
+    query, args = _list_query(queries.MEAL_HISTORY, user_id, start_date, end_date, limit, cursor)
+    return queries.stream(query, *args)
 
 # ==================== 运动记录相关 ====================
 
@@ -357,32 +300,12 @@ async def get_today_exercise_summary(user_id: str, date: datetime) -> Dict[str,
     start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
     end_of_day = date.replace(hour=23, minute=59, second=59, microsecond=999999)
     
-    query = """
-        SELECT 
-            id,
-            user_id,
-            exercise_time,
-            exercise_type,
-            duration_minutes,
-            intensity,
-            calories_burned,
-            notes,
-            created_at
-        FROM exercise_records
-        WHERE user_id = :user_id
-        AND exercise_time >= :start_date
-        AND exercise_time <= :end_date
-        ORDER BY exercise_time DESC
-    """
-    
-    values = {
-        "user_id": user_id,
-        "start_date": _normalize_datetime(start_of_day),
-        "end_date": _normalize_datetime(end_of_day)
-    }
-    
-    records = await database.fetch_all(query=query, values=values)
-    records_list = [dict(row) for row in records]
+    records_list = await queries.fetch(
+        queries.EXERCISE_DAY,
+        user_id,
+        _normalize_datetime(start_of_day),
+        _normalize_datetime(end_of_day)
+    )
     
     # 计算汇总
     total_calories = sum(r["calories_burned"] for r in records_list)
@@ -399,38 +322,23 @@ async def get_exercise_records(
     user_id: str,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    limit: int = 50
-) -> List[Dict[str, Any]]:
+    limit: int = 50,
+    cursor: Optional[Tuple[datetime, str]] = None
+) -> List[Mapping[str, Any]]:
     """获取运动记录列表"""
-    query = """
-        SELECT 
-            id,
-            user_id,
-            exercise_time,
-            exercise_type,
-            duration_minutes,
-            intensity,
-            calories_burned,
-            notes,
-            created_at
-        FROM exercise_records
-        WHERE user_id = :user_id
-    """
-    
-    values = {"user_id": user_id, "limit": limit}
-    
-    if start_date:
-        query += " AND exercise_time >= :start_date"
-        values["start_date"] = _normalize_datetime(start_date)
-    
-    if end_date:
-        query += " AND exercise_time <= :end_date"
-        values["end_date"] = _normalize_datetime(end_date)
-    
-    query += " ORDER BY exercise_time DESC LIMIT :limit"
-    
-    results = await database.fetch_all(query=query, values=values)
-    return [dict(row) for row in results]
+    query, args = _list_query(queries.EXERCISE_RECORDS, user_id, start_date, end_date, limit, cursor)
+    return await queries.fetch(query, *args)
+
+def stream_exercise_records(
+    user_id: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[Tuple[datetime, str]] = None
+) -> AsyncIterator[Mapping[str, Any]]:
+    """以数据库游标流式读取运动记录列表"""
+    query, args = _list_query(queries.EXERCISE_RECORDS, user_id, start_date, end_date, limit, cursor)
+    return queries.stream(query, *args)
 
 # ==================== 水分记录相关 ====================
 
@@ -470,30 +378,12 @@ async def get_today_water_summary(user_id: str, date: datetime) -> Dict[str, Any
     start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
     end_of_day = date.replace(hour=23, minute=59, second=59, microsecond=999999)
     
-    query = """
-        SELECT 
-            id,
-            user_id,
-            record_time,
-            amount_ml,
-            water_type,
-            notes,
-            created_at
-        FROM water_records
-        WHERE user_id = :user_id
-        AND record_time >= :start_date
-        AND record_time <= :end_date
-        ORDER BY record_time DESC
-    """
-    
-    values = {
-        "user_id": user_id,
-        "start_date": _normalize_datetime(start_of_day),
-        "end_date": _normalize_datetime(end_of_day)
-    }
-    
-    records = await database.fetch_all(query=query, values=values)
-    records_list = [dict(row) for row in records]
+    records_list = await queries.fetch(
+        queries.WATER_DAY,
+        user_id,
+        _normalize_datetime(start_of_day),
+        _normalize_datetime(end_of_day)
+    )
     
     # 计算汇总
     total_ml = sum(r["amount_ml"] for r in records_list)
@@ -510,36 +400,23 @@ async def get_water_records(
     user_id: str,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    limit: int = 50
-) -> List[Dict[str, Any]]:
+    limit: int = 50,
+    cursor: Optional[Tuple[datetime, str]] = None
+) -> List[Mapping[str, Any]]:
     """获取水分记录列表"""
-    query = """
-        SELECT 
-            id,
-            user_id,
-            record_time,
-            amount_ml,
-            water_type,
-            notes,
-            created_at
-        FROM water_records
-        WHERE user_id = :user_id
-    """
-    
-    values = {"user_id": user_id, "limit": limit}
-    
-    if start_date:
-        query += " AND record_time >= :start_date"
-        values["start_date"] = _normalize_datetime(start_date)
-    
-    if end_date:
-        query += " AND record_time <= :end_date"
-        values["end_date"] = _normalize_datetime(end_date)
-    
-    query += " ORDER BY record_time DESC LIMIT :limit"
-    
-    results = await database.fetch_all(query=query, values=values)
-    return [dict(row) for row in results]
+    query, args = _list_query(queries.WATER_RECORDS, user_id, start_date, end_date, limit, cursor)
+    return await queries.fetch(query, *args)
+
+def stream_water_records(
+    user_id: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[Tuple[datetime, str]] = None
+) -> AsyncIterator[Mapping[str, Any]]:
+    """以数据库游标流式读取水分记录列表"""
+    query, args = _list_query(queries.WATER_RECORDS, user_id, start_date, end_date, limit, cursor)
+    return queries.stream(query, *args)
 
 
 # ==================== 用药记录相关 ====================
@@ -584,32 +461,12 @@ async def get_today_medication_summary(user_id: str, date: datetime) -> Dict[str
     start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
     end_of_day = date.replace(hour=23, minute=59, second=59, microsecond=999999)
     
-    query = """
-        SELECT 
-            id,
-            user_id,
-            medication_time,
-            medication_type,
-            medication_name,
-            dosage,
-            dosage_unit,
-            notes,
-            created_at
-        FROM medication_records
-        WHERE user_id = :user_id
-        AND medication_time >= :start_date
-        AND medication_time <= :end_date
-        ORDER BY medication_time DESC
-    """
-    
-    values = {
-        "user_id": user_id,
-        "start_date": _normalize_datetime(start_of_day),
-        "end_date": _normalize_datetime(end_of_day)
-    }
-    
-    records = await database.fetch_all(query=query, values=values)
-    records_list = [dict(row) for row in records]
+    records_list = await queries.fetch(
+        queries.MEDICATION_DAY,
+        user_id,
+        _normalize_datetime(start_of_day),
+        _normalize_datetime(end_of_day)
+    )
     
     # 统计不同类型的用药
     insulin_count = sum(1 for r in records_list if r["medication_type"] == "insulin")
@@ -626,48 +483,24 @@ async def get_medication_records(
     user_id: str,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    limit: int = 50
-) -> List[Dict[str, Any]]:
+    limit: int = 50,
+    cursor: Optional[Tuple[datetime, str]] = None
+) -> List[Mapping[str, Any]]:
     """获取用药记录列表"""
-    query = """
-        SELECT 
-            id,
-            user_id,
-            medication_time,
-            medication_type,
-            medication_name,
-            dosage,
-            dosage_unit,
-            notes,
-            created_at
-        FROM medication_records
-        WHERE user_id = :user_id
-    """
-    
-    values = {"user_id": user_id, "limit": limit}
-    
-    if start_date:
-        query += " AND medication_time >= :start_date"
-        values["start_date"] = _normalize_datetime(start_date)
-    
-    if end_date:
-        query += " AND medication_time <= :end_date"
-        values["end_date"] = _normalize_datetime(end_date)
-    
-    query += " ORDER BY medication_time DESC LIMIT :limit"
-    
-    results = await database.fetch_all(query=query, values=values)
-    return [dict(row) for row in results]
+    query, args = _list_query(queries.MEDICATION_RECORDS, user_id, start_date, end_date, limit, cursor)
+    return await queries.fetch(query, *args)
+
+def stream_medication_records(
+    user_id: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[Tuple[datetime, str]] = None
+) -> AsyncIterator[Mapping[str, Any]]:
+    """以数据库游标流式读取用药记录列表"""
+    query, args = _list_query(queries.MEDICATION_RECORDS, user_id, start_date, end_date, limit, cursor)
+    return queries.stream(query, *args)
 
 async def get_last_medication_time(user_id: str) -> Optional[datetime]:
     """获取最后一次用药时间"""
-    query = """
-        SELECT medication_time
-        FROM medication_records
-        WHERE user_id = :user_id
-        ORDER BY medication_time DESC
-        LIMIT 1
-    """
-    result = await database.fetch_one(query=query, values={"user_id": user_id})
-    return result["medication_time"] if result else None
-
+    return await queries.fetchval(queries.LAST_MEDICATION_TIME, user_id)
@@ -0,0 +1,46 @@
+"""记录列表的键集分页与 NDJSON 流式输出"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional, Sequence, Tuple, Type
+from uuid import UUID
+from pydantic import BaseModel
+
+# 下一页游标通过响应头返回，保持列表响应体结构不变
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def encode_cursor(time_value: datetime, record_id: str) -> str:
+    """将 (时间, ID) 编码为不透明游标"""
+    payload = json.dumps([time_value.isoformat(), str(record_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """解析游标
+
+    Raises:
+        ValueError: 游标格式无效
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        time_str, record_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(time_str), str(UUID(record_id))
+    except Exception:
+        raise ValueError("分页游标无效")
+
+
+def next_cursor(items: Sequence[BaseModel], time_field: str, limit: Optional[int]) -> Optional[str]:
+    """本页已取满时，以最后一条记录生成下一页游标"""
+    if not items or limit is None or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(getattr(last, time_field), last.id)
+
+
+async def ndjson_lines(rows: AsyncIterator[Any], model: Type[BaseModel]) -> AsyncIterator[str]:
+    """将数据库游标逐行转换为 NDJSON，每行一个响应模型"""
+    async for row in rows:
+        yield model(**row).model_dump_json() + "\n"
@@ -0,0 +1,317 @@
+"""记录模块的预编译查询层
+
+热点查询以固定的 SQL 文本（``$n`` 位置参数）集中登记在这里，执行时直接走
+asyncpg 原生连接：asyncpg 按 SQL 文本在每个连接上缓存预编译语句，同一条查询
+在一个连接上只 prepare 一次，之后只传参数执行，绕过 databases 每次调用的
+命名参数翻译和逐行 Record 包装。
+
+日期过滤等可选条件不再通过字符串拼接追加，而是为每种组合登记一条固定语句，
+保证语句文本稳定、能命中预编译缓存。
+
+返回的行为 ``asyncpg.Record``（类元组，支持按列名访问和 ``**row`` 展开），
+SQL 中已将 UUID / NUMERIC 列转换为响应模型需要的类型，调用方可以直接
+``Model(**row)`` 构造响应模型，无需 ``dict(row)`` 拷贝。
+"""
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from app.database import database
+
+
+class PreparedQuery:
+    """登记的热点查询（每个连接预编译一次）"""
+
+    __slots__ = ("name", "sql")
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+
+    def __repr__(self) -> str:
+        return f"PreparedQuery({self.name!r})"
+
+
+# 已登记的全部查询 {name: PreparedQuery}，供回归检查脚本遍历
+REGISTRY: Dict[str, PreparedQuery] = {}
+
+
+def register(name: str, sql: str) -> PreparedQuery:
+    """登记一条热点查询"""
+    query = PreparedQuery(name, " ".join(sql.split()))
+    REGISTRY[name] = query
+    return query
+
+
+async def fetch(query: PreparedQuery, *args: Any) -> List[Any]:
+    """执行查询并返回全部行"""
+    async with database.connection() as connection:
+        return await connection.raw_connection.fetch(query.sql, *args)
+
+
+async def fetchrow(query: PreparedQuery, *args: Any) -> Optional[Any]:
+    """执行查询并返回第一行"""
+    async with database.connection() as connection:
+        return await connection.raw_connection.fetchrow(query.sql, *args)
+
+
+async def fetchval(query: PreparedQuery, *args: Any) -> Any:
+    """执行查询并返回第一行第一列"""
+    async with database.connection() as connection:
+        return await connection.raw_connection.fetchval(query.sql, *args)
+
+
+async def execute(query: PreparedQuery, *args: Any) -> str:
+    """执行写入语句，返回状态字符串（如 ``INSERT 0 3``）"""
+    async with database.connection() as connection:
+        return await connection.raw_connection.execute(query.sql, *args)
+
+
+async def executemany(query: PreparedQuery, args: List[Sequence[Any]]) -> None:
+    """以同一条预编译语句批量执行多组参数（单次往返管道化发送）"""
+    async with database.connection() as connection:
+        await connection.raw_connection.executemany(query.sql, args)
+
+
+async def stream(query: PreparedQuery, *args: Any, prefetch: int = 200) -> AsyncIterator[Any]:
+    """以服务端游标逐批读取查询结果
+
+    每次只从数据库取 prefetch 行，内存占用与结果总行数无关。
+    asyncpg 的游标必须在事务中使用，这里开启只读事务。
+    """
+    async with database.connection() as connection:
+        raw_connection = connection.raw_connection
+        async with raw_connection.transaction(readonly=True):
+            async for row in raw_connection.cursor(query.sql, *args, prefetch=prefetch):
+                yield row
+
+
+def _register_list_variants(
+    name: str,
+    select_sql: str,
+    time_column: str,
+    id_column: str
+) -> Dict[Tuple[bool, bool, bool], PreparedQuery]:
+    """为（开始时间, 结束时间, 翻页游标）是否存在的八种组合各登记一条固定语句
+
+    参数约定：$1 = user_id，$2 = limit（NULL 表示不限制），之后依次为
+    start / end / 游标时间 / 游标ID。排序固定为 (时间, ID) 倒序，游标条件写成
+    ``time <= $t AND (time < $t OR id < $id)``，使 ``time <= $t`` 能作为
+    (user_id, time DESC) 复合索引的索引条件，翻到任意深度都不需要跳过前面的行。
+    """
+    variants = {}
+    for has_start in (False, True):
+        for has_end in (False, True):
+            for has_cursor in (False, True):
+                conditions = []
+                position = 3
+                if has_start:
+                    conditions.append(f"{time_column} >= ${position}")
+                    position += 1
+                if has_end:
+                    conditions.append(f"{time_column} <= ${position}")
+                    position += 1
+                if has_cursor:
+                    conditions.append(
+                        f"{time_column} <= ${position} AND "
+                        f"({time_column} < ${position} OR {id_column} < ${position + 1})"
+                    )
+                where_extra = "".join(f" AND {c}" for c in conditions)
+                suffix = (
+                    ("_from" if has_start else "")
+                    + ("_to" if has_end else "")
+                    + ("_after" if has_cursor else "")
+                )
+                variants[(has_start, has_end, has_cursor)] = register(
+                    f"{name}{suffix}",
+                    f"{select_sql}{where_extra} "
+                    f"ORDER BY {time_column} DESC, {id_column} DESC LIMIT $2"
+                )
+    return variants
+
+
+def list_args(
+    variants: Dict[Tuple[bool, bool, bool], PreparedQuery],
+    user_id: str,
+    limit: Optional[int],
+    start: Optional[Any] = None,
+    end: Optional[Any] = None,
+    cursor: Optional[Tuple[Any, str]] = None
+) -> Tuple[PreparedQuery, List[Any]]:
+    """根据可选的时间范围和游标选出对应语句并组装位置参数"""
+    query = variants[(start is not None, end is not None, cursor is not None)]
+    args: List[Any] = [user_id, limit]
+    if start is not None:
+        args.append(start)
+    if end is not None:
+        args.append(end)
+    if cursor is not None:
+        args.extend(cursor)
+    return query, args
+
+
+# ==================== 用餐记录 ====================
+
+MEAL_COLUMNS = """
+    mr.id::text AS id,
+    mr.user_id::text AS user_id,
+    mr.meal_time,
+    mr.food_recognition_id::text AS food_recognition_id,
+    mr.nutrition_record_id::text AS nutrition_record_id,
+    mr.notes,
+    mr.created_at
+"""
+
+MEAL_RECORDS = _register_list_variants(
+    "meal_records",
+    f"""
+    SELECT {MEAL_COLUMNS}
+    FROM meal_records mr
+    WHERE mr.user_id = $1
+    """,
+    "mr.meal_time",
+    "mr.id"
+)
+
+LAST_MEAL_TIME = register("last_meal_time", """
+    SELECT meal_time FROM meal_records
+    WHERE user_id = $1
+    ORDER BY meal_time DESC
+    LIMIT 1
+""")
+
+MEAL_HISTORY = _register_list_variants(
+    "meal_history",
+    f"""
+    SELECT {MEAL_COLUMNS},
+        nr.total_carbs::float8 AS total_carbs,
+        nr.net_carbs::float8 AS net_carbs,
+        nr.protein::float8 AS protein,
+        nr.fat::float8 AS fat,
+        nr.fiber::float8 AS fiber,
+        nr.calories::float8 AS calories,
+        nr.gi_value::float8 AS gi_value,
+        nr.gl_value::float8 AS gl_value,
+        fr.image_url,
+        fr.recognition_result
+    FROM meal_records mr
+    LEFT JOIN nutrition_records nr ON mr.nutrition_record_id = nr.id
+    LEFT JOIN food_recognitions fr ON mr.food_recognition_id = fr.id
+    WHERE mr.user_id = $1
+    """,
+    "mr.meal_time",
+    "mr.id"
+)
+
+# ==================== 胰岛素注射记录 ====================
+
+INSULIN_RECORDS = _register_list_variants(
+    "insulin_records",
+    """
+    SELECT
+        id::text AS id,
+        user_id::text AS user_id,
+        injection_time,
+        insulin_record_id::text AS insulin_record_id,
+        actual_dose::float8 AS actual_dose,
+        notes,
+        created_at
+    FROM insulin_injection_records
+    WHERE user_id = $1
+    """,
+    "injection_time",
+    "insulin_injection_records.id"
+)
+
+LAST_INSULIN_TIME = register("last_insulin_time", """
+    SELECT injection_time FROM insulin_injection_records
+    WHERE user_id = $1
+    ORDER BY injection_time DESC
+    LIMIT 1
+""")
+
+# ==================== 运动记录 ====================
+
+EXERCISE_SELECT = """
+    SELECT
+        id::text AS id,
+        user_id::text AS user_id,
+        exercise_time,
+        exercise_type,
+        duration_minutes,
+        intensity,
+        calories_burned::float8 AS calories_burned,
+        notes,
+        created_at
+    FROM exercise_records
+    WHERE user_id = $1
+"""
+
+EXERCISE_RECORDS = _register_list_variants(
+    "exercise_records", EXERCISE_SELECT, "exercise_time", "exercise_records.id"
+)
+
+EXERCISE_DAY = register("exercise_day", f"""
+    {EXERCISE_SELECT}
+      AND exercise_time >= $2
+      AND exercise_time <= $3
+    ORDER BY exercise_time DESC
+""")
+
+# ==================== 水分记录 ====================
+
+WATER_SELECT = """
+    SELECT
+        id::text AS id,
+        user_id::text AS user_id,
+        record_time,
+        amount_ml,
+        water_type,
+        notes,
+        created_at
+    FROM water_records
+    WHERE user_id = $1
+"""
+
+WATER_RECORDS = _register_list_variants(
+    "water_records", WATER_SELECT, "record_time", "water_records.id"
+)
+
+WATER_DAY = register("water_day", f"""
+    {WATER_SELECT}
+      AND record_time >= $2
+      AND record_time <= $3
+    ORDER BY record_time DESC
+""")
+
+# ==================== 用药记录 ====================
+
+MEDICATION_SELECT = """
+    SELECT
+        id::text AS id,
+        user_id::text AS user_id,
+        medication_time,
+        medication_type,
+        medication_name,
+        dosage::float8 AS dosage,
+        dosage_unit,
+        notes,
+        created_at
+    FROM medication_records
+    WHERE user_id = $1
+"""
+
+MEDICATION_RECORDS = _register_list_variants(
+    "medication_records", MEDICATION_SELECT, "medication_time", "medication_records.id"
+)
+
+MEDICATION_DAY = register("medication_day", f"""
+    {MEDICATION_SELECT}
+      AND medication_time >= $2
+      AND medication_time <= $3
+    ORDER BY medication_time DESC
+""")
+
+LAST_MEDICATION_TIME = register("last_medication_time", """
+    SELECT medication_time FROM medication_records
+    WHERE user_id = $1
+    ORDER BY medication_time DESC
+    LIMIT 1
+""")
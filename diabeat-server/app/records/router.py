@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Tuple
 from datetime import datetime
-from app.records import schemas
+from app.records import schemas, crud, pagination
 from app.records.service import RecordService
 from app.user.router import get_current_user_dependency
 from app.user.schemas import UserResponse
@@ -18,6 +19,63 @@ def get_record_service() -> RecordService:
     """获取记录服务实例"""
     return RecordService()
 
+def _parse_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, str]]:
+    """解析分页游标，格式无效时返回 400"""
+    if not cursor:
+        return None
+    try:
+        return pagination.decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def _parse_iso_range(start_date: Optional[str], end_date: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """解析 ISO 格式的日期范围，格式无效时返回 400"""
+    try:
+        start_dt = datetime.fromisoformat(start_date) if start_date else None
+        end_dt = datetime.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="日期格式错误，请使用 ISO 格式"
+        )
+    return start_dt, end_dt
+
+def _parse_date_range(start_date: Optional[str], end_date: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """解析 YYYY-MM-DD 格式的日期范围（结束日期包含当天）"""
+    start_dt = None
+    end_dt = None
+    
+    if start_date:
+        try:
+            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+            start_dt = start_dt.replace(hour=0, minute=0, second=0, microsecond=0)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="开始日期格式错误，请使用 YYYY-MM-DD 格式"
+            )
+    
+    if end_date:
+        try:
+            end_dt = datetime.strptime(end_date, "%Y-%m-%d")
+            end_dt = end_dt.replace(hour=23, minute=59, second=59, microsecond=999999)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="结束日期格式错误，请使用 YYYY-MM-DD 格式"
+            )
+    
+    return start_dt, end_dt
+
+def _ndjson_response(rows, model) -> StreamingResponse:
+    """以 NDJSON 流式返回数据库游标中的记录"""
+    return StreamingResponse(
+        pagination.ndjson_lines(rows, model),
+        media_type=pagination.NDJSON_MEDIA_TYPE
+    )
+
+CURSOR_DESCRIPTION = f"分页游标（取自上一页响应头 {pagination.NEXT_CURSOR_HEADER}）"
+
 @router.post(
     "/meals",
     response_model=schemas.MealRecordResponse,
@@ -71,46 +129,40 @@ async def create_insulin_record(
     description="获取用户的用餐记录列表"
 )
 async def get_meal_records(
+    response: Response,
     limit: int = Query(10, ge=1, le=100, description="返回记录数量"),
     date: Optional[str] = Query(None, description="日期过滤（YYYY-MM-DD格式）"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     record_service: RecordService = Depends(get_record_service),
     current_user: UserResponse = Depends(get_current_user_dependency),
 ):
     """获取用餐记录"""
+    cursor_key = _parse_cursor(cursor)
     try:
-        from app.records import crud
-        from datetime import datetime
-        
+        start_date = None
+        end_date = None
         if date:
-            # 如果指定了日期，获取该日期的记录
+            # 如果指定了日期，获取该日期的记录；日期格式错误时忽略过滤
             try:
                 target_date = datetime.strptime(date, "%Y-%m-%d")
                 start_date = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
                 end_date = target_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-                records = await crud.get_meal_history(
-                    current_user.id,
-                    start_date=start_date,
-                    end_date=end_date,
-                    limit=limit
-                )
             except ValueError:
-                # 日期格式错误，使用默认查询
-                records = await crud.get_recent_meal_records(current_user.id, limit=limit)
-        else:
-            records = await crud.get_recent_meal_records(current_user.id, limit=limit)
+                pass
         
-        return [
-            schemas.MealRecordResponse(
-                id=str(r["id"]),
-                user_id=str(r["user_id"]),
-                meal_time=r["meal_time"],
-                food_recognition_id=str(r.get("food_recognition_id")) if r.get("food_recognition_id") else None,
-                nutrition_record_id=str(r.get("nutrition_record_id")) if r.get("nutrition_record_id") else None,
-                notes=r.get("notes"),
-                created_at=r["created_at"]
-            )
-            for r in records
-        ]
+        records = await crud.get_meal_records(
+            current_user.id,
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit,
+            cursor=cursor_key
+        )
+        
+        items = [schemas.MealRecordResponse(**r) for r in records]
+        next_cursor = pagination.next_cursor(items, "meal_time", limit)
+        if next_cursor:
+            response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+        return items
     except Exception as e:
         logger.error(f"Get meal records error: {str(e)}")
         raise HTTPException(
@@ -125,15 +177,17 @@ async def get_meal_records(
     description="获取用户的胰岛素注射记录列表"
 )
 async def get_insulin_records(
+    response: Response,
     limit: int = Query(10, ge=1, le=100, description="返回记录数量"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     record_service: RecordService = Depends(get_record_service),
     current_user: UserResponse = Depends(get_current_user_dependency),
 ):
     """获取胰岛素注射记录"""
+    cursor_key = _parse_cursor(cursor)
     try:
-        from app.records import crud
-        records = await crud.get_recent_insulin_records(current_user.id, limit=limit)
-        return [
+        records = await crud.get_recent_insulin_records(current_user.id, limit=limit, cursor=cursor_key)
+        items = [
             schemas.InsulinRecordResponse(
                 id=str(r["id"]),
                 user_id=str(r["user_id"]),
@@ -145,6 +199,10 @@ async def get_insulin_records(
             )
             for r in records
         ]
+        next_cursor = pagination.next_cursor(items, "injection_time", limit)
+        if next_cursor:
+            response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+        return items
     except Exception as e:
         logger.error(f"Get insulin records error: {str(e)}")
         raise HTTPException(
@@ -152,6 +210,25 @@ async def get_insulin_records(
             detail=f"获取胰岛素记录失败: {str(e)}"
         )
 
+@router.get(
+    "/insulin/stream",
+    response_class=StreamingResponse,
+    summary="流式导出胰岛素注射记录",
+    description="以 NDJSON 逐行返回胰岛素注射记录，数据直接从数据库游标读出，适合同步完整历史"
+)
+async def stream_insulin_records(
+    limit: Optional[int] = Query(None, ge=1, description="最多返回记录数量（默认不限制）"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """流式导出胰岛素注射记录"""
+    rows = crud.stream_insulin_records(
+        current_user.id,
+        limit=limit,
+        cursor=_parse_cursor(cursor)
+    )
+    return _ndjson_response(rows, schemas.InsulinInjectionItem)
+
 @router.get(
     "/predict-next-insulin",
     response_model=schemas.NextInsulinPredictionResponse,
@@ -196,67 +273,29 @@ async def predict_next_insulin(
     description="获取用户的饮食历史记录，支持日期范围查询，包含营养信息"
 )
 async def get_meal_history(
+    response: Response,
     start_date: Optional[str] = Query(None, description="开始日期（YYYY-MM-DD格式）"),
     end_date: Optional[str] = Query(None, description="结束日期（YYYY-MM-DD格式）"),
     limit: int = Query(100, ge=1, le=500, description="返回记录数量"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     current_user: UserResponse = Depends(get_current_user_dependency),
 ):
     """获取饮食历史记录（包含营养信息）"""
     try:
-        from app.records import crud
-        
-        start_dt = None
-        end_dt = None
-        
-        if start_date:
-            try:
-                start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-                start_dt = start_dt.replace(hour=0, minute=0, second=0, microsecond=0)
-            except ValueError:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="开始日期格式错误，请使用 YYYY-MM-DD 格式"
-                )
-        
-        if end_date:
-            try:
-                end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-                end_dt = end_dt.replace(hour=23, minute=59, second=59, microsecond=999999)
-            except ValueError:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="结束日期格式错误，请使用 YYYY-MM-DD 格式"
-                )
-        
+        start_dt, end_dt = _parse_date_range(start_date, end_date)
         records = await crud.get_meal_history(
             user_id=current_user.id,
             start_date=start_dt,
             end_date=end_dt,
-            limit=limit
+            limit=limit,
+            cursor=_parse_cursor(cursor)
         )
         
-        return [
-            schemas.MealHistoryItem(
-                id=str(r["id"]),
-                user_id=str(r["user_id"]),
-                meal_time=r["meal_time"],
-                food_recognition_id=r.get("food_recognition_id"),
-                nutrition_record_id=r.get("nutrition_record_id"),
-                notes=r.get("notes"),
-                created_at=r["created_at"],
-                total_carbs=float(r["total_carbs"]) if r.get("total_carbs") else None,
-                net_carbs=float(r["net_carbs"]) if r.get("net_carbs") else None,
-                protein=float(r["protein"]) if r.get("protein") else None,
-                fat=float(r["fat"]) if r.get("fat") else None,
-                fiber=float(r["fiber"]) if r.get("fiber") else None,
-                calories=float(r["calories"]) if r.get("calories") else None,
-                gi_value=float(r["gi_value"]) if r.get("gi_value") else None,
-                gl_value=float(r["gl_value"]) if r.get("gl_value") else None,
-                image_url=r.get("image_url"),
-                recognition_result=r.get("recognition_result")
-            )
-            for r in records
-        ]
+        items = [schemas.MealHistoryItem(**r) for r in records]
+        next_cursor = pagination.next_cursor(items, "meal_time", limit)
+        if next_cursor:
+            response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+        return items
     except HTTPException:
         raise
     except Exception as e:
@@ -266,6 +305,29 @@ async def get_meal_history(
             detail=f"获取饮食历史失败: {str(e)}"
         )
 
+@router.get(
+    "/meals/history/stream",
+    response_class=StreamingResponse,
+    summary="流式导出饮食历史记录",
+    description="以 NDJSON 逐行返回饮食历史记录，数据直接从数据库游标读出，适合同步完整历史"
+)
+async def stream_meal_history(
+    start_date: Optional[str] = Query(None, description="开始日期（YYYY-MM-DD格式）"),
+    end_date: Optional[str] = Query(None, description="结束日期（YYYY-MM-DD格式）"),
+    limit: Optional[int] = Query(None, ge=1, description="最多返回记录数量（默认不限制）"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """流式导出饮食历史记录"""
+    start_dt, end_dt = _parse_date_range(start_date, end_date)
+    rows = crud.stream_meal_history(
+        current_user.id,
+        start_date=start_dt,
+        end_date=end_dt,
+        limit=limit,
+        cursor=_parse_cursor(cursor)
+    )
+    return _ndjson_response(rows, schemas.MealHistoryItem)
 
 # ==================== 运动记录相关 ====================
 
@@ -320,9 +382,11 @@ async def get_today_exercise_summary(
     description="获取用户的运动记录历史"
 )
 async def get_exercise_records(
+    response: Response,
     start_date: Optional[str] = Query(None, description="开始日期 (ISO格式)"),
     end_date: Optional[str] = Query(None, description="结束日期 (ISO格式)"),
     limit: int = Query(50, ge=1, le=100, description="返回记录数量"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     record_service: RecordService = Depends(get_record_service),
     current_user: UserResponse = Depends(get_current_user_dependency),
 ):
@@ -330,15 +394,21 @@ async def get_exercise_records(
     try:
         logger.info(f"📋 获取运动记录: user={current_user.id}")
         
-        start_dt = datetime.fromisoformat(start_date) if start_date else None
-        end_dt = datetime.fromisoformat(end_date) if end_date else None
-        
-        return await record_service.get_exercise_records(
+        start_dt, end_dt = _parse_iso_range(start_date, end_date)
+        items = await record_service.get_exercise_records(
             current_user.id,
             start_date=start_dt,
             end_date=end_dt,
-            limit=limit
+            limit=limit,
+            cursor=_parse_cursor(cursor)
         )
+        
+        next_cursor = pagination.next_cursor(items, "exercise_time", limit)
+        if next_cursor:
+            response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+        return items
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get exercise records error: {str(e)}")
         raise HTTPException(
@@ -346,6 +416,30 @@ async def get_exercise_records(
             detail=f"获取运动记录失败: {str(e)}"
         )
 
+@router.get(
+    "/exercises/stream",
+    response_class=StreamingResponse,
+    summary="流式导出运动记录",
+    description="以 NDJSON 逐行返回运动记录，数据直接从数据库游标读出，适合同步完整历史"
+)
+async def stream_exercise_records(
+    start_date: Optional[str] = Query(None, description="开始日期 (ISO格式)"),
+    end_date: Optional[str] = Query(None, description="结束日期 (ISO格式)"),
+    limit: Optional[int] = Query(None, ge=1, description="最多返回记录数量（默认不限制）"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """流式导出运动记录"""
+    start_dt, end_dt = _parse_iso_range(start_date, end_date)
+    rows = crud.stream_exercise_records(
+        current_user.id,
+        start_date=start_dt,
+        end_date=end_dt,
+        limit=limit,
+        cursor=_parse_cursor(cursor)
+    )
+    return _ndjson_response(rows, schemas.ExerciseRecordResponse)
+
 # ==================== 水分记录相关 ====================
 
 @router.post(
@@ -399,9 +493,11 @@ async def get_today_water_summary(
     description="获取用户的水分摄入历史记录"
 )
 async def get_water_records(
+    response: Response,
     start_date: Optional[str] = Query(None, description="开始日期 (ISO格式)"),
     end_date: Optional[str] = Query(None, description="结束日期 (ISO格式)"),
     limit: int = Query(50, ge=1, le=100, description="返回记录数量"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     record_service: RecordService = Depends(get_record_service),
     current_user: UserResponse = Depends(get_current_user_dependency),
 ):
@@ -409,15 +505,21 @@ async def get_water_records(
     try:
         logger.info(f"📋 获取水分记录: user={current_user.id}")
         
-        start_dt = datetime.fromisoformat(start_date) if start_date else None
-        end_dt = datetime.fromisoformat(end_date) if end_date else None
-        
-        return await record_service.get_water_records(
+        start_dt, end_dt = _parse_iso_range(start_date, end_date)
+        items = await record_service.get_water_records(
             current_user.id,
             start_date=start_dt,
             end_date=end_dt,
-            limit=limit
+            limit=limit,
+            cursor=_parse_cursor(cursor)
         )
+        
+        next_cursor = pagination.next_cursor(items, "record_time", limit)
+        if next_cursor:
+            response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+        return items
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get water records error: {str(e)}")
         raise HTTPException(
@@ -425,6 +527,30 @@ async def get_water_records(
             detail=f"获取水分记录失败: {str(e)}"
         )
 
+@router.get(
+    "/water/stream",
+    response_class=StreamingResponse,
+    summary="流式导出水分记录",
+    description="以 NDJSON 逐行返回水分记录，数据直接从数据库游标读出，适合同步完整历史"
+)
+async def stream_water_records(
+    start_date: Optional[str] = Query(None, description="开始日期 (ISO格式)"),
+    end_date: Optional[str] = Query(None, description="结束日期 (ISO格式)"),
+    limit: Optional[int] = Query(None, ge=1, description="最多返回记录数量（默认不限制）"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """流式导出水分记录"""
+    start_dt, end_dt = _parse_iso_range(start_date, end_date)
+    rows = crud.stream_water_records(
+        current_user.id,
+        start_date=start_dt,
+        end_date=end_dt,
+        limit=limit,
+        cursor=_parse_cursor(cursor)
+    )
+    return _ndjson_response(rows, schemas.WaterRecordResponse)
+
 # ==================== 用药记录相关 ====================
 
 @router.post(
@@ -478,9 +604,11 @@ async def get_today_medication_summary(
     description="获取用户的用药历史记录"
 )
 async def get_medication_records(
+    response: Response,
     start_date: Optional[str] = Query(None, description="开始日期 (ISO格式)"),
     end_date: Optional[str] = Query(None, description="结束日期 (ISO格式)"),
     limit: int = Query(50, ge=1, le=100, description="返回记录数量"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     record_service: RecordService = Depends(get_record_service),
     current_user: UserResponse = Depends(get_current_user_dependency),
 ):
@@ -488,18 +616,48 @@ async def get_medication_records(
     try:
         logger.info(f"📋 获取用药记录: user={current_user.id}")
         
-        start_dt = datetime.fromisoformat(start_date) if start_date else None
-        end_dt = datetime.fromisoformat(end_date) if end_date else None
-        
-        return await record_service.get_medication_records(
+        start_dt, end_dt = _parse_iso_range(start_date, end_date)
+        items = await record_service.get_medication_records(
             current_user.id,
             start_date=start_dt,
             end_date=end_dt,
-            limit=limit
+            limit=limit,
+            cursor=_parse_cursor(cursor)
         )
+        
+        next_cursor = pagination.next_cursor(items, "medication_time", limit)
+        if next_cursor:
+            response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+        return items
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get medication records error: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"获取用药记录失败: {str(e)}"
         )
+
+@router.get(
+    "/medications/stream",
+    response_class=StreamingResponse,
+    summary="流式导出用药记录",
+    description="以 NDJSON 逐行返回用药记录，数据直接从数据库游标读出，适合同步完整历史"
+)
+async def stream_medication_records(
+    start_date: Optional[str] = Query(None, description="开始日期 (ISO格式)"),
+    end_date: Optional[str] = Query(None, description="结束日期 (ISO格式)"),
+    limit: Optional[int] = Query(None, ge=1, description="最多返回记录数量（默认不限制）"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """流式导出用药记录"""
+    start_dt, end_dt = _parse_iso_range(start_date, end_date)
+    rows = crud.stream_medication_records(
+        current_user.id,
+        start_date=start_dt,
+        end_date=end_dt,
+        limit=limit,
+        cursor=_parse_cursor(cursor)
+    )
+    return _ndjson_response(rows, schemas.MedicationRecordResponse)
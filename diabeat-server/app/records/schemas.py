@@ -1,6 +1,6 @@
 """记录相关的数据模型"""
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Any
 from datetime import datetime
 
 # 用餐记录相关
@@ -55,6 +55,19 @@ class InsulinRecordResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class InsulinInjectionItem(BaseModel):
+    """胰岛素注射记录项（与注射记录表的列一致，用于流式导出）"""
+    id: str
+    user_id: str
+    injection_time: datetime
+    insulin_record_id: Optional[str] = None
+    actual_dose: float
+    notes: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
 # 运动记录相关
 class ExerciseRecordCreate(BaseModel):
     """创建运动记录"""
@@ -183,6 +196,10 @@ class MealHistoryItem(BaseModel):
     fat: Optional[float] = None
     fiber: Optional[float] = None
     calories: Optional[float] = None
+    gi_value: Optional[float] = None
+    gl_value: Optional[float] = None
+    image_url: Optional[str] = None
+    recognition_result: Optional[Any] = None
     
     class Config:
         from_attributes = True
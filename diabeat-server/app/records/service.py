@@ -1,7 +1,9 @@
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime, timedelta
 from app.records import schemas, crud
 from app.user import crud as user_crud
+from app.insulin.on_board import on_board_tracker
+from app.records.activity import activity_tracker
 from app.database import database
 import logging
 
@@ -24,19 +26,21 @@ class RecordService:
             notes=request.notes
         )
         
+        try:
+            await on_board_tracker.record_meal(
+                user_id, record_id, request.meal_time, request.nutrition_record_id
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 更新活性碳水失败: {str(e)}")
+        try:
+            await activity_tracker.record_meal(user_id, request.meal_time)
+        except Exception as e:
+            logger.warning(f"⚠️ 更新活动快照失败: {str(e)}")
+        
         # 获取创建的记录
         records = await crud.get_recent_meal_records(user_id, limit=1)
         if records:
-            record = records[0]
-            return schemas.MealRecordResponse(
-                id=str(record["id"]),
-                user_id=str(record["user_id"]),
-                meal_time=record["meal_time"],
-                food_recognition_id=str(record.get("food_recognition_id")) if record.get("food_recognition_id") else None,
-                nutrition_record_id=str(record.get("nutrition_record_id")) if record.get("nutrition_record_id") else None,
-                notes=record.get("notes"),
-                created_at=record["created_at"]
-            )
+            return schemas.MealRecordResponse(**records[0])
         raise Exception("Failed to create meal record")
     
     async def create_insulin_record(
@@ -53,6 +57,18 @@ class RecordService:
             notes=request.notes
         )
         
+        try:
+            await on_board_tracker.record_insulin(
+                user_id, record_id, request.injection_time, request.actual_dose,
+                ref=request.insulin_record_id
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 更新活性胰岛素失败: {str(e)}")
+        try:
+            await activity_tracker.record_insulin(user_id, request.injection_time)
+        except Exception as e:
+            logger.warning(f"⚠️ 更新活动快照失败: {str(e)}")
+        
         # 获取创建的记录
         records = await crud.get_recent_insulin_records(user_id, limit=1)
         if records:
@@ -70,20 +86,26 @@ class RecordService:
     
     async def predict_next_insulin_time(
         self,
-        user_id: str
+        user_id: str,
+        user_params: Optional[Dict[str, Any]] = None
     ) -> schemas.NextInsulinPredictionResponse:
-        """预测下次胰岛素注射时间"""
+        """预测下次胰岛素注射时间
+        
+        Args:
+            user_id: 用户ID
+            user_params: 已加载的用户参数（可选，未提供时读取）
+        """
         # 获取用户参数
-        user_params = await user_crud.get_user_parameters(user_id)
+        if user_params is None:
+            user_params = await user_crud.get_user_parameters(user_id)
         if not user_params:
             raise ValueError("用户参数未设置")
         
-        # 获取最近的用餐和注射记录
-        last_meal_time = await crud.get_last_meal_time(user_id)
-        last_insulin_time = await crud.get_last_insulin_time(user_id)
-        
-        # 分析用餐模式
-        meal_pattern = await crud.get_user_meal_pattern(user_id, days=7)
+        # 最近的用餐和注射时间、用餐模式（活动快照，一次读取）
+        activity = await activity_tracker.get_snapshot(user_id)
+        last_meal_time = activity["last_meal_time"]
+        last_insulin_time = activity["last_insulin_time"]
+        meal_pattern = activity["meal_pattern"]
         
         if not last_meal_time:
             # 如果没有用餐记录，基于常规用餐时间预测
@@ -213,20 +235,7 @@ class RecordService:
         summary = await crud.get_today_exercise_summary(user_id, datetime.utcnow())
         
         # 转换为响应模型
-        exercises = [
-            schemas.ExerciseRecordResponse(
-                id=str(r["id"]),
-                user_id=str(r["user_id"]),
-                exercise_time=r["exercise_time"],
-                exercise_type=r["exercise_type"],
-                duration_minutes=r["duration_minutes"],
-                intensity=r["intensity"],
-                calories_burned=float(r["calories_burned"]),
-                notes=r.get("notes"),
-                created_at=r["created_at"]
-            )
-            for r in summary["exercises"]
-        ]
+        exercises = [schemas.ExerciseRecordResponse(**r) for r in summary["exercises"]]
         
         return schemas.TodayExerciseSummary(
             total_calories=summary["total_calories"],
@@ -240,30 +249,19 @@ class RecordService:
         user_id: str,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
-        limit: int = 50
+        limit: int = 50,
+        cursor: Optional[Tuple[datetime, str]] = None
     ) -> List[schemas.ExerciseRecordResponse]:
         """获取运动记录列表"""
         records = await crud.get_exercise_records(
             user_id=user_id,
             start_date=start_date,
             end_date=end_date,
-            limit=limit
+            limit=limit,
+            cursor=cursor
         )
         
-        return [
-            schemas.ExerciseRecordResponse(
-                id=str(r["id"]),
-                user_id=str(r["user_id"]),
-                exercise_time=r["exercise_time"],
-                exercise_type=r["exercise_type"],
-                duration_minutes=r["duration_minutes"],
-                intensity=r["intensity"],
-                calories_burned=float(r["calories_burned"]),
-                notes=r.get("notes"),
-                created_at=r["created_at"]
-            )
-            for r in records
-        ]
+        return [schemas.ExerciseRecordResponse(**r) for r in records]
     
     # ==================== 水分记录相关 ====================
     
@@ -305,18 +303,7 @@ class RecordService:
         summary = await crud.get_today_water_summary(user_id, datetime.utcnow())
         
         # 转换为响应模型
-        records = [
-            schemas.WaterRecordResponse(
-                id=str(r["id"]),
-                user_id=str(r["user_id"]),
-                record_time=r["record_time"],
-                amount_ml=r["amount_ml"],
-                water_type=r["water_type"],
-                notes=r.get("notes"),
-                created_at=r["created_at"]
-            )
-            for r in summary["records"]
-        ]
+        records = [schemas.WaterRecordResponse(**r) for r in summary["records"]]
         
         return schemas.TodayWaterSummary(
             total_ml=summary["total_ml"],
@@ -330,28 +317,19 @@ class RecordService:
         user_id: str,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
-        limit: int = 50
+        limit: int = 50,
+        cursor: Optional[Tuple[datetime, str]] = None
     ) -> List[schemas.WaterRecordResponse]:
         """获取水分记录列表"""
         records = await crud.get_water_records(
             user_id=user_id,
             start_date=start_date,
             end_date=end_date,
-            limit=limit
+            limit=limit,
+            cursor=cursor
         )
         
-        return [
-            schemas.WaterRecordResponse(
-                id=str(r["id"]),
-                user_id=str(r["user_id"]),
-                record_time=r["record_time"],
-                amount_ml=r["amount_ml"],
-                water_type=r["water_type"],
-                notes=r.get("notes"),
-                created_at=r["created_at"]
-            )
-            for r in records
-        ]
+        return [schemas.WaterRecordResponse(**r) for r in records]
 
     # ==================== 用药记录相关 ====================
     
@@ -371,6 +349,11 @@ class RecordService:
             notes=request.notes
         )
         
+        try:
+            await activity_tracker.record_medication(user_id, request.medication_time, request.medication_type)
+        except Exception as e:
+            logger.warning(f"⚠️ 更新活动快照失败: {str(e)}")
+        
         # 查询完整记录信息返回
         query = """
             SELECT * FROM medication_records WHERE id = :id
@@ -397,20 +380,7 @@ class RecordService:
         summary = await crud.get_today_medication_summary(user_id, datetime.utcnow())
         
         # 转换为响应模型
-        medications = [
-            schemas.MedicationRecordResponse(
-                id=str(r["id"]),
-                user_id=str(r["user_id"]),
-                medication_time=r["medication_time"],
-                medication_type=r["medication_type"],
-                medication_name=r["medication_name"],
-                dosage=float(r["dosage"]),
-                dosage_unit=r["dosage_unit"],
-                notes=r.get("notes"),
-                created_at=r["created_at"]
-            )
-            for r in summary["medications"]
-        ]
+        medications = [schemas.MedicationRecordResponse(**r) for r in summary["medications"]]
         
         return schemas.TodayMedicationSummary(
             total_count=summary["total_count"],
@@ -424,27 +394,16 @@ class RecordService:
         user_id: str,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
-        limit: int = 50
+        limit: int = 50,
+        cursor: Optional[Tuple[datetime, str]] = None
     ) -> List[schemas.MedicationRecordResponse]:
         """获取用药记录列表"""
         records = await crud.get_medication_records(
             user_id=user_id,
             start_date=start_date,
             end_date=end_date,
-            limit=limit
+            limit=limit,
+            cursor=cursor
         )
         
-        return [
-            schemas.MedicationRecordResponse(
-                id=str(r["id"]),
-                user_id=str(r["user_id"]),
-                medication_time=r["medication_time"],
-                medication_type=r["medication_type"],
-                medication_name=r["medication_name"],
-                dosage=float(r["dosage"]),
-                dosage_unit=r["dosage_unit"],
-                notes=r.get("notes"),
-                created_at=r["created_at"]
-            )
-            for r in records
-        ]
+        return [schemas.MedicationRecordResponse(**r) for r in records]
@@ -1,7 +1,6 @@
 """智能提醒服务"""
-from typing import Optional
 from datetime import datetime, timedelta
-from app.database import database
+from app.records.activity import activity_tracker
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,12 +27,11 @@ class SmartReminderService:
     async def get_smart_reminders(self, user_id: str) -> dict:
         """获取智能提醒"""
         try:
-            # 1. 获取最后一餐时间
-            last_meal_time = await self._get_last_meal_time(user_id)
-            
-            # 2. 获取最后用药时间
-            last_medication_time = await self._get_last_medication_time(user_id)
-            last_medication_type = await self._get_last_medication_type(user_id)
+            # 1. 获取最后一餐时间、最后用药时间和类型（活动快照，一次读取）
+            activity = await activity_tracker.get_snapshot(user_id)
+            last_meal_time = activity["last_meal_time"]
+            last_medication_time = activity["last_medication_time"]
+            last_medication_type = activity["last_medication_type"]
             
             # 3. 预测下次用餐时间
             next_meal_time = None
@@ -123,42 +121,6 @@ class SmartReminderService:
                 "should_take_medication_soon": False,
                 "reasoning": "数据不足，无法生成提醒"
             }
-    
-    async def _get_last_meal_time(self, user_id: str) -> Optional[datetime]:
-        """获取最后一餐时间"""
-        query = """
-            SELECT meal_time
-            FROM meal_records
-            WHERE user_id = :user_id
-            ORDER BY meal_time DESC
-            LIMIT 1
-        """
-        result = await database.fetch_one(query=query, values={"user_id": user_id})
-        return result["meal_time"] if result else None
-    
-    async def _get_last_medication_time(self, user_id: str) -> Optional[datetime]:
-        """获取最后用药时间"""
-        query = """
-            SELECT medication_time
-            FROM medication_records
-            WHERE user_id = :user_id
-            ORDER BY medication_time DESC
-            LIMIT 1
-        """
-        result = await database.fetch_one(query=query, values={"user_id": user_id})
-        return result["medication_time"] if result else None
-    
-    async def _get_last_medication_type(self, user_id: str) -> Optional[str]:
-        """获取最后用药类型"""
-        query = """
-            SELECT medication_type
-            FROM medication_records
-            WHERE user_id = :user_id
-            ORDER BY medication_time DESC
-            LIMIT 1
-        """
-        result = await database.fetch_one(query=query, values={"user_id": user_id})
-        return result["medication_type"] if result else None
 
 
 # 单例服务
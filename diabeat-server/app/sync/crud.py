@@ -0,0 +1,177 @@
+"""增量同步的数据访问
+
+每张可同步的表都有 sync_txid / sync_version / updated_at 三列（见
+sql/migrations/add_sync_versions.sql），由触发器在写入时维护。
+拉取变更时按 (sync_txid, sync_version) 顺序读取，并只返回 sync_txid 低于
+当前快照 xmin 的行：这些事务都已结束，之后不会再出现更小的版本号，
+游标可以安全前移。
+"""
+from typing import Any, Dict, List, Sequence, Tuple
+from app.records import queries
+
+# 同步位置：(sync_txid, sync_version)
+SyncPosition = Tuple[int, int]
+
+SYNC_HORIZON = queries.register("sync_horizon", """
+    SELECT txid_snapshot_xmin(txid_current_snapshot())
+""")
+
+
+class SyncTable:
+    """一张可同步的表"""
+
+    def __init__(self, key: str, table: str, select_columns: str, write_columns: Sequence[str] = ()):
+        self.key = key
+        self.table = table
+        self.write_columns = list(write_columns)
+        self.changes = queries.register(f"sync_{key}", f"""
+            SELECT
+                id::text AS id,
+                {select_columns},
+                created_at,
+                updated_at,
+                sync_txid,
+                sync_version
+            FROM {table}
+            WHERE user_id = $1
+              AND sync_txid < $2
+              AND (sync_txid, sync_version) > ($3, $4)
+            ORDER BY sync_txid, sync_version
+            LIMIT $5
+        """)
+        self.upsert = None
+        self.owned = None
+        if self.write_columns:
+            self._register_writes()
+
+    def _register_writes(self):
+        """登记幂等写入语句
+
+        以客户端生成的 id 作为冲突键：首次上传插入，重复上传同样内容时
+        IS DISTINCT FROM 条件不成立，不产生更新也不推进版本号；
+        id 已属于其他用户时不做任何修改。
+        """
+        columns = ["id", "user_id"] + self.write_columns + ["created_at"]
+        placeholders = [f"${i}" for i in range(1, len(columns))]
+        placeholders.append(f"COALESCE(${len(columns)}, CURRENT_TIMESTAMP)")
+        assignments = ", ".join(f"{c} = EXCLUDED.{c}" for c in self.write_columns)
+        current = ", ".join(f"t.{c}" for c in self.write_columns)
+        incoming = ", ".join(f"EXCLUDED.{c}" for c in self.write_columns)
+        self.upsert = queries.register(f"sync_upsert_{self.key}", f"""
+            INSERT INTO {self.table} AS t ({", ".join(columns)})
+            VALUES ({", ".join(placeholders)})
+            ON CONFLICT (id) DO UPDATE SET {assignments}
+            WHERE t.user_id = EXCLUDED.user_id
+              AND ({current}) IS DISTINCT FROM ({incoming})
+        """)
+        self.owned = queries.register(f"sync_owned_{self.key}", f"""
+            SELECT id::text FROM {self.table}
+            WHERE id = ANY($1::uuid[]) AND user_id = $2
+        """)
+
+
+MEALS = SyncTable(
+    "meals",
+    "meal_records",
+    """
+    meal_time,
+    food_recognition_id::text AS food_recognition_id,
+    nutrition_record_id::text AS nutrition_record_id,
+    notes
+    """,
+    ["meal_time", "food_recognition_id", "nutrition_record_id", "notes"]
+)
+
+INSULIN = SyncTable(
+    "insulin",
+    "insulin_injection_records",
+    """
+    injection_time,
+    actual_dose::float8 AS actual_dose,
+    insulin_record_id::text AS insulin_record_id,
+    notes
+    """,
+    ["injection_time", "actual_dose", "insulin_record_id", "notes"]
+)
+
+EXERCISES = SyncTable(
+    "exercises",
+    "exercise_records",
+    """
+    exercise_time,
+    exercise_type,
+    duration_minutes,
+    intensity,
+    calories_burned::float8 AS calories_burned,
+    notes
+    """,
+    ["exercise_time", "exercise_type", "duration_minutes", "intensity", "calories_burned", "notes"]
+)
+
+WATER = SyncTable(
+    "water",
+    "water_records",
+    """
+    record_time,
+    amount_ml,
+    water_type,
+    notes
+    """,
+    ["record_time", "amount_ml", "water_type", "notes"]
+)
+
+MEDICATIONS = SyncTable(
+    "medications",
+    "medication_records",
+    """
+    medication_time,
+    medication_type,
+    medication_name,
+    dosage::float8 AS dosage,
+    dosage_unit,
+    notes
+    """,
+    ["medication_time", "medication_type", "medication_name", "dosage", "dosage_unit", "notes"]
+)
+
+PREDICTIONS = SyncTable(
+    "predictions",
+    "bg_predictions",
+    """
+    insulin_record_id::text AS insulin_record_id,
+    nutrition_record_id::text AS nutrition_record_id,
+    prediction_data
+    """
+)
+
+# 下发顺序
+SYNC_TABLES: Dict[str, SyncTable] = {
+    t.key: t for t in (MEALS, INSULIN, EXERCISES, WATER, MEDICATIONS, PREDICTIONS)
+}
+
+
+async def get_sync_horizon() -> int:
+    """当前快照中最早的未结束事务ID，低于它的事务都已提交或回滚"""
+    return await queries.fetchval(SYNC_HORIZON)
+
+
+async def get_changes(
+    table: SyncTable,
+    user_id: str,
+    horizon: int,
+    position: SyncPosition,
+    limit: int
+) -> List[Any]:
+    """获取某张表在同步位置之后的变更"""
+    return await queries.fetch(table.changes, user_id, horizon, position[0], position[1], limit)
+
+
+async def upsert_rows(table: SyncTable, rows: List[Sequence[Any]]) -> None:
+    """批量幂等写入（参数顺序：id, user_id, 写入列..., created_at）"""
+    await queries.executemany(table.upsert, rows)
+
+
+async def get_owned_ids(table: SyncTable, user_id: str, ids: List[Any]) -> List[str]:
+    """返回属于该用户的记录ID"""
+    rows = await queries.fetch(table.owned, ids, user_id)
+    return [row[0] for row in rows]
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.sync import schemas
+from app.sync.service import SyncService
+from app.user.router import get_current_user_dependency
+from app.user.schemas import UserResponse
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="",
+    tags=["sync"]
+)
+
+def get_sync_service() -> SyncService:
+    """获取同步服务实例"""
+    return SyncService()
+
+@router.post(
+    "",
+    response_model=schemas.SyncResponse,
+    summary="增量同步",
+    description="上传离线创建的记录并获取上次同步以来的服务端变更；has_more 为 true 时应携带新令牌立即再次同步"
+)
+async def sync(
+    request: schemas.SyncRequest,
+    sync_service: SyncService = Depends(get_sync_service),
+    current_user: UserResponse = Depends(get_current_user_dependency),
+):
+    """增量同步"""
+    try:
+        return await sync_service.sync(request, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Sync error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"同步失败: {str(e)}"
+        )
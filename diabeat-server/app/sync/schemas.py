@@ -0,0 +1,100 @@
+"""增量同步相关的数据模型"""
+from pydantic import BaseModel, Field
+from typing import Optional, List, Any, Dict
+from datetime import datetime
+from uuid import UUID
+
+# 同步记录项：客户端离线创建时自行生成 UUID 作为 id，重复上传同一 id 是幂等的
+class SyncMealRecord(BaseModel):
+    """用餐记录（同步）"""
+    id: UUID = Field(..., description="记录ID（客户端生成的UUID）")
+    meal_time: datetime = Field(..., description="用餐时间")
+    food_recognition_id: Optional[UUID] = Field(None, description="食物识别记录ID")
+    nutrition_record_id: Optional[UUID] = Field(None, description="营养记录ID")
+    notes: Optional[str] = Field(None, description="备注")
+    created_at: Optional[datetime] = Field(None, description="创建时间")
+    updated_at: Optional[datetime] = Field(None, description="服务端最近修改时间（仅下发）")
+
+class SyncInsulinRecord(BaseModel):
+    """胰岛素注射记录（同步）"""
+    id: UUID = Field(..., description="记录ID（客户端生成的UUID）")
+    injection_time: datetime = Field(..., description="注射时间")
+    actual_dose: float = Field(..., ge=0, description="实际注射剂量（单位）")
+    insulin_record_id: Optional[UUID] = Field(None, description="胰岛素计算记录ID")
+    notes: Optional[str] = Field(None, description="备注")
+    created_at: Optional[datetime] = Field(None, description="创建时间")
+    updated_at: Optional[datetime] = Field(None, description="服务端最近修改时间（仅下发）")
+
+class SyncExerciseRecord(BaseModel):
+    """运动记录（同步）"""
+    id: UUID = Field(..., description="记录ID（客户端生成的UUID）")
+    exercise_time: datetime = Field(..., description="运动时间")
+    exercise_type: str = Field(..., description="运动类型")
+    duration_minutes: int = Field(..., gt=0, description="运动时长（分钟）")
+    intensity: str = Field(default="moderate", description="运动强度 (light/moderate/vigorous)")
+    calories_burned: Optional[float] = Field(None, description="消耗热量（可选，服务端自动估算）")
+    notes: Optional[str] = Field(None, description="备注")
+    created_at: Optional[datetime] = Field(None, description="创建时间")
+    updated_at: Optional[datetime] = Field(None, description="服务端最近修改时间（仅下发）")
+
+class SyncWaterRecord(BaseModel):
+    """水分记录（同步）"""
+    id: UUID = Field(..., description="记录ID（客户端生成的UUID）")
+    record_time: datetime = Field(..., description="记录时间")
+    amount_ml: int = Field(..., gt=0, le=2000, description="摄入量（毫升）")
+    water_type: str = Field(default="water", description="类型 (water/tea/coffee/juice/other)")
+    notes: Optional[str] = Field(None, description="备注")
+    created_at: Optional[datetime] = Field(None, description="创建时间")
+    updated_at: Optional[datetime] = Field(None, description="服务端最近修改时间（仅下发）")
+
+class SyncMedicationRecord(BaseModel):
+    """用药记录（同步）"""
+    id: UUID = Field(..., description="记录ID（客户端生成的UUID）")
+    medication_time: datetime = Field(..., description="用药时间")
+    medication_type: str = Field(..., description="药物类型 (insulin/oral_medication/other)")
+    medication_name: str = Field(..., description="药物名称")
+    dosage: float = Field(..., description="剂量")
+    dosage_unit: str = Field(..., description="剂量单位 (units/mg/ml/tablets)")
+    notes: Optional[str] = Field(None, description="备注")
+    created_at: Optional[datetime] = Field(None, description="创建时间")
+    updated_at: Optional[datetime] = Field(None, description="服务端最近修改时间（仅下发）")
+
+class SyncPrediction(BaseModel):
+    """血糖预测记录（只下发）"""
+    id: UUID
+    insulin_record_id: Optional[UUID] = None
+    nutrition_record_id: Optional[UUID] = None
+    prediction_data: Any = Field(..., description="预测数据")
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class SyncChanges(BaseModel):
+    """客户端上传的离线变更"""
+    meals: List[SyncMealRecord] = Field(default_factory=list)
+    insulin: List[SyncInsulinRecord] = Field(default_factory=list)
+    exercises: List[SyncExerciseRecord] = Field(default_factory=list)
+    water: List[SyncWaterRecord] = Field(default_factory=list)
+    medications: List[SyncMedicationRecord] = Field(default_factory=list)
+
+class SyncRequest(BaseModel):
+    """增量同步请求"""
+    sync_token: Optional[str] = Field(None, description="上次同步返回的令牌，首次同步留空")
+    limit: int = Field(500, ge=1, le=2000, description="每种记录类型最多返回的变更数")
+    changes: SyncChanges = Field(default_factory=SyncChanges, description="离线创建/修改的记录")
+
+class SyncUploadResult(BaseModel):
+    """上传结果"""
+    accepted: List[str] = Field(default_factory=list, description="已写入（或此前已写入）的记录ID")
+    rejected: List[str] = Field(default_factory=list, description="被拒绝的记录ID（属于其他用户或引用无效）")
+
+class SyncResponse(BaseModel):
+    """增量同步响应"""
+    sync_token: str = Field(..., description="下次同步时携带的令牌")
+    has_more: bool = Field(..., description="是否还有未下发的变更（需立即再次同步）")
+    meals: List[SyncMealRecord] = Field(default_factory=list)
+    insulin: List[SyncInsulinRecord] = Field(default_factory=list)
+    exercises: List[SyncExerciseRecord] = Field(default_factory=list)
+    water: List[SyncWaterRecord] = Field(default_factory=list)
+    medications: List[SyncMedicationRecord] = Field(default_factory=list)
+    predictions: List[SyncPrediction] = Field(default_factory=list)
+    uploads: Dict[str, SyncUploadResult] = Field(default_factory=dict, description="按记录类型的上传结果")
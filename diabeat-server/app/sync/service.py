@@ -0,0 +1,225 @@
+import base64
+import json
+from typing import Any, Callable, Dict, List, Sequence
+from pydantic import BaseModel
+from app.sync import schemas, crud
+from app.records.crud import _normalize_datetime, _estimate_calories_burned, forget_nutrition_intake
+from app.database import database
+from app.insulin.on_board import on_board_tracker
+from app.records.activity import activity_tracker
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _optional_datetime(value):
+    return _normalize_datetime(value) if value is not None else None
+
+
+def _meal_args(item: schemas.SyncMealRecord) -> List[Any]:
+    return [
+        _normalize_datetime(item.meal_time),
+        item.food_recognition_id,
+        item.nutrition_record_id,
+        item.notes
+    ]
+
+
+def _insulin_args(item: schemas.SyncInsulinRecord) -> List[Any]:
+    return [
+        _normalize_datetime(item.injection_time),
+        item.actual_dose,
+        item.insulin_record_id,
+        item.notes
+    ]
+
+
+def _exercise_args(item: schemas.SyncExerciseRecord) -> List[Any]:
+    calories_burned = item.calories_burned
+    if calories_burned is None:
+        calories_burned = _estimate_calories_burned(
+            item.exercise_type, item.duration_minutes, item.intensity
+        )
+    return [
+        _normalize_datetime(item.exercise_time),
+        item.exercise_type,
+        item.duration_minutes,
+        item.intensity,
+        calories_burned,
+        item.notes
+    ]
+
+
+def _water_args(item: schemas.SyncWaterRecord) -> List[Any]:
+    return [
+        _normalize_datetime(item.record_time),
+        item.amount_ml,
+        item.water_type,
+        item.notes
+    ]
+
+
+def _medication_args(item: schemas.SyncMedicationRecord) -> List[Any]:
+    return [
+        _normalize_datetime(item.medication_time),
+        item.medication_type,
+        item.medication_name,
+        item.dosage,
+        item.dosage_unit,
+        item.notes
+    ]
+
+
+# 记录类型 -> (同步表, 写入参数构造函数)
+UPLOADS: Dict[str, tuple] = {
+    "meals": (crud.MEALS, _meal_args),
+    "insulin": (crud.INSULIN, _insulin_args),
+    "exercises": (crud.EXERCISES, _exercise_args),
+    "water": (crud.WATER, _water_args),
+    "medications": (crud.MEDICATIONS, _medication_args),
+}
+
+# 记录类型 -> 下发模型
+DOWNLOADS: Dict[str, type] = {
+    "meals": schemas.SyncMealRecord,
+    "insulin": schemas.SyncInsulinRecord,
+    "exercises": schemas.SyncExerciseRecord,
+    "water": schemas.SyncWaterRecord,
+    "medications": schemas.SyncMedicationRecord,
+    "predictions": schemas.SyncPrediction,
+}
+
+
+def encode_sync_token(positions: Dict[str, crud.SyncPosition]) -> str:
+    """将各表的同步位置编码为不透明令牌"""
+    payload = json.dumps(
+        {key: [txid, version] for key, (txid, version) in positions.items()},
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_sync_token(token: str) -> Dict[str, crud.SyncPosition]:
+    """解析同步令牌，缺失的表从头同步
+
+    Raises:
+        ValueError: 令牌格式无效
+    """
+    positions = {key: (0, 0) for key in crud.SYNC_TABLES}
+    if not token:
+        return positions
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        for key, (txid, version) in payload.items():
+            if key in positions:
+                positions[key] = (int(txid), int(version))
+    except Exception:
+        raise ValueError("同步令牌无效")
+    return positions
+
+
+class SyncService:
+    """增量同步服务"""
+
+    async def sync(self, request: schemas.SyncRequest, user_id: str) -> schemas.SyncResponse:
+        """先写入客户端上传的变更，再下发令牌之后的服务端变更
+
+        客户端自己上传的记录也会出现在下发结果中（带服务端 updated_at），
+        客户端按 id 覆盖本地即可。
+        """
+        positions = decode_sync_token(request.sync_token)
+
+        uploads = {}
+        for key, (table, build_args) in UPLOADS.items():
+            items = getattr(request.changes, key)
+            if items:
+                uploads[key] = await self._apply_uploads(table, build_args, items, user_id)
+
+        # 之后的营养摄入读取不再加入上传前开始的查询
+        if "meals" in uploads:
+            forget_nutrition_intake(user_id)
+        if uploads:
+            # 离线记录可能早于缓冲区中的事件、修改已有记录的时间，直接丢弃缓冲区和活动快照，下次读取时回填
+            try:
+                await on_board_tracker.invalidate(user_id)
+            except Exception as e:
+                logger.warning(f"⚠️ 重置活性胰岛素缓冲区失败: {str(e)}")
+            try:
+                await activity_tracker.invalidate(user_id)
+            except Exception as e:
+                logger.warning(f"⚠️ 重置活动快照失败: {str(e)}")
+
+        horizon = await crud.get_sync_horizon()
+        has_more = False
+        result: Dict[str, Any] = {}
+        for key, table in crud.SYNC_TABLES.items():
+            rows = await crud.get_changes(table, user_id, horizon, positions[key], request.limit)
+            model = DOWNLOADS[key]
+            result[key] = [model(**self._row_fields(row)) for row in rows]
+            if len(rows) >= request.limit:
+                has_more = True
+                positions[key] = (rows[-1]["sync_txid"], rows[-1]["sync_version"])
+            else:
+                # 已追平：之后的新变更的 sync_txid 都不会小于当前水位
+                positions[key] = (horizon, 0)
+
+        logger.info(
+            f"🔄 同步完成: user={user_id}, "
+            + ", ".join(f"{key}={len(items)}" for key, items in result.items())
+            + f", has_more={has_more}"
+        )
+        return schemas.SyncResponse(
+            sync_token=encode_sync_token(positions),
+            has_more=has_more,
+            uploads=uploads,
+            **result
+        )
+
+    async def _apply_uploads(
+        self,
+        table: crud.SyncTable,
+        build_args: Callable[[BaseModel], List[Any]],
+        items: Sequence[BaseModel],
+        user_id: str
+    ) -> schemas.SyncUploadResult:
+        """批量幂等写入一种记录
+
+        正常情况下整批一次写入；若有记录违反约束（如引用了不存在的营养记录），
+        整批回滚后逐条在保存点中重试，只拒绝出错的记录。
+        """
+        rows = [
+            [item.id, user_id] + build_args(item) + [_optional_datetime(item.created_at)]
+            for item in items
+        ]
+        failed = set()
+        try:
+            async with database.transaction():
+                await crud.upsert_rows(table, rows)
+        except Exception as e:
+            logger.warning(f"⚠️ 批量同步写入失败，逐条重试: table={table.table}, error={str(e)}")
+            async with database.transaction():
+                for row in rows:
+                    try:
+                        async with database.transaction():
+                            await crud.upsert_rows(table, [row])
+                    except Exception as row_error:
+                        logger.warning(f"⚠️ 同步记录被拒绝: id={row[0]}, error={str(row_error)}")
+                        failed.add(str(row[0]))
+
+        # id 属于其他用户时 upsert 不做修改，这里据此区分接受与拒绝
+        candidates = [item.id for item in items if str(item.id) not in failed]
+        owned = set(await crud.get_owned_ids(table, user_id, candidates)) if candidates else set()
+        accepted = [str(item.id) for item in items if str(item.id) in owned]
+        rejected = [str(item.id) for item in items if str(item.id) not in owned]
+        return schemas.SyncUploadResult(accepted=accepted, rejected=rejected)
+
+    @staticmethod
+    def _row_fields(row) -> Dict[str, Any]:
+        fields = dict(row)
+        fields.pop("sync_txid", None)
+        fields.pop("sync_version", None)
+        prediction_data = fields.get("prediction_data")
+        if isinstance(prediction_data, str):
+            fields["prediction_data"] = json.loads(prediction_data)
+        return fields
@@ -1,6 +1,8 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from databases import Database
 from app.database import database
+from app.utils.cache import query_cache, user_tag
+from app.utils.single_flight import SingleFlight
 from uuid import uuid4
 from datetime import datetime
 from decimal import Decimal
@@ -8,6 +10,12 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# 并发加载同一用户的信息和参数（识别食物、每日推荐）合并为一次查询
+_context_flight = SingleFlight("user_context")
+
+# 用户参数缓存时间（秒）；参数变更时按标签失效
+USER_PARAMS_CACHE_TTL = 3600
+
 async def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     """根据用户ID获取用户"""
     try:
@@ -78,17 +86,29 @@ async def create_user_with_device_id(
         raise
 
 async def get_user_parameters(user_id: str) -> Optional[Dict[str, Any]]:
-    """获取用户参数"""
-    try:
+    """获取用户参数（经查询缓存，创建 / 更新参数时失效）"""
+    async def load():
         query = "SELECT * FROM user_parameters WHERE user_id = :user_id"
         result = await database.fetch_one(query=query, values={"user_id": user_id})
         if result:
             return dict(result)
         return None
+    try:
+        return await query_cache.get_or_load(
+            "user_params", user_id, load, ttl=USER_PARAMS_CACHE_TTL, tags=[user_tag(user_id, "params")]
+        )
     except Exception as e:
         logger.error(f"Error in get_user_parameters for user_id {user_id}: {e}")
         raise
 
+async def load_user_context(user_id: str) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """获取用户信息和用户参数（用户不存在时信息为空字典），并发的相同请求只查询一次"""
+    async def load():
+        user_info = await get_user_by_id(user_id) or {}
+        user_params = await get_user_parameters(user_id)
+        return user_info, user_params
+    return await _context_flight.do(user_id, load)
+
 async def create_user_parameters(user_id: str, params: Dict[str, Any]) -> str:
     """创建用户参数"""
     try:
@@ -116,6 +136,8 @@ async def create_user_parameters(user_id: str, params: Dict[str, Any]) -> str:
             "updated_at": datetime.utcnow()
         }
         result = await database.fetch_one(query=query, values=values)
+        _context_flight.forget(user_id)
+        await query_cache.invalidate(user_tag(user_id, "params"))
         return str(result["id"])
     except Exception as e:
         logger.error(f"Error in create_user_parameters for user_id {user_id} with params {params}: {e}")
@@ -126,24 +148,31 @@ async def update_user_parameters(user_id: str, params: Dict[str, Any]) -> bool:
     try:
         # 构建更新字段
         update_fields = []
+        changed_conditions = []
         values = {"user_id": user_id, "updated_at": datetime.utcnow()}
         
         for key in ["insulin_type", "isf", "icr", "target_bg_low", "target_bg_high", 
                     "max_insulin_dose", "min_insulin_dose"]:
             if key in params:
                 update_fields.append(f"{key} = :{key}")
+                changed_conditions.append(f"{key} IS DISTINCT FROM :{key}")
                 values[key] = params[key]
         
         if not update_fields:
             return False
         
         update_fields.append("updated_at = :updated_at")
+        # 资料版本递增，按版本缓存的每日营养方案随之失效；值都没有变化时不更新，版本保持不变
+        update_fields.append("profile_version = profile_version + 1")
         query = f"""
             UPDATE user_parameters 
             SET {', '.join(update_fields)}
             WHERE user_id = :user_id
+              AND ({' OR '.join(changed_conditions)})
         """
         await database.execute(query=query, values=values)
+        _context_flight.forget(user_id)
+        await query_cache.invalidate(user_tag(user_id, "params"))
         return True
     except Exception as e:
         logger.error(f"Error in update_user_parameters for user_id {user_id} with params {params}: {e}")
@@ -184,11 +213,17 @@ async def update_user_info(
     if not update_fields:
         return
     
+    changed_conditions = [f"{key} IS DISTINCT FROM :{key}" for key in values if key != "user_id"]
+    # 资料版本递增，按版本缓存的每日营养方案随之失效；值都没有变化时不更新，
+    # 版本保持不变（引导流程重复提交相同资料时可命中缓存）
+    update_fields.append("profile_version = profile_version + 1")
     query = f"""
         UPDATE users 
         SET {', '.join(update_fields)}
         WHERE id = :user_id
+          AND ({' OR '.join(changed_conditions)})
     """
     
     await database.execute(query=query, values=values)
+    _context_flight.forget(user_id)
 
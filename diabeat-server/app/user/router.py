@@ -90,22 +90,13 @@ async def complete_onboarding(
             diabetes_type=diabetes_type or current_user.diabetes_type
         )
         
-        # 使用AI计算每日营养建议
+        # 使用AI计算每日营养建议（按资料版本缓存，重复提交相同资料不会再次调用大模型）
         from app.nutrition.daily_recommendation import DailyNutritionRecommendation
         
-        user_info = {
-            "gender": gender,
-            "age": age,
-            "height": height,
-            "weight": weight,
-            "diabetes_type": diabetes_type or current_user.diabetes_type,
-            "activity_level": "moderate"  # 默认中等活动量
-        }
-        
         daily_rec = DailyNutritionRecommendation()
         
         # 优先使用AI生成，失败则使用传统计算
-        recommendation = daily_rec.calculate_daily_recommendation_with_ai(user_info)
+        recommendation = await daily_rec.get_user_ai_recommendation(current_user.id)
         
         logger.info(f"✅ 引导完成: user={current_user.id}, 每日热量={recommendation.get('daily_calories')}kcal")
         
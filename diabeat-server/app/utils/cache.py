@@ -0,0 +1,349 @@
+"""查询结果缓存（进程内 LRU + Redis 两级）
+
+    rows = await query_cache.get_or_load(
+        "user_params", user_id, load, ttl=600, tags=[user_tag(user_id, "params")]
+    )
+    ...
+    await query_cache.invalidate(user_tag(user_id, "params"))  # 写入后
+
+- 序列化：JSON，datetime / date / Decimal / UUID 带类型标记，读出后类型不变
+  （数据库记录按字典保存）
+- 两级缓存：先查进程内 LRU，再查 Redis，都未命中时执行 loader 并回填两级
+- 标签失效：每个标签在 Redis 中有一个版本号，缓存项记录写入时各标签的版本，
+  读取时版本不一致即视为失效；invalidate 递增版本号并通过 Redis 频道通知
+  各 worker 丢弃本地副本。loader 执行前先读取版本，执行期间发生的失效不会被
+  写入的旧结果覆盖
+- 本地 LRU 只在订阅 Redis 失效频道正常时使用（否则收不到其他 worker 的失效
+  通知），Redis 不可用时直接执行 loader
+- 防击穿：同一进程内并发的相同键只执行一次 loader（app.utils.single_flight）；
+  临近过期时按 XFetch 算法概率性提前刷新，热点键不会在同一时刻集体过期
+- 命中率指标：diabeat_query_cache_requests_total{cache, result}，result 为
+  local_hit / redis_hit / miss；diabeat_cache_hit_ratio 汇总所有缓存
+
+返回值是独立副本，调用方可以修改。
+"""
+import asyncio
+import copy
+import json
+import math
+import random
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Sequence, Tuple
+from uuid import UUID
+import logging
+
+from app.config import settings
+from app.database import get_redis
+from app.monitoring.metrics import CACHE_HIT_RATIO, QUERY_CACHE_REQUESTS
+from app.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "qc"
+TAG_PREFIX = "qc:tag"
+INVALIDATION_CHANNEL = "qc:invalidate"
+# 标签版本号的有效期，必须大于任何带标签缓存项的有效期（否则版本号过期归零后旧缓存项会重新生效）
+TAG_TTL_SECONDS = 7 * 24 * 3600
+MAX_TAGGED_TTL_SECONDS = TAG_TTL_SECONDS // 2
+# XFetch 提前刷新系数，越大越早刷新
+XFETCH_BETA = 1.0
+# 订阅断开后的重连间隔（秒）
+RESUBSCRIBE_MIN = 1
+RESUBSCRIBE_MAX = 30
+
+
+def user_tag(user_id: str, scope: str) -> str:
+    """用户维度的失效标签，如 user:{id}:params"""
+    return f"user:{user_id}:{scope}"
+
+
+# ==================== 序列化 ====================
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__t": "datetime", "v": value.isoformat()}
+    if isinstance(value, date):
+        return {"__t": "date", "v": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__t": "decimal", "v": str(value)}
+    if isinstance(value, UUID):
+        return {"__t": "uuid", "v": str(value)}
+    if hasattr(value, "_mapping"):
+        return dict(value._mapping)
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"无法缓存 {type(value).__name__} 类型的值")
+
+
+_DECODERS = {
+    "datetime": datetime.fromisoformat,
+    "date": date.fromisoformat,
+    "decimal": Decimal,
+    "uuid": UUID,
+}
+
+
+def _object_hook(obj: Dict[str, Any]) -> Any:
+    kind = obj.get("__t")
+    if kind in _DECODERS and len(obj) == 2:
+        return _DECODERS[kind](obj["v"])
+    return obj
+
+
+def encode(value: Any) -> str:
+    """序列化缓存值（元组按列表保存）"""
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode(payload: str) -> Any:
+    return json.loads(payload, object_hook=_object_hook)
+
+
+# ==================== 缓存 ====================
+
+class _Entry:
+    __slots__ = ("value", "tags", "expires_at", "delta")
+
+    def __init__(self, value: Any, tags: Dict[str, int], expires_at: float, delta: float):
+        self.value = value
+        self.tags = tags
+        self.expires_at = expires_at  # Unix 时间戳，各 worker 之间可比较
+        self.delta = delta  # 上次执行 loader 的耗时（秒），用于 XFetch
+
+    def should_refresh(self, now: float) -> bool:
+        """XFetch：越接近过期、loader 越慢，越可能提前刷新"""
+        return now - self.delta * XFETCH_BETA * math.log(random.random() or 1e-12) >= self.expires_at
+
+
+class QueryCache:
+    """两级查询结果缓存（asyncio 单线程使用，无需加锁）"""
+
+    def __init__(self, local_size: int = 2048, local_ttl: float = 60.0):
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+        self._local: "OrderedDict[str, _Entry]" = OrderedDict()
+        # 本 worker 已知的标签版本（来自失效通知），用于校验本地副本
+        self._tag_versions: "OrderedDict[str, int]" = OrderedDict()
+        self._flight = SingleFlight("query_cache")
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribed = False
+        self.stats = {"local_hit": 0, "redis_hit": 0, "miss": 0, "errors": 0, "invalidations": 0}
+
+    async def get_or_load(
+        self,
+        name: str,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int,
+        tags: Sequence[str] = (),
+        cache_if: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """读取缓存，未命中时执行 loader 并写入
+
+        Args:
+            name: 缓存名称（指标标签和键前缀），如 user_params
+            key: 名称内的键，如用户 ID
+            loader: 读取数据库的函数，返回值需可序列化
+            ttl: 缓存有效期（秒）
+            tags: 失效标签，任一标签失效后该项失效
+            cache_if: 根据结果决定是否写入缓存（如降级结果不缓存），默认总是写入
+        """
+        full_key = f"{KEY_PREFIX}:{name}:{key}"
+        if not settings.QUERY_CACHE_ENABLED:
+            # 不缓存时仍合并并发的相同查询
+            return await self._flight.do(full_key, loader)
+
+        now = time.time()
+        entry = self._local.get(full_key)
+        if entry is not None:
+            if self._subscribed and self._local_valid(entry, now):
+                self._local.move_to_end(full_key)
+                self._record(name, "local_hit")
+                return copy.deepcopy(entry.value)
+            del self._local[full_key]
+
+        value, source = await self._flight.do(
+            full_key, lambda: self._load(full_key, loader, ttl, list(tags), cache_if)
+        )
+        self._record(name, source)
+        return copy.deepcopy(value)
+
+    async def invalidate(self, *tags: str):
+        """使带有这些标签的缓存项失效（在写入数据库之后调用）"""
+        if not tags:
+            return
+        self.stats["invalidations"] += 1
+        for tag in tags:
+            self._drop_local(tag, None)
+        redis = await self._redis()
+        if not redis:
+            return
+        try:
+            pipe = redis.pipeline(transaction=False)
+            for tag in tags:
+                pipe.incr(f"{TAG_PREFIX}:{tag}")
+                pipe.expire(f"{TAG_PREFIX}:{tag}", TAG_TTL_SECONDS)
+            results = await pipe.execute()
+            versions = {tag: int(results[i * 2]) for i, tag in enumerate(tags)}
+            for tag, version in versions.items():
+                self._remember_version(tag, version)
+            await redis.publish(INVALIDATION_CHANNEL, json.dumps(versions))
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"⚠️ 缓存失效写入失败: {str(e)}")
+
+    async def _load(self, full_key: str, loader, ttl: int, tags: Sequence[str], cache_if) -> Tuple[Any, str]:
+        redis = await self._redis()
+        versions: Dict[str, int] = {}
+        if redis:
+            cached = None
+            try:
+                values = await redis.mget([full_key] + [f"{TAG_PREFIX}:{tag}" for tag in tags])
+                versions = {tag: int(raw or 0) for tag, raw in zip(tags, values[1:])}
+                cached = values[0]
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"⚠️ 缓存读取失败: {str(e)}")
+                redis = None
+            if cached:
+                try:
+                    entry = self._entry_from_payload(decode(cached))
+                    if entry.tags == versions and not entry.should_refresh(time.time()):
+                        self._store_local(full_key, entry)
+                        return entry.value, "redis_hit"
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.warning(f"⚠️ 缓存内容无法解析，重新加载 {full_key}: {str(e)}")
+
+        started = time.time()
+        value = await loader()
+        finished = time.time()
+        if tags:
+            ttl = min(ttl, MAX_TAGGED_TTL_SECONDS)
+        entry = _Entry(value, versions, finished + ttl, finished - started)
+        if redis and (cache_if is None or cache_if(value)):
+            try:
+                payload = {"v": value, "t": versions, "x": entry.expires_at, "d": entry.delta}
+                await redis.setex(full_key, ttl, encode(payload))
+                self._store_local(full_key, entry)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"⚠️ 缓存写入失败 {full_key}: {str(e)}")
+        return value, "miss"
+
+    @staticmethod
+    def _entry_from_payload(payload: Dict[str, Any]) -> _Entry:
+        return _Entry(payload["v"], payload["t"], float(payload["x"]), float(payload["d"]))
+
+    def _local_valid(self, entry: _Entry, now: float) -> bool:
+        if entry.expires_at <= now or entry.should_refresh(now):
+            return False
+        return all(self._tag_versions.get(tag, version) <= version for tag, version in entry.tags.items())
+
+    def _store_local(self, full_key: str, entry: _Entry):
+        if not self._subscribed or self.local_size <= 0:
+            return
+        # 本地副本最多保留 local_ttl 秒，失效通知丢失时也只会短暂读到旧值
+        local = _Entry(entry.value, entry.tags, min(entry.expires_at, time.time() + self.local_ttl), entry.delta)
+        self._local[full_key] = local
+        self._local.move_to_end(full_key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    def _remember_version(self, tag: str, version: int):
+        if self._tag_versions.get(tag, 0) < version:
+            self._tag_versions[tag] = version
+        self._tag_versions.move_to_end(tag)
+        while len(self._tag_versions) > self.local_size * 4:
+            self._tag_versions.popitem(last=False)
+
+    def _drop_local(self, tag: str, version: Optional[int]):
+        if version is not None:
+            self._remember_version(tag, version)
+        for full_key in [k for k, entry in self._local.items() if tag in entry.tags]:
+            del self._local[full_key]
+
+    def _record(self, name: str, result: str):
+        self.stats[result] += 1
+        QUERY_CACHE_REQUESTS.labels(cache=name, result=result).inc()
+        CACHE_HIT_RATIO.observe(0 if result == "miss" else 1)
+
+    async def _redis(self):
+        try:
+            return await get_redis()
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"⚠️ 查询缓存不可用: {str(e)}")
+            return None
+
+    # ==================== 失效通知 ====================
+
+    def start(self):
+        """订阅失效频道（应用启动时调用）；订阅正常时才启用本地 LRU"""
+        if self._listener is None and settings.QUERY_CACHE_ENABLED:
+            self._listener = asyncio.create_task(self._listen(), name="query-cache-invalidation")
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        self._subscribed = False
+        self._local.clear()
+
+    async def _listen(self):
+        delay = RESUBSCRIBE_MIN
+        while True:
+            pubsub = None
+            try:
+                redis = await get_redis()
+                if redis is None:
+                    raise RuntimeError("Redis 未配置")
+                pubsub = redis.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                self._subscribed = True
+                delay = RESUBSCRIBE_MIN
+                logger.info("✅ 查询缓存已订阅失效通知，启用本地缓存")
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        for tag, version in json.loads(message["data"]).items():
+                            self._drop_local(tag, int(version))
+                    except (ValueError, TypeError, AttributeError) as e:
+                        logger.warning(f"⚠️ 无法解析缓存失效通知: {str(e)}")
+                raise RuntimeError("失效频道连接已关闭")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._subscribed:
+                    logger.warning(f"⚠️ 查询缓存失效通知中断，停用本地缓存: {str(e)}")
+                self._subscribed = False
+                self._local.clear()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RESUBSCRIBE_MAX)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["local_hit"] + self.stats["redis_hit"] + self.stats["miss"]
+        hits = self.stats["local_hit"] + self.stats["redis_hit"]
+        return {
+            "local_enabled": self._subscribed,
+            "local_entries": len(self._local),
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            **self.stats,
+        }
+
+
+# 模块级单例
+query_cache = QueryCache(
+    local_size=settings.QUERY_CACHE_LOCAL_SIZE,
+    local_ttl=settings.QUERY_CACHE_LOCAL_TTL,
+)
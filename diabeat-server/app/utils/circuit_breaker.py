@@ -0,0 +1,70 @@
+"""熔断器
+
+下游服务连续失败达到阈值后熔断（open）：在冷却时间内直接走降级方案，不再
+发起请求、不再等待超时。冷却结束后进入半开（half_open）状态，只放行一个
+试探请求，成功则恢复（closed），失败则重新熔断。试探请求被取消而没有
+结果时，冷却时间过后再放行下一个试探请求。
+"""
+import time
+from typing import Any, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """单进程熔断器（asyncio 单线程使用，无需加锁）"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_started = 0.0
+        self.stats = {"short_circuited": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        """是否放行本次请求"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                self.stats["short_circuited"] += 1
+                return False
+            self.state = HALF_OPEN
+            self._probe_started = 0.0
+        # 半开：只放行一个试探请求
+        now = time.monotonic()
+        if self._probe_started and now - self._probe_started < self.reset_seconds:
+            self.stats["short_circuited"] += 1
+            return False
+        self._probe_started = now
+        return True
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"✅ {self.name} 已恢复，熔断器关闭")
+        self.state = CLOSED
+        self.failures = 0
+        self._probe_started = 0.0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.stats["opened"] += 1
+                logger.warning(
+                    f"⚠️ {self.name} 连续失败 {self.failures} 次，熔断 {self.reset_seconds:.0f} 秒"
+                )
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self._probe_started = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, **self.stats}
@@ -1,18 +1,37 @@
 import httpx
 import asyncio
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Sequence, Tuple
 import logging
 from app.config import settings
+from app.utils.circuit_breaker import CircuitBreaker
 
 logger = logging.getLogger(__name__)
 
+# 可重试的状态码（网关 / 服务暂时不可用）
+RETRYABLE_STATUS = (502, 503, 504)
+# 重试退避基数（秒），按 0.2、0.4、0.8... 递增
+RETRY_BACKOFF_SECONDS = 0.2
+
+# 代理接口的候选路径（不同版本的 MCP 服务器前缀不同），首次成功后缓存
+HEALTH_ADVISOR_PATHS = ("/api/agents/health-advisor/ask", "/agents/health-advisor/ask")
+DIABETES_ANALYST_PATHS = ("/api/agents/diabetes-analyst/enhance", "/agents/diabetes-analyst/enhance")
+
+# _send 的结果
+OK = "ok"
+NOT_FOUND = "not_found"
+FAILED = "failed"
+
 class FastMCPClient:
-    """FastMCP服务器客户端，用于与MCP服务器进行通信"""
+    """FastMCP服务器客户端，用于与MCP服务器进行通信
+    
+    所有请求共用一个长连接池（keep-alive，可选 HTTP/2），由应用 lifespan
+    调用 start() / close() 管理。MCP 服务连续失败时熔断，直接返回降级结果。
+    """
     
     def __init__(self):
         self.base_url = settings.FASTMCP_URL
         self.api_key = settings.FASTMCP_API_KEY
-        self.timeout = httpx.Timeout(settings.MCP_TIMEOUT)
+        self.timeout = httpx.Timeout(settings.MCP_TIMEOUT, connect=settings.MCP_CONNECT_TIMEOUT)
         self.retry_count = settings.MCP_RETRY_COUNT
         self.enabled = settings.MCP_ENABLED
         self.headers = {
@@ -22,56 +41,155 @@ class FastMCPClient:
         if self.api_key:
             self.headers["Authorization"] = f"Bearer {self.api_key}"
         
-    async def _make_request(self, endpoint: str, method: str = "GET", data: Optional[Dict] = None) -> Optional[Dict]:
-        """基础请求方法，带重试机制"""
+        self.breaker = CircuitBreaker(
+            "MCP服务",
+            failure_threshold=settings.MCP_CIRCUIT_FAILURE_THRESHOLD,
+            reset_seconds=settings.MCP_CIRCUIT_RESET_SECONDS
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        # 候选路径组 -> 已确认可用的路径
+        self._resolved_paths: Dict[Tuple[str, ...], str] = {}
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.MCP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.MCP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.MCP_KEEPALIVE_EXPIRY
+        )
+        http2 = settings.MCP_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+            except ImportError:
+                logger.warning("⚠️ 未安装 h2，MCP 客户端使用 HTTP/1.1")
+                http2 = False
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=self.timeout,
+            limits=limits,
+            http2=http2
+        )
+    
+    async def start(self):
+        """创建连接池（应用启动时调用）"""
+        if self._client is None:
+            self._client = self._create_client()
+            logger.info(f"✅ MCP客户端连接池已创建: {self.base_url}")
+    
+    async def close(self):
+        """关闭连接池（应用关闭时调用）"""
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+            logger.info("✅ MCP客户端连接池已关闭")
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # 未经 lifespan 启动时（脚本、测试）按需创建
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+    
+    async def _send(self, endpoint: str, method: str = "GET", data: Optional[Dict] = None) -> Tuple[str, Optional[Dict]]:
+        """发送请求，返回 (OK / NOT_FOUND / FAILED, 响应 JSON)
+        
+        连接错误和 502/503/504 按指数退避重试；超时、5xx 和连接错误计入熔断器，
+        401/404 等客户端错误不计入（服务本身是可用的）。
+        """
         if not self.enabled:
             logger.info("MCP集成已禁用，跳过请求")
-            return None
-        
-        url = f"{self.base_url}{endpoint}"
+            return FAILED, None
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            for attempt in range(self.retry_count):
-                try:
-                    if method == "GET":
-                        response = await client.get(url, headers=self.headers, params=data)
-                    elif method == "POST":
-                        response = await client.post(url, headers=self.headers, json=data)
-                    elif method == "PUT":
-                        response = await client.put(url, headers=self.headers, json=data)
-                    elif method == "DELETE":
-                        response = await client.delete(url, headers=self.headers)
-                    else:
-                        logger.error(f"不支持的HTTP方法: {method}")
-                        return None
-                    
-                    if response.status_code == 200:
-                        return response.json()
-                    elif response.status_code == 401:
-                        logger.error("MCP服务认证失败: 无效的API密钥")
-                        return None
-                    elif response.status_code == 404:
-                        logger.error(f"MCP服务端点不存在: {endpoint}")
-                        return None
-                    else:
-                        logger.warning(
-                            f"MCP服务请求失败 (状态码: {response.status_code})，尝试 {attempt + 1}/{self.retry_count}"
-                        )
-                        # 重试前等待
-                        await asyncio.sleep(1 * (attempt + 1))
-                        
-                except httpx.RequestError as e:
-                    logger.warning(
-                        f"MCP服务请求错误: {str(e)}，尝试 {attempt + 1}/{self.retry_count}"
-                    )
-                    # 重试前等待
-                    await asyncio.sleep(1 * (attempt + 1))
-                except Exception as e:
-                    logger.error(f"MCP服务请求发生未知错误: {str(e)}")
-                    return None
+        for attempt in range(self.retry_count):
+            if not self.breaker.allow():
+                logger.debug(f"MCP服务熔断中，跳过请求: {endpoint}")
+                return FAILED, None
             
-            logger.error(f"MCP服务请求在 {self.retry_count} 次尝试后失败")
-            return None
+            retryable = False
+            try:
+                if method == "GET":
+                    response = await self.client.get(endpoint, params=data)
+                elif method == "POST":
+                    response = await self.client.post(endpoint, json=data)
+                elif method == "PUT":
+                    response = await self.client.put(endpoint, json=data)
+                elif method == "DELETE":
+                    response = await self.client.delete(endpoint)
+                else:
+                    logger.error(f"不支持的HTTP方法: {method}")
+                    return FAILED, None
+                
+                if response.status_code == 200:
+                    self.breaker.record_success()
+                    return OK, response.json()
+                elif response.status_code == 401:
+                    self.breaker.record_success()
+                    logger.error("MCP服务认证失败: 无效的API密钥")
+                    return FAILED, None
+                elif response.status_code == 404:
+                    self.breaker.record_success()
+                    logger.warning(f"MCP服务端点不存在: {endpoint}")
+                    return NOT_FOUND, None
+                elif response.status_code < 500:
+                    self.breaker.record_success()
+                    logger.error(f"MCP服务请求被拒绝 (状态码: {response.status_code}): {endpoint}")
+                    return FAILED, None
+                
+                self.breaker.record_failure()
+                retryable = response.status_code in RETRYABLE_STATUS
+                logger.warning(
+                    f"MCP服务请求失败 (状态码: {response.status_code})，尝试 {attempt + 1}/{self.retry_count}"
+                )
+            except httpx.TimeoutException as e:
+                # 超时不重试：再等一个完整超时的代价太高
+                self.breaker.record_failure()
+                logger.warning(f"MCP服务请求超时: {endpoint}, {type(e).__name__}")
+                return FAILED, None
+            except httpx.RequestError as e:
+                self.breaker.record_failure()
+                retryable = True
+                logger.warning(
+                    f"MCP服务请求错误: {str(e)}，尝试 {attempt + 1}/{self.retry_count}"
+                )
+            except Exception as e:
+                logger.error(f"MCP服务请求发生未知错误: {str(e)}")
+                return FAILED, None
+            
+            if not retryable or attempt + 1 >= self.retry_count:
+                break
+            # 重试前等待
+            await asyncio.sleep(RETRY_BACKOFF_SECONDS * (2 ** attempt))
+        
+        logger.error(f"MCP服务请求失败: {endpoint}")
+        return FAILED, None
+    
+    async def _make_request(self, endpoint: str, method: str = "GET", data: Optional[Dict] = None) -> Optional[Dict]:
+        """基础请求方法，带重试机制和熔断"""
+        _, result = await self._send(endpoint, method, data)
+        return result
+    
+    async def _post_first_available(self, paths: Sequence[str], data: Dict) -> Optional[Dict]:
+        """依次尝试候选路径，缓存第一个存在的路径
+        
+        只有 404 才尝试下一个候选路径；服务不可用时直接返回，不再逐个路径等待超时。
+        """
+        key = tuple(paths)
+        resolved = self._resolved_paths.get(key)
+        candidates = [resolved] if resolved else list(paths)
+        for endpoint in candidates:
+            outcome, response = await self._send(endpoint, "POST", data)
+            if outcome == OK:
+                if resolved is None:
+                    self._resolved_paths[key] = endpoint
+                    logger.info(f"✅ MCP服务端点已确认: {endpoint}")
+                return response
+            if outcome == FAILED:
+                return None
+        if resolved:
+            # 服务器升级后路径变化，下次重新探测
+            self._resolved_paths.pop(key, None)
+        return None
     
     async def get_data(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
         """获取数据"""
@@ -97,7 +215,7 @@ class FastMCPClient:
     async def list_agents(self) -> List[Dict[str, Any]]:
         """列出所有可用代理"""
         result = await self.get_data("/api/agents")
-        return result.get("agents", [])
+        return (result or {}).get("agents", [])
     
     async def health_check(self) -> bool:
         """检查MCP服务器健康状态"""
@@ -118,17 +236,12 @@ class FastMCPClient:
                 "context": context or ""
             }
             
-            # 尝试两种可能的端点路径
-            for endpoint in [
-                "/api/agents/health-advisor/ask",
-                "/agents/health-advisor/ask"
-            ]:
-                response = await self.post_data(endpoint, data)
-                if response:
-                    return response
+            response = await self._post_first_available(HEALTH_ADVISOR_PATHS, data)
+            if response:
+                return response
             
-            # 如果都失败，使用回退方案
-            logger.warning("所有健康咨询端点都失败，使用回退方案")
+            # 服务不可用或熔断中，使用回退方案
+            logger.warning("健康咨询请求失败，使用回退方案")
             return self._fallback_health_response(question)
             
         except Exception as e:
@@ -149,17 +262,12 @@ class FastMCPClient:
     ) -> Dict[str, Any]:
         """增强血糖预测结果"""
         try:
-            # 尝试两种可能的端点路径
-            for endpoint in [
-                "/api/agents/diabetes-analyst/enhance",
-                "/agents/diabetes-analyst/enhance"
-            ]:
-                response = await self.post_data(endpoint, prediction_data)
-                if response:
-                    return response
+            response = await self._post_first_available(DIABETES_ANALYST_PATHS, prediction_data)
+            if response:
+                return response
             
-            # 如果都失败，使用回退方案
-            logger.warning("所有预测增强端点都失败，使用回退方案")
+            # 服务不可用或熔断中，使用回退方案
+            logger.warning("预测增强请求失败，使用回退方案")
             return self._fallback_enhanced_prediction()
             
         except Exception as e:
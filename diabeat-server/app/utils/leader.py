@@ -0,0 +1,105 @@
+"""单例后台任务的主节点选举
+
+多 worker、多实例部署时，每个 worker 都会启动应用生命周期，但通知处理、
+营养汇总修复等周期任务在整个集群只应运行一份。各 worker 定期尝试获取
+Postgres 会话级咨询锁，拿到锁的 worker 成为主节点并运行这些任务：
+
+- 锁绑定在一个专用连接上（不占用连接池），连接断开或进程退出时由数据库
+  自动释放，其他 worker 在下一次尝试时接管
+- 主节点定期在锁连接上执行心跳查询，连接失效即停止任务、重新参与选举；
+  从连接失效到停止任务之间最多有一个心跳间隔的重叠，任务需要能容忍
+- 任务意外退出时由主节点重新启动
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncpg
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRY_LOCK = "SELECT pg_try_advisory_lock(hashtextextended($1::text, 0))"
+HEARTBEAT = "SELECT 1"
+
+
+class LeaderElection:
+    """基于 Postgres 咨询锁的主节点选举，主节点上运行 jobs 中的周期任务"""
+
+    def __init__(
+        self,
+        name: str,
+        jobs: Dict[str, Callable[[], Awaitable[Any]]],
+        interval: Optional[float] = None
+    ):
+        """
+        Args:
+            name: 锁名称（同名的 LeaderElection 在整个集群中只有一个主节点）
+            jobs: 任务名称 -> 返回协程的函数（通常是不会返回的周期循环）
+            interval: 选举重试和心跳间隔（秒）
+        """
+        self.name = name
+        self.jobs = jobs
+        self.interval = interval if interval is not None else settings.LEADER_ELECTION_INTERVAL
+        self.is_leader = False
+        self.stats = {"elected": 0, "job_restarts": 0}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"leader:{self.name}")
+
+    async def stop(self):
+        """停止任务并释放锁（关闭锁连接）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        dsn = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(dsn, timeout=self.interval)
+                if await conn.fetchval(TRY_LOCK, self.name):
+                    await self._lead(conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ 单例任务选举失败（{self.name}），{self.interval:.0f} 秒后重试: {str(e)}")
+            finally:
+                if conn is not None:
+                    # 关闭连接即释放锁；连接已失效时直接丢弃
+                    try:
+                        await asyncio.wait_for(conn.close(), timeout=5)
+                    except Exception:
+                        conn.terminate()
+            await asyncio.sleep(self.interval)
+
+    async def _lead(self, conn: asyncpg.Connection):
+        self.is_leader = True
+        self.stats["elected"] += 1
+        logger.info(f"👑 当选为单例任务主节点（{self.name}），启动: {', '.join(self.jobs)}")
+        tasks = {name: asyncio.create_task(job(), name=f"singleton:{name}") for name, job in self.jobs.items()}
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                await asyncio.wait_for(conn.fetchval(HEARTBEAT), timeout=self.interval)
+                for name, task in tasks.items():
+                    if task.done():
+                        error = None if task.cancelled() else task.exception()
+                        logger.error(f"单例任务 {name} 意外退出，重新启动: {error}")
+                        self.stats["job_restarts"] += 1
+                        tasks[name] = asyncio.create_task(self.jobs[name](), name=f"singleton:{name}")
+        finally:
+            self.is_leader = False
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            logger.info(f"单例任务已停止（{self.name}）")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"name": self.name, "is_leader": self.is_leader, "jobs": list(self.jobs), **self.stats}
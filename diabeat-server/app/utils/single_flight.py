@@ -0,0 +1,91 @@
+"""进程内 single-flight（合并并发的相同调用）
+
+同一个键的调用正在执行时，后到的调用方不再各自查询数据库 / 调用大模型，
+而是等待同一次执行的结果：
+
+- 只合并正在执行的调用，不缓存结果：执行完成后的下一次调用会重新执行
+- 执行放在独立任务中，某个调用方被取消（如客户端断开）不影响其他调用方；
+  所有调用方都取消后才取消执行，并立即移除该键，取消完成前到达的调用方会重新执行，
+  不会加入正在取消的执行
+- 有多个调用方共享结果时，每个调用方拿到各自的深拷贝，互相修改不受影响
+- 只在同一个 worker 进程内合并；跨进程的合并见 app.prediction.memo
+
+写入数据后调用 forget(key)，之后到达的调用方不会再加入写入前开始的执行。
+"""
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+from app.monitoring.metrics import SINGLE_FLIGHT_CALLS
+
+
+class _Call:
+    """一次正在执行的调用"""
+
+    __slots__ = ("task", "callers", "waiting")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.callers = 0  # 加入过的调用方总数
+        self.waiting = 0  # 仍在等待的调用方数
+
+
+class SingleFlight:
+    """按键合并并发调用（asyncio 单线程使用，无需加锁）"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self.stats = {"executed": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """执行 fn 或等待同一个键正在执行的调用，返回结果"""
+        result, _ = await self.execute(key, fn)
+        return result
+
+    async def execute(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """执行 fn 或等待同一个键正在执行的调用
+
+        Returns:
+            (结果, 本次调用是否加入了其他调用方正在执行的调用)
+        """
+        call = self._calls.get(key)
+        if call is None or call.task.done():
+            call = _Call(asyncio.get_running_loop().create_task(fn()))
+            call.task.add_done_callback(lambda _task, key=key, call=call: self._finish(key, call))
+            self._calls[key] = call
+            outcome = "executed"
+        else:
+            outcome = "coalesced"
+        self.stats[outcome] += 1
+        SINGLE_FLIGHT_CALLS.labels(name=self.name, outcome=outcome).inc()
+
+        call.callers += 1
+        call.waiting += 1
+        try:
+            result = await asyncio.shield(call.task)
+        finally:
+            call.waiting -= 1
+            if call.waiting == 0 and not call.task.done():
+                self._finish(key, call)
+                call.task.cancel()
+
+        # 执行完成后不会再有调用方加入，callers 已是最终值
+        if call.callers > 1:
+            result = copy.deepcopy(result)
+        return result, outcome == "coalesced"
+
+    def forget(self, key: Hashable):
+        """之后的调用不再加入该键正在执行的调用（正在等待的调用方不受影响）"""
+        self._calls.pop(key, None)
+
+    def forget_if(self, predicate: Callable[[Hashable], bool]):
+        """之后的调用不再加入满足条件的键正在执行的调用"""
+        for key in [key for key in self._calls if predicate(key)]:
+            del self._calls[key]
+
+    def _finish(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._calls), **self.stats}
@@ -0,0 +1,54 @@
+"""生产环境启动配置（gunicorn + uvicorn worker）
+
+用法：
+
+    gunicorn -c gunicorn_conf.py app.main:app
+
+环境变量：
+
+- WEB_CONCURRENCY: worker 数量，默认等于 CPU 核数
+- PORT / BIND: 监听端口 / 地址，默认 0.0.0.0:8000
+- DB_CONNECTION_BUDGET / APP_INSTANCES: 整个集群的数据库连接预算和实例数，
+  每个 worker 的连接池大小按预算均分（见 app/database.py）
+- PROMETHEUS_MULTIPROC_DIR: 多 worker 指标汇总目录，默认为临时目录
+- GUNICORN_TIMEOUT / GUNICORN_GRACEFUL_TIMEOUT / GUNICORN_MAX_REQUESTS
+
+应用代码在主进程中预加载（preload_app），fork 出的 worker 共享已导入的模块，
+冷启动只需执行各自的 lifespan。通知处理等单例任务由 worker 之间的主节点选举
+保证只运行一份（见 app/utils/leader.py）。
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# 预加载应用前写回环境变量：app.database 按 worker 数计算连接池大小
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# 多进程指标目录需在预加载应用（导入 prometheus_client）之前准备好，并清空上次运行遗留的文件
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "diabeat-metrics"))
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+# 定期重启 worker 以回收内存（0 表示不重启），加随机抖动避免同时重启
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+# 请求日志由应用中间件记录
+accesslog = None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+
+def child_exit(server, worker):
+    """worker 退出后清理其存活型（Gauge）指标"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""CGM 分析报告离线基准与一致性检查
+
+用法（不需要数据库）：
+
+    python scripts/bench_glucose_analytics.py --days 90
+
+生成 days 天 1 分钟间隔的合成 CGM 读数（含低血糖 / 高血糖时段和数据中断），
+按天逐日计算每日统计（与写入后重算相同：每天单独计算，只多读前一天末尾的
+读数），再由每日统计生成报告，与直接在原始读数上计算的结果对比：
+读数数量、分档占比、平均值 / 标准差、事件次数必须一致，AGP 百分位误差
+不超过一个直方图区间。不一致时以非零状态码退出，最后输出两种方式的耗时。
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.glucose import stats  # noqa: E402
+from app.glucose.analytics import AGP_PERCENTILES, build_report  # noqa: E402
+
+START = date(2024, 1, 1)
+# 数据中断的概率（每天一次，持续 20-120 分钟）
+GAP_PROBABILITY = 0.3
+
+
+def make_readings(days: int, seed: int):
+    rng = np.random.default_rng(seed)
+    minutes = np.arange(days * 24 * 60)
+    values = (
+        7.5
+        + 3.5 * np.sin(minutes / (24 * 60) * 2 * np.pi * 3)
+        + np.cumsum(rng.normal(0, 0.08, minutes.size)) % 3
+        + rng.normal(0, 0.3, minutes.size)
+    )
+    # 每天随机插入一段低血糖和一段高血糖
+    for day in range(days):
+        low_at = day * 1440 + rng.integers(0, 1380)
+        values[low_at:low_at + rng.integers(5, 60)] = rng.uniform(2.4, 3.7)
+        high_at = day * 1440 + rng.integers(0, 1380)
+        values[high_at:high_at + rng.integers(5, 90)] = rng.uniform(14.5, 20)
+    keep = np.ones(minutes.size, dtype=bool)
+    for day in range(days):
+        if rng.random() < GAP_PROBABILITY:
+            gap_at = day * 1440 + rng.integers(0, 1300)
+            keep[gap_at:gap_at + rng.integers(20, 120)] = False
+    epoch_start = stats.day_number(START) * stats.SECONDS_PER_DAY
+    times = (epoch_start + minutes * 60).astype(np.float64)
+    return times[keep], np.round(np.clip(values[keep], 1.5, 30), 2)
+
+
+def daily_rows(times: np.ndarray, values: np.ndarray, days: int):
+    """逐日计算（模拟写入后的按天重算）"""
+    rows = []
+    lookback = stats.EVENT_LOOKBACK.total_seconds()
+    for offset in range(days):
+        day = START + timedelta(days=offset)
+        start = stats.day_number(day) * stats.SECONDS_PER_DAY
+        window = (times >= start - lookback) & (times < start + stats.SECONDS_PER_DAY)
+        rows.extend(stats.compute_daily_stats(times[window], values[window], [day]))
+    return rows
+
+
+def raw_report(times: np.ndarray, values: np.ndarray):
+    """直接在原始读数上计算"""
+    hours = (times.astype(np.int64) % stats.SECONDS_PER_DAY) // 3600
+    agp = np.array([np.percentile(values[hours == hour], AGP_PERCENTILES) for hour in range(stats.HOURS)])
+    return {
+        "reading_count": values.size,
+        "mean_bg": round(float(values.mean()), 1),
+        "sd": round(float(values.std(ddof=1)), 2),
+        "time_in_range": round(float(((values >= stats.LOW) & (values <= stats.HIGH)).mean()), 4),
+        "time_very_low": round(float((values < stats.VERY_LOW).mean()), 4),
+        "time_very_high": round(float((values > stats.VERY_HIGH).mean()), 4),
+        "hypo_events": stats.event_times(times, values < stats.LOW).size,
+        "hyper_events": stats.event_times(times, values > stats.VERY_HIGH).size,
+        "agp": agp,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=20, help="报告计算重复次数")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    times, values = make_readings(args.days, args.seed)
+    started = time.perf_counter()
+    rows = daily_rows(times, values, args.days)
+    refresh_ms = (time.perf_counter() - started) * 1000 / args.days
+    end = START + timedelta(days=args.days - 1)
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        report = build_report(rows, START, end)
+    report_ms = (time.perf_counter() - started) * 1000 / args.repeat
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        expected = raw_report(times, values)
+    raw_ms = (time.perf_counter() - started) * 1000 / args.repeat
+
+    failures = []
+    for key in ("reading_count", "mean_bg", "sd", "time_in_range", "time_very_low",
+                "time_very_high", "hypo_events", "hyper_events"):
+        if report[key] != expected[key]:
+            failures.append(f"{key}: 每日统计 {report[key]} != 原始读数 {expected[key]}")
+    agp = np.array([[hour[f"p{p}"] for p in AGP_PERCENTILES] for hour in report["agp"]])
+    agp_error = float(np.abs(agp - expected["agp"]).max())
+    if agp_error > stats.HIST_BIN:
+        failures.append(f"AGP 百分位最大误差 {agp_error:.3f} 超过区间宽度 {stats.HIST_BIN}")
+
+    print(f"读数: {values.size}（{args.days} 天），低血糖事件 {report['hypo_events']}，高血糖事件 {report['hyper_events']}")
+    print(f"TIR {report['time_in_range']:.1%}，GMI {report['gmi']}%，CV {report['cv']}%，AGP 最大误差 {agp_error:.3f} mmol/L")
+    print(f"每日统计重算: {refresh_ms:.2f} ms/天")
+    print(f"报告（每日统计）: {report_ms:.2f} ms")
+    print(f"报告（原始读数）: {raw_ms:.2f} ms（不含读取 {values.size} 行的数据库耗时）")
+
+    if failures:
+        print("\n✗ 结果不一致:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("\n✓ 每日统计与原始读数计算结果一致")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""连续血糖读数批量写入基准
+
+用法：
+
+    # 只测校验（不需要数据库）
+    python scripts/bench_glucose_ingest.py --users 20 --days 14
+
+    # 校验 + 写入（需要可用的 DATABASE_URL，已执行 scripts/init_db.sh，库中已有用户）
+    python scripts/bench_glucose_ingest.py --users 20 --days 14 --write --concurrency 8
+
+为每个用户生成 1 分钟间隔的合成 CGM 读数（含少量越界值和重复读数），按
+--batch 切分成批，依次经过 prepare_readings 校验，--write 时再以
+--concurrency 个并发连接执行与接口相同的 INSERT 语句，输出每秒读数。
+写入的读数 device_id 为 "bench"，结束后删除。
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.glucose.ingest import ENSURE_PARTITION, INSERT_READINGS, prepare_readings  # noqa: E402
+
+BENCH_DEVICE = "bench"
+# 合成数据中的越界值 / 重复读数比例
+INVALID_RATE = 0.002
+DUPLICATE_RATE = 0.01
+
+
+def make_batches(users: int, days: int, batch: int, seed: int):
+    """生成 [(用户下标, 测量时间列表, 数值列表)]"""
+    rng = np.random.default_rng(seed)
+    end = datetime.utcnow().replace(second=0, microsecond=0) - timedelta(minutes=10)
+    minutes = days * 24 * 60
+    batches = []
+    for user in range(users):
+        times = [end - timedelta(minutes=m) for m in range(minutes)][::-1]
+        phase = rng.uniform(0, 2 * np.pi)
+        values = 7 + 3 * np.sin(np.arange(minutes) / 240 + phase) + rng.normal(0, 0.4, minutes)
+        values[rng.random(minutes) < INVALID_RATE] = 60.0
+        for start in range(0, minutes, batch):
+            chunk_times = times[start:start + batch]
+            chunk_values = values[start:start + batch].tolist()
+            duplicates = int(len(chunk_times) * DUPLICATE_RATE)
+            chunk_times += chunk_times[:duplicates]
+            chunk_values += chunk_values[:duplicates]
+            batches.append((user, chunk_times, chunk_values))
+    return batches
+
+
+async def write_all(prepared, concurrency: int) -> float:
+    import asyncpg
+    from app.config import settings
+
+    dsn = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+    pool = await asyncpg.create_pool(dsn, min_size=concurrency, max_size=concurrency)
+    try:
+        user_ids = [row["id"] for row in await pool.fetch("SELECT id FROM users ORDER BY id LIMIT $1", len(prepared))]
+        needed = max(user for user, _ in prepared) + 1
+        if len(user_ids) < needed:
+            raise SystemExit(f"数据库中只有 {len(user_ids)} 个用户，需要 {needed} 个（调小 --users）")
+
+        months = sorted({month for _, readings in prepared for month in readings.months()})
+        for month in months:
+            await pool.execute(ENSURE_PARTITION.sql, month)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in prepared:
+            queue.put_nowait(item)
+
+        async def worker():
+            async with pool.acquire() as conn:
+                while not queue.empty():
+                    user, readings = queue.get_nowait()
+                    await conn.execute(
+                        INSERT_READINGS.sql,
+                        user_ids[user],
+                        readings.measured_at.astype("datetime64[us]").tolist(),
+                        readings.values.tolist(),
+                        "cgm",
+                        BENCH_DEVICE
+                    )
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        await pool.execute("DELETE FROM glucose_readings WHERE device_id = $1", BENCH_DEVICE)
+        return elapsed
+    finally:
+        await pool.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--batch", type=int, default=5000, help="每批读数数量")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发写入连接数")
+    parser.add_argument("--write", action="store_true", help="写入数据库")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    batches = make_batches(args.users, args.days, args.batch, args.seed)
+    received = sum(len(values) for _, _, values in batches)
+
+    started = time.perf_counter()
+    prepared = [(user, prepare_readings(times, values)) for user, times, values in batches]
+    validate_seconds = time.perf_counter() - started
+    valid = sum(len(readings) for _, readings in prepared)
+    rejected = sum(len(readings.rejections) for _, readings in prepared)
+    duplicates = sum(readings.duplicates for _, readings in prepared)
+
+    print(f"读数: {received}（{len(batches)} 批），有效 {valid}，拒绝 {rejected}，批内重复 {duplicates}")
+    print(f"校验: {validate_seconds * 1000:.1f} ms，{received / validate_seconds:,.0f} 条/秒")
+
+    if args.write:
+        write_seconds = asyncio.run(write_all(prepared, args.concurrency))
+        print(f"写入: {write_seconds * 1000:.1f} ms，{valid / write_seconds:,.0f} 条/秒（{args.concurrency} 个连接）")
+        total = validate_seconds + write_seconds
+        print(f"合计: {received / total:,.0f} 条/秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
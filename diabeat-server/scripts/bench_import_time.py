@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""应用导入耗时分析（python -X importtime）
+
+用法（在 diabeat-server 目录下，需要完整的运行环境）：
+
+    python scripts/bench_import_time.py
+    python scripts/bench_import_time.py --module app.main --top 30 --runs 5
+
+在子进程中以 -X importtime 导入目标模块（默认 app.main，即 worker 冷启动时
+uvicorn 导入的模块），输出：
+
+- 导入总耗时（多次运行取中位数）
+- 按顶层包汇总的耗时排名（含被间接导入的依赖）
+- 启动时不应加载的重型 SDK（OpenAI、boto3、firebase_admin 等只在首次使用时
+  导入）；若被提前导入则列出并以非零状态码退出，可用于 CI 检查
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# 只在特定路由 / 配置下才需要的 SDK，不应在启动时导入
+LAZY_PACKAGES = ("openai", "boto3", "botocore", "firebase_admin", "cv2", "dashscope", "PIL")
+
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def profile(module: str) -> List[Tuple[int, int, int, str]]:
+    """返回 (自身耗时 us, 累计耗时 us, 嵌套深度, 模块名)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            entries.append((int(own), int(cumulative), len(indent) // 2, name))
+    return entries
+
+
+def by_package(entries) -> Dict[str, int]:
+    """按顶层包汇总自身耗时（us）"""
+    totals: Dict[str, int] = defaultdict(int)
+    for own, _, _, name in entries:
+        totals[name.split(".")[0]] += own
+    return totals
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    runs = [profile(args.module) for _ in range(args.runs)]
+    totals = [sum(cumulative for _, cumulative, depth, _ in entries if depth == 0) for entries in runs]
+    median_run = runs[totals.index(sorted(totals)[len(totals) // 2])]
+
+    print(f"导入 {args.module}: {statistics.median(totals) / 1000:.0f} ms（{args.runs} 次中位数，"
+          f"最快 {min(totals) / 1000:.0f} ms），共 {len(median_run)} 个模块\n")
+    print(f"{'包':<28}{'耗时 ms':>10}")
+    for package, own in sorted(by_package(median_run).items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:<28}{own / 1000:>10.1f}")
+
+    loaded = sorted({name.split(".")[0] for _, _, _, name in median_run} & set(LAZY_PACKAGES))
+    if loaded:
+        print(f"\n✗ 启动时导入了应延迟加载的 SDK: {', '.join(loaded)}")
+        return 1
+    print("\n✓ 未在启动时导入重型 SDK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
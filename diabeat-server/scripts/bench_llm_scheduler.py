@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""LLM 调度器模拟基准（不调用真实服务商）
+
+用法：
+
+    python scripts/bench_llm_scheduler.py --requests 600 --quota 8 --overload 1.5
+
+模拟一个并发配额为 quota 的服务商（超出时返回 429，单次调用耗时约
+latency 秒），requests 个请求（识别 / 预测 / 营养方案混合）按 overload 倍于
+理论吞吐上限的速率随机到达（模拟用餐高峰），对比：
+
+- 直接调用：超出配额即 429，按 SDK 默认策略退避重试 2 次，仍失败则走回退方案
+- 经过 LLMScheduler：按配额放行，等待超过该优先级上限的请求立即拒绝
+
+输出成功数、429 次数、被拒绝 / 失败数、有效吞吐量和各优先级的排队等待。
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.llm.scheduler import (  # noqa: E402
+    LLMOverloadedError, LLMScheduler, PRIORITY_NAMES,
+    PRIORITY_NUTRITION_PLAN, PRIORITY_PREDICTION, PRIORITY_RECOGNITION,
+)
+
+MIX = [PRIORITY_RECOGNITION] * 5 + [PRIORITY_PREDICTION] * 3 + [PRIORITY_NUTRITION_PLAN] * 2
+
+
+class RateLimited(Exception):
+    pass
+
+
+class FakeProvider:
+    def __init__(self, quota: int, latency: float):
+        self.quota = quota
+        self.latency = latency
+        self.active = 0
+        self.rate_limited = 0
+
+    async def call(self):
+        if self.active >= self.quota:
+            self.rate_limited += 1
+            # 服务商拒绝也需要一次往返
+            await asyncio.sleep(self.latency * 0.05)
+            raise RateLimited()
+        self.active += 1
+        try:
+            await asyncio.sleep(self.latency * random.uniform(0.7, 1.3))
+        finally:
+            self.active -= 1
+
+
+async def arrivals(priorities, rate: float):
+    """按泊松过程依次产生请求"""
+    for priority in priorities:
+        yield priority
+        await asyncio.sleep(random.expovariate(rate))
+
+
+async def run_direct(provider: FakeProvider, priorities, stats, rate):
+    async def one(priority):
+        started = time.perf_counter()
+        for attempt in range(3):
+            try:
+                await provider.call()
+                stats["ok"] += 1
+                stats["wait"][priority].append(time.perf_counter() - started - provider.latency)
+                return
+            except RateLimited:
+                await asyncio.sleep(provider.latency * 0.5 * 2 ** attempt)
+        stats["failed"] += 1
+    await asyncio.gather(*[asyncio.create_task(one(p)) async for p in arrivals(priorities, rate)])
+
+
+async def run_scheduled(provider: FakeProvider, priorities, stats, rate, max_wait):
+    scheduler = LLMScheduler({"fake": {"concurrency": provider.quota, "latency": provider.latency}}, {}, max_wait)
+
+    async def one(priority):
+        started = time.perf_counter()
+        try:
+            slot = await scheduler.acquire("fake", "model", priority, 1000)
+        except LLMOverloadedError:
+            stats["failed"] += 1
+            return
+        stats["wait"][priority].append(time.perf_counter() - started)
+        try:
+            await provider.call()
+            stats["ok"] += 1
+        except RateLimited:
+            stats["failed"] += 1
+        finally:
+            slot.release()
+    await asyncio.gather(*[asyncio.create_task(one(p)) async for p in arrivals(priorities, rate)])
+
+
+def report(name: str, provider: FakeProvider, stats, elapsed: float):
+    print(f"{name}: 成功 {stats['ok']}，失败 / 拒绝 {stats['failed']}，429 {provider.rate_limited} 次，"
+          f"耗时 {elapsed:.2f}s，有效吞吐 {stats['ok'] / elapsed:.1f} 次/s")
+    for priority in sorted(stats["wait"]):
+        waits = sorted(stats["wait"][priority])
+        if waits:
+            p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+            print(f"  {PRIORITY_NAMES[priority]:<15} 成功 {len(waits):>4}，等待中位数 {waits[len(waits) // 2]:.2f}s，p95 {p95:.2f}s")
+
+
+async def main_async(args):
+    random.seed(args.seed)
+    priorities = [random.choice(MIX) for _ in range(args.requests)]
+    ceiling = args.quota / args.latency
+    rate = ceiling * args.overload
+    print(f"配额 {args.quota} 并发，单次约 {args.latency}s，理论吞吐上限 {ceiling:.1f} 次/s，"
+          f"{args.requests} 个请求以 {rate:.1f} 次/s 到达\n")
+
+    # 等待上限按模拟的时间尺度缩放（生产默认：识别 20s / 预测 5s / 营养方案 10s，单次约 5s）
+    scale = args.latency / 5.0
+    max_wait = {"recognition": 20 * scale, "prediction": 5 * scale, "nutrition_plan": 10 * scale}
+
+    for name, runner in (("直接调用", run_direct), ("调度器", run_scheduled)):
+        provider = FakeProvider(args.quota, args.latency)
+        stats = {"ok": 0, "failed": 0, "wait": defaultdict(list)}
+        started = time.perf_counter()
+        if runner is run_scheduled:
+            await runner(provider, priorities, stats, rate, max_wait)
+        else:
+            await runner(provider, priorities, stats, rate)
+        report(name, provider, stats, time.perf_counter() - started)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--quota", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="模拟的单次调用耗时（秒）")
+    parser.add_argument("--overload", type=float, default=1.5, help="到达速率 / 理论吞吐上限")
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main_async(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
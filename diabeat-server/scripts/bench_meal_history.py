@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""get_meal_history 微基准：databases 命名参数路径 vs 预编译查询层
+
+用法（需要可用的 DATABASE_URL，已执行 scripts/init_db.sh）：
+
+    python scripts/bench_meal_history.py --rows 600 --limit 500 --iterations 200
+
+脚本会创建一个临时用户并写入 --rows 条带营养信息的用餐记录，分别用
+旧路径（SQL 拼接 + databases.fetch_all + dict(row) + 逐字段构造模型）和
+新路径（app.records.queries 预编译语句 + Model(**row)）读取 limit 条记录，
+先确认两者返回的数据完全相同，再输出两者的 rows/s，最后删除临时用户（级联删除测试数据）。
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.database import database  # noqa: E402
+from app.records import crud, schemas  # noqa: E402
+
+
+async def legacy_get_meal_history(user_id, start_date=None, end_date=None, limit=100):
+    """改造前的实现（保留用于对比）"""
+    query = """
+        SELECT
+            mr.id, mr.user_id, mr.meal_time, mr.food_recognition_id, mr.nutrition_record_id,
+            mr.notes, mr.created_at, nr.total_carbs, nr.net_carbs, nr.protein, nr.fat,
+            nr.fiber, nr.calories, nr.gi_value, nr.gl_value, fr.image_url, fr.recognition_result
+        FROM meal_records mr
+        LEFT JOIN nutrition_records nr ON mr.nutrition_record_id = nr.id
+        LEFT JOIN food_recognitions fr ON mr.food_recognition_id = fr.id
+        WHERE mr.user_id = :user_id
+    """
+    values = {"user_id": user_id, "limit": limit}
+    if start_date:
+        query += " AND mr.meal_time >= :start_date"
+        values["start_date"] = start_date
+    if end_date:
+        query += " AND mr.meal_time <= :end_date"
+        values["end_date"] = end_date
+    query += " ORDER BY mr.meal_time DESC LIMIT :limit"
+    results = await database.fetch_all(query=query, values=values)
+    rows = [dict(row) for row in results]
+    return [
+        schemas.MealHistoryItem(
+            id=str(r["id"]),
+            user_id=str(r["user_id"]),
+            meal_time=r["meal_time"],
+            food_recognition_id=str(r["food_recognition_id"]) if r.get("food_recognition_id") else None,
+            nutrition_record_id=str(r["nutrition_record_id"]) if r.get("nutrition_record_id") else None,
+            notes=r.get("notes"),
+            created_at=r["created_at"],
+            total_carbs=float(r["total_carbs"]) if r.get("total_carbs") is not None else None,
+            net_carbs=float(r["net_carbs"]) if r.get("net_carbs") is not None else None,
+            protein=float(r["protein"]) if r.get("protein") is not None else None,
+            fat=float(r["fat"]) if r.get("fat") is not None else None,
+            fiber=float(r["fiber"]) if r.get("fiber") is not None else None,
+            calories=float(r["calories"]) if r.get("calories") is not None else None,
+            gi_value=float(r["gi_value"]) if r.get("gi_value") is not None else None,
+            gl_value=float(r["gl_value"]) if r.get("gl_value") is not None else None,
+            image_url=r.get("image_url"),
+            recognition_result=r.get("recognition_result"),
+        )
+        for r in rows
+    ]
+
+
+async def prepared_get_meal_history(user_id, start_date=None, end_date=None, limit=100):
+    """预编译查询层实现"""
+    records = await crud.get_meal_history(user_id, start_date=start_date, end_date=end_date, limit=limit)
+    return [schemas.MealHistoryItem(**r) for r in records]
+
+
+async def seed(user_id: str, rows: int):
+    """写入测试用户和用餐记录"""
+    await database.execute(
+        "INSERT INTO users (id, device_id, diabetes_type) VALUES (:id, :device_id, 'type1')",
+        {"id": user_id, "device_id": f"bench-{user_id}"}
+    )
+    now = datetime.utcnow()
+    nutrition_values = []
+    meal_values = []
+    for i in range(rows):
+        nutrition_id = str(uuid4())
+        nutrition_values.append({
+            "id": nutrition_id, "user_id": user_id, "total_carbs": 45.5, "net_carbs": 40.0,
+            "fiber": 5.5, "protein": 20.0, "fat": 12.0, "calories": 420.0, "gi_value": 62.0, "gl_value": 25.2
+        })
+        meal_values.append({
+            "id": str(uuid4()), "user_id": user_id, "meal_time": now - timedelta(hours=5 * i),
+            "nutrition_record_id": nutrition_id, "notes": f"bench meal {i}"
+        })
+    await database.execute_many(
+        """INSERT INTO nutrition_records
+           (id, user_id, total_carbs, net_carbs, fiber, protein, fat, calories, gi_value, gl_value)
+           VALUES (:id, :user_id, :total_carbs, :net_carbs, :fiber, :protein, :fat, :calories, :gi_value, :gl_value)""",
+        nutrition_values
+    )
+    await database.execute_many(
+        """INSERT INTO meal_records (id, user_id, meal_time, nutrition_record_id, notes)
+           VALUES (:id, :user_id, :meal_time, :nutrition_record_id, :notes)""",
+        meal_values
+    )
+
+
+async def check_same_payload(user_id: str, limit: int):
+    """计时前确认两条路径返回完全相同的数据，否则对比没有意义"""
+    before = [item.model_dump() for item in await legacy_get_meal_history(user_id, limit=limit)]
+    after = [item.model_dump() for item in await prepared_get_meal_history(user_id, limit=limit)]
+    assert before == after, "旧路径与预编译路径返回的数据不一致"
+
+
+async def measure(label: str, func, user_id: str, limit: int, iterations: int) -> float:
+    """测量 rows/s"""
+    # 预热：建立连接并让预编译语句进入连接缓存
+    for _ in range(5):
+        await func(user_id, limit=limit)
+    total_rows = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        total_rows += len(await func(user_id, limit=limit))
+    elapsed = time.perf_counter() - start
+    rate = total_rows / elapsed
+    print(f"{label:<12} {iterations} 次, 每次 {total_rows // iterations} 行, "
+          f"{elapsed * 1000 / iterations:.2f} ms/次, {rate:,.0f} rows/s")
+    return rate
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="get_meal_history 微基准")
+    parser.add_argument("--rows", type=int, default=600, help="写入的用餐记录数")
+    parser.add_argument("--limit", type=int, default=500, help="每次查询的 limit")
+    parser.add_argument("--iterations", type=int, default=200, help="每种路径的执行次数")
+    args = parser.parse_args()
+
+    await database.connect()
+    user_id = str(uuid4())
+    try:
+        await seed(user_id, args.rows)
+        await check_same_payload(user_id, args.limit)
+        before = await measure("before", legacy_get_meal_history, user_id, args.limit, args.iterations)
+        after = await measure("after", prepared_get_meal_history, user_id, args.limit, args.iterations)
+        print(f"提升: {after / before:.2f}x")
+    finally:
+        await database.execute("DELETE FROM users WHERE id = :id", {"id": user_id})
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
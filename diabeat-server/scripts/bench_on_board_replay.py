@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""活性胰岛素（IOB）/ 活性碳水（COB）离线回放基准
+
+用法（不需要数据库和 Redis）：
+
+    python scripts/bench_on_board_replay.py --users 50 --days 30
+
+为每个用户生成一个月的合成注射 / 用药 / 用餐历史，按时间顺序回放：
+每写入一条记录就追加到 MemoryRingStore，每次注射前（剂量计算时）读取一次
+IOB/COB。同时用“每次读取都扫描全部历史”的朴素实现计算同一时刻的结果，
+两者不一致时以非零状态码退出，最后输出两种方式的读取耗时。
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.insulin.on_board import (  # noqa: E402
+    CARBS,
+    INSULIN,
+    MemoryRingStore,
+    compute_on_board,
+    make_event,
+)
+from app.prediction.time_aware_predictor import CARB_PROFILES  # noqa: E402
+
+# 一天中的用餐时间（小时）及碳水范围（克）
+MEALS = [(7.5, 30, 60), (12, 50, 90), (18.5, 50, 100)]
+SNACK_PROBABILITY = 0.4
+
+
+def make_history(user_index: int, days: int, seed: int):
+    """生成按时间排序的事件列表"""
+    rng = random.Random(seed + user_index)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    events = []
+    serial = 0
+
+    def add(kind, at, amount, profile, ref=None):
+        nonlocal serial
+        serial += 1
+        events.append(make_event(kind, f"{user_index}-{serial}", at, amount, profile, ref))
+
+    for day in range(days):
+        base = start + timedelta(days=day)
+        meals = list(MEALS)
+        if rng.random() < SNACK_PROBABILITY:
+            meals.append((rng.uniform(14.5, 16.5), 10, 30))
+        for hour, low, high in meals:
+            meal_at = base + timedelta(hours=hour + rng.uniform(-0.5, 0.5))
+            carbs = round(rng.uniform(low, high), 1)
+            ref = f"n{user_index}-{day}-{hour}"
+            add(CARBS, meal_at, carbs, rng.choice(list(CARB_PROFILES)), ref)
+            if carbs >= 20:
+                injected_at = meal_at - timedelta(minutes=rng.randint(0, 20))
+                add(INSULIN, injected_at, round(carbs / rng.uniform(8, 15), 1), "rapid", f"i{serial}")
+        # 偶尔的纠正剂量
+        if rng.random() < 0.3:
+            add(INSULIN, base + timedelta(hours=rng.uniform(20, 23)), round(rng.uniform(1, 3), 1), "rapid")
+
+    events.sort(key=lambda event: event["t"])
+    return events
+
+
+async def replay(histories):
+    """按时间顺序写入环形缓冲区，每次注射前读取一次"""
+    store = MemoryRingStore(ttl_seconds=10 ** 9)
+    results = []
+    elapsed = 0.0
+    for user_id, events in histories.items():
+        await store.seed(user_id, [])
+        for event in events:
+            if event["k"] == INSULIN:
+                start = time.perf_counter()
+                state = compute_on_board(await store.load(user_id), event["t"])
+                elapsed += time.perf_counter() - start
+                results.append(state)
+            await store.append(user_id, event)
+    return results, elapsed
+
+
+def rescan(histories):
+    """朴素实现：每次读取都扫描该用户此前的全部历史"""
+    results = []
+    elapsed = 0.0
+    for events in histories.values():
+        for index, event in enumerate(events):
+            if event["k"] == INSULIN:
+                start = time.perf_counter()
+                state = compute_on_board(reversed(events[:index]), event["t"])
+                elapsed += time.perf_counter() - start
+                results.append(state)
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IOB/COB 离线回放基准")
+    parser.add_argument("--users", type=int, default=50, help="用户数")
+    parser.add_argument("--days", type=int, default=30, help="每个用户的历史天数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    histories = {f"user-{i}": make_history(i, args.days, args.seed) for i in range(args.users)}
+    total_events = sum(len(events) for events in histories.values())
+
+    ring_results, ring_elapsed = asyncio.run(replay(histories))
+    scan_results, scan_elapsed = rescan(histories)
+
+    mismatches = [
+        (index, ring, scan)
+        for index, (ring, scan) in enumerate(zip(ring_results, scan_results))
+        if ring != scan
+    ]
+    for index, ring, scan in mismatches[:5]:
+        print(f"✗ 第 {index} 次读取不一致\n  环形缓冲区: {ring}\n  全量扫描:   {scan}")
+    if mismatches:
+        print(f"\n{len(mismatches)} 次读取与全量扫描不一致")
+        sys.exit(1)
+
+    reads = len(ring_results)
+    print(f"✓ {args.users} 个用户、{total_events} 条事件、{reads} 次读取，环形缓冲区与全量扫描结果完全一致\n")
+    print(f"{'环形缓冲区':<12} {ring_elapsed * 1000:9.1f} ms  {reads / ring_elapsed:12,.0f} reads/s")
+    print(f"{'全量扫描':<12} {scan_elapsed * 1000:9.1f} ms  {reads / scan_elapsed:12,.0f} reads/s")
+    print(f"\n加速比: {scan_elapsed / ring_elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""向量化预测引擎基准：BloodGlucosePredictor 逐个预测 vs app.prediction.engine 批量预测
+
+用法（不需要数据库）：
+
+    python scripts/bench_prediction_engine.py --scenarios 10000
+
+先在默认时间点上逐个比对两者的结果（预测点、峰值、风险等级、建议），
+不一致时以非零状态码退出；再分别输出默认 6 个时间点和每 5 分钟 / 6 小时
+网格下的 predictions/s（一个场景的一条完整曲线算一次预测）。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.prediction import engine  # noqa: E402
+from app.prediction.predictor import BloodGlucosePredictor  # noqa: E402
+
+ACTIVITY_LEVELS = ["sedentary", "light", "moderate", "vigorous"]
+
+
+def make_scenarios(count: int, seed: int):
+    rng = random.Random(seed)
+    scenarios = []
+    for _ in range(count):
+        scenarios.append((
+            round(rng.uniform(5, 150), 1),
+            round(rng.uniform(0, 15), 1),
+            round(rng.uniform(3, 15), 1),
+            rng.choice([None, 0, 55, 70, round(rng.uniform(20, 100), 1)]),
+            rng.choice(ACTIVITY_LEVELS),
+        ))
+    return scenarios
+
+
+def run_engine(scenarios, time_points):
+    return engine.predict_batch(
+        total_carbs=[s[0] for s in scenarios],
+        insulin_dose=[s[1] for s in scenarios],
+        current_bg=[s[2] for s in scenarios],
+        gi_value=[s[3] for s in scenarios],
+        activity_level=[s[4] for s in scenarios],
+        time_points=time_points
+    )
+
+
+def verify(scenarios) -> int:
+    predictor = BloodGlucosePredictor()
+    batch = run_engine(scenarios, engine.DEFAULT_TIME_POINTS)
+    mismatches = 0
+    for index, (carbs, dose, bg, gi, activity) in enumerate(scenarios):
+        expected = predictor.predict(carbs, dose, bg, gi, activity)
+        actual = batch.result(index)
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"✗ 不一致: {scenarios[index]}\n  标量: {expected}\n  批量: {actual}")
+    return mismatches
+
+
+def bench(label, func, count):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed * 1000:9.1f} ms  {count / elapsed:12,.0f} predictions/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量化预测引擎基准")
+    parser.add_argument("--scenarios", type=int, default=10000, help="场景数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    scenarios = make_scenarios(args.scenarios, args.seed)
+
+    mismatches = verify(scenarios)
+    if mismatches:
+        print(f"\n{mismatches} 个场景与标量实现不一致")
+        sys.exit(1)
+    print(f"✓ {len(scenarios)} 个场景在默认时间点上与标量实现完全一致\n")
+
+    predictor = BloodGlucosePredictor()
+    grid = engine.time_grid(5, 360)
+    count = len(scenarios)
+
+    scalar = bench(
+        "标量 predict（6 点）",
+        lambda: [predictor.predict(*s) for s in scenarios],
+        count
+    )
+    vectorized = bench(
+        "批量 predict_batch（6 点）",
+        lambda: run_engine(scenarios, engine.DEFAULT_TIME_POINTS),
+        count
+    )
+    bench(
+        f"批量 predict_batch（{len(grid)} 点）",
+        lambda: run_engine(scenarios, grid),
+        count
+    )
+    print(f"\n默认时间点加速比: {scalar / vectorized:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""服务启动耗时基准
+
+用法（在 diabeat-server 目录下，需要完整的运行环境）：
+
+    python scripts/bench_startup.py --runs 3
+    python scripts/bench_startup.py --mcp-url http://10.255.255.1:8001   # 模拟 MCP 不可达
+
+启动 uvicorn 子进程，轮询记录三个时间点（从启动进程开始计时）：
+
+- live: /health/live 首次返回 200（开始接受请求，不依赖任何外部服务）
+- ready: /health/ready 首次返回 200（必需依赖——数据库——已连接）
+- mcp: 就绪状态中 MCP 探测完成（成功或首次失败）
+
+默认把 FASTMCP_URL 指向不可路由的地址，验证 MCP 不可达时 live / ready 不受影响。
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+POLL_INTERVAL = 0.02
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get(url: str):
+    """返回 (状态码, JSON)，连接失败返回 (None, None)"""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read())
+        except ValueError:
+            return e.code, None
+    except (OSError, ValueError):
+        return None, None
+
+
+def run_once(args) -> dict:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}/health"
+    env = dict(os.environ, FASTMCP_URL=args.mcp_url)
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    timings = {"live": None, "ready": None, "mcp": None}
+    try:
+        deadline = started + args.timeout
+        while time.perf_counter() < deadline and None in timings.values():
+            if process.poll() is not None:
+                raise RuntimeError(f"服务进程提前退出（退出码 {process.returncode}）")
+            elapsed = time.perf_counter() - started
+            if timings["live"] is None:
+                status, _ = get(f"{base}/live")
+                if status == 200:
+                    timings["live"] = elapsed
+            else:
+                status, body = get(f"{base}/ready")
+                if isinstance(body, dict) and "detail" in body:
+                    body = body["detail"]
+                components = (body or {}).get("components", {})
+                if timings["ready"] is None and status == 200:
+                    timings["ready"] = elapsed
+                if timings["mcp"] is None and components.get("mcp", {}).get("attempts"):
+                    timings["mcp"] = elapsed
+            time.sleep(POLL_INTERVAL)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return timings
+
+
+def fmt(value) -> str:
+    return f"{value:.2f}s" if value is not None else "超时"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0, help="每次启动最多等待的秒数")
+    parser.add_argument("--mcp-url", default="http://10.255.255.1:8001", help="MCP 地址（默认不可路由）")
+    args = parser.parse_args()
+
+    results = []
+    for run in range(args.runs):
+        timings = run_once(args)
+        results.append(timings)
+        print(f"第 {run + 1} 次: live {fmt(timings['live'])}, ready {fmt(timings['ready'])}, mcp {fmt(timings['mcp'])}")
+
+    lives = sorted(r["live"] for r in results if r["live"] is not None)
+    readies = sorted(r["ready"] for r in results if r["ready"] is not None)
+    if lives:
+        print(f"\nlive 中位数: {lives[len(lives) // 2]:.2f}s")
+    if readies:
+        print(f"ready 中位数: {readies[len(readies) // 2]:.2f}s")
+    return 0 if len(lives) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
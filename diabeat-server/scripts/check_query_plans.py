@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""热点查询执行计划回归检查
+
+对 app.records.queries 中登记的每条热点查询（含 app.sync.crud、app.nutrition.rollup、app.insulin.on_board 中登记的查询）执行 EXPLAIN (FORMAT JSON)，
+确认访问记录表时使用了预期的 (user_id, <时间> DESC) 复合索引，而不是
+顺序扫描或其他索引。检查失败时以非零状态码退出，可直接接入 CI。
+
+用法（需要可用的 DATABASE_URL，已执行 scripts/init_db.sh）：
+
+    python scripts/check_query_plans.py
+
+测试库数据量通常很小，规划器会倾向顺序扫描，因此检查时关闭 enable_seqscan，
+只验证“索引可用且被选中”这一点。
+"""
+import asyncio
+import importlib
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Tuple
+from uuid import uuid4
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import asyncpg  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.records import queries  # noqa: E402
+
+# 这些模块在导入时向 queries.REGISTRY 登记各自的查询，只需导入、不直接使用
+# （按模块名导入，pyflakes 不会把只为副作用的导入报告为未使用）
+REGISTERING_MODULES = (
+    "app.sync.crud",              # 同步查询
+    "app.nutrition.rollup",       # 营养汇总查询
+    "app.insulin.on_board",       # 活性胰岛素回填查询
+    "app.prediction.corrections", # 纠正记录查询
+    "app.glucose.stats",          # 每日血糖统计查询
+)
+for _module in REGISTERING_MODULES:
+    importlib.import_module(_module)
+
+# 查询名前缀 -> (表名, 预期索引)
+EXPECTED_INDEXES: List[Tuple[str, str, str]] = [
+    ("meal_records", "meal_records", "idx_meal_records_user_time"),
+    ("last_meal_time", "meal_records", "idx_meal_records_user_time"),
+    ("meal_history", "meal_records", "idx_meal_records_user_time"),
+    ("insulin_records", "insulin_injection_records", "idx_insulin_injection_records_user_time"),
+    ("last_insulin_time", "insulin_injection_records", "idx_insulin_injection_records_user_time"),
+    ("exercise_", "exercise_records", "idx_exercise_records_user_time"),
+    ("water_", "water_records", "idx_water_records_user_time"),
+    ("medication_", "medication_records", "idx_medication_records_user_time"),
+    ("last_medication_time", "medication_records", "idx_medication_records_user_time"),
+    ("sync_meals", "meal_records", "idx_meal_records_user_sync"),
+    ("sync_insulin", "insulin_injection_records", "idx_insulin_injection_records_user_sync"),
+    ("sync_exercises", "exercise_records", "idx_exercise_records_user_sync"),
+    ("sync_water", "water_records", "idx_water_records_user_sync"),
+    ("sync_medications", "medication_records", "idx_medication_records_user_sync"),
+    ("sync_predictions", "bg_predictions", "idx_bg_predictions_user_sync"),
+    ("nutrition_rollup_day", "daily_nutrition_rollup", "daily_nutrition_rollup_pkey"),
+    ("nutrition_rollup_range", "daily_nutrition_rollup", "daily_nutrition_rollup_pkey"),
+    ("nutrition_rollup_trends", "daily_nutrition_rollup", "daily_nutrition_rollup_pkey"),
+    ("onboard_injections", "insulin_injection_records", "idx_insulin_injection_records_user_time"),
+    ("onboard_meals", "meal_records", "idx_meal_records_user_time"),
+    ("correction_list", "blood_glucose_corrections", "idx_bg_corrections_user_time"),
+    ("correction_bias", "user_prediction_bias", "user_prediction_bias_pkey"),
+    ("glucose_stats_range", "glucose_daily_stats", "glucose_daily_stats_pkey"),
+]
+
+# 参数类型 -> 占位值
+SAMPLE_VALUES = {
+    "uuid": lambda: uuid4(),
+    "int2": lambda: 50,
+    "int4": lambda: 50,
+    "int8": lambda: 50,
+    "date": lambda: datetime.utcnow().date(),
+    "timestamp": lambda: datetime.utcnow(),
+    "timestamptz": lambda: datetime.utcnow().astimezone(),
+    "text": lambda: "week",
+    "varchar": lambda: "",
+}
+
+
+def _expected_for(name: str) -> Tuple[str, str]:
+    for prefix, table, index in EXPECTED_INDEXES:
+        if name.startswith(prefix):
+            return table, index
+    raise KeyError(name)
+
+
+def _walk(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _walk(child)
+
+
+async def check_query(conn: asyncpg.Connection, query: queries.PreparedQuery) -> List[str]:
+    """检查单条查询，返回问题列表"""
+    table, index = _expected_for(query.name)
+    statement = await conn.prepare(query.sql)
+    args = [SAMPLE_VALUES[param.name]() for param in statement.get_parameters()]
+    raw_plan = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query.sql}", *args)
+    plan = (json.loads(raw_plan) if isinstance(raw_plan, str) else raw_plan)[0]["Plan"]
+
+    problems = []
+    for node in _walk(plan):
+        if node.get("Relation Name") != table:
+            continue
+        node_type = node.get("Node Type")
+        used_index = node.get("Index Name")
+        if node_type == "Bitmap Heap Scan":
+            # 位图扫描的索引名在子节点 Bitmap Index Scan 上
+            used_index = next(
+                (child.get("Index Name") for child in _walk(node) if child.get("Index Name")),
+                None
+            )
+        if used_index != index:
+            problems.append(f"{table}: {node_type} {used_index or ''}".strip() + f"（预期 {index}）")
+    return problems
+
+
+async def main() -> int:
+    dsn = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+    conn = await asyncpg.connect(dsn)
+    failures = 0
+    try:
+        await conn.execute("SET enable_seqscan = off")
+        for query in queries.REGISTRY.values():
+            try:
+                _expected_for(query.name)
+            except KeyError:
+                print(f"- {query.name}: 未配置预期索引，跳过")
+                continue
+            problems = await check_query(conn, query)
+            if problems:
+                failures += 1
+                print(f"✗ {query.name}: " + "; ".join(problems))
+            else:
+                print(f"✓ {query.name}")
+    finally:
+        await conn.close()
+
+    if failures:
+        print(f"\n{failures} 条查询未使用预期索引")
+        return 1
+    print("\n所有热点查询均使用预期索引")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -66,5 +66,29 @@ echo "✓ 用户设备表创建完成"
 PGPASSWORD=$DB_PASS psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -f "$SQL_DIR/nutrition_foods_data.sql"
 echo "✓ 营养成分数据库扩展完成"
 
+PGPASSWORD=$DB_PASS psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -f "$SQL_DIR/migrations/add_exercise_water_medication_records.sql"
+echo "✓ 运动/水分/用药记录表创建完成"
+
+PGPASSWORD=$DB_PASS psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -f "$SQL_DIR/migrations/add_records_composite_indexes.sql"
+echo "✓ 记录表复合索引创建完成"
+
+PGPASSWORD=$DB_PASS psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -f "$SQL_DIR/migrations/add_sync_versions.sql"
+echo "✓ 增量同步版本列创建完成"
+
+PGPASSWORD=$DB_PASS psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -f "$SQL_DIR/migrations/add_daily_nutrition_rollup.sql"
+echo "✓ 每日营养汇总表创建完成"
+
+PGPASSWORD=$DB_PASS psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -f "$SQL_DIR/migrations/add_bg_corrections.sql"
+echo "✓ 血糖纠正记录表创建完成"
+
+PGPASSWORD=$DB_PASS psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -f "$SQL_DIR/migrations/add_glucose_readings.sql"
+echo "✓ 连续血糖读数分区表创建完成"
+
+PGPASSWORD=$DB_PASS psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -f "$SQL_DIR/migrations/add_glucose_daily_stats.sql"
+echo "✓ 每日血糖统计表创建完成"
+
+PGPASSWORD=$DB_PASS psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -f "$SQL_DIR/migrations/add_profile_version.sql"
+echo "✓ 用户资料版本列创建完成"
+
 echo "数据库初始化完成！"
 
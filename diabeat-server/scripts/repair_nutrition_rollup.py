@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""每日营养汇总回填 / 修复
+
+按 meal_records + nutrition_records 重算 daily_nutrition_rollup，只改写
+有偏差的行。服务运行时会每小时修复最近两天，这个脚本用于全量回填或修复
+更早的历史数据。
+
+用法（需要可用的 DATABASE_URL，已执行 scripts/init_db.sh）：
+
+    python scripts/repair_nutrition_rollup.py --days 30
+    python scripts/repair_nutrition_rollup.py --start 2024-01-01 --end 2024-12-31
+
+修复期间会阻塞用餐记录写入，大范围回填按 --chunk-days 分段执行，
+每段单独加锁，避免长时间阻塞线上写入。
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.database import database  # noqa: E402
+from app.nutrition import rollup  # noqa: E402
+
+
+def _parse_date(value: str):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="每日营养汇总回填 / 修复")
+    parser.add_argument("--days", type=int, default=rollup.REPAIR_RECENT_DAYS, help="修复最近的天数（含今天）")
+    parser.add_argument("--start", type=_parse_date, help="开始日期 YYYY-MM-DD（指定后忽略 --days）")
+    parser.add_argument("--end", type=_parse_date, help="结束日期 YYYY-MM-DD（默认今天）")
+    parser.add_argument("--chunk-days", type=int, default=31, help="每次加锁修复的天数")
+    args = parser.parse_args()
+
+    end_date = args.end or datetime.utcnow().date()
+    start_date = args.start or end_date - timedelta(days=args.days - 1)
+
+    await database.connect()
+    try:
+        upserted = deleted = 0
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + timedelta(days=args.chunk_days - 1), end_date)
+            result = await rollup.repair_daily_rollup(chunk_start, chunk_end)
+            upserted += result["upserted"]
+            deleted += result["deleted"]
+            chunk_start = chunk_end + timedelta(days=1)
+        print(f"{start_date} ~ {end_date}: 更新 {upserted} 行, 删除 {deleted} 行")
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
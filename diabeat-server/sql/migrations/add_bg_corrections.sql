@@ -0,0 +1,32 @@
+-- 血糖预测纠正记录与每用户预测偏差统计
+-- 实测血糖仍写入 actual_blood_glucose，与预测的关联（预测ID、时间点、
+-- 预测值、差值）保存在 blood_glucose_corrections 中
+-- user_prediction_bias 保存偏差的指数加权移动平均（EWMA）和纠正次数，
+-- 每次提交纠正时在同一事务中 O(1) 更新，预测时无需回扫纠正记录
+
+CREATE TABLE IF NOT EXISTS blood_glucose_corrections (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    actual_bg_id UUID NOT NULL REFERENCES actual_blood_glucose(id) ON DELETE CASCADE,
+    prediction_id UUID REFERENCES bg_predictions(id) ON DELETE SET NULL,
+    prediction_time_minutes INTEGER, -- 纠正的预测时间点（分钟）
+    predicted_value DECIMAL(4,1), -- 预测值 (mmol/L)，无关联预测时为空
+    actual_value DECIMAL(4,1) NOT NULL, -- 实测值 (mmol/L)
+    difference DECIMAL(5,2), -- 实测值 - 预测值，无关联预测时为空
+    measured_at TIMESTAMP NOT NULL,
+    source VARCHAR(20) NOT NULL DEFAULT 'manual', -- 'manual', 'cgm', 'meter'
+    note TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_bg_corrections_user_time
+    ON blood_glucose_corrections(user_id, measured_at DESC);
+CREATE INDEX IF NOT EXISTS idx_bg_corrections_prediction_id
+    ON blood_glucose_corrections(prediction_id);
+
+CREATE TABLE IF NOT EXISTS user_prediction_bias (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    bias DOUBLE PRECISION NOT NULL DEFAULT 0, -- 偏差 EWMA (mmol/L)，正值表示实测偏高
+    correction_count INTEGER NOT NULL DEFAULT 0, -- 有关联预测的纠正次数
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,135 @@
+-- 每日营养摄入汇总表（增量维护）
+-- 今日摄入与多日趋势直接按 (user_id, date) 主键读取，不再对
+-- meal_records JOIN nutrition_records 做 SUM 聚合
+-- 日期按 meal_time（UTC，不带时区）的自然日划分
+-- 由触发器在写入用餐记录 / 修改营养记录时增量累加，
+-- app/nutrition/rollup.py 中的修复任务负责回填和纠偏
+
+CREATE TABLE IF NOT EXISTS daily_nutrition_rollup (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    date DATE NOT NULL,
+    total_calories DECIMAL(10,2) NOT NULL DEFAULT 0, -- 总热量 (kcal)
+    total_carbs DECIMAL(10,2) NOT NULL DEFAULT 0, -- 总碳水化合物 (g)
+    total_net_carbs DECIMAL(10,2) NOT NULL DEFAULT 0, -- 净碳水化合物 (g)
+    total_protein DECIMAL(10,2) NOT NULL DEFAULT 0, -- 蛋白质 (g)
+    total_fat DECIMAL(10,2) NOT NULL DEFAULT 0, -- 脂肪 (g)
+    total_fiber DECIMAL(10,2) NOT NULL DEFAULT 0, -- 膳食纤维 (g)
+    meal_count INTEGER NOT NULL DEFAULT 0, -- 用餐次数
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, date)
+);
+
+-- 营养记录修改时按 nutrition_record_id 查找引用它的用餐记录
+CREATE INDEX IF NOT EXISTS idx_meal_records_nutrition_record_id ON meal_records(nutrition_record_id);
+
+-- 将一条用餐记录的营养累加（p_sign = 1）或扣除（p_sign = -1）到对应日期
+CREATE OR REPLACE FUNCTION rollup_add_meal(p_user_id UUID, p_date DATE, p_nutrition_record_id UUID, p_sign INTEGER)
+RETURNS void AS $$
+BEGIN
+    INSERT INTO daily_nutrition_rollup AS r (
+        user_id, date, total_calories, total_carbs, total_net_carbs,
+        total_protein, total_fat, total_fiber, meal_count
+    )
+    SELECT
+        p_user_id,
+        p_date,
+        p_sign * COALESCE(nr.calories, 0),
+        p_sign * COALESCE(nr.total_carbs, 0),
+        p_sign * COALESCE(nr.net_carbs, 0),
+        p_sign * COALESCE(nr.protein, 0),
+        p_sign * COALESCE(nr.fat, 0),
+        p_sign * COALESCE(nr.fiber, 0),
+        p_sign
+    FROM (SELECT 1) AS one
+    LEFT JOIN nutrition_records nr ON nr.id = p_nutrition_record_id
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        total_calories = r.total_calories + EXCLUDED.total_calories,
+        total_carbs = r.total_carbs + EXCLUDED.total_carbs,
+        total_net_carbs = r.total_net_carbs + EXCLUDED.total_net_carbs,
+        total_protein = r.total_protein + EXCLUDED.total_protein,
+        total_fat = r.total_fat + EXCLUDED.total_fat,
+        total_fiber = r.total_fiber + EXCLUDED.total_fiber,
+        meal_count = r.meal_count + EXCLUDED.meal_count,
+        updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_meal_record_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM rollup_add_meal(OLD.user_id, OLD.meal_time::date, OLD.nutrition_record_id, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM rollup_add_meal(NEW.user_id, NEW.meal_time::date, NEW.nutrition_record_id, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_meal_records_rollup ON meal_records;
+CREATE TRIGGER trg_meal_records_rollup AFTER INSERT OR DELETE ON meal_records
+    FOR EACH ROW EXECUTE FUNCTION rollup_meal_record_change();
+
+-- 只有影响汇总的列变化时才重新累加（同步重复上传等无变化更新不产生写入）
+DROP TRIGGER IF EXISTS trg_meal_records_rollup_update ON meal_records;
+CREATE TRIGGER trg_meal_records_rollup_update AFTER UPDATE OF user_id, meal_time, nutrition_record_id ON meal_records
+    FOR EACH ROW
+    WHEN ((OLD.user_id, OLD.meal_time, OLD.nutrition_record_id) IS DISTINCT FROM (NEW.user_id, NEW.meal_time, NEW.nutrition_record_id))
+    EXECUTE FUNCTION rollup_meal_record_change();
+
+-- 营养记录被修正时，把差值乘以引用次数累加到相关日期
+CREATE OR REPLACE FUNCTION rollup_nutrition_record_change() RETURNS trigger AS $$
+BEGIN
+    UPDATE daily_nutrition_rollup r SET
+        total_calories = r.total_calories + (COALESCE(NEW.calories, 0) - COALESCE(OLD.calories, 0)) * m.meals,
+        total_carbs = r.total_carbs + (COALESCE(NEW.total_carbs, 0) - COALESCE(OLD.total_carbs, 0)) * m.meals,
+        total_net_carbs = r.total_net_carbs + (COALESCE(NEW.net_carbs, 0) - COALESCE(OLD.net_carbs, 0)) * m.meals,
+        total_protein = r.total_protein + (COALESCE(NEW.protein, 0) - COALESCE(OLD.protein, 0)) * m.meals,
+        total_fat = r.total_fat + (COALESCE(NEW.fat, 0) - COALESCE(OLD.fat, 0)) * m.meals,
+        total_fiber = r.total_fiber + (COALESCE(NEW.fiber, 0) - COALESCE(OLD.fiber, 0)) * m.meals,
+        updated_at = CURRENT_TIMESTAMP
+    FROM (
+        SELECT user_id, meal_time::date AS date, COUNT(*) AS meals
+        FROM meal_records
+        WHERE nutrition_record_id = NEW.id
+        GROUP BY user_id, meal_time::date
+    ) m
+    WHERE r.user_id = m.user_id AND r.date = m.date;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_nutrition_records_rollup ON nutrition_records;
+CREATE TRIGGER trg_nutrition_records_rollup AFTER UPDATE OF calories, total_carbs, net_carbs, protein, fat, fiber ON nutrition_records
+    FOR EACH ROW
+    WHEN ((OLD.calories, OLD.total_carbs, OLD.net_carbs, OLD.protein, OLD.fat, OLD.fiber)
+          IS DISTINCT FROM (NEW.calories, NEW.total_carbs, NEW.net_carbs, NEW.protein, NEW.fat, NEW.fiber))
+    EXECUTE FUNCTION rollup_nutrition_record_change();
+
+-- 回填已有数据（重复执行时按源数据重算）
+INSERT INTO daily_nutrition_rollup AS r (
+    user_id, date, total_calories, total_carbs, total_net_carbs,
+    total_protein, total_fat, total_fiber, meal_count
+)
+SELECT
+    mr.user_id,
+    mr.meal_time::date,
+    COALESCE(SUM(nr.calories), 0),
+    COALESCE(SUM(nr.total_carbs), 0),
+    COALESCE(SUM(nr.net_carbs), 0),
+    COALESCE(SUM(nr.protein), 0),
+    COALESCE(SUM(nr.fat), 0),
+    COALESCE(SUM(nr.fiber), 0),
+    COUNT(*)
+FROM meal_records mr
+LEFT JOIN nutrition_records nr ON mr.nutrition_record_id = nr.id
+GROUP BY mr.user_id, mr.meal_time::date
+ON CONFLICT (user_id, date) DO UPDATE SET
+    total_calories = EXCLUDED.total_calories,
+    total_carbs = EXCLUDED.total_carbs,
+    total_net_carbs = EXCLUDED.total_net_carbs,
+    total_protein = EXCLUDED.total_protein,
+    total_fat = EXCLUDED.total_fat,
+    total_fiber = EXCLUDED.total_fiber,
+    meal_count = EXCLUDED.meal_count,
+    updated_at = CURRENT_TIMESTAMP;
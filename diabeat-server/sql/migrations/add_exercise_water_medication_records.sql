@@ -0,0 +1,52 @@
+-- DiabEat AI - 运动、水分、用药记录表结构
+-- 这三张表此前只在代码中使用，没有对应的 DDL
+-- 所有热点查询都是 WHERE user_id = ? ORDER BY <时间> DESC，因此只建 (user_id, <时间> DESC) 复合索引，
+-- 并用 INCLUDE 覆盖汇总/提醒查询需要的列，使其可以走 Index Only Scan
+
+-- 创建运动记录表
+CREATE TABLE IF NOT EXISTS exercise_records (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    exercise_time TIMESTAMP NOT NULL,
+    exercise_type VARCHAR(50) NOT NULL, -- 'walking', 'running', 'cycling', 'swimming', 'gym', 'yoga', 'dancing', 'other'
+    duration_minutes INTEGER NOT NULL, -- 运动时长（分钟）
+    intensity VARCHAR(20) NOT NULL DEFAULT 'moderate', -- 'light', 'moderate', 'vigorous'
+    calories_burned DECIMAL(7,1) NOT NULL DEFAULT 0, -- 消耗热量 (kcal)
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 创建水分记录表
+CREATE TABLE IF NOT EXISTS water_records (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    record_time TIMESTAMP NOT NULL,
+    amount_ml INTEGER NOT NULL, -- 摄入量（毫升）
+    water_type VARCHAR(20) NOT NULL DEFAULT 'water', -- 'water', 'tea', 'coffee', 'juice', 'other'
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 创建用药记录表
+CREATE TABLE IF NOT EXISTS medication_records (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    medication_time TIMESTAMP NOT NULL,
+    medication_type VARCHAR(30) NOT NULL, -- 'insulin', 'oral_medication', 'other'
+    medication_name VARCHAR(100) NOT NULL,
+    dosage DECIMAL(7,2) NOT NULL, -- 剂量
+    dosage_unit VARCHAR(20) NOT NULL, -- 'units', 'mg', 'ml', 'tablets'
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 创建复合索引（含覆盖列）
+-- 运动：今日汇总累加时长/热量
+CREATE INDEX IF NOT EXISTS idx_exercise_records_user_time
+    ON exercise_records(user_id, exercise_time DESC) INCLUDE (duration_minutes, calories_burned);
+-- 水分：今日汇总累加摄入量
+CREATE INDEX IF NOT EXISTS idx_water_records_user_time
+    ON water_records(user_id, record_time DESC) INCLUDE (amount_ml);
+-- 用药：SmartReminderService 取最近一次用药时间和类型
+CREATE INDEX IF NOT EXISTS idx_medication_records_user_time
+    ON medication_records(user_id, medication_time DESC) INCLUDE (medication_type);
@@ -0,0 +1,26 @@
+-- 每日血糖统计（CGM 分析报告的预计算数据）
+-- 每个用户每天一行，由 app/glucose/stats.py 在读数写入后按天重算
+-- 日期和小时按 measured_at（UTC，不带时区）划分
+-- 血糖分档（mmol/L）：very_low < 3.0 <= low < 3.9 <= in_range <= 10.0 < high <= 13.9 < very_high
+-- hourly_histogram：24 小时 x 170 个 0.2 mmol/L 区间（从 1.0 开始）的读数计数，
+-- 小端 uint16 按行展开，用于计算 AGP 百分位带
+
+CREATE TABLE IF NOT EXISTS glucose_daily_stats (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    date DATE NOT NULL,
+    reading_count INTEGER NOT NULL, -- 读数数量
+    bg_sum DOUBLE PRECISION NOT NULL, -- 血糖值之和
+    bg_sum_sq DOUBLE PRECISION NOT NULL, -- 血糖值平方和（计算标准差）
+    bg_min REAL NOT NULL,
+    bg_max REAL NOT NULL,
+    very_low_count INTEGER NOT NULL,
+    low_count INTEGER NOT NULL,
+    in_range_count INTEGER NOT NULL,
+    high_count INTEGER NOT NULL,
+    very_high_count INTEGER NOT NULL,
+    hypo_events INTEGER NOT NULL, -- 低血糖事件（< 3.9 持续 15 分钟以上）
+    hyper_events INTEGER NOT NULL, -- 高血糖事件（> 13.9 持续 15 分钟以上）
+    hourly_histogram BYTEA NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, date)
+);
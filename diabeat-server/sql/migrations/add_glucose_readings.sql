@@ -0,0 +1,40 @@
+-- 连续血糖（CGM）读数表，按测量时间按月分区
+-- CGM 每 1-5 分钟一条读数（每用户每天 288-1440 条），由批量写入接口
+-- （app/glucose/ingest.py）以多行 INSERT 写入，(user_id, measured_at) 去重
+-- 指尖血糖和预测纠正仍写入 actual_blood_glucose（纠正记录按 id 引用它）
+-- 时间为 UTC，不带时区；分区按需由 ensure_glucose_partition 创建
+
+CREATE TABLE IF NOT EXISTS glucose_readings (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    measured_at TIMESTAMP NOT NULL,
+    bg_value REAL NOT NULL, -- 血糖值 (mmol/L)
+    source VARCHAR(20) NOT NULL DEFAULT 'cgm', -- 'cgm', 'meter', 'manual'
+    device_id VARCHAR(64), -- 设备标识
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, measured_at)
+) PARTITION BY RANGE (measured_at);
+
+-- 创建 p_month 所在月份的分区（已存在时不做任何操作）
+-- 多个进程可能同时为同一月份建分区，用事务级咨询锁串行化
+CREATE OR REPLACE FUNCTION ensure_glucose_partition(p_month DATE)
+RETURNS void AS $$
+DECLARE
+    v_start DATE := date_trunc('month', p_month)::date;
+    v_end DATE := (date_trunc('month', p_month) + INTERVAL '1 month')::date;
+    v_name TEXT := 'glucose_readings_' || to_char(v_start, 'YYYYMM');
+BEGIN
+    IF to_regclass(v_name) IS NOT NULL THEN
+        RETURN;
+    END IF;
+    PERFORM pg_advisory_xact_lock(hashtext('glucose_readings_partition'));
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF glucose_readings FOR VALUES FROM (%L) TO (%L)',
+        v_name, v_start, v_end
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- 预先创建上月到下月的分区
+SELECT ensure_glucose_partition((CURRENT_DATE - INTERVAL '1 month')::date);
+SELECT ensure_glucose_partition(CURRENT_DATE);
+SELECT ensure_glucose_partition((CURRENT_DATE + INTERVAL '1 month')::date);
@@ -0,0 +1,6 @@
+-- 用户资料版本号
+-- update_user_info / update_user_parameters 每次修改时递增，
+-- 每日营养方案按 (user_id, 资料版本, 参数版本) 缓存，版本变化后重新计算
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS profile_version INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE user_parameters ADD COLUMN IF NOT EXISTS profile_version INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,13 @@
+-- 用餐/胰岛素注射记录改用 (user_id, <时间> DESC) 复合索引
+-- 原有 user_id 单列索引被复合索引的前导列完全覆盖，删除以减少写入开销
+
+-- 用餐：覆盖 nutrition_record_id，今日营养汇总在 meal_records 一侧可走 Index Only Scan
+CREATE INDEX IF NOT EXISTS idx_meal_records_user_time
+    ON meal_records(user_id, meal_time DESC) INCLUDE (nutrition_record_id);
+
+-- 胰岛素注射：覆盖 actual_dose，活性胰岛素等剂量汇总无需回表
+CREATE INDEX IF NOT EXISTS idx_insulin_injection_records_user_time
+    ON insulin_injection_records(user_id, injection_time DESC) INCLUDE (actual_dose);
+
+DROP INDEX IF EXISTS idx_meal_records_user_id;
+DROP INDEX IF EXISTS idx_insulin_injection_records_user_id;
@@ -0,0 +1,71 @@
+-- 增量同步：为记录表增加行级变更版本
+-- sync_txid    写入该行的事务ID（txid_current()），用于计算“已确定提交”的安全水位
+-- sync_version 全局递增序列号，同一事务内的稳定排序
+-- updated_at   最近一次修改时间
+-- 同步时只返回 sync_txid 小于当前快照 xmin 的行（这些事务已全部结束），
+-- 因此不会因为序列号分配顺序与提交顺序不一致而漏掉变更
+
+CREATE SEQUENCE IF NOT EXISTS record_sync_seq;
+
+CREATE OR REPLACE FUNCTION touch_sync_version() RETURNS trigger AS $$
+BEGIN
+    NEW.sync_txid := txid_current();
+    NEW.sync_version := nextval('record_sync_seq');
+    NEW.updated_at := CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 用餐记录
+ALTER TABLE meal_records ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE meal_records ADD COLUMN IF NOT EXISTS sync_txid BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE meal_records ADD COLUMN IF NOT EXISTS sync_version BIGINT NOT NULL DEFAULT nextval('record_sync_seq');
+DROP TRIGGER IF EXISTS trg_meal_records_sync ON meal_records;
+CREATE TRIGGER trg_meal_records_sync BEFORE INSERT OR UPDATE ON meal_records
+    FOR EACH ROW EXECUTE FUNCTION touch_sync_version();
+CREATE INDEX IF NOT EXISTS idx_meal_records_user_sync ON meal_records(user_id, sync_txid, sync_version);
+
+-- 胰岛素注射记录
+ALTER TABLE insulin_injection_records ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE insulin_injection_records ADD COLUMN IF NOT EXISTS sync_txid BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE insulin_injection_records ADD COLUMN IF NOT EXISTS sync_version BIGINT NOT NULL DEFAULT nextval('record_sync_seq');
+DROP TRIGGER IF EXISTS trg_insulin_injection_records_sync ON insulin_injection_records;
+CREATE TRIGGER trg_insulin_injection_records_sync BEFORE INSERT OR UPDATE ON insulin_injection_records
+    FOR EACH ROW EXECUTE FUNCTION touch_sync_version();
+CREATE INDEX IF NOT EXISTS idx_insulin_injection_records_user_sync ON insulin_injection_records(user_id, sync_txid, sync_version);
+
+-- 运动记录
+ALTER TABLE exercise_records ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE exercise_records ADD COLUMN IF NOT EXISTS sync_txid BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE exercise_records ADD COLUMN IF NOT EXISTS sync_version BIGINT NOT NULL DEFAULT nextval('record_sync_seq');
+DROP TRIGGER IF EXISTS trg_exercise_records_sync ON exercise_records;
+CREATE TRIGGER trg_exercise_records_sync BEFORE INSERT OR UPDATE ON exercise_records
+    FOR EACH ROW EXECUTE FUNCTION touch_sync_version();
+CREATE INDEX IF NOT EXISTS idx_exercise_records_user_sync ON exercise_records(user_id, sync_txid, sync_version);
+
+-- 水分记录
+ALTER TABLE water_records ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE water_records ADD COLUMN IF NOT EXISTS sync_txid BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE water_records ADD COLUMN IF NOT EXISTS sync_version BIGINT NOT NULL DEFAULT nextval('record_sync_seq');
+DROP TRIGGER IF EXISTS trg_water_records_sync ON water_records;
+CREATE TRIGGER trg_water_records_sync BEFORE INSERT OR UPDATE ON water_records
+    FOR EACH ROW EXECUTE FUNCTION touch_sync_version();
+CREATE INDEX IF NOT EXISTS idx_water_records_user_sync ON water_records(user_id, sync_txid, sync_version);
+
+-- 用药记录
+ALTER TABLE medication_records ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE medication_records ADD COLUMN IF NOT EXISTS sync_txid BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE medication_records ADD COLUMN IF NOT EXISTS sync_version BIGINT NOT NULL DEFAULT nextval('record_sync_seq');
+DROP TRIGGER IF EXISTS trg_medication_records_sync ON medication_records;
+CREATE TRIGGER trg_medication_records_sync BEFORE INSERT OR UPDATE ON medication_records
+    FOR EACH ROW EXECUTE FUNCTION touch_sync_version();
+CREATE INDEX IF NOT EXISTS idx_medication_records_user_sync ON medication_records(user_id, sync_txid, sync_version);
+
+-- 血糖预测（只读同步）
+ALTER TABLE bg_predictions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE bg_predictions ADD COLUMN IF NOT EXISTS sync_txid BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE bg_predictions ADD COLUMN IF NOT EXISTS sync_version BIGINT NOT NULL DEFAULT nextval('record_sync_seq');
+DROP TRIGGER IF EXISTS trg_bg_predictions_sync ON bg_predictions;
+CREATE TRIGGER trg_bg_predictions_sync BEFORE INSERT OR UPDATE ON bg_predictions
+    FOR EACH ROW EXECUTE FUNCTION touch_sync_version();
+CREATE INDEX IF NOT EXISTS idx_bg_predictions_user_sync ON bg_predictions(user_id, sync_txid, sync_version);